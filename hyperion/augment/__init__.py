@@ -7,3 +7,4 @@ from .speech_augment import SpeechAugment
 from .speed_augment import SpeedAugment
 from .noise_augment import NoiseAugment
 from .reverb_augment import ReverbAugment
+from .wav_bank import WavBank
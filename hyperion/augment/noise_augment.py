@@ -13,6 +13,7 @@ import numpy as np
 
 from ..hyp_defs import float_cpu
 from ..io import RandomAccessAudioReader as AR
+from .wav_bank import WavBank
 
 
 class SingleNoiseAugment(object):
@@ -25,6 +26,10 @@ class SingleNoiseAugment(object):
                   to the noise wav files.
       min_snr: mininimum SNR(dB) to sample from.
       max_snr: maximum SNR(dB) to sample from.
+      bank_path: directory of a memory-mapped noise bank shared by all
+                 the processes, it is created if it doesn't exist.
+                 If None, noises are read from noise_path on each call.
+      bank_dtype: data type of the noise bank (float32 or float16).
       rng:     Random number generator returned by 
                np.random.RandomState (optional)
     """
@@ -33,6 +38,8 @@ class SingleNoiseAugment(object):
                  noise_path,
                  min_snr,
                  max_snr,
+                 bank_path=None,
+                 bank_dtype='float32',
                  random_seed=112358,
                  rng=None):
         logging.info(
@@ -40,8 +47,15 @@ class SingleNoiseAugment(object):
                 noise_type, noise_path, min_snr, max_snr))
 
         self.noise_type = noise_type
-        self.r = AR(noise_path)
-        self.noise_keys = self.r.keys
+        if bank_path is None:
+            self.r = AR(noise_path)
+            self.bank = None
+            self.noise_keys = self.r.keys
+        else:
+            self.r = None
+            self.bank = WavBank.create_from_audio(noise_path, bank_path,
+                                                  bank_dtype)
+            self.noise_keys = self.bank.keys
         self.min_snr = min_snr
         self.max_snr = max_snr
         self.cache = None
@@ -83,9 +97,13 @@ class SingleNoiseAugment(object):
         while noise is None or noise.shape[0] < num_samples:
             with self.lock:
                 noise_idx = self.rng.randint(len(self.noise_keys))
-                key = self.noise_keys[noise_idx]
-                noise_k, fs_k = self.r.read([key])
-                noise_k = noise_k[0]
+                if self.bank is None:
+                    key = self.noise_keys[noise_idx]
+                    noise_k, fs_k = self.r.read([key])
+                    noise_k = noise_k[0]
+
+            if self.bank is not None:
+                noise_k = self.bank.read(noise_idx)
 
             if noise is None:
                 need_samples = min(x.shape[0], noise_k.shape[0])
@@ -119,7 +137,8 @@ class NoiseAugment(object):
       noise_prob: probability of adding noise
       noise_types: dictionary of options with one entry per noise-type,
                   Each entry is also a dictiory with the following entries:
-                  weight, max_snr, min_snr, noise_path. The weight parameter
+                  weight, max_snr, min_snr, noise_path and optionally
+                  bank_path and bank_dtype. The weight parameter
                   is proportional to how often we want to sample a given noise 
                   type.
       rng:     Random number generator returned by 
@@ -140,6 +159,8 @@ class NoiseAugment(object):
                                      opts['noise_path'],
                                      opts['min_snr'],
                                      opts['max_snr'],
+                                     bank_path=opts.get('bank_path', None),
+                                     bank_dtype=opts.get('bank_dtype', 'float32'),
                                      random_seed=random_seed,
                                      rng=rng)
             augmenters.append(aug)
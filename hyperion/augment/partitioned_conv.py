@@ -0,0 +1,218 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import os
+import logging
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import scipy.fft as sp_fft
+
+from ..hyp_defs import float_cpu
+
+
+def partition_spectra(h, block_size):
+    """Splits a filter in partitions of block_size samples and computes
+    the spectrum of each partition zero-padded to 2 x block_size.
+
+    Args:
+      h: filter impulse response.
+      block_size: partition size.
+
+    Returns:
+      Complex matrix with shape (num_partitions, block_size+1).
+    """
+    num_parts = int(math.ceil(len(h) / block_size))
+    h_pad = np.zeros((num_parts, 2 * block_size), dtype="float32")
+    h_pad[:, :block_size] = np.pad(h, (0, num_parts * block_size - len(h))).reshape(
+        num_parts, block_size
+    )
+    return sp_fft.rfft(h_pad, axis=-1).astype("complex64", copy=False)
+
+
+def partitioned_convolve(x, H, block_size, num_samples=None):
+    """Convolves a signal with a filter using uniformly partitioned
+    overlap-save.
+
+    Args:
+      x: input signal.
+      H: partition spectra of the filter from partition_spectra.
+      block_size: partition size.
+      num_samples: number of output samples to compute, by default
+                   the full convolution length.
+
+    Returns:
+      First num_samples samples of the convolution of x and the filter.
+    """
+    num_parts = H.shape[0]
+    if num_samples is None:
+        num_samples = len(x) + num_parts * block_size - 1
+
+    B = block_size
+    num_blocks = int(math.ceil(num_samples / B))
+    # frame k contains input blocks k-1 and k
+    x_pad = np.zeros(((num_blocks + 1) * B,), dtype="float32")
+    n = min(len(x), num_blocks * B)
+    x_pad[B : B + n] = x[:n]
+    s = x_pad.strides[0]
+    frames = as_strided(x_pad, shape=(num_blocks, 2 * B), strides=(B * s, s))
+    X = sp_fft.rfft(frames, axis=-1)
+
+    # Y_k = sum_p X_{k-p} H_p
+    Y = X * H[0]
+    for p in range(1, min(num_parts, num_blocks)):
+        Y[p:] += X[:-p] * H[p]
+
+    y = sp_fft.irfft(Y, n=2 * B, axis=-1, overwrite_x=True)[:, B:]
+    return y.ravel()[:num_samples]
+
+
+def _conv_cost(num_samples, rir_length, block_size):
+    num_blocks = math.ceil(num_samples / block_size)
+    num_parts = math.ceil(rir_length / block_size)
+    fft_cost = 2 * 2 * block_size * math.log2(2 * block_size)
+    mac_cost = 4 * num_parts * (block_size + 1)
+    return num_blocks * (fft_cost + mac_cost)
+
+
+class PartitionedRIRBank(object):
+    """Stores the spectra of the uniformly partitioned RIRs
+    of a WavBank for a set of partition sizes, to convolve
+    signals with the RIRs without computing the RIR FFTs every time.
+
+    The peak sample of each RIR (direct path) is removed from
+    the stored partitions, the convolution with the direct path is a
+    scaled and delayed copy of the input, added afterwards.
+    In this way, the signal-to-reverberation ratio is obtained
+    from the energies of the input and the reverberant tail without
+    extra passes over the signals.
+
+    When bank_path is given, the spectra are stored in
+    <bank_path>/spec_<block_size>.bin and memory-mapped,
+    so they are shared by all the processes.
+
+    Attributes:
+      rir_bank: WavBank with the RIRs and their peak statistics.
+      block_sizes: list of partition sizes.
+      bank_path: directory of the RIR bank (optional).
+    """
+
+    def __init__(self, rir_bank, block_sizes=[256, 1024, 4096], bank_path=None):
+        assert rir_bank.has_stats
+        self.rir_bank = rir_bank
+        self.block_sizes = block_sizes
+        self.bank_path = bank_path
+        self.part_offsets = {}
+        self.num_parts = {}
+        self.spectra = {}
+        for B in block_sizes:
+            num_parts = (rir_bank.lengths + B - 1) // B
+            self.num_parts[B] = num_parts
+            self.part_offsets[B] = np.concatenate(([0], np.cumsum(num_parts)[:-1]))
+            self.spectra[B] = self._create_spectra(B, bank_path)
+
+    def __getstate__(self):
+        # memory-mapped spectra are reopened instead of copied
+        # when sent to other processes
+        if self.bank_path is not None:
+            return {
+                "rir_bank": self.rir_bank,
+                "block_sizes": self.block_sizes,
+                "bank_path": self.bank_path,
+            }
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if "spectra" not in state:
+            self.__init__(**state)
+        else:
+            self.__dict__.update(state)
+
+    def _compute_spectra(self, B, spectra):
+        for i in range(len(self.rir_bank)):
+            offset = self.part_offsets[B][i]
+            spectra[offset : offset + self.num_parts[B][i]] = partition_spectra(
+                self._read_tail(i), B
+            )
+
+    def _create_spectra(self, B, bank_path):
+        shape = (int(np.sum(self.num_parts[B])), B + 1)
+        if bank_path is None:
+            spectra = np.zeros(shape, dtype="complex64")
+            self._compute_spectra(B, spectra)
+            return spectra
+
+        file_path = os.path.join(bank_path, "spec_%d.bin" % B)
+        if not os.path.isfile(file_path):
+            logging.info("building RIR partition spectra %s" % (file_path))
+            # we write in a temp file and rename at the end so that other
+            # processes never see an incomplete file
+            tmp_path = "%s.tmp%d" % (file_path, os.getpid())
+            spectra = np.memmap(tmp_path, dtype="complex64", mode="w+", shape=shape)
+            self._compute_spectra(B, spectra)
+            spectra.flush()
+            del spectra
+            os.replace(tmp_path, file_path)
+
+        return np.memmap(file_path, dtype="complex64", mode="r", shape=shape)
+
+    def _read_tail(self, rir_idx):
+        """Reads a RIR and removes its direct path."""
+        h = np.array(self.rir_bank.read(rir_idx), dtype="float32")
+        h[self.rir_bank.peak_idx[rir_idx]] = 0
+        return h
+
+    def select_block_size(self, num_samples, rir_idx):
+        """Selects the partition size with the lowest computational cost."""
+        rir_length = self.rir_bank.lengths[rir_idx]
+        costs = [_conv_cost(num_samples, rir_length, B) for B in self.block_sizes]
+        return self.block_sizes[int(np.argmin(costs))]
+
+    def get_spectra(self, rir_idx, block_size):
+        offset = self.part_offsets[block_size][rir_idx]
+        return self.spectra[block_size][
+            offset : offset + self.num_parts[block_size][rir_idx]
+        ]
+
+    def convolve(self, x, rir_idx, scale=1, num_samples=None, block_size=None):
+        """Convolves x with a RIR scaled by scale.
+
+        Args:
+          x: input signal.
+          rir_idx: index of the RIR in the bank.
+          scale: scale applied to the RIR, e.g., for normalization.
+          num_samples: number of output samples to compute, by default
+                       the full convolution length.
+          block_size: partition size, if None, it selects the one
+                      with the lowest cost.
+
+        Returns:
+          Reverberated signal.
+          Signal-to-reverberation ratio in dB measured in the
+          samples [h_delay, h_delay + len(x)) of the output.
+        """
+        h_delay = self.rir_bank.peak_idx[rir_idx]
+        h_max = scale * self.rir_bank.peak[rir_idx]
+        if num_samples is None:
+            num_samples = len(x) + self.rir_bank.lengths[rir_idx] - 1
+
+        if block_size is None:
+            block_size = self.select_block_size(num_samples, rir_idx)
+
+        H = self.get_spectra(rir_idx, block_size)
+        y = partitioned_convolve(x, H, block_size, num_samples)
+        if scale != 1:
+            y *= scale
+
+        # reverberation energy in the same window as SingleReverbAugment.sdr
+        y_tail = y[h_delay : h_delay + len(x)]
+        e_tail = np.dot(y_tail, y_tail)
+        # add direct path
+        n = min(len(x), num_samples - h_delay)
+        e_x = np.dot(x, x)
+        y[h_delay : h_delay + n] += h_max * x[:n]
+        srr = 10 * np.log10(h_max**2 * e_x + 1e-5) - 10 * np.log10(e_tail + 1e-5)
+        return y.astype(float_cpu(), copy=False), srr
@@ -16,6 +16,8 @@ from scipy import signal
 
 from ..hyp_defs import float_cpu
 from ..io import RandomAccessDataReaderFactory as DRF
+from .wav_bank import WavBank
+from .partitioned_conv import PartitionedRIRBank
 
 class RIRNormType(Enum):
     """normalization type to apply to RIR"""
@@ -37,25 +39,41 @@ class SingleReverbAugment(object):
                   this delay will happen if the maximum of the RIR is not in 
                   its first sample.
       preload_rirs: if True all RIRS are loaded into RAM
+      bank_path: directory of a memory-mapped RIR bank shared by all
+                 the processes, it is created if it doesn't exist.
+                 It overrides preload_rirs.
+      bank_dtype: data type of the RIR bank (float32 or float16).
+      conv_block_sizes: list of partition sizes for uniformly partitioned 
+                  convolution with precomputed RIR spectra, if None, it uses 
+                  fftconvolve. It requires preload_rirs or bank_path.
       rng:     Random number generator returned by 
                np.random.RandomState (optional)
     """
 
     def __init__(self, rir_type, rir_path, rir_norm=None, comp_delay=True, 
-                 preload_rirs=True, random_seed=112358, rng=None):
+                 preload_rirs=True, bank_path=None, bank_dtype='float32',
+                 conv_block_sizes=None, random_seed=112358, rng=None):
         self.rir_type = rir_type
         logging.info(('init reverb_augment with RIR={} rir_path={} '
                       'rir_norm={} comp_delay={}').format(
                           rir_type, rir_path, rir_norm, comp_delay))
-        self.r = DRF.create(rir_path)
-        #logging.info('init reverb_augment with RIR={} read RIR lengths'.format(rir_type))
-        self.rir_keys = self.r.keys
-        self.preload_rirs = preload_rirs
-        if preload_rirs:
-            self.rirs = self.r.read(self.rir_keys)
-            self.r.close()
+        self.preload_rirs = preload_rirs or bank_path is not None
+        if self.preload_rirs:
+            # RIRs with precomputed peaks and energies
+            self.bank = WavBank.create_from_data(rir_path, bank_path, bank_dtype)
+            self.rir_keys = self.bank.keys
+            self.r = None
         else:
-            self.rirs = None
+            self.bank = None
+            self.r = DRF.create(rir_path)
+            self.rir_keys = self.r.keys
+
+        self.part_bank = None
+        if conv_block_sizes is not None:
+            assert self.bank is not None, (
+                'partitioned convolution needs preload_rirs or bank_path')
+            self.part_bank = PartitionedRIRBank(
+                self.bank, conv_block_sizes, bank_path)
 
         if rir_norm is None:
             self.rir_norm = RIRNormType.NONE
@@ -96,21 +114,62 @@ class SingleReverbAugment(object):
 
         return h / np.sum(h**2)
 
+
+    def _norm_scale(self, peak, energy):
+        if self.rir_norm == RIRNormType.NONE:
+            return 1
+        if self.rir_norm == RIRNormType.MAX:
+            return 1 / peak
+
+        return 1 / energy
+
+
+    def read_rir(self, rir_idx):
+        """Reads a normalized RIR.
+
+        Returns:
+          Normalized RIR, position of the maximum and value of the maximum.
+        """
+        if self.bank is None:
+            key = self.rir_keys[rir_idx]
+            h = self._norm_rir(self.r.read([key])[0])
+            h_delay = np.argmax(np.abs(h))
+            return h, h_delay, h[h_delay]
+
+        h = self.bank.read(rir_idx)
+        h_delay = self.bank.peak_idx[rir_idx]
+        scale = self._norm_scale(self.bank.peak[rir_idx], self.bank.energy[rir_idx])
+        h_max = self.bank.peak[rir_idx] * scale
+        if scale != 1:
+            h = scale * h
+        return h, h_delay, h_max
+
     
+    def _forward_partitioned(self, x, rir_idx):
+        num_samples = x.shape[0]
+        h_delay = self.bank.peak_idx[rir_idx]
+        scale = self._norm_scale(self.bank.peak[rir_idx], self.bank.energy[rir_idx])
+        h_max = self.bank.peak[rir_idx] * scale
+        y, srr = self.part_bank.convolve(
+            x, rir_idx, scale, num_samples=num_samples + h_delay)
+        if self.comp_delay:
+            y = y[h_delay:]
+            h_delay = 0
+
+        info = {'rir_type': self.rir_type, 'srr': srr, 
+                'h_max': h_max, 'h_delay': h_delay}
+        return y, info
+
+
     def forward(self, x):
         num_samples = x.shape[0]
         with self.lock:
             rir_idx = self.rng.randint(len(self.rir_keys))
 
-        if self.preload_rirs:
-            h = self.rirs[rir_idx]
-        else:
-            key = self.rir_keys[rir_idx]
-            h = self.r.read([key])[0]
+        if self.part_bank is not None:
+            return self._forward_partitioned(x, rir_idx)
 
-        h = self._norm_rir(h)
-        h_delay = np.argmax(np.abs(h))
-        h_max =  h[h_delay]
+        h, h_delay, h_max = self.read_rir(rir_idx)
         y = signal.fftconvolve(x, h)
         if self.comp_delay:
             y = y[h_delay:num_samples+h_delay]
@@ -139,7 +198,8 @@ class ReverbAugment(object):
       reverb_prob: probability of adding reverberation
       rir_types: dictionary of options with one entry per RIR-type,
                   Each entry is also a dictiory with the following entries:
-                  weight, rir_norm, comp_delay, rir_path. The weight parameter
+                  weight, rir_norm, comp_delay, rir_path, preload_rirs,
+                  bank_path, bank_dtype, conv_block_sizes. The weight parameter
                   is proportional to how often we want to sample a given RIR 
                   type.
       max_reverb_context: number of samples required as left context 
@@ -157,7 +217,8 @@ class ReverbAugment(object):
         augmenters = []
         self.weights = np.zeros((len(rir_types),))
         count = 0
-        val_opts = ('rir_path', 'rir_norm', 'comp_delay', 'preload_rirs')
+        val_opts = ('rir_path', 'rir_norm', 'comp_delay', 'preload_rirs',
+                    'bank_path', 'bank_dtype', 'conv_block_sizes')
         for key, opts in rir_types.items():
             self.weights[count] = opts['weight']
             
@@ -61,11 +61,51 @@ class SpeechAugment(object):
 
         return self.reverb_aug.max_reverb_context
 
-    def forward(self, x):
-
+    @staticmethod
+    def is_augmented(info):
+        """Returns True if the info dictionary returned by forward
+        indicates that the signal was modified."""
+        if "speed" in info and info["speed"]["speed_ratio"] != 1:
+            return True
+
+        return (
+            info["reverb"]["rir_type"] is not None
+            or info["noise"]["noise_type"] is not None
+        )
+
+    def sample_speed_ratio(self):
+        """Samples the speed ratio for the next signal, so we can read
+        the amount of audio needed for a given output length before
+        calling forward.
+        """
+        if self.speed_aug is None:
+            return 1
+
+        return self.speed_aug.sample_speed_ratio()
+
+    def num_output_samples(self, num_samples, speed_ratio):
+        """Number of samples after speed perturbation."""
+        if self.speed_aug is None:
+            return num_samples
+
+        return self.speed_aug.num_output_samples(num_samples, speed_ratio)
+
+    def forward(self, x, speed_ratio=None, num_samples=None):
+        """Applies speed perturbation, reverberation and noise.
+
+        Args:
+          x: input signal.
+          speed_ratio: speed ratio, if None, it is sampled.
+          num_samples: number of samples of the output after speed
+                       perturbation (optional).
+
+        Returns:
+          Augmented signal.
+          Info dictionary.
+        """
         info = {}
         if self.speed_aug is not None:
-            x, speed_info = self.speed_aug(x)
+            x, speed_info = self.speed_aug(x, speed_ratio, num_samples)
             info["speed"] = speed_info
 
         x_speed = x
@@ -94,5 +134,5 @@ class SpeechAugment(object):
 
         return x, info
 
-    def __call__(self, x):
-        return self.forward(x)
+    def __call__(self, x, speed_ratio=None, num_samples=None):
+        return self.forward(x, speed_ratio, num_samples)
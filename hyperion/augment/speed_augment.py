@@ -4,14 +4,81 @@
 """
 
 import logging
+import math
 from copy import deepcopy
+from fractions import Fraction
 import multiprocessing
+
+import yaml
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from librosa.effects import time_stretch
 
 from ..hyp_defs import float_cpu
 
 
+def sinc_resample_kernel(orig_freq, new_freq, lowpass_filter_width=6, rolloff=0.99):
+    """Computes the polyphase windowed-sinc filter bank
+    to resample from orig_freq to new_freq.
+
+    Args:
+      orig_freq: original sampling rate (reduced by the gcd).
+      new_freq: new sampling rate (reduced by the gcd).
+      lowpass_filter_width: number of zero crossings of the sinc
+                            at each side.
+      rolloff: cutoff frequency relative to the Nyquist frequency of the
+               lower sampling rate.
+
+    Returns:
+      Filters with shape (new_freq, kernel_width) and
+      number of samples of left padding.
+    """
+    base_freq = min(orig_freq, new_freq) * rolloff
+    width = int(math.ceil(lowpass_filter_width * orig_freq / base_freq))
+    idx = np.arange(-width, width + orig_freq, dtype=np.float64) / orig_freq
+    t = np.arange(0, -new_freq, -1, dtype=np.float64)[:, None] / new_freq + idx
+    t = t * base_freq
+    t = np.clip(t, -lowpass_filter_width, lowpass_filter_width)
+    window = np.cos(t * math.pi / lowpass_filter_width / 2) ** 2
+    t = t * math.pi
+    scale = base_freq / orig_freq
+    kernels = np.sinc(t / math.pi) * window * scale
+    return kernels, width
+
+
+def resample(x, orig_freq, new_freq, kernel, width, num_samples=None):
+    """Resamples a signal with a polyphase filter bank.
+
+    Args:
+      x: input signal.
+      orig_freq: original sampling rate (reduced by the gcd).
+      new_freq: new sampling rate (reduced by the gcd).
+      kernel: filter bank from sinc_resample_kernel.
+      width: left padding from sinc_resample_kernel.
+      num_samples: number of output samples to compute,
+                   by default ceil(len(x)*new_freq/orig_freq).
+
+    Returns:
+      Resampled signal.
+    """
+    if num_samples is None:
+        num_samples = int(math.ceil(new_freq * len(x) / orig_freq))
+
+    # output frame i contains new_freq samples and uses the input
+    # samples [i*orig_freq - width, (i+1)*orig_freq + width)
+    kernel_width = kernel.shape[-1]
+    num_frames = int(math.ceil(num_samples / new_freq))
+    x_pad = np.zeros(((num_frames - 1) * orig_freq + kernel_width,), dtype=x.dtype)
+    n = min(len(x), len(x_pad) - width)
+    x_pad[width : width + n] = x[:n]
+    s = x_pad.strides[0]
+    frames = as_strided(
+        x_pad, shape=(num_frames, kernel_width), strides=(orig_freq * s, s)
+    )
+    y = np.dot(frames, kernel.T)
+    return y.ravel()[:num_samples]
+
+
 class SpeedAugment(object):
     """Class to augment speech with speed perturbation
 
@@ -19,6 +86,10 @@ class SpeedAugment(object):
       speed_prob: probability of applying speed perturbation
       speed_ratios: list of speed pertubation ratios
       keep_length: applies padding or cropping to keep the lenght of the signal
+      mode: "resample" to change speed and pitch by resampling with
+            polyphase filters, like Kaldi/sox speed perturbation,
+            or "time_stretch" to change the speed without changing the pitch
+            with librosa phase vocoder.
       random_seed: random seed for random number generator
       rng:     Random number generator returned by
                np.random.RandomState (optional)
@@ -29,18 +100,25 @@ class SpeedAugment(object):
         speed_prob,
         speed_ratios=[0.9, 1.1],
         keep_length=False,
+        mode="resample",
         random_seed=112358,
         rng=None,
     ):
         logging.info(
-            "init speed augment with prob={}, speed_ratios={}, keep_length={}".format(
-                speed_prob, speed_ratios, keep_length
-            )
+            (
+                "init speed augment with prob={}, speed_ratios={}, "
+                "keep_length={}, mode={}"
+            ).format(speed_prob, speed_ratios, keep_length, mode)
         )
+        assert mode in ["resample", "time_stretch"], "wrong speed mode %s" % mode
         self.speed_prob = speed_prob
         self.speed_ratios = speed_ratios
         self.keep_length = keep_length
+        self.mode = mode
+        # resampling filters for each speed ratio
+        self._kernels = {}
 
+        self.lock = multiprocessing.Lock()
         if rng is None:
             self.rng = np.random.RandomState(seed=random_seed)
         else:
@@ -68,35 +146,100 @@ class SpeedAugment(object):
             speed_prob=cfg["speed_prob"],
             speed_ratios=cfg["speed_ratios"],
             keep_length=cfg["keep_length"],
+            mode=cfg.get("mode", "resample"),
             random_seed=random_seed,
             rng=rng,
         )
 
-    def forward(self, x):
+    @staticmethod
+    def _ratio_to_freqs(r):
+        # speed r is equivalent to resample from fs to fs/r
+        f = Fraction(r).limit_denominator(1000)
+        return f.numerator, f.denominator
+
+    def _get_kernel(self, orig_freq, new_freq, dtype):
+        key = (orig_freq, new_freq, dtype)
+        if key not in self._kernels:
+            kernel, width = sinc_resample_kernel(orig_freq, new_freq)
+            self._kernels[key] = kernel.astype(dtype), width
+        return self._kernels[key]
+
+    def sample_speed_ratio(self):
+        """Samples the speed ratio for the next signal,
+        it returns 1 if we don't apply speed perturbation."""
+        with self.lock:
+            p = self.rng.random_sample()
+            if p > self.speed_prob:
+                return 1
+
+            speed_idx = self.rng.choice(len(self.speed_ratios))
+
+        return self.speed_ratios[speed_idx]
+
+    def num_output_samples(self, num_samples, r):
+        """Number of samples after perturbation of a signal
+        with num_samples samples."""
+        if r == 1:
+            return num_samples
+        orig_freq, new_freq = self._ratio_to_freqs(r)
+        return int(math.ceil(new_freq * num_samples / orig_freq))
+
+    def change_speed(self, x, r, num_samples=None):
+        """Changes the speed of a signal.
 
-        # decide whether to add noise or not
-        p = self.rng.random_sample()
-        if p > self.speed_prob:
-            # we don't add speed perturbation
-            info = {"speed_ratio": 1}
-            return x, info
+        Args:
+          x: input signal.
+          r: speed ratio.
+          num_samples: number of output samples to compute (optional).
 
-        speed_idx = self.rng.choice(len(self.speed_ratios))
-        # change speed
-        r = self.speed_ratios[speed_idx]
+        Returns:
+          Perturbed signal.
+        """
+        if self.mode == "time_stretch":
+            return time_stretch(x, rate=r)[:num_samples]
+
+        orig_freq, new_freq = self._ratio_to_freqs(r)
+        dtype = x.dtype if x.dtype in [np.float32, np.float64] else float_cpu()
+        kernel, width = self._get_kernel(orig_freq, new_freq, dtype)
+        return resample(x, orig_freq, new_freq, kernel, width, num_samples)
+
+    def forward(self, x, speed_ratio=None, num_samples=None):
+        """Applies speed perturbation.
+
+        Args:
+          x: input signal.
+          speed_ratio: speed ratio, if None, it is sampled.
+          num_samples: number of output samples, if the signal is shorter
+                       it is padded. If None, it is the length of x when
+                       keep_length is True, or all the samples otherwise.
+
+        Returns:
+          Perturbed signal.
+          Info dictionary with the speed ratio.
+        """
+        r = self.sample_speed_ratio() if speed_ratio is None else speed_ratio
         info = {"speed_ratio": r}
-        y = time_stretch(x, r)
-        # print(f"1 r={r} {x.shape} {y.shape}", flush=True)
-        if self.keep_length:
-            if r > 1:
+        if num_samples is None and self.keep_length:
+            num_samples = x.shape[-1]
+
+        if r == 1:
+            y = x
+        else:
+            # we only compute the output samples that we return
+            out_samples = self.num_output_samples(x.shape[-1], r)
+            if num_samples is not None:
+                out_samples = min(out_samples, num_samples)
+            y = self.change_speed(x, r, out_samples)
+
+        if num_samples is not None:
+            if y.shape[-1] < num_samples:
                 dither = np.max(x) / 2 ** 15  # we add some dither in the padding
-                pad_y = dither * np.ones((x.shape[-1] - y.shape[-1],), dtype=y.dtype)
+                pad_y = dither * np.ones((num_samples - y.shape[-1],), dtype=y.dtype)
                 y = np.concatenate((y, pad_y), axis=-1)
-            elif r < 1:
-                y = y[: x.shape[-1]]
+            else:
+                y = y[:num_samples]
 
-        # print(f"2 r={r} {x.shape} {y.shape}", flush=True)
         return y, info
 
-    def __call__(self, x):
-        return self.forward(x)
+    def __call__(self, x, speed_ratio=None, num_samples=None):
+        return self.forward(x, speed_ratio, num_samples)
@@ -0,0 +1,231 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import os
+import shutil
+import logging
+
+import numpy as np
+
+from ..hyp_defs import float_cpu
+from ..io import RandomAccessAudioReader as AR
+from ..io import RandomAccessDataReaderFactory as DRF
+
+
+class WavBank(object):
+    """Bank of signals, e.g. noises or RIRs, stored in a single
+    contiguous array with an index.
+
+    When the bank is stored on disk, the array is memory-mapped, so all the
+    processes that open the same bank (e.g. data loader workers
+    of all the GPUs) share the same physical memory through the page cache,
+    and reading a signal returns a slice of the map without copying.
+
+    For RIRs, it also stores the position and value of the maximum
+    and the energy of each RIR, so they don't need to be computed
+    every time a RIR is used.
+
+    Attributes:
+      data: 1D array with all the signals concatenated.
+      keys: signal names.
+      offsets: first sample of each signal in data.
+      lengths: number of samples of each signal.
+      peak_idx: position of the absolute maximum of each signal (optional).
+      peak: value of the signal at peak_idx (optional).
+      energy: energy of each signal (optional).
+    """
+
+    def __init__(
+        self,
+        data,
+        keys,
+        offsets,
+        lengths,
+        peak_idx=None,
+        peak=None,
+        energy=None,
+        bank_path=None,
+    ):
+        self.data = data
+        self.keys = np.asarray(keys)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.peak_idx = peak_idx
+        self.peak = peak
+        self.energy = energy
+        self.bank_path = bank_path
+
+    def __getstate__(self):
+        # when sent to other processes, e.g., spawned data loader workers,
+        # memory-mapped banks are reopened instead of copied
+        if self.bank_path is not None:
+            return {"bank_path": self.bank_path}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if "data" not in state:
+            state = self._load(state["bank_path"]).__dict__
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def has_stats(self):
+        return self.peak_idx is not None
+
+    def read(self, idx):
+        """Returns the signal with index idx.
+        If the bank is stored in float32, it is a read-only view of the bank.
+        """
+        offset = self.offsets[idx]
+        x = self.data[offset : offset + self.lengths[idx]]
+        if x.dtype != float_cpu():
+            x = x.astype(float_cpu())
+        return x
+
+    def read_segment(self, idx, first_sample, num_samples):
+        """Returns a segment of the signal with index idx."""
+        first_sample = min(first_sample, self.lengths[idx])
+        num_samples = min(num_samples, self.lengths[idx] - first_sample)
+        offset = self.offsets[idx] + first_sample
+        x = self.data[offset : offset + num_samples]
+        if x.dtype != float_cpu():
+            x = x.astype(float_cpu())
+        return x
+
+    @staticmethod
+    def _compute_stats(x):
+        peak_idx = np.argmax(np.abs(x))
+        return peak_idx, x[peak_idx], np.sum(x**2)
+
+    @classmethod
+    def _load(cls, bank_path):
+        logging.info("loading wav bank %s" % (bank_path))
+        index = np.load(os.path.join(bank_path, "index.npz"))
+        data = np.memmap(
+            os.path.join(bank_path, "data.bin"), dtype=str(index["dtype"]), mode="r"
+        )
+        stats = {}
+        for k in ["peak_idx", "peak", "energy"]:
+            if k in index:
+                stats[k] = index[k]
+
+        return cls(
+            data,
+            index["keys"],
+            index["offsets"],
+            index["lengths"],
+            bank_path=bank_path,
+            **stats
+        )
+
+    @staticmethod
+    def _build(read_fn, keys, bank_path, dtype, compute_stats):
+        logging.info("building wav bank %s with %d signals" % (bank_path, len(keys)))
+        bank_dir = os.path.dirname(os.path.abspath(bank_path))
+        os.makedirs(bank_dir, exist_ok=True)
+        # we build in a temp dir and rename at the end, so that other
+        # processes never see an incomplete bank
+        tmp_path = "%s.tmp%d" % (bank_path, os.getpid())
+        os.makedirs(tmp_path, exist_ok=True)
+        offsets = np.zeros((len(keys),), dtype=np.int64)
+        lengths = np.zeros((len(keys),), dtype=np.int64)
+        if compute_stats:
+            peak_idx = np.zeros((len(keys),), dtype=np.int64)
+            peak = np.zeros((len(keys),), dtype=float_cpu())
+            energy = np.zeros((len(keys),), dtype=float_cpu())
+
+        offset = 0
+        with open(os.path.join(tmp_path, "data.bin"), "wb") as f:
+            for i, key in enumerate(keys):
+                x = np.asarray(read_fn(key)).ravel()
+                offsets[i] = offset
+                lengths[i] = len(x)
+                offset += len(x)
+                if compute_stats:
+                    peak_idx[i], peak[i], energy[i] = WavBank._compute_stats(x)
+                f.write(x.astype(dtype).tobytes())
+
+        index = {
+            "keys": np.asarray(keys),
+            "offsets": offsets,
+            "lengths": lengths,
+            "dtype": np.asarray(dtype),
+        }
+        if compute_stats:
+            index.update({"peak_idx": peak_idx, "peak": peak, "energy": energy})
+        np.savez(os.path.join(tmp_path, "index.npz"), **index)
+        try:
+            os.rename(tmp_path, bank_path)
+        except OSError:
+            # other process built the bank before us
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def _create(cls, read_fn, keys, bank_path, dtype, compute_stats):
+        if bank_path is None:
+            # in-memory bank, private to this process
+            x = [np.asarray(read_fn(key)).ravel() for key in keys]
+            lengths = np.array([len(x_i) for x_i in x], dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            stats = {}
+            if compute_stats:
+                s = [cls._compute_stats(x_i) for x_i in x]
+                stats["peak_idx"] = np.array([s_i[0] for s_i in s], dtype=np.int64)
+                stats["peak"] = np.array([s_i[1] for s_i in s], dtype=float_cpu())
+                stats["energy"] = np.array([s_i[2] for s_i in s], dtype=float_cpu())
+            data = np.concatenate(x).astype(dtype, copy=False)
+            return cls(data, keys, offsets, lengths, **stats)
+
+        if not os.path.isdir(bank_path):
+            cls._build(read_fn, keys, bank_path, dtype, compute_stats)
+
+        return cls._load(bank_path)
+
+    @classmethod
+    def create_from_audio(cls, audio_path, bank_path=None, dtype="float32"):
+        """Creates a bank from audio files, e.g., noises.
+
+        Args:
+          audio_path: Kaldi style wav.scp file.
+          bank_path: directory where the bank is stored, if it doesn't exist it is
+                     created. If None, the bank is kept in this process memory.
+          dtype: float32 or float16.
+
+        Returns:
+          WavBank object.
+        """
+        if bank_path is not None and os.path.isdir(bank_path):
+            return cls._load(bank_path)
+
+        r = AR(audio_path)
+        read_fn = lambda key: r.read([key])[0][0]
+        return cls._create(read_fn, r.keys, bank_path, dtype, False)
+
+    @classmethod
+    def create_from_data(
+        cls, data_path, bank_path=None, dtype="float32", compute_stats=True
+    ):
+        """Creates a bank from Ark or H5 files, e.g., RIRs.
+
+        Args:
+          data_path: Kaldi style rspecifier to Ark or H5 file.
+          bank_path: directory where the bank is stored, if it doesn't exist it is
+                     created. If None, the bank is kept in this process memory.
+          dtype: float32 or float16.
+          compute_stats: computes the peak and energy of the signals.
+
+        Returns:
+          WavBank object.
+        """
+        if bank_path is not None and os.path.isdir(bank_path):
+            return cls._load(bank_path)
+
+        r = DRF.create(data_path)
+        read_fn = lambda key: r.read([key])[0]
+        bank = cls._create(read_fn, r.keys, bank_path, dtype, compute_stats)
+        r.close()
+        return bank
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, namespace_to_dict
+import time
+import logging
+
+import numpy as np
+
+import torch
+
+from hyperion.hyp_defs import config_logger
+from hyperion.torch.utils import open_device
+from hyperion.torch.narchs import ResNetFactory as RNF
+from hyperion.torch.narchs import SpineNetFactory as SNF
+from hyperion.torch.narchs import ResNet2dEncoder, ConformerEncoderV1, TransformerEncoderV1
+
+
+def make_resnet(in_feats, act_checkpoint):
+    stages = [0, 1, 2, 3, 4] if act_checkpoint else None
+    return RNF.create("resnet34", in_channels=1, in_feats=in_feats, in_norm=False,
+                      act_checkpoint_stages=stages)
+
+
+def make_res2net(in_feats, act_checkpoint):
+    stages = [0, 1, 2, 3, 4] if act_checkpoint else None
+    return ResNet2dEncoder(resb_type="res2basic", resb_repeats=[3, 4, 6, 3],
+                           resb_strides=[1, 2, 2, 2], res2net_scale=4,
+                           act_checkpoint_stages=stages)
+
+
+def make_spinenet(in_feats, act_checkpoint):
+    net = SNF.create("spinenet49", 1, in_feats=in_feats, in_norm=False)
+    if act_checkpoint:
+        net.act_checkpoint_stages = list(range(len(net.blocks) + 1))
+    return net
+
+
+# transformer encoders use a linear input layer, so that the memory
+# is dominated by the encoder blocks rather than by the conv2d subsampler
+def make_conformer(in_feats, act_checkpoint):
+    blocks = list(range(6)) if act_checkpoint else None
+    return ConformerEncoderV1(in_feats, d_model=256, num_heads=4, num_blocks=6,
+                              d_ff=1024, in_layer_type="linear",
+                              act_checkpoint_blocks=blocks)
+
+
+def make_transformer(in_feats, act_checkpoint):
+    blocks = list(range(6)) if act_checkpoint else None
+    return TransformerEncoderV1(in_feats, d_model=256, num_heads=4, num_blocks=6,
+                                d_ff=1024, in_layer_type="linear",
+                                act_checkpoint_blocks=blocks)
+
+
+arch_dict = {
+    "resnet34": make_resnet,
+    "res2net34": make_res2net,
+    "spinenet49": make_spinenet,
+    "conformer": make_conformer,
+    "transformer": make_transformer,
+}
+
+
+def make_input(arch, batch_size, in_feats, num_frames, device):
+    if arch in ["conformer", "transformer"]:
+        # (batch, feats, time)
+        return torch.randn(batch_size, in_feats, num_frames, device=device)
+
+    # (batch, channels, feats, time)
+    return torch.randn(batch_size, 1, in_feats, num_frames, device=device)
+
+
+def train_step(model, x):
+    y = model(x)
+    if isinstance(y, tuple):
+        y = y[0]
+    loss = y.float().pow(2).mean()
+    loss.backward()
+    model.zero_grad(set_to_none=True)
+
+
+def cpu_peak_mem(model, x):
+    """Peak memory allocated by a training step in the CPU,
+    computed from the allocator records of the profiler."""
+    from torch.profiler import profile, ProfilerActivity
+
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        train_step(model, x)
+
+    events = [
+        e
+        for e in prof.profiler.kineto_results.events()
+        if e.name() == "[memory]" and e.device_type() == torch.autograd.DeviceType.CPU
+    ]
+    events.sort(key=lambda e: e.start_ns())
+    mem = np.cumsum([e.nbytes() for e in events])
+    return max(0, np.max(mem)) if len(mem) > 0 else 0
+
+
+def gpu_peak_mem(model, x):
+    torch.cuda.synchronize()
+    torch.cuda.reset_peak_memory_stats()
+    mem0 = torch.cuda.memory_allocated()
+    train_step(model, x)
+    torch.cuda.synchronize()
+    return torch.cuda.max_memory_allocated() - mem0
+
+
+def time_step(model, x, num_trials):
+    train_step(model, x)
+    if x.is_cuda:
+        torch.cuda.synchronize()
+
+    t1 = time.time()
+    for i in range(num_trials):
+        train_step(model, x)
+    if x.is_cuda:
+        torch.cuda.synchronize()
+    return (time.time() - t1) / num_trials
+
+
+def benchmark_act_checkpoint(archs, batch_size, in_feats, num_frames, num_trials,
+                             use_gpu, random_seed, **kwargs):
+
+    device = open_device(num_gpus=1 if use_gpu else 0)
+    for arch in archs:
+        results = {}
+        for act_checkpoint in [False, True]:
+            torch.manual_seed(random_seed)
+            model = arch_dict[arch](in_feats, act_checkpoint).to(device)
+            model.train()
+            x = make_input(arch, batch_size, in_feats, num_frames, device)
+            if device.type == "cuda":
+                mem = gpu_peak_mem(model, x)
+            else:
+                mem = cpu_peak_mem(model, x)
+            t = time_step(model, x, num_trials)
+            results[act_checkpoint] = (mem, t)
+            logging.info(
+                "arch=%s act-checkpoint=%s peak-mem=%.1f MB step-time=%.1f ms" % (
+                    arch, act_checkpoint, mem / 2 ** 20, t * 1000))
+            del model, x
+
+        mem0, t0 = results[False]
+        mem1, t1 = results[True]
+        logging.info(
+            "arch=%s act-checkpoint memory-ratio=%.2f time-ratio=%.2f" % (
+                arch, mem1 / mem0, t1 / t0))
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description=("Benchmarks peak memory and time of a training step "
+                     "with and without activation checkpointing"))
+
+    parser.add_argument("--cfg", action=ActionConfigFile)
+    parser.add_argument("--archs", default=list(arch_dict.keys()), nargs="+",
+                        choices=list(arch_dict.keys()))
+    parser.add_argument("--batch-size", default=8, type=int)
+    parser.add_argument("--in-feats", default=80, type=int)
+    parser.add_argument("--num-frames", default=400, type=int)
+    parser.add_argument("--num-trials", default=5, type=int)
+    parser.add_argument("--use-gpu", default=False, action="store_true")
+    parser.add_argument("--random-seed", default=1234, type=int)
+    parser.add_argument("-v", "--verbose", dest="verbose", default=1, choices=[0, 1, 2, 3], type=int,
+                        help="Verbose level")
+    args = parser.parse_args()
+    config_logger(args.verbose)
+    del args.verbose
+    logging.debug(args)
+
+    benchmark_act_checkpoint(**namespace_to_dict(args))
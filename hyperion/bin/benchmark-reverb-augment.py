@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+ Copyright 2021 Jesus Villalba (Johns Hopkins University)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, ActionParser, namespace_to_dict
+import time
+import logging
+
+import numpy as np
+
+from hyperion.hyp_defs import config_logger
+from hyperion.augment.reverb_augment import SingleReverbAugment
+
+
+def benchmark_aug(aug, x, num_trials):
+    # first call builds caches
+    aug(x)
+    t1 = time.time()
+    for i in range(num_trials):
+        y, info = aug(x)
+    return (time.time() - t1) / num_trials
+
+
+def benchmark_reverb_augment(rir_path, rir_norm, comp_delay, chunk_length, fs,
+                             conv_block_sizes, num_trials, random_seed, **kwargs):
+
+    x = np.random.RandomState(seed=random_seed).randn(
+        int(chunk_length * fs)).astype('float32')
+
+    aug_fft = SingleReverbAugment(
+        'rir', rir_path, rir_norm=rir_norm, comp_delay=comp_delay,
+        random_seed=random_seed)
+    aug_part = SingleReverbAugment(
+        'rir', rir_path, rir_norm=rir_norm, comp_delay=comp_delay,
+        conv_block_sizes=conv_block_sizes, random_seed=random_seed)
+
+    rir_lengths = aug_fft.bank.lengths
+    logging.info('num-rirs=%d rir-length mean=%.1f max=%d chunk-length=%d' % (
+        len(rir_lengths), np.mean(rir_lengths), np.max(rir_lengths), len(x)))
+
+    # check that both paths produce the same signals
+    max_err = 0
+    max_srr_err = 0
+    for i in range(min(num_trials, 20)):
+        y_fft, info_fft = aug_fft(x)
+        y_part, info_part = aug_part(x)
+        max_err = max(max_err, np.max(np.abs(y_fft - y_part)) / np.max(np.abs(y_fft)))
+        max_srr_err = max(max_srr_err, abs(info_fft['srr'] - info_part['srr']))
+
+    logging.info('max-rel-error=%.3e max-srr-error=%.3e dB' % (max_err, max_srr_err))
+
+    t_fft = benchmark_aug(aug_fft, x, num_trials)
+    t_part = benchmark_aug(aug_part, x, num_trials)
+    logging.info('fftconvolve: %.3f ms/chunk' % (t_fft * 1000))
+    logging.info('partitioned block-sizes=%s: %.3f ms/chunk speed-up=%.2f' % (
+        str(conv_block_sizes), t_part * 1000, t_fft / t_part))
+    for B in conv_block_sizes:
+        aug_part.part_bank.block_sizes = [B]
+        t_B = benchmark_aug(aug_part, x, num_trials)
+        logging.info('partitioned block-size=%d: %.3f ms/chunk' % (B, t_B * 1000))
+
+
+if __name__ == "__main__":
+
+    parser=ArgumentParser(
+        description=('Benchmarks reverberation augmentation with fftconvolve '
+                     'versus partitioned convolution with cached RIR spectra'))
+
+    parser.add_argument('--cfg', action=ActionConfigFile)
+    parser.add_argument('--rir-path', required=True,
+                        help='rspecifier of the RIR ark or h5 file')
+    parser.add_argument('--rir-norm', default=None, choices=['max', 'energy'])
+    parser.add_argument('--no-comp-delay', dest='comp_delay', default=True,
+                        action='store_false')
+    parser.add_argument('--chunk-length', default=4., type=float,
+                        help='length of the signal in secs')
+    parser.add_argument('--fs', default=16000, type=int)
+    parser.add_argument('--conv-block-sizes', default=[256, 1024, 4096],
+                        type=int, nargs='+')
+    parser.add_argument('--num-trials', default=200, type=int)
+    parser.add_argument('--random-seed', default=1234, type=int)
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int,
+                        help='Verbose level')
+    args=parser.parse_args()
+    config_logger(args.verbose)
+    del args.verbose
+    logging.debug(args)
+
+    benchmark_reverb_augment(**namespace_to_dict(args))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+"""
+Compiles a TransformList into a FusedTransformList
+"""
+import sys
+import os
+import argparse
+import time
+import logging
+
+import numpy as np
+
+from hyperion.hyp_defs import config_logger
+from hyperion.transforms import TransformList
+
+
+def compile_tlist(input_path, output_path, dtype, block_size, num_threads):
+
+    tfl = TransformList.load(input_path)
+    model = tfl.compile(dtype=dtype, block_size=block_size,
+                        num_threads=num_threads)
+    logging.info('compiled %d transforms into %d stages: %s' % (
+        len(tfl.transforms), len(model.stages),
+        ' '.join([s[0] for s in model.stages])))
+    model.save(output_path)
+
+
+
+if __name__ == "__main__":
+
+    parser=argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        fromfile_prefix_chars='@',
+        description='Compiles a transform list merging the affine transforms')
+
+    parser.add_argument('--input-path', dest='input_path', required=True)
+    parser.add_argument('--output-path', dest='output_path', required=True)
+    parser.add_argument('--dtype', default='float32',
+                        choices=['float32', 'float64'])
+    parser.add_argument('--block-size', dest='block_size', default=16384, type=int,
+                        help='number of vectors processed at once by each thread')
+    parser.add_argument('--num-threads', dest='num_threads', default=None, type=int)
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int)
+
+    args=parser.parse_args()
+    config_logger(args.verbose)
+    del args.verbose
+    logging.debug(args)
+
+    compile_tlist(**vars(args))
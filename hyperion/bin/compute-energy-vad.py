@@ -14,13 +14,40 @@ import numpy as np
 from hyperion.hyp_defs import config_logger
 from hyperion.io import SequentialAudioReader as AR
 from hyperion.io import DataWriterFactory as DWF
+from hyperion.utils.process_pool import ordered_imap, WorkerRTF
 from hyperion.feats import EnergyVAD
 
-def compute_vad(input_path, output_path, write_num_frames, **kwargs):
+# VAD object used by the worker process
+_vad = {}
+
+
+def init_worker(vad_args, verbose=1):
+    config_logger(verbose)
+    _vad['vad'] = EnergyVAD(**vad_args)
+
+
+def compute_vad_file(args):
+    key, x = args
+    vad = _vad['vad']
+    logging.info('Extracting VAD for %s' % (key))
+    t1 = time.time()
+    y = vad.compute(x)
+    vad.reset()
+    dt = time.time() - t1
+    rtf = dt*1000/(vad.frame_shift*y.shape[0])
+    num_speech_frames = np.sum(y)
+    prob_speech = num_speech_frames / y.shape[0] * 100
+    logging.info('Extracted VAD for %s detected %d/%d (%f %%) speech frames, elapsed-time=%.2f ms. real-time-factor=%.2f' %
+                 (key, num_speech_frames, y.shape[0], prob_speech, dt*1000, rtf))
+    return key, y, dt, os.getpid()
+
+
+def compute_vad(input_path, output_path, write_num_frames,
+                num_workers=1, max_pending=None, verbose=1, **kwargs):
 
     vad_args = EnergyVAD.filter_args(**kwargs)
     vad = EnergyVAD(**vad_args)
-    
+
     input_args = AR.filter_args(**kwargs)
     reader = AR(input_path, **input_args)
 
@@ -29,26 +56,26 @@ def compute_vad(input_path, output_path, write_num_frames, **kwargs):
     if write_num_frames is not None:
         f_num_frames = open(write_num_frames, 'w')
 
-    for data in reader:
-        key, x, fs = data
-        logging.info('Extracting VAD for %s' % (key))
-        t1 = time.time()
-        y = vad.compute(x)
-        dt = (time.time() - t1)*1000
-        rtf = vad.frame_shift*y.shape[0]/dt
-        num_speech_frames = np.sum(y)
-        prob_speech = num_speech_frames / y.shape[0] * 100
-        logging.info('Extracted VAD for %s detected %d/%d (%f %%) speech frames, elapsed-time=%.2f ms. real-time-factor=%.2f' %
-                     (key, num_speech_frames, y.shape[0], prob_speech, dt, rtf))
+    def read_items():
+        for key, x, fs in reader:
+            yield key, x
+
+    rtf = WorkerRTF()
+    t1 = time.time()
+    for key, y, dt, worker_id in ordered_imap(
+            compute_vad_file, read_items(), num_workers, max_pending,
+            initializer=init_worker, initargs=(vad_args, verbose)):
         writer.write([key], [y])
+        rtf.update(worker_id, dt, y.shape[0]*vad.frame_shift/1000)
         if write_num_frames is not None:
             f_num_frames.write('%s %d\n' % (key, y.shape[0]))
 
-        vad.reset()
-    
+    writer.close()
     if write_num_frames is not None:
         f_num_frames.close()
 
+    rtf.report(time.time() - t1)
+
 
 if __name__ == "__main__":
     
@@ -62,11 +89,16 @@ if __name__ == "__main__":
 
     AR.add_class_args(parser)
     EnergyVAD.add_class_args(parser)
+    parser.add_argument('--num-workers', default=1, type=int,
+                        help=('number of processes computing VAD, '
+                              'the main process reads and writes the files'))
+    parser.add_argument('--max-pending', default=None, type=int,
+                        help=('maximum number of files inside the pool of '
+                              'workers, by default 4 x num-workers'))
     parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int,
                         help='Verbose level')
     args=parser.parse_args()
     config_logger(args.verbose)
-    del args.verbose
     logging.debug(args)
     
     compute_vad(**namespace_to_dict(args))
@@ -16,11 +16,41 @@ from hyperion.io import SequentialAudioReader as AR
 from hyperion.io import SequentialDataReaderFactory as DRF
 from hyperion.io import DataWriterFactory as DWF
 from hyperion.io import compression_methods
+from hyperion.utils import KaldiCompressedMatrix
+from hyperion.utils.process_pool import ordered_imap, WorkerRTF
 from hyperion.feats import MFCC
 
+# MFCC object used by the worker process
+_mfcc = {}
+
+
+def init_worker(mfcc_args, verbose=1):
+    config_logger(verbose)
+    _mfcc['mfcc'] = MFCC(**mfcc_args)
+
+
+def compute_mfcc(args):
+    key, x, compress, compression_method = args
+    mfcc = _mfcc['mfcc']
+    logging.info('Extracting MFCC for %s num_samples=%d' % (key, len(x)))
+    t1 = time.time()
+    y = mfcc.compute(x)
+    mfcc.reset()
+    num_frames = y.shape[0]
+    if compress:
+        # compress inside the worker so the writer only serializes
+        y = KaldiCompressedMatrix.compress(y, compression_method)
+    dt = time.time() - t1
+    rtf = dt*1000/(mfcc.frame_shift*num_frames)
+    logging.info('Extracted MFCC for %s num-frames=%d elapsed-time=%.2f ms. real-time-factor=%.2f' %
+                 (key, num_frames, dt*1000, rtf))
+    return key, y, num_frames, dt, os.getpid()
+
+
 def compute_mfcc_feats(input_path, output_path,
-                       compress, compression_method, 
-                       write_num_frames, **kwargs):
+                       compress, compression_method,
+                       write_num_frames, num_workers=1, max_pending=None,
+                       verbose=1, **kwargs):
 
     mfcc_args = MFCC.filter_args(**kwargs)
     mfcc = MFCC(**mfcc_args)
@@ -38,29 +68,29 @@ def compute_mfcc_feats(input_path, output_path,
 
     if write_num_frames is not None:
         f_num_frames = open(write_num_frames, 'w')
-    
-    for data in reader:
-        if mfcc.input_step == 'wave':
-            key, x, fs = data
-        else:
-            key, x = data
-        logging.info('Extracting MFCC for %s num_samples=%d' % (key, len(x)))
-        t1 = time.time()
-        y = mfcc.compute(x)
-        dt = (time.time() - t1)*1000
-        rtf = dt/(mfcc.frame_shift*y.shape[0])
-        logging.info('Extracted MFCC for %s num-frames=%d elapsed-time=%.2f ms. real-time-factor=%.2f' %
-                     (key, y.shape[0], dt, rtf))
+
+    def read_items():
+        for data in reader:
+            key, x = data[:2]
+            yield key, x, compress, compression_method
+
+    rtf = WorkerRTF()
+    t1 = time.time()
+    for key, y, num_frames, dt, worker_id in ordered_imap(
+            compute_mfcc, read_items(), num_workers, max_pending,
+            initializer=init_worker, initargs=(mfcc_args, verbose)):
         writer.write([key], [y])
-        
+        rtf.update(worker_id, dt, num_frames*mfcc.frame_shift/1000)
+
         if write_num_frames is not None:
-            f_num_frames.write('%s %d\n' % (key, y.shape[0]))
+            f_num_frames.write('%s %d\n' % (key, num_frames))
 
-        mfcc.reset()
-            
+    writer.close()
     if write_num_frames is not None:
         f_num_frames.close()
-    
+
+    rtf.report(time.time() - t1)
+
 
 if __name__ == "__main__":
     
@@ -78,11 +108,16 @@ if __name__ == "__main__":
     parser.add_argument('--compress', dest='compress', default=False, action='store_true', help='Compress the features')
     parser.add_argument('--compression-method', dest='compression_method', default='auto',
                         choices=compression_methods, help='Compression method')
+    parser.add_argument('--num-workers', default=1, type=int,
+                        help=('number of processes computing features, '
+                              'the main process reads and writes the files'))
+    parser.add_argument('--max-pending', default=None, type=int,
+                        help=('maximum number of files inside the pool of '
+                              'workers, by default 4 x num-workers'))
     parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int,
                         help='Verbose level')
     args=parser.parse_args()
     config_logger(args.verbose)
-    del args.verbose
     logging.debug(args)
     
     compute_mfcc_feats(**namespace_to_dict(args))
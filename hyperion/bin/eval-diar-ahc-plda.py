@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+"""
+Diarizes a list of recordings with AHC + PLDA scoring using a pool
+of worker processes. Input is a file with a sequence of x-vectors
+per recording, e.g., computed with torch-extract-xvectors-slidwin.py.
+Output is a single RTTM file with all the recordings.
+"""
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, ActionParser, namespace_to_dict
+import time
+import logging
+import multiprocessing
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from hyperion.hyp_defs import float_cpu, config_logger
+from hyperion.utils import Utt2Info, RTTM
+from hyperion.utils.list_utils import split_list, partition_list_balanced
+from hyperion.utils.vad_utils import intersect_segment_timestamps_with_vad as istwv
+from hyperion.io import RandomAccessDataReaderFactory as DRF
+from hyperion.io import VADReaderFactory as VRF
+from hyperion.helpers import PLDAFactory as F
+from hyperion.transforms import TransformList
+from hyperion.diarization import DiarAHCPLDA as Diar
+
+# objects shared by all the tasks processed by the same worker
+_worker = {}
+
+
+def make_timestamps(n, win_start, win_length, win_shift, win_shrink):
+
+    t1 = win_start + win_shift * np.arange(n, dtype=float_cpu())
+    t2 = t1 + win_length - win_shrink
+    t1 += win_shrink
+    t1[t1<0] = 0
+    assert np.all(t2-t1>0)
+    timestamps = np.concatenate((t1[:,None],t2[:,None]), axis=1)
+    return timestamps
+
+
+def init_readers(v_file, timestamps_file, vad_file, **kwargs):
+    r_x = DRF.create(v_file)
+    r_time = None
+    if timestamps_file is not None:
+        r_time = DRF.create(timestamps_file)
+
+    r_vad = None
+    if vad_file is not None:
+        vad_args = VRF.filter_args(**kwargs.get('vad', {}))
+        r_vad = VRF.create(vad_file, **vad_args)
+
+    return r_x, r_time, r_vad
+
+
+def init_worker(v_file, timestamps_file, vad_file,
+                preproc_file, verbose, **kwargs):
+    """Loads the models and opens the readers once per worker process."""
+    config_logger(verbose)
+    _worker['readers'] = init_readers(
+        v_file, timestamps_file, vad_file, **kwargs)
+
+    preproc = None
+    if preproc_file is not None:
+        preproc = TransformList.load(preproc_file)
+    plda_args = F.filter_eval_args(**kwargs)
+    plda_model = F.load_plda(**plda_args)
+    diar_args = Diar.filter_args(**kwargs)
+    _worker['diarizer'] = Diar(plda_model, preproc, **diar_args)
+
+
+def load_feats(key, r_x, r_time, r_vad,
+               win_start, win_length, win_shift, win_shrink):
+
+    x = r_x.read([key])[0]
+    if r_time is not None:
+        timestamps = r_time.read([key])[0]
+    else:
+        timestamps = make_timestamps(
+            len(x), win_start, win_length, win_shift, win_shrink)
+
+    if r_vad is not None:
+        vad_timestamps = r_vad.read_timestamps([key])[0]
+        speech_idx, timestamps, ts2segs = istwv(timestamps, vad_timestamps)
+        x = x[speech_idx]
+    else:
+        ts2segs = np.arange(len(x), dtype=np.int64)
+
+    return x, timestamps, ts2segs
+
+
+def diarize_files(keys, win_start, win_length, win_shift, win_shrink,
+                  score_hist_dir):
+    """Diarizes a group of files inside a worker.
+
+    Returns:
+      List of (key, RTTM) tuples and total processing time.
+    """
+    r_x, r_time, r_vad = _worker['readers']
+    diarizer = _worker['diarizer']
+    t1 = time.time()
+    rttms = []
+    for key in keys:
+        x, timestamps, ts2segs = load_feats(
+            key, r_x, r_time, r_vad,
+            win_start, win_length, win_shift, win_shrink)
+
+        hist_file = None
+        if score_hist_dir is not None:
+            hist_file = Path(score_hist_dir) / key
+
+        logging.info('clustering utt {} x={}'.format(key,  x.shape))
+        seg_class_ids = diarizer.cluster(x, hist_file)
+        ts_class_ids = seg_class_ids[ts2segs]
+        logging.info('utt %s found %d spks' % (key, np.max(seg_class_ids)+1))
+
+        rttm = RTTM.create_spkdiar_single_file(
+            key, timestamps[:,0], timestamps[:,1]-timestamps[:,0], ts_class_ids)
+        rttm.merge_adjacent_segments()
+        rttms.append((key, rttm))
+
+    return rttms, time.time() - t1
+
+
+def _diarize_files(args):
+    return diarize_files(*args)
+
+
+def make_tasks(keys, num_rows, num_tasks):
+    """Packs the files into tasks with similar computing cost.
+       AHC+PLDA cost grows quadratically with the number of x-vectors,
+       so big files are processed alone while small files are
+       grouped into the same task.
+    """
+    num_tasks = min(num_tasks, len(keys))
+    cost = np.asarray(num_rows, dtype=float)**2
+    part_ids = partition_list_balanced(cost, num_tasks)
+    keys = np.asarray(keys)
+    tasks = []
+    for i in range(num_tasks):
+        keys_i = keys[part_ids == i]
+        if len(keys_i) > 0:
+            tasks.append(list(keys_i))
+    return tasks
+
+
+def eval_diar(test_list, v_file, timestamps_file, vad_file,
+              preproc_file, rttm_file,
+              win_start, win_length, win_shift, win_shrink,
+              score_hist_dir=None, num_workers=None, tasks_per_worker=4,
+              num_threads_per_worker=1, part_idx=1, num_parts=1,
+              verbose=1, **kwargs):
+
+    if num_workers is None or num_workers <= 0:
+        num_workers = multiprocessing.cpu_count()
+
+    r_x, _, _ = init_readers(v_file, None, None)
+    if test_list is None:
+        keys = np.asarray(r_x.keys)
+    else:
+        logging.info('reading utterance list %s' % test_list)
+        keys = Utt2Info.load(test_list).key
+
+    keys, _ = split_list(keys, part_idx, num_parts)
+
+    num_rows = r_x.read_num_rows(keys)
+    r_x.close()
+    num_workers = min(num_workers, len(keys))
+    tasks = make_tasks(keys, num_rows, num_workers * tasks_per_worker)
+    logging.info('diarizing %d files in %d tasks with %d workers' % (
+        len(keys), len(tasks), num_workers))
+
+    if score_hist_dir is not None:
+        Path(score_hist_dir).mkdir(parents=True, exist_ok=True)
+
+    # avoid oversubscribing the cores with BLAS threads inside each worker,
+    # workers are spawned so they pick up these values
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(num_threads_per_worker)
+
+    task_args = [(t, win_start, win_length, win_shift, win_shrink,
+                  score_hist_dir) for t in tasks]
+    init_fn = partial(init_worker, v_file, timestamps_file, vad_file,
+                      preproc_file, verbose, **kwargs)
+    rttms = {}
+    proc_time = 0
+    t1 = time.time()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(num_workers, initializer=init_fn) as pool:
+        for rttms_i, dt_i in pool.imap_unordered(_diarize_files, task_args):
+            rttms.update(rttms_i)
+            proc_time += dt_i
+            logging.info('diarized %d/%d files' % (len(rttms), len(keys)))
+
+    dt = time.time() - t1
+    logging.info(('elapsed-time=%.2f s. processing-time=%.2f s. '
+                  'speed-up=%.2f') % (dt, proc_time, proc_time/dt))
+
+    rttm = RTTM.merge([rttms[k] for k in keys])
+    rttm.save(rttm_file)
+
+
+if __name__ == "__main__":
+
+    parser=ArgumentParser(
+        description=('Diarizes a list of files with AHC and PLDA scoring '
+                     'distributing the files over a pool of processes'))
+
+    parser.add_argument('--cfg', action=ActionConfigFile)
+    parser.add_argument('--test-list', default=None,
+                        help=('list of files to diarize, '
+                              'if None, all the files in v-file'))
+    parser.add_argument('--v-file', required=True,
+                        help='x-vector sequences for each file')
+    parser.add_argument('--timestamps-file', default=None)
+    parser.add_argument('--vad-file', default=None)
+    parser.add_argument('--preproc-file', default=None)
+    VRF.add_argparse_args(parser, prefix='vad')
+
+    F.add_argparse_eval_args(parser)
+    Diar.add_argparse_args(parser)
+
+    parser.add_argument('--win-start', default=-0.675, type=float)
+    parser.add_argument('--win-length', default=1.5, type=float)
+    parser.add_argument('--win-shift', default=0.25, type=float)
+    parser.add_argument('--win-shrink', default=0.675, type=float)
+
+    parser.add_argument('--num-workers', type=int, default=None,
+                        help='number of worker processes, by default number of cores')
+    parser.add_argument('--tasks-per-worker', type=int, default=4,
+                        help=('files are packed into num_workers x tasks_per_worker '
+                              'tasks with similar cost'))
+    parser.add_argument('--num-threads-per-worker', type=int, default=1,
+                        help='number of BLAS threads per worker')
+    parser.add_argument('--part-idx', type=int, default=1,
+                        help=('splits the list of files in num-parts '
+                              'and process part_idx'))
+    parser.add_argument('--num-parts', type=int, default=1,
+                        help=('splits the list of files in num-parts '
+                              'and process part_idx'))
+
+    parser.add_argument('--rttm-file', required=True)
+    parser.add_argument('--score-hist-dir', default=None)
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1,
+                        choices=[0, 1, 2, 3], type=int)
+
+    args = parser.parse_args()
+    config_logger(args.verbose)
+    logging.debug(args)
+
+    eval_diar(**namespace_to_dict(args))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, ActionParser, namespace_to_dict
+import time
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import torch
+import torch.multiprocessing as mp
+
+from hyperion.hyp_defs import config_logger, set_float_cpu
+from hyperion.torch.utils import ddp
+from hyperion.torch.trainers import XVectorTrainer as Trainer
+from hyperion.torch.models import TDNNXVector as TDXVec
+
+
+def make_loader(num_steps, batch_size, in_feats, num_frames, num_classes, seed):
+    # synthetic features, each rank generates its own shard
+    g = torch.Generator()
+    g.manual_seed(seed)
+    num_samples = num_steps * batch_size
+    x = torch.randn(num_samples, in_feats, num_frames, generator=g)
+    y = torch.randint(num_classes, (num_samples,), generator=g)
+    data = torch.utils.data.TensorDataset(x, y)
+    return torch.utils.data.DataLoader(data, batch_size=batch_size)
+
+
+def bench_worker(local_rank, num_procs, results, exp_path, master_port, args):
+    run_bench(local_rank, num_procs, results, exp_path, master_port, **args)
+
+
+def run_bench(local_rank, num_procs, results, exp_path, master_port,
+              batch_size, num_frames, num_classes, num_steps, warmup_steps,
+              seed, num_threads_per_proc, bind_cpus, ddp_bucket_cap_mb,
+              ddp_grad_as_bucket_view, verbose, **kwargs):
+
+    config_logger(verbose if local_rank == 0 else 0)
+    set_float_cpu('float32')
+    device, rank, world_size = ddp.ddp_init(
+        local_rank, num_gpus=0, num_cpu_procs=num_procs,
+        master_port=str(master_port),
+        num_threads_per_proc=num_threads_per_proc, bind_cpus=bind_cpus)
+
+    # all ranks start from the same model
+    torch.manual_seed(seed)
+    xvec_args = TDXVec.filter_args(**kwargs)
+    xvec_args['num_classes'] = num_classes
+    model = TDXVec(**xvec_args)
+    in_feats = xvec_args['in_feats']
+
+    trainer = Trainer(model, optim={'opt_type': 'sgd', 'lr': 0.01, 'momentum': 0.9},
+                      epochs=1, exp_path='%s/procs%d' % (exp_path, num_procs),
+                      device=device, metrics={}, ddp=world_size > 1,
+                      log_interval=10000,
+                      ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                      ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                      prof={'stages': True})
+
+    seed_rank = seed + 1000 * rank
+    warmup_loader = make_loader(warmup_steps, batch_size, in_feats, num_frames,
+                                num_classes, seed_rank)
+    loader = make_loader(num_steps, batch_size, in_feats, num_frames,
+                         num_classes, seed_rank + 1)
+    trainer.train_epoch(warmup_loader)
+
+    if world_size > 1:
+        torch.distributed.barrier()
+    t1 = time.time()
+    trainer.train_epoch(loader)
+    if world_size > 1:
+        torch.distributed.barrier()
+    elapsed = time.time() - t1
+
+    if rank == 0:
+        result = {'num_procs': num_procs,
+                  'threads_per_proc': torch.get_num_threads(),
+                  'steps_per_sec': num_steps / elapsed,
+                  'samples_per_sec': num_steps * batch_size * world_size / elapsed}
+        for k, v in trainer.step_prof.metrics.items():
+            result[k] = v
+        results.put(result)
+
+    ddp.ddp_cleanup()
+
+
+def benchmark(num_procs, output_path, master_port, **kwargs):
+
+    logging.info('torch=%s cpus=%d' % (torch.__version__, os.cpu_count()))
+    ctx = mp.get_context('spawn')
+    results = ctx.SimpleQueue()
+    df = []
+    with tempfile.TemporaryDirectory() as exp_path:
+        for i, n in enumerate(num_procs):
+            logging.info('benchmarking %d processes' % (n))
+            # each run uses a new port in case the previous one wasn't released
+            mp.spawn(bench_worker, nprocs=n,
+                     args=(n, results, exp_path, master_port + i, kwargs))
+            result = results.get()
+            logging.info(' '.join('%s=%s' % (k, v) for k, v in result.items()))
+            df.append(result)
+
+    df = pd.DataFrame(df)
+    ref = df.iloc[0]
+    df['speedup'] = df['samples_per_sec'] / ref['samples_per_sec']
+    df['efficiency'] = df['speedup'] * ref['num_procs'] / df['num_procs']
+    logging.info('scaling with per-rank batch-size=%d:\n%s' % (
+        kwargs['batch_size'], df.to_string(index=False, float_format='%.4f')))
+    if output_path is not None:
+        output_dir = os.path.dirname(output_path)
+        if output_dir != '':
+            os.makedirs(output_dir, exist_ok=True)
+        logging.info('saving results to %s' % (output_path))
+        df.to_csv(output_path, index=False, float_format='%.5f')
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(
+        description=('Benchmarks the scaling of cpu distributed data parallel '
+                     'training (gloo) of a TDNN x-vector on synthetic data'))
+
+    parser.add_argument('--cfg', action=ActionConfigFile)
+    TDXVec.add_class_args(parser)
+    # by default, the original TDNN x-vector on 80-dim features,
+    # the defaults of the encoder layers in TDNNXVector are not valid
+    # for nargs='+', so they are set here
+    parser.set_defaults(
+        in_feats=80, tdnn_type='tdnn', num_enc_blocks=5,
+        enc_hid_units=[512, 512, 512, 512, 1500],
+        kernel_size=[5, 3, 3, 1, 1], dilation=[1, 2, 3, 1, 1])
+    parser.add_argument('--num-procs', type=int, nargs='+', default=[1, 2, 4],
+                        help='number of processes of each run')
+    parser.add_argument('--num-threads-per-proc', type=int, default=0,
+                        help=('number of intra-op threads of each process, '
+                              'if 0, the cores are split among the processes'))
+    parser.add_argument('--bind-cpus', default=False, action='store_true',
+                        help='binds each process to its own subset of cores')
+    parser.add_argument('--ddp-bucket-cap-mb', type=float, default=25,
+                        help='size in MB of the gradient buckets')
+    parser.add_argument('--ddp-grad-as-bucket-view', default=False,
+                        action='store_true',
+                        help='gradients are views of the ddp buckets')
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help='batch size per process')
+    parser.add_argument('--num-frames', type=int, default=200,
+                        help='number of frames of the training chunks')
+    parser.add_argument('--num-classes', type=int, default=1000)
+    parser.add_argument('--num-steps', type=int, default=20,
+                        help='number of timed steps')
+    parser.add_argument('--warmup-steps', type=int, default=3,
+                        help='number of steps before timing')
+    parser.add_argument('--seed', type=int, default=1123581321)
+    parser.add_argument('--master-port', type=int, default=29500)
+    parser.add_argument('--output-path', default=None,
+                        help='csv file to save the results')
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1,
+                        choices=[0, 1, 2, 3], type=int)
+
+    args = parser.parse_args()
+    config_logger(args.verbose)
+    logging.debug(args)
+
+    benchmark(**namespace_to_dict(args))
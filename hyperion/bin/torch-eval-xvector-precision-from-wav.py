@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""
+ Copyright 2022 Jesus Villalba (Johns Hopkins University)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, ActionParser, namespace_to_dict
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+import torch
+
+from hyperion.hyp_defs import config_logger, float_cpu, set_float_cpu
+from hyperion.utils import Utt2Info, TrialKey, TrialScores
+from hyperion.utils.list_utils import ismember
+from hyperion.io import RandomAccessAudioReader as AR
+from hyperion.io import SequentialAudioReader as SAR
+from hyperion.io import VADReaderFactory as VRF
+from hyperion.metrics import fast_eval_dcf_eer
+
+from hyperion.torch.utils import open_device
+from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.models import XVectorInference as XVI
+from hyperion.torch import TorchModelLoader as TML
+
+
+def init_device(use_gpu):
+    set_float_cpu('float32')
+    num_gpus = 1 if use_gpu else 0
+    logging.info('initializing devices num_gpus={}'.format(num_gpus))
+    device = open_device(num_gpus=num_gpus)
+    return device
+
+
+def calib_batches(calib_input, num_calib_utts, wav_scale, device):
+    logging.info('reading %d calibration utts from %s' % (
+        num_calib_utts, calib_input))
+    num_utts = 0
+    with SAR(calib_input, wav_scale=wav_scale) as reader:
+        while not reader.eof() and num_utts < num_calib_utts:
+            key, x, fs = reader.read(1)
+            if len(key) == 0:
+                break
+            num_utts += 1
+            x = torch.as_tensor(x[0][None, :], dtype=torch.get_default_dtype())
+            x_lengths = torch.as_tensor([x.shape[1]], dtype=torch.long)
+            yield x.to(device), x_lengths.to(device)
+
+
+def load_model(model_path, embed_layer, precision, calib_input,
+               num_calib_utts, device, **kwargs):
+    feat_args = AF.filter_args(**kwargs['feats'])
+    feat_extractor = AF(trans=False, **feat_args)
+    xvector = TML.load(model_path)
+    model = XVI(feat_extractor, xvector, embed_layer=embed_layer,
+                precision='bfloat16' if precision == 'bfloat16' else 'float32')
+    model.to(device)
+    model.eval()
+    if precision == 'int8':
+        if device.type != 'cpu':
+            raise ValueError('int8 models only run on cpu')
+        model.quantize_int8(
+            calib_batches(calib_input, num_calib_utts, kwargs['wav_scale'],
+                          device))
+
+    return model
+
+
+def read_trials(key_file, enroll_file):
+    key = TrialKey.load(key_file)
+    if enroll_file is None:
+        enroll = Utt2Info.create(key.model_set, key.model_set)
+    else:
+        enroll = Utt2Info.load(enroll_file)
+        f, _ = ismember(key.model_set, enroll.info)
+        assert np.all(f), 'some models are not in the enrollment file'
+
+    utts = np.unique(np.concatenate((enroll.key, key.seg_set)))
+    return key, enroll, utts
+
+
+def extract_embed(model, key, audio_reader, v_reader, device):
+    s, fs = audio_reader.read([key])
+    x = torch.as_tensor(s[0][None, :], dtype=torch.get_default_dtype()).to(device)
+    x_lengths = torch.as_tensor([x.shape[1]], dtype=torch.long).to(device)
+    f, f_lengths = model.extract_feats(x, x_lengths)
+    if v_reader is not None:
+        vad = v_reader.read([key], num_frames=f.shape[1])[0]
+        f = f[:, torch.as_tensor(vad, dtype=torch.bool).to(device)]
+        f_lengths = torch.as_tensor([f.shape[1]], dtype=torch.long).to(device)
+
+    y = model.extract_embed(f.transpose(1, 2).contiguous(), f_lengths)
+    return y[0].cpu().numpy(), s[0].shape[0] / fs[0]
+
+
+def extract_embeds(model, utts, audio_reader, v_reader, device):
+    x = np.zeros((len(utts), model.embed_dim), dtype=float_cpu())
+    with torch.no_grad():
+        # warm-up to exclude one time initializations from the timing
+        extract_embed(model, utts[0], audio_reader, v_reader, device)
+        proc_time = 0
+        duration = 0
+        for i, key in enumerate(utts):
+            t1 = time.time()
+            x[i], duration_i = extract_embed(
+                model, key, audio_reader, v_reader, device)
+            proc_time += time.time() - t1
+            duration += duration_i
+
+    return x, proc_time, duration
+
+
+def l2_norm(x):
+    return x / (np.sqrt(np.sum(x ** 2, axis=-1, keepdims=True)) + 1e-10)
+
+
+def eval_cosine(x, utts, key, enroll, p_tar):
+    x = l2_norm(x)
+    _, idx = ismember(enroll.key, utts)
+    _, model_idx = ismember(enroll.info, key.model_set)
+    x_e = np.zeros((key.num_models, x.shape[1]), dtype=x.dtype)
+    np.add.at(x_e, model_idx, x[idx])
+    x_e = l2_norm(x_e)
+    _, idx = ismember(key.seg_set, utts)
+    scores = np.dot(x_e, x[idx].T)
+    scores = TrialScores(key.model_set, key.seg_set, scores,
+                         score_mask=np.logical_or(key.tar, key.non))
+    tar, non = scores.get_tar_non(key)
+    min_dcf, _, eer, _ = fast_eval_dcf_eer(tar, non, p_tar)
+    return eer, min_dcf
+
+
+def eval_xvector_precision(test_wav_file, key_file, enroll_file, vad_spec,
+                           vad_path_prefix, model_path, embed_layer,
+                           precisions, calib_input, num_calib_utts, p_tar,
+                           num_threads, use_gpu, output_path, **kwargs):
+
+    device = init_device(use_gpu)
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    logging.info('using %d threads' % torch.get_num_threads())
+
+    key, enroll, utts = read_trials(key_file, enroll_file)
+    logging.info('evaluating %d trials with %d utts' % (
+        np.sum(key.tar) + np.sum(key.non), len(utts)))
+    if calib_input is None:
+        calib_input = test_wav_file
+
+    audio_args = AR.filter_args(**kwargs)
+    audio_reader = AR(test_wav_file, **audio_args)
+    v_reader = None
+    if vad_spec is not None:
+        logging.info('opening VAD stream: %s' % (vad_spec))
+        v_reader = VRF.create(vad_spec, path_prefix=vad_path_prefix,
+                              scp_sep=' ')
+
+    p_tar = np.sort(p_tar)
+    results = []
+    for precision in precisions:
+        logging.info('evaluating %s precision' % (precision))
+        model = load_model(model_path, embed_layer, precision, calib_input,
+                           num_calib_utts, device, **kwargs)
+        x, proc_time, duration = extract_embeds(
+            model, utts, audio_reader, v_reader, device)
+        eer, min_dcf = eval_cosine(x, utts, key, enroll, p_tar)
+        result = {'precision': precision, 'eer': eer * 100}
+        for p, dcf in zip(p_tar, min_dcf):
+            result['min_dcf_%g' % p] = dcf
+        result['rtf'] = proc_time / duration
+        if len(results) == 0:
+            x_ref = l2_norm(x)
+            ref = result
+        result['eer_drift'] = result['eer'] - ref['eer']
+        result['speedup'] = ref['rtf'] / result['rtf']
+        result['embed_cos'] = np.mean(np.sum(l2_norm(x) * x_ref, axis=-1))
+        logging.info(' '.join('%s=%s' % (k, v) for k, v in result.items()))
+        results.append(result)
+        del model
+
+    df = pd.DataFrame(results)
+    logging.info('accuracy vs speed report (drift w.r.t. %s):\n%s' % (
+        precisions[0], df.to_string(index=False, float_format='%.4f')))
+    if output_path is not None:
+        output_dir = os.path.dirname(output_path)
+        if output_dir != '':
+            os.makedirs(output_dir, exist_ok=True)
+        logging.info('saving report to %s' % (output_path))
+        df.to_csv(output_path, index=False, float_format='%.5f')
+
+
+if __name__ == "__main__":
+
+    parser=ArgumentParser(
+        description=('Compares the EER/DCF and realtime factor of '
+                     'x-vector extractors in float32, bfloat16 and int8 '
+                     'precisions with cosine scoring'))
+
+    parser.add_argument('--cfg', action=ActionConfigFile)
+    parser.add_argument('--test-wav-file', required=True,
+                        help='audio list with the enrollment and test utts')
+    parser.add_argument('--key-file', required=True)
+    parser.add_argument('--enroll-file', default=None,
+                        help=('Utt2Info file mapping enrollment utts to model ids, '
+                              'if None, model ids are utt ids'))
+    parser.add_argument('--vad', dest='vad_spec', default=None)
+    parser.add_argument('--vad-path-prefix', default=None,
+                        help=('scp file_path prefix for vad'))
+
+    AR.add_class_args(parser)
+    AF.add_class_args(parser, prefix='feats')
+
+    parser.add_argument('--model-path', required=True)
+    parser.add_argument('--embed-layer', type=int, default=None,
+                        help=('classifier layer to get the embedding from, '
+                              'if None, it uses layer set in training phase'))
+    parser.add_argument('--precisions', nargs='+',
+                        default=['float32', 'bfloat16', 'int8'],
+                        choices=['float32', 'bfloat16', 'int8'],
+                        help=('precisions to evaluate, drifts are computed '
+                              'w.r.t. the first one'))
+    parser.add_argument('--calib-input', default=None,
+                        help=('audio list to calibrate int8 quantization, '
+                              'if None, it uses the first utts of --test-wav-file'))
+    parser.add_argument('--num-calib-utts', type=int, default=20,
+                        help='number of utterances to calibrate int8 quantization')
+    parser.add_argument('--p-tar', type=float, nargs='+', default=[0.005, 0.01],
+                        help='target priors for the minimum DCF')
+    parser.add_argument('--num-threads', type=int, default=0,
+                        help='number of intra-op threads, if 0 uses torch default')
+    parser.add_argument('--use-gpu', default=False, action='store_true',
+                        help='extract xvectors in gpu')
+    parser.add_argument('--output-path', default=None,
+                        help='csv file to save the report')
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1,
+                        choices=[0, 1, 2, 3], type=int)
+
+    args=parser.parse_args()
+    config_logger(args.verbose)
+    del args.verbose
+    logging.debug(args)
+
+    eval_xvector_precision(**namespace_to_dict(args))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+ Copyright 2022 Jesus Villalba (Johns Hopkins University)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import sys
+import os
+from jsonargparse import ArgumentParser, ActionConfigFile, ActionParser, namespace_to_dict
+import time
+import logging
+
+import torch
+
+from hyperion.hyp_defs import config_logger, set_float_cpu
+from hyperion.torch.utils import open_device
+from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.models import XVectorInference as XVI
+from hyperion.torch import TorchModelLoader as TML
+
+
+def export_xvector(model_path, output_path, embed_layer,
+                   example_secs, use_gpu, **kwargs):
+
+    set_float_cpu('float32')
+    num_gpus = 1 if use_gpu else 0
+    device = open_device(num_gpus=num_gpus)
+
+    feat_args = AF.filter_args(**kwargs['feats'])
+    logging.info('feat args={}'.format(feat_args))
+    feat_extractor = AF(trans=False, **feat_args)
+    logging.info('feat-extractor={}'.format(feat_extractor))
+
+    logging.info('loading model {}'.format(model_path))
+    model = TML.load(model_path)
+    logging.info('xvector-model={}'.format(model))
+
+    model = XVI(feat_extractor, model, embed_layer=embed_layer)
+    model.to(device)
+    model.eval()
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir != '':
+        os.makedirs(output_dir, exist_ok=True)
+
+    t1 = time.time()
+    model.export(output_path, example_secs=example_secs)
+    logging.info('exported model in %.2f secs' % (time.time() - t1))
+
+
+if __name__ == "__main__":
+
+    parser=ArgumentParser(
+        description=('Exports the feature extractor and x-vector model '
+                     'to a single TorchScript inference graph'))
+
+    parser.add_argument('--cfg', action=ActionConfigFile)
+    AF.add_class_args(parser, prefix='feats')
+
+    parser.add_argument('--model-path', required=True)
+    parser.add_argument('--embed-layer', type=int, default=None,
+                        help=('classifier layer to get the embedding from, '
+                              'if None, it uses layer set in training phase'))
+    parser.add_argument('--example-secs', type=float, default=10.,
+                        help=('duration of the example signals used for tracing, '
+                              'it has to be longer than the mvn context window'))
+    parser.add_argument('--output-path', required=True)
+    parser.add_argument('--use-gpu', default=False, action='store_true',
+                        help='export the model in gpu')
+    parser.add_argument('-v', '--verbose', dest='verbose', default=1,
+                        choices=[0, 1, 2, 3], type=int)
+
+    args=parser.parse_args()
+    config_logger(args.verbose)
+    del args.verbose
+    logging.debug(args)
+
+    export_xvector(**namespace_to_dict(args))
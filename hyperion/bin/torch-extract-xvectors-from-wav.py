@@ -24,6 +24,7 @@ from hyperion.augment import SpeechAugment
 
 from hyperion.torch.utils import open_device
 from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.models import XVectorInference as XVI
 from hyperion.torch import TorchModelLoader as TML
 
 def init_device(use_gpu):
@@ -45,12 +46,53 @@ def init_feats(device, **kwargs):
     return feat_extractor
 
 
-def load_model(model_path, device):
+def calib_batches(calib_input, num_calib_utts, device, **kwargs):
+    logging.info('reading %d calibration utts from %s' % (
+        num_calib_utts, calib_input))
+    num_utts = 0
+    with AR(calib_input, wav_scale=kwargs['wav_scale']) as reader:
+        while not reader.eof() and num_utts < num_calib_utts:
+            key, x, fs = reader.read(1)
+            if len(key) == 0:
+                break
+            num_utts += 1
+            yield pad_batch(x, device)
+
+
+def load_model(model_path, chunk_length, embed_layer, precision,
+               calib_input, num_calib_utts, device, **kwargs):
+    if XVI.is_exported(model_path):
+        logging.info('loading exported model {}'.format(model_path))
+        logging.info('feature extractor args are ignored, '
+                     'the features are computed by the exported graph')
+        if chunk_length > 0:
+            logging.warning('exported models don\'t support chunk-length > 0, '
+                            'using full utterances')
+        if precision != 'float32':
+            raise ValueError('exported models only support float32 precision')
+        model = XVI.load(model_path, map_location=device)
+        if embed_layer is not None and embed_layer != model.embed_layer:
+            raise ValueError('model was exported with embed_layer=%s' % (
+                model.embed_layer))
+        logging.info('xvector-model={}'.format(model))
+        return model
+
+    feat_extractor = init_feats(device, **kwargs)
     logging.info('loading model {}'.format(model_path))
-    model = TML.load(model_path)
-    logging.info('xvector-model={}'.format(model))
+    xvector = TML.load(model_path)
+    logging.info('xvector-model={}'.format(xvector))
+    model = XVI(feat_extractor, xvector, embed_layer=embed_layer,
+                chunk_length=chunk_length,
+                precision='bfloat16' if precision == 'bfloat16' else 'float32')
     model.to(device)
     model.eval()
+    if precision == 'int8':
+        if device.type != 'cpu':
+            raise ValueError('int8 models only run on cpu')
+        model.quantize_int8(
+            calib_batches(calib_input, num_calib_utts, device, **kwargs))
+        logging.info('int8 xvector-model={}'.format(model.xvector))
+
     return model
 
 
@@ -86,17 +128,70 @@ def select_random_chunk(key, x, min_utt_length, max_utt_length, rng):
     return x
 
 
+def pad_batch(xs, device):
+    x_lengths = torch.as_tensor([x.shape[-1] for x in xs], dtype=torch.long)
+    x = torch.zeros((len(xs),) + tuple(xs[0].shape[:-1]) + (int(x_lengths.max()),),
+                    dtype=torch.get_default_dtype())
+    for i, x_i in enumerate(xs):
+        x[i, ..., :x_i.shape[-1]] = torch.as_tensor(x_i)
+
+    return x.to(device), x_lengths.to(device)
+
+
+def extract_xvectors_batch(keys, keys0, xs, model, v_reader,
+                           random_utt_length, min_utt_length, max_utt_length,
+                           rng, device):
+    
+    t1 = time.time()
+    x, x_lengths = pad_batch(xs, device)
+    f, f_lengths = model.extract_feats(x, x_lengths)
+    t2 = time.time()
+    f_lengths = f_lengths.tolist()
+    fs = []
+    for i in range(len(keys)):
+        f_i = f[i:i+1, :f_lengths[i]]
+        tot_frames = f_i.shape[1]
+        if v_reader is not None:
+            vad = v_reader.read(keys0[i], num_frames=tot_frames)[0]
+            vad = torch.tensor(vad, dtype=torch.bool).to(device)
+            f_i = f_i[:, vad]
+
+        logging.info(
+            'utt %s detected %d/%d (%.2f %%) speech frames' % (
+                keys[i], f_i.shape[1], tot_frames, 
+                f_i.shape[1]/max(tot_frames, 1)*100))
+
+        if random_utt_length:
+            f_i = select_random_chunk(
+                keys[i], f_i, min_utt_length, max_utt_length, rng)
+        fs.append(f_i[0].transpose(0, 1))
+
+    t3 = time.time()
+    y = np.zeros((len(keys), model.embed_dim), dtype=float_cpu())
+    num_frames = [f_i.shape[1] for f_i in fs]
+    valid = [i for i in range(len(keys)) if num_frames[i] > 0]
+    if len(valid) > 0:
+        f, f_lengths = pad_batch([fs[i] for i in valid], device)
+        y[valid] = model.extract_embed(f, f_lengths).cpu().numpy()
+
+    t4 = time.time()
+    return y, num_frames, (t2-t1, t3-t2, t4-t3)
+
+
 def extract_xvectors(input_spec, output_spec, vad_spec, write_num_frames_spec,
                      scp_sep, vad_path_prefix, 
-                     model_path, chunk_length, embed_layer, 
+                     model_path, chunk_length, embed_layer,
+                     precision, calib_input, num_calib_utts,
                      random_utt_length, min_utt_length, max_utt_length,
                      aug_cfg, num_augs, aug_info_path,
-                     use_gpu, **kwargs):
+                     use_gpu, batch_size, sort_window, **kwargs):
 
     rng = np.random.RandomState(seed=1123581321+kwargs['part_idx'])
     device = init_device(use_gpu)
-    feat_extractor = init_feats(device, **kwargs)
-    model = load_model(model_path, device)
+    if precision == 'int8' and calib_input is None:
+        calib_input = input_spec
+    model = load_model(model_path, chunk_length, embed_layer, precision,
+                       calib_input, num_calib_utts, device, **kwargs)
 
     if write_num_frames_spec is not None:
         keys = []
@@ -118,74 +213,71 @@ def extract_xvectors(input_spec, output_spec, vad_spec, write_num_frames_spec,
             input_spec, ar_args))
         with AR(input_spec, **ar_args) as reader:
 
+            v_reader = None
             if vad_spec is not None:
                 logging.info('opening VAD stream: %s' % (vad_spec))
                 v_reader = VRF.create(vad_spec, path_prefix=vad_path_prefix, 
                                       scp_sep=scp_sep)
     
             while not reader.eof():
+                # reads several batches to sort them by length
                 t1 = time.time()
-                key, x0, fs = reader.read(1)
-                if len(key) == 0:
+                key_in, x_in, fs = reader.read(batch_size * sort_window)
+                if len(key_in) == 0:
                     break
 
-                x0 = x0[0]
-                key0 = key[0]
                 t2 = time.time()
-
-                logging.info('processing utt %s' % (key0))
-                for aug_id in range(num_augs):
-                    t3 = time.time()
-                    key, x = augment(key0, x0, augmenter, aug_df, aug_id)
-                    t4 = time.time()
+                batch_keys = []
+                batch_keys0 = []
+                batch_x = []
+                for key0, x0 in zip(key_in, x_in):
+                    logging.info('processing utt %s' % (key0))
+                    for aug_id in range(num_augs):
+                        key, x = augment(key0, x0, augmenter, aug_df, aug_id)
+                        batch_keys.append(key)
+                        batch_keys0.append(key0)
+                        batch_x.append(x)
+
+                # sort by length to reduce the padding in each batch
+                t3 = time.time()
+                index = np.argsort([-len(x) for x in batch_x], kind='stable')
+                times = np.zeros((3,))
+                batch_y = [None] * len(batch_x)
+                batch_frames = [None] * len(batch_x)
+                for i in range(0, len(index), batch_size):
+                    idx = index[i:i+batch_size]
                     with torch.no_grad():
-                        x = torch.tensor(
-                            x[None,:], dtype=torch.get_default_dtype()).to(
-                            device)
-
-                        x = feat_extractor(x)
-                        t5 = time.time()
-                        tot_frames = x.shape[1]
-                        if vad_spec is not None:
-                            vad = v_reader.read(
-                                key0, num_frames=tot_frames)[0]
-                            vad = torch.tensor(vad, dtype=torch.bool).to(device)
-                            x = x[:,vad]
-
-                        logging.info(
-                            'utt %s detected %d/%d (%.2f %%) speech frames' % (
-                                key, x.shape[1], tot_frames, 
-                                x.shape[1]/tot_frames*100))
-                
-                        if random_utt_length:
-                            x = select_random_chunk(
-                                key, x, min_utt_length, max_utt_length, rng)
-
-                        t6 = time.time()
-                        if x.shape[1] == 0:
-                            y = np.zeros((model.embed_dim,), dtype=float_cpu())
-                        else:
-                            x = x.transpose(1,2).contiguous()
-                            y = model.extract_embed(
-                                x, chunk_length=chunk_length, 
-                                embed_layer=embed_layer).cpu().numpy()[0]
-
-                    t7 = time.time()
-                    writer.write([key], [y])
-                    if write_num_frames_spec is not None:
-                        keys.append(key)
-                        info.append(str(x.shape[1]))
-
-                    t8 = time.time()
-                    read_time = t2 - t1
-                    tot_time = read_time + t8-t3
-                    logging.info((
-                        'utt %s total-time=%.3f read-time=%.3f '
-                        'aug-time=%.3f feat-time=%.3f '
-                        'vad-time=%.3f embed-time=%.3f write-time=%.3f '
-                        'rt-factor=%.2f') % (
-                            key, tot_time, read_time, t4-t3, t5-t4, 
-                            t6-t5, t7-t6, t8-t7, x0.shape[0]/fs[0]/tot_time))
+                        y, num_frames, times_i = extract_xvectors_batch(
+                            [batch_keys[j] for j in idx], 
+                            [batch_keys0[j] for j in idx], 
+                            [batch_x[j] for j in idx], 
+                            model, v_reader,
+                            random_utt_length, min_utt_length, max_utt_length,
+                            rng, device)
+                    times += times_i
+
+                    for k, j in enumerate(idx):
+                        batch_y[j] = y[k]
+                        batch_frames[j] = num_frames[k]
+
+                t4 = time.time()
+                writer.write(batch_keys, batch_y)
+                if write_num_frames_spec is not None:
+                    keys += batch_keys
+                    info += [str(n) for n in batch_frames]
+
+                t5 = time.time()
+                read_time = t2 - t1
+                tot_time = t5 - t1
+                duration = np.sum([x0.shape[0]/fs_i for x0, fs_i in zip(x_in, fs)])
+                logging.info((
+                    'window of %d utts total-time=%.3f read-time=%.3f '
+                    'aug-time=%.3f feat-time=%.3f '
+                    'vad-time=%.3f embed-time=%.3f write-time=%.3f '
+                    'rt-factor=%.2f') % (
+                        len(key_in), tot_time, read_time, t3-t2, times[0], 
+                        times[1], times[2], t5-t4,
+                        duration/tot_time))
 
     if write_num_frames_spec is not None:
         logging.info('writing num-frames to %s' % (write_num_frames_spec))
@@ -222,7 +314,9 @@ if __name__ == "__main__":
 
     AF.add_class_args(parser, prefix='feats')
 
-    parser.add_argument('--model-path', required=True)
+    parser.add_argument('--model-path', required=True,
+                        help=('model file, it can be a model checkpoint or '
+                              'a graph exported by torch-export-xvector.py'))
     parser.add_argument('--chunk-length', type=int, default=0, 
                         help=('number of frames used in each forward pass '
                               'of the x-vector encoder,'
@@ -231,6 +325,17 @@ if __name__ == "__main__":
                         help=('classifier layer to get the embedding from, ' 
                               'if None, it uses layer set in training phase'))
 
+    parser.add_argument('--precision', default='float32',
+                        choices=['float32', 'bfloat16', 'int8'],
+                        help=('precision of the x-vector network, '
+                              'bfloat16 uses autocast, int8 uses '
+                              'post-training static quantization (cpu only)'))
+    parser.add_argument('--calib-input', default=None,
+                        help=('audio list to calibrate int8 quantization, '
+                              'if None, it uses the first utts of --input'))
+    parser.add_argument('--num-calib-utts', type=int, default=20,
+                        help='number of utterances to calibrate int8 quantization')
+
     parser.add_argument('--random-utt-length', default=False, action='store_true',
                         help='calculates x-vector from a random chunk')
     parser.add_argument('--min-utt-length', type=int, default=500, 
@@ -238,6 +343,14 @@ if __name__ == "__main__":
     parser.add_argument('--max-utt-length', type=int, default=12000, 
                         help=('maximum utterance length when using random utt length'))
 
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help=('number of utterances processed together, '
+                              'utterances are padded inside each batch'))
+    parser.add_argument('--sort-window', type=int, default=16,
+                        help=('number of batches read at once, the utterances '
+                              'of the window are sorted by length before '
+                              'splitting them into batches to reduce padding'))
+
     parser.add_argument('--output', dest='output_spec', required=True)
     parser.add_argument('--use-gpu', default=False, action='store_true',
                         help='extract xvectors in gpu')
@@ -24,6 +24,7 @@ from hyperion.torch.data import AudioDataset as AD
 from hyperion.torch.data import ClassWeightedSeqSampler as Sampler
 from hyperion.torch.metrics import CategoricalAccuracy
 from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.layers import BatchSpeechAugment
 
 
 def init_data(audio_path, train_list, val_list, 
@@ -45,8 +46,9 @@ def init_data(audio_path, train_list, val_list,
     train_sampler = Sampler(train_data, **sampler_args)
     val_sampler = Sampler(val_data, **sampler_args)
 
-    num_workers_per_gpu = int((num_workers + num_gpus - 1) / num_gpus)
-    largs = {'num_workers': num_workers_per_gpu, 'pin_memory': True} if num_gpus > 0 else {}
+    num_procs = ddp.get_num_local_procs(num_gpus, **kwargs)
+    num_workers_per_proc = int((num_workers + num_procs - 1) / num_procs)
+    largs = {'num_workers': num_workers_per_proc, 'pin_memory': num_gpus > 0}
 
     train_loader = torch.utils.data.DataLoader(
         train_data, batch_sampler = train_sampler, **largs)
@@ -68,6 +70,16 @@ def init_feats(rank, **kwargs):
     return feat_extractor
 
 
+def init_batch_aug(rank, train_batch_aug_cfg, **kwargs):
+    if train_batch_aug_cfg is None:
+        return None
+
+    if rank == 0:
+        logging.info('initializing batch augmentation')
+    return BatchSpeechAugment.create(
+        train_batch_aug_cfg, random_seed=112358 + 1000 * rank)
+
+
 def init_xvector(num_classes, rank, **kwargs):
     xvec_args = XVec.filter_args(**kwargs)
     if rank == 0:
@@ -94,6 +106,7 @@ def train_xvec(gpu_id, args):
     kwargs['rank'] = rank
     train_loader, test_loader = init_data(**kwargs)
     feat_extractor = init_feats(**kwargs)
+    wav_augment = init_batch_aug(**kwargs)
     model = init_xvector(train_loader.dataset.num_classes, **kwargs)
 
     trn_args = Trainer.filter_args(**kwargs)
@@ -102,7 +115,8 @@ def train_xvec(gpu_id, args):
     metrics = { 'acc': CategoricalAccuracy() }
     trainer = Trainer(model, feat_extractor,
                       device=device, metrics=metrics, 
-                      ddp=world_size>1, **trn_args)
+                      ddp=world_size>1, wav_augment=wav_augment,
+                      **trn_args)
     if args.resume:
         trainer.load_last_checkpoint()
     trainer.fit(train_loader, test_loader)
@@ -125,6 +139,10 @@ if __name__ == '__main__':
 
     parser.add_argument('--train-aug-cfg', default=None)
     parser.add_argument('--val-aug-cfg', default=None)
+    parser.add_argument('--train-batch-aug-cfg', default=None,
+                        help=('augmentation config applied to the collated batch '
+                              'in the training device, instead of '
+                              'in the data loader workers'))
 
     parser.add_argument('--num-workers', type=int, default=5, 
                         help='num_workers of data loader')
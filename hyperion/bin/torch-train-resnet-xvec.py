@@ -47,10 +47,9 @@ def init_data(data_rspec, train_list, val_list, num_workers, num_gpus, rank, **k
     train_sampler = Sampler(train_data, **sampler_args)
     val_sampler = Sampler(val_data, **sampler_args)
 
-    num_workers_per_gpu = int((num_workers + num_gpus - 1) / num_gpus)
-    largs = (
-        {"num_workers": num_workers_per_gpu, "pin_memory": True} if num_gpus > 0 else {}
-    )
+    num_procs = ddp.get_num_local_procs(num_gpus, **kwargs)
+    num_workers_per_proc = int((num_workers + num_procs - 1) / num_procs)
+    largs = {"num_workers": num_workers_per_proc, "pin_memory": num_gpus > 0}
 
     train_loader = torch.utils.data.DataLoader(
         train_data, batch_sampler=train_sampler, **largs
@@ -22,8 +22,10 @@ from hyperion.torch.utils import ddp
 from hyperion.torch.trainers import XVectorTrainerFromWav as Trainer
 from hyperion.torch.data import AudioDataset as AD
 from hyperion.torch.data import ClassWeightedSeqSampler as Sampler
+from hyperion.torch.data import FeatCache
 from hyperion.torch.metrics import CategoricalAccuracy
 from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.layers import BatchSpeechAugment
 from hyperion.torch.models import ResNetXVector as RXVec
 from hyperion.torch.models import EfficientNetXVector as EXVec
 from hyperion.torch.models import TDNNXVector as TDXVec
@@ -34,9 +36,14 @@ xvec_dict = {'resnet': RXVec, 'efficientnet': EXVec, 'tdnn': TDXVec, 'transforme
 
 def init_data(audio_path, train_list, val_list, 
               train_aug_cfg, val_aug_cfg, num_workers, 
-              num_gpus, rank, **kwargs):
+              num_gpus, rank, feat_cache_path=None, 
+              chunk_frame_shift=0.01, **kwargs):
 
     ad_args = AD.filter_args(**kwargs)
+    if feat_cache_path is not None:
+        # chunk info is needed to read/write the feature cache
+        ad_args['return_chunk_info'] = True
+        ad_args['chunk_frame_shift'] = chunk_frame_shift
     sampler_args = Sampler.filter_args(**kwargs)
     if rank == 0:
         logging.info('audio dataset args={}'.format(ad_args))
@@ -51,8 +58,9 @@ def init_data(audio_path, train_list, val_list,
     train_sampler = Sampler(train_data, **sampler_args)
     val_sampler = Sampler(val_data, **sampler_args)
 
-    num_workers_per_gpu = int((num_workers + num_gpus - 1) / num_gpus)
-    largs = {'num_workers': num_workers_per_gpu, 'pin_memory': True} if num_gpus > 0 else {}
+    num_procs = ddp.get_num_local_procs(num_gpus, **kwargs)
+    num_workers_per_proc = int((num_workers + num_procs - 1) / num_procs)
+    largs = {'num_workers': num_workers_per_proc, 'pin_memory': num_gpus > 0}
 
     train_loader = torch.utils.data.DataLoader(
         train_data, batch_sampler = train_sampler, **largs)
@@ -74,6 +82,34 @@ def init_feats(rank, **kwargs):
     return feat_extractor
 
 
+def init_feat_cache(rank, feat_cache_path, feat_cache_dtype, 
+                    dataset, feat_extractor, name):
+    if feat_cache_path is None:
+        return None
+
+    cache_path = '%s/%s' % (feat_cache_path, name)
+    if rank == 0:
+        logging.info('initializing %s feature cache %s' % (name, cache_path))
+    # feature dimension of the features before normalization
+    with torch.no_grad():
+        x = torch.zeros((1, int(feat_extractor.fs)))
+        feat_dim = feat_extractor.audio_feats(x).shape[-1]
+
+    return FeatCache.create(
+        cache_path, dataset.seq_lengths, feat_extractor.frame_shift / 1000,
+        feat_dim, feat_cache_dtype)
+
+
+def init_batch_aug(rank, train_batch_aug_cfg, **kwargs):
+    if train_batch_aug_cfg is None:
+        return None
+
+    if rank == 0:
+        logging.info('initializing batch augmentation')
+    return BatchSpeechAugment.create(
+        train_batch_aug_cfg, random_seed=112358 + 1000 * rank)
+
+
 def init_xvector(num_classes, rank, xvec_class, **kwargs):
     
     xvec_args = xvec_class.filter_args(**kwargs)
@@ -100,8 +136,16 @@ def train_xvec(gpu_id, args):
     device, rank, world_size = ddp.ddp_init(gpu_id, **ddp_args)
     kwargs['rank'] = rank
 
-    train_loader, test_loader = init_data(**kwargs)
     feat_extractor = init_feats(**kwargs)
+    train_loader, test_loader = init_data(
+        chunk_frame_shift=feat_extractor.frame_shift / 1000, **kwargs)
+    wav_augment = init_batch_aug(**kwargs)
+    feat_cache = init_feat_cache(
+        dataset=train_loader.dataset, feat_extractor=feat_extractor, 
+        name='train', **kwargs)
+    val_feat_cache = init_feat_cache(
+        dataset=test_loader.dataset, feat_extractor=feat_extractor, 
+        name='val', **kwargs)
     model = init_xvector(train_loader.dataset.num_classes, **kwargs)
 
     trn_args = Trainer.filter_args(**kwargs)
@@ -110,7 +154,9 @@ def train_xvec(gpu_id, args):
     metrics = { 'acc': CategoricalAccuracy() }
     trainer = Trainer(model, feat_extractor,
                       device=device, metrics=metrics, 
-                      ddp=world_size>1, **trn_args)
+                      ddp=world_size>1, wav_augment=wav_augment, 
+                      feat_cache=feat_cache, val_feat_cache=val_feat_cache,
+                      **trn_args)
     if args.resume:
         trainer.load_last_checkpoint()
     trainer.fit(train_loader, test_loader)
@@ -131,6 +177,18 @@ def make_parser(xvec_class):
 
     parser.add_argument('--train-aug-cfg', default=None)
     parser.add_argument('--val-aug-cfg', default=None)
+    parser.add_argument('--train-batch-aug-cfg', default=None,
+                        help=('augmentation config applied to the collated batch '
+                              'in the training device, instead of '
+                              'in the data loader workers'))
+
+    parser.add_argument('--feat-cache-path', default=None,
+                        help=('directory of the memory-mapped cache for the '
+                              'features of the clean chunks, if None, '
+                              'features are always recomputed'))
+    parser.add_argument('--feat-cache-dtype', default='float16',
+                        choices=['float16', 'float32'],
+                        help='data type of the feature cache')
 
     parser.add_argument('--num-workers', type=int, default=5, 
                         help='num_workers of data loader')
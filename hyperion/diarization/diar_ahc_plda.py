@@ -78,7 +78,8 @@ class DiarAHCPLDA(object):
 
 
     def cluster(self, x, hist_file=None):
-        x = self.preproc.predict(x)
+        if self.preproc is not None:
+            x = self.preproc.predict(x)
         if self.pca_var_r < 1:
             pca = PCA(pca_var_r=self.pca_var_r, whiten=True)
             pca.fit(x)
@@ -97,7 +98,7 @@ class DiarAHCPLDA(object):
             if hist_file:
                 hist_file_1 = '%s-nocal.pdf' % hist_file
                 self._plot_score_hist(scores, hist_file_1, None, gmm_2c)
-                scores = scores_cal
+            scores = scores_cal
 
         if hist_file:
             hist_file_1 = '%s.pdf' % hist_file
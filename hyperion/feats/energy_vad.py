@@ -60,8 +60,19 @@ class EnergyVAD(object):
 
 
     def reset(self):
-        """Resets the internal states of the filters """
+        """Resets the internal states of the filters and
+           the streaming buffers"""
         self._dc_zi = np.array([0], dtype=float_cpu())
+        self._stream_x = np.zeros((0,), dtype=float_cpu())
+        self._stream_rng = np.random.RandomState(seed=0)
+        # sum and number of the log-energies received until now
+        self._stream_sum_logE = 0
+        self._stream_num_frames = 0
+        # frame-level decisions waiting for right context
+        # plus left context of the next frame
+        self._stream_vad = np.zeros((0,), dtype=bool)
+        self._stream_vad_start = 0
+        self._stream_out_frames = 0
 
 
     def compute(self, x, return_loge=False):
@@ -134,6 +145,89 @@ class EnergyVAD(object):
         return vad
     
 
+    def _smooth_stream(self, flush=False):
+        """Applies the context smoothing to the buffered decisions
+           whose right context is available.
+        """
+        context = self.vad_frames_context
+        vad = self._stream_vad
+        start = self._stream_vad_start
+        end = start + len(vad)
+        out1 = self._stream_out_frames
+        out2 = end if flush else end - context
+        if out2 <= out1:
+            return np.zeros((0,), dtype=bool)
+
+        c = np.concatenate(([0], np.cumsum(vad, dtype=np.int64)))
+        t = np.arange(out1, out2)
+        idx1 = np.maximum(t - context, 0)
+        idx2 = np.minimum(t + context + 1, end)
+        num_count = (c[idx2 - start] - c[idx1 - start])/(idx2 - idx1)
+        y = num_count > self.vad_proportion_threshold
+
+        self._stream_out_frames = out2
+        # keep the left context of the next output frame
+        new_start = max(out2 - context, start)
+        self._stream_vad = vad[new_start - start:]
+        self._stream_vad_start = new_start
+        return y
+
+
+    def accept_waveform(self, x):
+        """Streaming version of compute, it receives the waveform by chunks
+           and returns the VAD decisions that are ready after adding the chunk.
+
+           The energy threshold uses the mean log-energy of all the frames
+           received until the end of the current chunk, instead of the mean
+           of the full signal. With frame context, the decisions are delayed
+           by vad_frames_context frames, call flush() at the end of the
+           signal to get the last ones. Memory does not grow with the
+           length of the signal. Call reset() before starting a new signal.
+
+           Args:
+             x: chunk of the wave signal.
+
+           Returns:
+             Binary VAD of the new frames, it can have zero frames.
+        """
+        assert self.snip_edges, 'accept_waveform requires snip_edges=True'
+        x = np.asarray(x, dtype=float_cpu())
+        if self.dither > 0:
+            x = x + self.dither * self._stream_rng.randn(len(x)).astype(
+                float_cpu(), copy=False)
+
+        x, self._dc_zi = lfilter(self._dc_b, self._dc_a, x, zi=self._dc_zi)
+        x = np.concatenate((self._stream_x, x))
+        num_frames = max(0, int(
+            np.floor((len(x) - self._length + self._shift)/self._shift)))
+        num_used = (num_frames - 1) * self._shift + self._length
+        logE = st_logE(x[:num_used], self._length, self._shift)
+        self._stream_x = x[num_frames * self._shift:]
+
+        self._stream_sum_logE += np.sum(logE)
+        self._stream_num_frames += num_frames
+        if self._stream_num_frames == 0:
+            return np.zeros((0,), dtype=bool)
+
+        mean_logE = self._stream_sum_logE / self._stream_num_frames
+        e_thr = self.vad_energy_threshold + self.vad_energy_mean_scale * mean_logE
+        vad = logE > e_thr
+        if self.vad_frames_context == 0:
+            return vad
+
+        self._stream_vad = np.concatenate((self._stream_vad, vad))
+        return self._smooth_stream()
+
+
+    def flush(self):
+        """Returns the streaming VAD decisions that were waiting
+           for right context at the end of the signal.
+        """
+        if self.vad_frames_context == 0:
+            return np.zeros((0,), dtype=bool)
+        return self._smooth_stream(flush=True)
+
+
     @staticmethod
     def filter_args(**kwargs):
         """Filters VAD args from arguments dictionary.
@@ -26,6 +26,21 @@ class MeanVarianceNorm(object):
         self.norm_var = norm_var
         self.left_context = left_context
         self.right_context = right_context
+        self.reset()
+
+
+
+    def reset(self):
+        """Resets the streaming buffers."""
+        # frames waiting for right context plus left context of the next frame
+        self._stream_x = None
+        self._stream_start = 0
+        self._stream_out_frames = 0
+        # stats of the past frames removed from the buffer,
+        # only used when left_context is None
+        self._stream_past_n = 0
+        self._stream_past_sx = 0
+        self._stream_past_sx2 = 0
 
 
 
@@ -202,6 +217,98 @@ class MeanVarianceNorm(object):
 
 
 
+    def _normalize_stream(self, flush=False):
+        """Normalizes the buffered frames whose right context is available."""
+        x = self._stream_x
+        start = self._stream_start
+        end = start + x.shape[0]
+        out1 = self._stream_out_frames
+        out2 = end if flush else end - self.right_context
+        if out2 <= out1:
+            return np.zeros((0, x.shape[1]), dtype=float_cpu())
+
+        t = np.arange(out1, out2)
+        if self.left_context is None:
+            idx1 = np.full_like(t, start)
+        else:
+            idx1 = np.maximum(t - self.left_context, 0)
+        idx2 = np.minimum(t + self.right_context + 1, end)
+
+        c_x = np.zeros((x.shape[0]+1, x.shape[1]), dtype='float64')
+        np.cumsum(x, axis=0, out=c_x[1:])
+        counts = (idx2 - idx1 + self._stream_past_n)[:, None]
+        m_x = (c_x[idx2-start] - c_x[idx1-start] + self._stream_past_sx)/counts
+
+        y = x[out1-start:out2-start]
+        if self.norm_mean:
+            y = y - m_x
+
+        if self.norm_var:
+            c2_x = np.zeros_like(c_x)
+            np.cumsum(x*x, axis=0, out=c2_x[1:])
+            m2_x = (c2_x[idx2-start] - c2_x[idx1-start] +
+                    self._stream_past_sx2)/counts
+            s2_x = m2_x - m_x**2
+            s2_x[s2_x<1e-5] = 1e-5
+            y = y/np.sqrt(s2_x)
+
+        self._stream_out_frames = out2
+        # remove the frames that are not in the context of the next frame
+        if self.left_context is None:
+            new_start = out2
+        else:
+            new_start = max(out2 - self.left_context, 0)
+        new_start = min(max(new_start, start), end)
+        num_drop = new_start - start
+        if self.left_context is None and num_drop > 0:
+            x_drop = x[:num_drop]
+            self._stream_past_n += num_drop
+            self._stream_past_sx = self._stream_past_sx + np.sum(x_drop, axis=0)
+            self._stream_past_sx2 = (self._stream_past_sx2 +
+                                     np.sum(x_drop*x_drop, axis=0))
+        self._stream_x = x[num_drop:]
+        self._stream_start = new_start
+        return y.astype(float_cpu(), copy=False)
+
+
+
+    def accept_frames(self, x):
+        """Streaming version of normalize_cumsum, it receives the features
+           by chunks and returns the normalized frames whose right context
+           is complete, i.e., with a latency of right_context frames.
+           Call flush() at the end of the signal to get the last frames and
+           reset() before starting a new signal.
+
+           Mean normalization gives the same result as normalize_cumsum,
+           variance normalization is the same up to the variance floor.
+           Memory is bounded by the size of the sliding window.
+
+        Args:
+          x: chunk of the input feature matrix.
+
+        Returns:
+          Normalized frames, it can have zero frames.
+        """
+        assert self.right_context is not None, (
+            'streaming normalization requires finite right_context')
+        if self._stream_x is None:
+            self._stream_x = x
+        else:
+            self._stream_x = np.concatenate((self._stream_x, x), axis=0)
+        return self._normalize_stream()
+
+
+
+    def flush(self):
+        """Returns the streaming normalized frames that were waiting
+           for right context at the end of the signal.
+        """
+        if self._stream_x is None:
+            return None
+        return self._normalize_stream(flush=True)
+
+
+
     @staticmethod
     def filter_args(**kwargs):
         """Filters ST-CMVN args from arguments dictionary.
@@ -167,9 +167,13 @@ class MFCC(object):
         self.reset()
 
     def reset(self):
-        """Resets the internal states of the filters """
+        """Resets the internal states of the filters and
+           the streaming buffers"""
         self._dc_zi = np.array([0], dtype=float_cpu())
         self._preemph_zi = np.array([0], dtype=float_cpu())
+        self._stream_x = np.zeros((0,), dtype=float_cpu())
+        self._stream_raw_x = np.zeros((0,), dtype=float_cpu())
+        self._stream_rng = np.random.RandomState(seed=0)
 
     @staticmethod
     def make_lifter(N, Q):
@@ -219,6 +223,11 @@ class MFCC(object):
                                      or self._output_step < MFCCSteps.SPEC))
         assert not (return_logfb and self._output_step < MFCCSteps.LOGFB)
 
+        X = None
+        F = None
+        B = None
+        logE = None
+
         # Prepare input
         if self._input_step == MFCCSteps.FFT:
             X = x
@@ -275,39 +284,57 @@ class MFCC(object):
                                               x,
                                               zi=self._preemph_zi)
 
-            #Comptue STFFT
-            #_, _, X = stft(x, window=self._window, nperseg=self._nperseg, noverlap=self._overlap, nfft=self.fft_length, boundary=None)
-            # Fix scale of FFT
-            #X = self._fft_scale * X[:, :num_frames].T
-            # xx = []
-            # j = 0
-            # for i in range(len(x)//160-2):
-            #     #print(x[j:j+400].shape)
-            #     #print(self._window.shape)
-            #     xx.append(x[j:j+400]*self._window)
-            #     j += 160
-
-            # return np.vstack(tuple(xx))
-
             X = strft(x, self._length, self._shift, self.fft_length,
                       self._window)
+            F, logE_fft = self._stft_to_spec(X)
+            if logE_fft is not None:
+                logE = logE_fft
 
-            # Compute |X(f)|
-            F = np.abs(X).astype(dtype=float_cpu(), copy=False)
+        return self._spec_to_output(X, F, B, logE,
+                                    return_fft, return_spec, return_logfb)
+
+    def _stft_to_spec(self, X):
+        """Computes the magnitude or power spectrum from the STFT.
 
-            # Compute no-raw energy
+           Args:
+             X: Short-time fft.
+
+           Returns:
+             |X(f)|^2 if the power spectrum is needed, otherwise |X(f)|.
+             Log-energy from the spectrum if raw_energy is False, else None.
+        """
+        logE = None
+        if self.use_fft2 and self._output_step >= MFCCSteps.SPEC:
+            # Compute |X(f)|^2 directly in float32 without the sqrt
+            F = X.real**2
+            F += X.imag**2
+            if self.use_energy and not self.raw_energy:
+                # Use Paserval's theorem
+                logE = np.log(np.mean(F, axis=-1) + 1e-10)
+        else:
+            # Compute |X(f)|
+            F = np.abs(X)
             if self.use_energy and not self.raw_energy:
                 # Use Paserval's theorem
                 logE = np.log(np.mean(F**2, axis=-1) + 1e-10)
 
+        return F, logE
+
+    def _spec_to_output(self, X, F, B, logE,
+                        return_fft=False, return_spec=False,
+                        return_logfb=False):
+        """Evaluates the steps of the MFCC pipeline after the spectrum."""
         # Compute |X(f)|^2
-        if self._input_step <= MFCCSteps.FFT and self._output_step >= MFCCSteps.SPEC:
+        if (self._input_step == MFCCSteps.FFT and
+            self._output_step >= MFCCSteps.SPEC):
             if self.use_fft2:
                 F = F**2
 
         # Compute log-filter-bank
         if self._input_step <= MFCCSteps.LOG_SPEC and self._output_step >= MFCCSteps.LOGFB:
-            B = np.log(np.dot(F, self._fb) + 1e-10)
+            B = np.dot(F, self._fb.astype(F.dtype, copy=False))
+            B += 1e-10
+            B = np.log(B).astype(float_cpu(), copy=False)
             #B = np.maximum(B, np.log(self.energy_floor+1e-15))
 
         # Compute MFCC
@@ -321,9 +348,9 @@ class MFCC(object):
         if self._output_step == MFCCSteps.FFT:
             R = X
         elif self._output_step == MFCCSteps.SPEC:
-            R = F
+            R = F.astype(float_cpu(), copy=False)
         elif self._output_step == MFCCSteps.LOG_SPEC:
-            R = np.log(F + 1e-10)
+            R = np.log(F + 1e-10).astype(float_cpu(), copy=False)
         elif self._output_step == MFCCSteps.LOGFB:
             R = B
         else:
@@ -351,6 +378,66 @@ class MFCC(object):
 
         return tuple(R)
 
+    def accept_waveform(self, x):
+        """Streaming version of compute, it receives the waveform by chunks
+           and returns the frames that are complete after adding the chunk.
+           The samples of incomplete frames are kept in an internal buffer,
+           so memory does not grow with the length of the signal.
+           Concatenating the outputs of all the chunks gives the same result
+           as compute on the full signal (with snip_edges=True and up to
+           the dither noise). Call reset() before starting a new signal.
+
+           Args:
+             x: chunk of the wave signal.
+
+           Returns:
+             Spectrogram, log-filter-bank or MFCC of the new frames
+             depending on output_step, it can have zero frames.
+        """
+        assert self._input_step == MFCCSteps.WAVE, (
+            'accept_waveform only accepts wave input')
+        assert self.snip_edges, 'accept_waveform requires snip_edges=True'
+
+        x = np.asarray(x, dtype=float_cpu())
+        if self.dither > 0:
+            x = x + self.dither * self._stream_rng.randn(len(x)).astype(
+                float_cpu(), copy=False)
+
+        if self.remove_dc_offset:
+            x, self._dc_zi = lfilter(self._dc_b, self._dc_a, x,
+                                     zi=self._dc_zi)
+
+        raw_energy = self.use_energy and self.raw_energy
+        if raw_energy:
+            self._stream_raw_x = np.concatenate((self._stream_raw_x, x))
+
+        if self.preemphasis_coeff > 0:
+            x, self._preemph_zi = lfilter(self._preemph_b, [1], x,
+                                          zi=self._preemph_zi)
+
+        x = np.concatenate((self._stream_x, x))
+        num_frames = int(
+            np.floor((len(x) - self._length + self._shift) / self._shift))
+        num_frames = max(num_frames, 0)
+        # samples used by the new frames, the rest are kept for the next call
+        num_used = (num_frames - 1) * self._shift + self._length
+        num_consumed = num_frames * self._shift
+
+        logE = None
+        if raw_energy:
+            logE = self.compute_raw_logE(self._stream_raw_x[:num_used])
+            self._stream_raw_x = self._stream_raw_x[num_consumed:]
+
+        X = strft(x[:num_used], self._length, self._shift, self.fft_length,
+                  self._window)
+        self._stream_x = x[num_consumed:]
+
+        F, logE_fft = self._stft_to_spec(X)
+        if logE_fft is not None:
+            logE = logE_fft
+
+        return self._spec_to_output(X, F, None, logE)
+
     @staticmethod
     def filter_args(**kwargs):
         """Filters MFCC args from arguments dictionary.
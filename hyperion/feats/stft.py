@@ -6,84 +6,122 @@
 import logging
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import scipy.fft as sp_fft
 
 from ..hyp_defs import float_cpu
 
-def stft(x, frame_length, frame_shift, fft_length, window=None):
 
-    if window is None:
-        window = 1
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-    X = np.zeros((num_frames, fft_length), dtype='complex64')
-    j = 0
-    for i in range(num_frames):
-        X[i,:] = np.fft.fft(x[j:j+frame_length]*window, n=fft_length)
-        j += frame_shift
-            
-    return X
+def num_frames(num_samples, frame_length, frame_shift):
+    """Number of frames that fit completely in the signal."""
+    return max(0, int(np.floor(
+        (num_samples - frame_length + frame_shift)/frame_shift)))
 
 
-def istft(X, frame_length, frame_shift, window=None):
+def frame_signal(x, frame_length, frame_shift):
+    """Splits the signal into overlapping frames without copying the data.
+
+       Args:
+         x: wave signal.
+         frame_length: frame length in samples.
+         frame_shift: frame shift in samples.
+
+       Returns:
+         Read-only strided view of x with shape (num_frames, frame_length).
+    """
+    x = np.ascontiguousarray(x)
+    n = num_frames(len(x), frame_length, frame_shift)
+    s = x.strides[0]
+    return as_strided(x, shape=(n, frame_length),
+                      strides=(frame_shift*s, s), writeable=False)
+
+
+def _windowed_frames(x, frame_length, frame_shift, fft_length, window,
+                     dtype='float32'):
+    """Copies the frames into a zero-padded (num_frames, fft_length) buffer
+       and applies the window in-place.
+    """
+    frames = frame_signal(x, frame_length, frame_shift)
+    buf = np.zeros((frames.shape[0], fft_length), dtype=dtype)
+    buf[:, :frame_length] = frames
+    if window is not None:
+        buf[:, :frame_length] *= np.asarray(window, dtype=dtype)
+    return buf
+
+
+def _overlap_add(frames, frame_shift, num_samples):
+    """Vectorized overlap-add.
+       Frames are split into blocks of frame_shift samples, the k-th block
+       of all the frames is added at once to the output.
 
+       Args:
+         frames: matrix (num_frames, frame_length).
+         frame_shift: frame shift in samples.
+         num_samples: length of the output signal.
+
+       Returns:
+         Signal with num_samples samples.
+    """
+    n, frame_length = frames.shape
+    num_blocks = int(np.ceil(frame_length/frame_shift))
+    pad = num_blocks*frame_shift - frame_length
+    if pad > 0:
+        frames = np.pad(frames, ((0, 0), (0, pad)))
+    frames = frames.reshape(n, num_blocks, frame_shift)
+    y = np.zeros((n + num_blocks - 1, frame_shift), dtype=frames.dtype)
+    for k in range(num_blocks):
+        y[k:k+n] += frames[:, k]
+    return y.ravel()[:num_samples]
+
+
+def _window_overlap(window, frame_length, n, frame_shift, num_samples):
+    """Computes the inverse of the overlapped window sum."""
     if window is None:
         window = np.ones((frame_length,), dtype=float_cpu())
+    w_overlap = _overlap_add(
+        np.broadcast_to(window[None, :], (n, frame_length)),
+        frame_shift, num_samples).astype(float_cpu(), copy=False)
+    w_overlap[w_overlap==0] = 1
+    return 1/w_overlap
 
-    num_samples = (X.shape[0] - 1)*frame_shift + frame_length
-    x_overlap = np.zeros((num_samples,), dtype='complex64')
-    w_overlap = np.zeros((num_samples,), dtype=float_cpu())
 
-    xx = np.fft.ifft(X, axis=-1)[:,:frame_length]
-    j = 0
-    for i in range(X.shape[0]):
-        x_overlap[j:j+frame_length] += xx[i]
-        w_overlap[j:j+frame_length] += window
-        j += frame_shift
+def stft(x, frame_length, frame_shift, fft_length, window=None):
 
-    w_overlap[w_overlap==0] = 1
-    iw = 1/w_overlap
-    # iw[w_overlap==0] = 0
+    buf = _windowed_frames(x, frame_length, frame_shift, fft_length, window)
+    return sp_fft.fft(buf, axis=-1, overwrite_x=True).astype(
+        'complex64', copy=False)
+
+
+def istft(X, frame_length, frame_shift, window=None):
+
+    num_samples = (X.shape[0] - 1)*frame_shift + frame_length
+    X = X.astype('complex128', copy=False)
+    xx = sp_fft.ifft(X, axis=-1)[:,:frame_length]
+    x_overlap = _overlap_add(xx, frame_shift, num_samples)
+    iw = _window_overlap(window, frame_length, X.shape[0],
+                         frame_shift, num_samples)
     x = x_overlap * iw
     return x
 
 
 
-
 def strft(x, frame_length, frame_shift, fft_length, window=None):
 
-    if window is None:
-        window = 1
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-    X = np.zeros((num_frames, int(fft_length/2+1)), dtype='complex64')
-    j = 0
-    for i in range(num_frames):
-        X[i,:] = np.fft.rfft(x[j:j+frame_length]*window, n=fft_length)
-        j += frame_shift
-            
-    return X
+    buf = _windowed_frames(x, frame_length, frame_shift, fft_length, window)
+    return sp_fft.rfft(buf, axis=-1, overwrite_x=True).astype(
+        'complex64', copy=False)
 
 
 
 def istrft(X, frame_length, frame_shift, window=None):
 
-    if window is None:
-        window = np.ones((frame_length,), dtype=float_cpu())
-
     num_samples = (X.shape[0] - 1)*frame_shift + frame_length
-    x_overlap = np.zeros((num_samples,), dtype=float_cpu())
-    w_overlap = np.zeros((num_samples,), dtype=float_cpu())
-
-    xx = np.fft.irfft(X, axis=-1)[:,:frame_length]
-    j = 0
-    for i in range(X.shape[0]):
-        x_overlap[j:j+frame_length] += xx[i]
-        w_overlap[j:j+frame_length] += window
-        j += frame_shift
-
-    w_overlap[w_overlap==0] = 1
-    iw = 1/w_overlap
-    # iw[w_overlap==0] = 0
+    X = X.astype('complex128', copy=False)
+    xx = sp_fft.irfft(X, axis=-1)[:,:frame_length]
+    x_overlap = _overlap_add(xx, frame_shift, num_samples).astype(
+        float_cpu(), copy=False)
+    iw = _window_overlap(window, frame_length, X.shape[0],
+                         frame_shift, num_samples)
     x = x_overlap * iw
     return x
 
@@ -98,14 +136,7 @@ def st_logE(x, frame_length, frame_shift):
        Returns:
          Log-energy
      """
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-        
-    x2 = x**2
-    e = np.zeros((num_frames,), dtype=float_cpu())
-    j = 0
-    for i in range(num_frames):
-        e[i] = np.sum(x2[j:j+frame_length])
-        j += frame_shift
-            
+
+    frames = frame_signal(x, frame_length, frame_shift)
+    e = np.einsum('ij,ij->i', frames, frames).astype(float_cpu(), copy=False)
     return np.log(e+1e-15)
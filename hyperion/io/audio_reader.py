@@ -144,13 +144,76 @@ class AudioReader(object):
         return x, fs
 
 
-    def _read_segment(self, segment, time_offset=0, time_dur=0):
-        """Reads a wave segment
+    @staticmethod
+    def read_wavspecifier_chunks(wavspecifier, scale=2**15, chunks=None):
+        """Reads multiple chunks from an audiospecifier (audio_file/pipe)
+           opening the file or running the pipe only once.
+           Chunks are read in increasing order of their offsets.
 
         Args:
-          segment: pandas DataFrame (segment_id , file_id, tbeg, tend)
+          wavspecifier: A pipe, wav, flac, ogg file etc.
+          scale:        Multiplies signal by scale factor
+          chunks: list of tuples (time_offset, time_dur, time_end),
+                  if time_dur is 0, it reads until time_end,
+                  if time_end is None or negative, it reads until the end.
+                  If None, it reads the full file.
+
         Returns:
-          Wave, sampling frequency
+          List of waveforms, sampling frequency
+        """
+        if chunks is None:
+            chunks = [(0, 0, None)]
+
+        wavspecifier = wavspecifier.strip()
+        if wavspecifier[-1] == '|':
+            x, fs = AudioReader.read_pipe(wavspecifier[:-1], scale)
+            data = []
+            for chunk in chunks:
+                s_beg, s_end = AudioReader._chunk_to_samples(
+                    wavspecifier, chunk, fs, len(x))
+                data.append(x[s_beg:s_end])
+            return data, fs
+
+        ext = os.path.splitext(wavspecifier)[1]
+        if ext in valid_ext:
+            data = [None] * len(chunks)
+            order = sorted(range(len(chunks)), key=lambda i: chunks[i][0])
+            with sf.SoundFile(wavspecifier, 'r') as f:
+                fs = f.samplerate
+                for i in order:
+                    s_beg, s_end = AudioReader._chunk_to_samples(
+                        wavspecifier, chunks[i], fs, f.frames)
+                    f.seek(s_beg)
+                    data[i] = scale * f.read(s_end - s_beg, dtype=float_cpu())
+            return data, fs
+
+        raise Exception('Unknown format for %s' % (wavspecifier))
+
+
+    @staticmethod
+    def _chunk_to_samples(wavspecifier, chunk, fs, num_samples):
+        """Converts a chunk (time_offset, time_dur, time_end) to
+           first and last samples.
+        """
+        t_beg, t_dur, t_end = chunk
+        s_beg = int(math.floor(t_beg * fs))
+        if s_beg > num_samples:
+            raise Exception('chunk tbeg=%.2f (sample=%d) longer that wav file %s (num_samples=%d)' % (
+                t_beg, s_beg, wavspecifier, num_samples))
+
+        if t_dur > 0:
+            s_end = s_beg + int(math.floor(t_dur * fs))
+        elif t_end is None or t_end < 0:
+            s_end = num_samples
+        else:
+            s_end = int(t_end * fs)
+
+        return s_beg, min(s_end, num_samples)
+
+
+    def _segment_to_chunk(self, segment, time_offset=0, time_dur=0):
+        """Converts a segment to the file containing it and
+           a chunk (time_offset, time_dur, time_end) of that file.
         """
         file_id = segment['file_id']
         t_beg = segment['tbeg'] + time_offset
@@ -161,19 +224,20 @@ class AudioReader(object):
             t_end = t_end_new
 
         file_path, _, _ = self.scp[file_id]
-        x_i, fs_i = self.read_wavspecifier(file_path, self.wav_scale)
-        num_samples_i = len(x_i)
-        s_beg = int(t_beg * fs_i)
-        if s_beg >= num_samples_i:
-            raise Exception('segment %s tbeg=%.2f (num_sample=%d) longer that wav file %s (num_samples=%d)' % (
-                key, tbeg, sbeg, file_id, num_samples_i))
-
-        s_end = int(t_end * fs_i)
-        if s_end > num_samples_i or t_end < 0:
-            s_end = num_samples_i
-                    
-        x_i = x_i[s_beg:s_end]
-        return x_i, fs_i
+        return file_path, (t_beg, 0, t_end)
+
+
+    def _read_segment(self, segment, time_offset=0, time_dur=0):
+        """Reads a wave segment
+
+        Args:
+          segment: pandas DataFrame (segment_id , file_id, tbeg, tend)
+        Returns:
+          Wave, sampling frequency
+        """
+        file_path, chunk = self._segment_to_chunk(segment, time_offset, time_dur)
+        x, fs = self.read_wavspecifier_chunks(file_path, self.wav_scale, [chunk])
+        return x[0], fs
 
     
 
@@ -334,6 +398,8 @@ class RandomAccessAudioReader(AudioReader):
 
     def _read(self, keys, time_offset=0, time_durs=0):
         """Reads the waveforms  for the recordings in keys.
+        The requests are grouped by audio file, so each file is opened
+        only once and its chunks are read in increasing order of offset.
         
         Args:
           keys: List of recording/segment_ids names.
@@ -347,8 +413,8 @@ class RandomAccessAudioReader(AudioReader):
         offset_is_list = isinstance(time_offset, (list, np.ndarray))
         dur_is_list = isinstance(time_durs, (list, np.ndarray))
 
-        data = []
-        fs = []
+        # file_path -> list of (key position, chunk)
+        file_chunks = {}
         for i,key in enumerate(keys):
 
             offset_i = time_offset[i] if offset_is_list else time_offset
@@ -359,17 +425,24 @@ class RandomAccessAudioReader(AudioReader):
                     raise Exception('Key %s not found' % key)
                 
                 segment = self.segments[key]
-                x_i, fs_i = self._read_segment(segment, offset_i, dur_i)
+                file_path, chunk = self._segment_to_chunk(segment, offset_i, dur_i)
             else:
                 if not (key in self.scp):
                     raise Exception('Key %s not found' % key)
 
                 file_path, _, _ = self.scp[key]
-                x_i, fs_i = self.read_wavspecifier(
-                    file_path, self.wav_scale, offset_i, dur_i)
-
-            data.append(x_i)
-            fs.append(fs_i)
+                chunk = (offset_i, dur_i, None)
+
+            file_chunks.setdefault(file_path, []).append((i, chunk))
+
+        data = [None] * len(keys)
+        fs = [None] * len(keys)
+        for file_path, chunks in file_chunks.items():
+            x, fs_f = self.read_wavspecifier_chunks(
+                file_path, self.wav_scale, [c[1] for c in chunks])
+            for (i, _), x_i in zip(chunks, x):
+                data[i] = x_i
+                fs[i] = fs_f
 
         return data, fs
 
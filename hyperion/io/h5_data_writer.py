@@ -76,7 +76,7 @@ class H5DataWriter(DataWriter):
         """Converts data to the format for saving.
         Compresses the data it needed.
         Args:
-          Numpy array feature matrix/vector.
+          Numpy array feature matrix/vector or KaldiCompressedMatrix.
 
         Returns:
           Numpy array to save in h5 file.
@@ -91,8 +91,12 @@ class H5DataWriter(DataWriter):
             else:
                 data = data.astype(float_save(), copy=False)
                 return data, None
+        elif isinstance(data, KaldiCompressedMatrix):
+            if self.compress:
+                return data.get_data_attrs()
+            return data.to_ndarray().astype(float_save(), copy=False), None
         else:
-            raise ValueError('Data is not ndarray')
+            raise ValueError('Data is not ndarray or KaldiCompressedMatrix')
 
 
         
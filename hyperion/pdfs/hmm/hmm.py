@@ -6,56 +6,91 @@
 import numpy as np
 
 from ...hyp_defs import float_cpu
-from ...utils.math import softmax, logsumexp
 from ..core import PDF
 
 class HMM(PDF):
-
-    def __init__(self, **kwargs):
-        super(HMM, self).__init__(num_states=1, pi=None, trans=None, trans_mask=None,
-                                  update_pi=True, update_trans=True,
-                                  tied_trans = False,
-                                  left_to_right = False,
-                                  **kwargs)
+    """Hidden Markov Model with discrete states.
+
+       The observation model is external to the class, all methods
+       receive x = log P(x_n|z_n) with shape (N, num_states) for a single
+       sequence or (batch, N, num_states) for a batch of zero-padded
+       sequences with lengths x_lengths.
+
+       Forward/backward recursions use scaled probabilities and process all
+       the sequences of the batch at once with matrix products.
+       Transition statistics are accumulated by chunks of time without
+       materializing the (N, num_states, num_states) posteriors.
+
+       Attributes:
+         num_states: number of states.
+         pi: initial state probabilities.
+         trans: transition probability matrix trans[i,j]=P(z_n=j|z_{n-1}=i).
+         trans_mask: binary mask with the allowed transitions.
+         update_pi: if True, updates pi in the M-step.
+         update_trans: if True, updates trans in the M-step.
+         tied_trans: if True, all states share the same self-loop probability.
+         left_to_right: if True, only allows left-to-right transitions.
+         chunk_length: number of frames processed at once when accumulating
+                       transition statistics.
+    """
+    def __init__(self, num_states=1, pi=None, trans=None, trans_mask=None,
+                 update_pi=True, update_trans=True, tied_trans=False,
+                 left_to_right=False, chunk_length=1000, **kwargs):
+        super(HMM, self).__init__(**kwargs)
         if pi is not None:
             num_states = len(pi)
-            
+
         self.num_states = num_states
         self.pi = pi
         self.trans = trans
         self.trans_mask = trans_mask
-        
+
         self.update_pi = update_pi
         self.update_trans = update_trans
         self.tied_trans = tied_trans
         self.left_to_right = left_to_right
-        
-        if left_to_rigth and (trans_mask is None):
-            self.trans_mask = np.triu(np.ones_like(self.trans))
+        self.chunk_length = chunk_length
+
+        if left_to_right and (trans_mask is None):
+            self.trans_mask = np.triu(
+                np.ones((num_states, num_states), dtype=float_cpu()))
 
         self._log_pi = None
         self._log_trans = None
 
 
 
-    def reset_aux():
+    def reset_aux(self):
         self._log_pi = None
         self._log_trans = None
 
-        
+
     @property
     def is_init(self):
         if self._is_init:
             return True
-        
+
         if self.pi is not None and self.trans is not None:
             self.validate()
-            self._is_init =True
+            self._is_init = True
 
         return self._is_init
-            
-    
-        
+
+
+    def initialize(self):
+        if self.pi is None:
+            self.pi = np.ones((self.num_states,),
+                              dtype=float_cpu())/self.num_states
+        if self.trans is None:
+            self.trans = np.ones((self.num_states, self.num_states),
+                                 dtype=float_cpu())
+            if self.trans_mask is not None:
+                self.trans *= self.trans_mask
+            self.trans /= np.sum(self.trans, axis=-1, keepdims=True)
+        self.reset_aux()
+        return self.is_init
+
+
     @property
     def log_pi(self):
         if self._log_pi is None:
@@ -68,9 +103,9 @@ class HMM(PDF):
         if self._log_trans is None:
             self._log_trans = np.log(self.trans+1e-15)
         return self._log_trans
-    
 
-    
+
+
     def validate(self):
         assert(len(self.pi) == self.num_states)
         assert(self.trans.shape[0] == self.num_states)
@@ -78,181 +113,392 @@ class HMM(PDF):
         if self.trans_mask is not None:
             assert self.trans_mask.shape == self.trans.shape
 
-        
-    def fit(self, x, sample_weight=None,
-            x_val=None, sample_weight_val=None,
-            epochs=10):
 
+    @staticmethod
+    def _to_batch(x, x_lengths=None):
+        """Converts the input into a zero-padded batch
+           (batch, N, num_states) and a (batch, N) mask of valid frames.
+
+        Returns:
+          Padded batch, mask and True if the input was a single sequence.
+        """
+        if isinstance(x, list):
+            x_lengths = np.asarray([x_i.shape[0] for x_i in x])
+            max_length = np.max(x_lengths)
+            x_b = np.zeros((len(x), max_length, x[0].shape[-1]),
+                           dtype=float_cpu())
+            for i, x_i in enumerate(x):
+                x_b[i, :x_i.shape[0]] = x_i
+            x = x_b
+            single = False
+        elif x.ndim == 2:
+            x = x[None, :]
+            single = True
+        else:
+            single = False
 
-        N_val_tot = 0
-        elbo = np.zeros((epochs,), dtype=float_cpu())
-        elbo_val = np.zeros((epochs,), dtype=float_cpu())
-        stats = None
-        for epoch in range(epochs):
-            for i in range(x.shape[0]):
-                stats =self.Estep(x[i], stats)
-                pz, Nzz = stats
-                elbo[epoch] += self.elbo(x[i], pz=pz, Nzz=Nzz)
-                        
-            self.Mstep(stats)
+        N = x.shape[1]
+        if x_lengths is None:
+            mask = np.ones(x.shape[:2], dtype=bool)
+        else:
+            mask = np.arange(N)[None, :] < np.asarray(x_lengths)[:, None]
 
-            if x_val is not None:
-                for i in range(x_val.shape[0]):
-                    pz, Nzz = self.Estep(x_val[i])
-                    elbo_val[epoch] += self.elbo(x[i], pz=pz, Nzz=Nzz)
+        return x, mask, single
 
-        N_tot = np.sum([x_i.shape[0] for x_i in x])
-        if x_val is None:
-            return elbo, elbo/N_tot
-        else:
-            N_val_tot = np.sum([x_i.shape[0] for x_i in x_val])
-            return elbo, elbo/N_tot, elbo_val, elbo_val/N_val_tot
 
+    @staticmethod
+    def _emission_probs(x):
+        """Computes the emission probabilities scaled to max 1 per frame.
 
+        Returns:
+          exp(x - max(x)) and max(x).
+        """
+        x_max = np.max(x, axis=-1)
+        b = np.exp(x - x_max[:, :, None])
+        return b, x_max
 
-    def forward(self, x):
-        # x = log P(x|z)
-        N = x.shape[0]
-        log_alpha = np.zeros((N, self.num_states), dtype=float_cpu())
-        log_alpha[0] = self.log_pi + x[0]
-        for n in range(1, N):
-            log_alpha[n] = x[n] + logsumexp(log_alpha[n-1][:, None] + self.log_trans, axis=0)
-                             
-        return log_alpha
 
+    def _forward_scaled(self, b, mask):
+        """Scaled forward recursion for a batch of sequences.
 
-    
-    def backward(self, x):
+        Args:
+          b: emission probabilities (batch, N, num_states).
+          mask: valid frames (batch, N).
 
-        N = x.shape[0]
-        log_beta = np.zeros((N, self.num_states), dtype=float_cpu())
-        log_beta[-1] = 1
+        Returns:
+          Normalized forward probabilities alpha_n(z)=P(z_n|x_1,..,x_n)
+          and log scale factors log P(x_n|x_1,...,x_{n-1}) - max(x_n).
+          Padded frames have scale factor 1.
+        """
+        batch_size, N = mask.shape
+        alpha = np.zeros(b.shape, dtype=float_cpu())
+        c = np.ones((batch_size, N), dtype=float_cpu())
+        a = self.pi * b[:, 0]
+        c[:, 0] = np.sum(a, axis=-1)
+        alpha[:, 0] = a / c[:, 0, None]
+        for n in range(1, N):
+            a = np.dot(alpha[:, n-1], self.trans) * b[:, n]
+            c_n = np.sum(a, axis=-1)
+            m_n = mask[:, n]
+            c[m_n, n] = c_n[m_n]
+            alpha[:, n] = np.where(
+                m_n[:, None], a / np.maximum(c_n, 1e-300)[:, None],
+                alpha[:, n-1])
+
+        return alpha, np.log(np.maximum(c, 1e-300))
+
+
+    def _backward_scaled(self, b, log_c, mask):
+        """Scaled backward recursion for a batch of sequences.
+
+        Returns:
+          beta_n(z)= P(x_{n+1},...,x_N|z_n)/P(x_{n+1},...,x_N|x_1,...,x_n)
+          scaled by the same factors as the forward recursion.
+        """
+        batch_size, N = mask.shape
+        beta = np.ones(b.shape, dtype=float_cpu())
+        c = np.exp(log_c)
         for n in range(N-2, -1, -1):
-            r = log_beta[n+1] + x[n+1] + self.log_trans
-            log_beta[n] = logsumexp(r.T, axis=0)
-
-        return log_beta
-        
-
-    
-    def compute_pz(self, x, return_Nzz=False, return_log_px=False):
-        log_alpha = self.forward(x)
-        log_beta = self.backward(x)
-        log_px = np.sum(log_alpha[-1])
-
-        pz = softmax(log_alpha + log_beta, axis=-1)
-
-        if not(return_Nzz or return_elbo or return_log_px):
-            return pz
-
-        r = [pz]
-        if return_pzz_acc:
-            x_e = np.expand_dims(axis=1)
-            log_alpha_e = np.expand_dims(axis=-1)
-            log_beta_e = np.expand_dims(axis=1)
-            log_trans_e = np.expand_dims(axis=0)
-            zz = log_alpha_e + x_e + log_trans_e + log_beta_e
-            zz = softmax(zz, axis=-1)
-            Nzz = np.sum(zz, axis=0)
+            r = np.dot(b[:, n+1] * beta[:, n+1], self.trans.T) / c[:, n+1, None]
+            m_n = mask[:, n+1]
+            beta[m_n, n] = r[m_n]
+
+        return beta
+
+
+    def _accum_trans_stats(self, alpha, b, beta, log_c, mask):
+        """Accumulates the expected transition counts
+           sum_n P(z_{n-1}=i, z_n=j|x) in chunks of time.
+        """
+        N = mask.shape[1]
+        Nzz = np.zeros((self.num_states, self.num_states), dtype=float_cpu())
+        for n1 in range(1, N, self.chunk_length):
+            n2 = min(n1 + self.chunk_length, N)
+            r = (b[:, n1:n2] * beta[:, n1:n2] *
+                 (mask[:, n1:n2] / np.exp(log_c[:, n1:n2]))[:, :, None])
+            a = alpha[:, n1-1:n2-1]
+            Nzz += np.dot(a.reshape(-1, self.num_states).T,
+                          r.reshape(-1, self.num_states))
+
+        return Nzz * self.trans
+
+
+    def forward(self, x, x_lengths=None):
+        """Computes log P(x_1,...,x_n, z_n) for all frames.
+
+        Args:
+          x: log P(x|z) with shape (N, num_states) or
+             (batch, N, num_states).
+          x_lengths: lengths of the sequences in the batch.
+
+        Returns:
+          log alpha with the same shape as x.
+        """
+        x, mask, single = self._to_batch(x, x_lengths)
+        b, x_max = self._emission_probs(x)
+        alpha, log_c = self._forward_scaled(b, mask)
+        log_scale = np.cumsum((log_c + x_max) * mask, axis=-1)
+        log_alpha = np.log(alpha + 1e-300) + log_scale[:, :, None]
+        return log_alpha[0] if single else log_alpha
+
+
+
+    def backward(self, x, x_lengths=None):
+        """Computes log P(x_{n+1},...,x_N|z_n) for all frames.
+
+        Args:
+          x: log P(x|z) with shape (N, num_states) or
+             (batch, N, num_states).
+          x_lengths: lengths of the sequences in the batch.
+
+        Returns:
+          log beta with the same shape as x.
+        """
+        x, mask, single = self._to_batch(x, x_lengths)
+        b, x_max = self._emission_probs(x)
+        alpha, log_c = self._forward_scaled(b, mask)
+        beta = self._backward_scaled(b, log_c, mask)
+        log_c = (log_c + x_max) * mask
+        # log P(x_{n+1},...,x_N|x_1,...,x_n)
+        log_scale = np.sum(log_c, axis=-1, keepdims=True) - np.cumsum(log_c, axis=-1)
+        log_beta = np.log(beta + 1e-300) + log_scale[:, :, None]
+        return log_beta[0] if single else log_beta
+
+
+
+    def compute_pz(self, x, x_lengths=None,
+                   return_Nzz=False, return_log_px=False):
+        """Computes the state posteriors P(z_n|x_1,...,x_N).
+
+        Args:
+          x: log P(x|z) with shape (N, num_states) or
+             (batch, N, num_states).
+          x_lengths: lengths of the sequences in the batch.
+          return_Nzz: if True, it also returns the expected transition counts
+                      accumulated over all the sequences.
+          return_log_px: if True, it also returns log P(x_1,...,x_N).
+
+        Returns:
+          State posteriors with the same shape as x, zero for padded frames.
+          Transition counts (num_states, num_states) if return_Nzz is True.
+          Log-likelihood of each sequence if return_log_px is True.
+        """
+        x, mask, single = self._to_batch(x, x_lengths)
+        b, x_max = self._emission_probs(x)
+        alpha, log_c = self._forward_scaled(b, mask)
+        beta = self._backward_scaled(b, log_c, mask)
+
+        pz = alpha * beta
+        pz /= np.maximum(np.sum(pz, axis=-1, keepdims=True), 1e-300)
+        pz *= mask[:, :, None]
+
+        if not(return_Nzz or return_log_px):
+            return pz[0] if single else pz
+
+        r = [pz[0] if single else pz]
+        if return_Nzz:
+            Nzz = self._accum_trans_stats(alpha, b, beta, log_c, mask)
             r.append(Nzz)
 
         if return_log_px:
-            r.append(log_px)
+            log_px = np.sum((log_c + x_max) * mask, axis=-1)
+            r.append(log_px[0] if single else log_px)
 
         return tuple(r)
 
 
-    
-    def elbo(self, x, pz=None, Nzz=None):
+    def log_prob(self, x, x_lengths=None):
+        """Computes log P(x_1,...,x_N) for each sequence."""
+        x, mask, single = self._to_batch(x, x_lengths)
+        b, x_max = self._emission_probs(x)
+        _, log_c = self._forward_scaled(b, mask)
+        log_px = np.sum((log_c + x_max) * mask, axis=-1)
+        return log_px[0] if single else log_px
+
+
+
+    def elbo(self, x, x_lengths=None, pz=None, Nzz=None):
         if pz is None:
-            pz, Nzz = self.compute_pz(x, return_Nzz=True)
+            pz, Nzz = self.compute_pz(x, x_lengths, return_Nzz=True)
 
-        Nz = pz[0]
+        x, mask, single = self._to_batch(x, x_lengths)
+        if single:
+            pz = pz[None, :]
+        Nz = np.sum(pz[:, 0], axis=0)
         elbo = (np.sum(Nz*self.log_pi) +
                 np.sum(Nzz*self.log_trans) +
-                np.sum(pz*x))
+                np.sum(pz*x*mask[:, :, None]))
         return elbo
 
 
 
-    def Estep(self, x, stats_0=None):
+    def Estep(self, x, x_lengths=None, stats_0=None, return_elbo=False):
+        """Computes the state posteriors and accumulates the EM stats.
 
+        Args:
+          x: log P(x|z) sequences.
+          x_lengths: lengths of the sequences in the batch.
+          stats_0: stats accumulated in previous batches.
+          return_elbo: if True, it also returns the ELBO of the batch,
+                       computed from the same posteriors.
+
+        Returns:
+          State posteriors.
+          Accumulated stats (Nz, Nzz).
+          ELBO of the batch if return_elbo is True.
+        """
         if stats_0 is None:
             Nz = np.zeros((self.num_states,), dtype=float_cpu())
             Nzz = np.zeros((self.num_states, self.num_states), dtype=float_cpu())
         else:
             Nz, Nzz = stats_0
 
-        pz, Nzz = self.compute_pz(x, return_Nzz=True)
-        Nz += pz[0]
-        Nzz += pzz
+        pz, Nzz_i = self.compute_pz(x, x_lengths, return_Nzz=True)
+        pz_0 = pz[0] if pz.ndim == 2 else np.sum(pz[:, 0], axis=0)
+        Nz += pz_0
+        Nzz += Nzz_i
         stats = (Nz, Nzz)
-        
+
+        if return_elbo:
+            elbo = self.elbo(x, x_lengths, pz=pz, Nzz=Nzz_i)
+            return pz, stats, elbo
+
         return pz, stats
 
 
-    
+
     def Mstep(self, stats):
         Nz, Nzz = stats
 
-        self.pi = Nz/np.sum(Nz)
-        self.trans = Nzz/np.sum(Nzz, axis=-1, keepdims=True)
+        if self.update_pi:
+            self.pi = Nz/np.sum(Nz)
 
-        if self.tied_trans:
-            p_loop = np.mean(np.diag(self.trans))
-            self.trans[:] = (1-p_loop)/self.num_states
-            self.trans[np.diag_indices(self.num_states)] = p_loop
-        
-        if self.trans_mask is not None:
-            self.trans *= self.trans_mask
-            self.trans /= np.sum(self.trans, axis=-1, keepdims=True)
+        if self.update_trans:
+            self.trans = Nzz/np.sum(Nzz, axis=-1, keepdims=True)
+
+            if self.tied_trans:
+                p_loop = np.mean(np.diag(self.trans))
+                self.trans[:] = (1-p_loop)/max(self.num_states-1, 1)
+                self.trans[np.diag_indices(self.num_states)] = p_loop
+
+            if self.trans_mask is not None:
+                self.trans *= self.trans_mask
+                self.trans /= np.sum(self.trans, axis=-1, keepdims=True)
 
         self.reset_aux()
 
 
-        
-    def log_predictive(self, x):
-        # log p(x_{N+1}|x_1,..,x_N}
-        assert self.is_init
-        
-        log_alpha = self.forward(x)[:-1]
-        log_px = np.sum(log_alpha, axis=-1, keepdims=True)
 
-        log_alpha_e = np.expand_dims(log_alpha, axis=-1)
-        log_trans_e = np.expand_dims(self.log_trans, axis=0)
-        
-        log_pred = logsumexp(log_alpha_e+log_trans_e, axis=1)
-        log_pred = logsumexp(log_pred+x[1:], axis=-1) - log_px
+    def fit(self, x, x_lengths=None, x_val=None, x_val_lengths=None,
+            epochs=10, batch_size=None):
+        """Trains the HMM parameters with EM.
+
+        Args:
+          x: list of log P(x|z) sequences, or batch of zero-padded
+             sequences (num_seqs, N, num_states).
+          x_lengths: lengths of the sequences in the batch.
+          x_val: validation sequences.
+          x_val_lengths: lengths of the validation sequences.
+          epochs: number of EM iterations.
+          batch_size: number of sequences processed at once,
+                      if None, all of them.
+
+        Returns:
+          ELBO and ELBO per frame for each epoch.
+        """
+        self.initialize()
+        x, mask, _ = self._to_batch(x, x_lengths)
+        x_lengths = np.sum(mask, axis=-1)
+        num_seqs = x.shape[0]
+        if batch_size is None:
+            batch_size = num_seqs
+
+        if x_val is not None:
+            x_val, mask_val, _ = self._to_batch(x_val, x_val_lengths)
+            x_val_lengths = np.sum(mask_val, axis=-1)
+
+        elbo = np.zeros((epochs,), dtype=float_cpu())
+        elbo_val = np.zeros((epochs,), dtype=float_cpu())
+        for epoch in range(epochs):
+            stats = None
+            for i in range(0, num_seqs, batch_size):
+                x_i = x[i:i+batch_size]
+                x_lengths_i = x_lengths[i:i+batch_size]
+                _, stats, elbo_i = self.Estep(
+                    x_i, x_lengths_i, stats, return_elbo=True)
+                elbo[epoch] += elbo_i
+
+            self.Mstep(stats)
+
+            if x_val is not None:
+                elbo_val[epoch] = self.elbo(x_val, x_val_lengths)
+
+        N_tot = np.sum(x_lengths)
+        if x_val is None:
+            return elbo, elbo/N_tot
+        else:
+            N_val_tot = np.sum(x_val_lengths)
+            return elbo, elbo/N_tot, elbo_val, elbo_val/N_val_tot
 
-        return log_pred
-        
 
 
-    def viterbi_decode(self, x, nbest=1):
+    def log_predictive(self, x, x_lengths=None):
+        """Computes log P(x_{n+1}|x_1,...,x_n) for n=1,...,N-1."""
         assert self.is_init
-        idx_aux = np.arange(self.num_states)
-        phi = np.zeros((x.shape[0], self.num_states), dtype=int)
-        w = self.log_pi + x[0]
-        for i in range(x.shape[0]):
-            u = w[:,None] + self.log_trans
-            k_max = np.argmax(u, axis=0)
-            w = x[i] + u[k_max,idx_aux]
-            phi[i-1] = k_max
-
-        best = np.fliplr(np.argsort(w))[:nbest]
-        log_pxz = w[best]
-        paths = np.zeros((nbest, x.shape[0]), dtype=int)
-        for n in range(nbest):
-            k_max = best[n]
-            paths[n,-1] = k_max
-            for i in range(x.shape[0]-2,-1,-1):
-                k_max = phi[i, k_max]
-                paths[n,i] = k_max
+        x, mask, single = self._to_batch(x, x_lengths)
+        b, x_max = self._emission_probs(x)
+        _, log_c = self._forward_scaled(b, mask)
+        log_pred = ((log_c + x_max) * mask)[:, 1:]
+        return log_pred[0] if single else log_pred
+
 
+
+    def viterbi_decode(self, x, x_lengths=None, nbest=1):
+        """Computes the most likely state sequences.
+
+        Args:
+          x: log P(x|z) with shape (N, num_states) or
+             (batch, N, num_states).
+          x_lengths: lengths of the sequences in the batch.
+          nbest: number of paths returned, they correspond to the best paths
+                 ending in the nbest final states.
+
+        Returns:
+          Paths (nbest, N) or (batch, nbest, N), padded frames are set to -1.
+          Log P(x, z) of the paths (nbest,) or (batch, nbest).
+        """
+        assert self.is_init
+        x, mask, single = self._to_batch(x, x_lengths)
+        batch_size, N = mask.shape
+        log_trans = self.log_trans
+        phi = np.zeros((batch_size, N, self.num_states), dtype=np.int32)
+        w = self.log_pi + x[:, 0]
+        for n in range(1, N):
+            u = w[:, :, None] + log_trans
+            k_max = np.argmax(u, axis=1)
+            w_n = x[:, n] + np.take_along_axis(u, k_max[:, None, :], axis=1)[:, 0]
+            m_n = mask[:, n]
+            w[m_n] = w_n[m_n]
+            phi[:, n] = k_max
+
+        best = np.argsort(-w, axis=-1)[:, :nbest]
+        log_pxz = np.take_along_axis(w, best, axis=-1)
+        lengths = np.sum(mask, axis=-1)
+        paths = np.full((batch_size, best.shape[1], N), -1, dtype=int)
+        k_max = best
+        for n in range(N-1, -1, -1):
+            active = (n < lengths)[:, None]
+            paths[:, :, n] = np.where(active, k_max, -1)
+            if n > 0:
+                k_prev = np.take_along_axis(phi[:, n], k_max, axis=-1)
+                k_max = np.where(active, k_prev, k_max)
+
+        if single:
+            return paths[0], log_pxz[0]
         return paths, log_pxz
-                
-    
-        
+
+
+
     def sample(self, num_seqs, num_steps, rng=None, seed=1024):
         if rng is None:
             rng = np.random.RandomState(seed)
@@ -262,33 +508,34 @@ class HMM(PDF):
         for t in range(1, num_steps):
             for k in range(self.num_states):
                 index = x[:,t-1,k] == 1
-                n_k = num.sum(index)
+                n_k = np.sum(index)
                 if n_k == 0:
                     continue
-                x[index] = rng.multinomial(1, self.trans[k], size=(n_k,))
+                x[index, t] = rng.multinomial(1, self.trans[k], size=(n_k,))
 
         return x
-        
 
-    
+
+
     def get_config(self):
         config = {'update_pi': self.update_pi,
                   'update_trans': self.update_trans,
                   'tied_trans': self.tied_trans,
-                  'left_to_right': self.left_to_right}
+                  'left_to_right': self.left_to_right,
+                  'chunk_length': self.chunk_length}
         base_config = super(HMM, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
 
-    
+
     def save_params(self, f):
         params = {'pi': self.pi,
                   'trans': self.trans}
         self._save_params_from_dict(f, params)
 
 
-        
+
     @classmethod
     def load_params(cls, f, config):
         param_list = ['pi', 'trans']
@@ -8,6 +8,7 @@ from .feat_seq_dataset import FeatSeqDataset
 from .paired_feat_seq_dataset import PairedFeatSeqDataset
 
 from .audio_dataset import AudioDataset
+from .feat_cache import FeatCache
 
 #samplers
 from .weighted_seq_sampler import ClassWeightedSeqSampler
@@ -38,6 +38,8 @@ class AudioDataset(Dataset):
         transpose_input=False,
         wav_scale=2 ** 15 - 1,
         is_val=False,
+        return_chunk_info=False,
+        chunk_frame_shift=0.01,
     ):
 
         try:
@@ -81,6 +83,10 @@ class AudioDataset(Dataset):
         self.return_clean_aug_pair = return_clean_aug_pair
 
         self.transpose_input = transpose_input
+        # when returning chunk info, chunks start at multiples of the frame shift,
+        # so features of chunks of the same sequence can be shared, e.g., by FeatCache
+        self.return_chunk_info = return_chunk_info
+        self.chunk_frame_shift = chunk_frame_shift
 
         self.augmenter = None
         self.reverb_context = 0
@@ -215,11 +221,11 @@ class AudioDataset(Dataset):
     def var_chunk_length(self):
         return self.min_chunk_length < self.max_chunk_length
 
-    def get_random_chunk_length(self):
+    def get_random_chunk_length(self, generator=None):
 
         if self.var_chunk_length:
             return (
-                torch.rand(size=(1,)).item()
+                torch.rand(size=(1,), generator=generator).item()
                 * (self.max_chunk_length - self.min_chunk_length)
                 + self.min_chunk_length
             )
@@ -234,11 +240,43 @@ class AudioDataset(Dataset):
         else:
             return self._get_random_chunk(index)
 
+    def __getitems__(self, indices):
+        """Gets all the examples of a batch with a single call to the
+        audio reader, which groups the reads by audio file,
+        so each file is opened only once per batch.
+
+        Args:
+          indices: list of indices returned by the batch sampler.
+
+        Returns:
+          List of examples as returned by __getitem__.
+        """
+        if self.return_fullseqs:
+            keys = [self.u2c.key[index] for index in indices]
+            x, fs = self.r.read(keys)
+            return [
+                self._process_fullseq(index, x_i) for index, x_i in zip(indices, x)
+            ]
+
+        # we sample all the chunks before reading
+        chunks = [self._sample_chunk(index) for index in indices]
+        keys = [self.u2c.key[c["index"]] for c in chunks]
+        time_offsets = [c["time_offset"] for c in chunks]
+        time_durs = [c["read_chunk_length"] for c in chunks]
+        x, fs = self.r.read(keys, time_offset=time_offsets, time_durs=time_durs)
+        return [
+            self._process_chunk(c, x_i, fs_i) for c, x_i, fs_i in zip(chunks, x, fs)
+        ]
+
     def _get_fullseq(self, index):
         key = self.u2c.key[index]
         x, fs = self.r.read([key])
-        x = x[0].astype(floatstr_torch(), copy=False)
+        return self._process_fullseq(index, x[0])
+
+    def _process_fullseq(self, index, x):
+        x = x.astype(floatstr_torch(), copy=False)
         x_clean = x
+        aug_info = None
         if self.augmenter is not None:
             x, aug_info = self.augmenter(x)
 
@@ -249,87 +287,118 @@ class AudioDataset(Dataset):
 
         if self.return_clean_aug_pair:
             r = x, x_clean
+        else:
+            r = (x,)
+
+        if self.return_class:
+            class_idx = self.utt_idx2class[index]
+            r = *r, class_idx
 
-        if not self.return_class:
-            return r
+        if self.return_chunk_info:
+            r = *r, self._get_chunk_info(index, 0, aug_info)
 
-        class_idx = self.utt_idx2class[index]
-        r = *r, class_idx
         return r
 
+    @staticmethod
+    def _is_augmented(aug_info):
+        if aug_info is None:
+            return False
+        return SpeechAugment.is_augmented(aug_info)
+
+    def _get_chunk_info(self, index, frame_offset, aug_info):
+        return {
+            "seq_idx": index,
+            "frame_offset": frame_offset,
+            "augmented": self._is_augmented(aug_info),
+        }
+
     def _get_random_chunk(self, index):
+        chunk = self._sample_chunk(index)
+        key = self.u2c.key[chunk["index"]]
+        x, fs = self.r.read(
+            [key],
+            time_offset=chunk["time_offset"],
+            time_durs=chunk["read_chunk_length"],
+        )
+        return self._process_chunk(chunk, x[0], fs[0])
 
+    def _sample_chunk(self, index):
+        """Samples the speed perturbation and the offset and length
+        of the audio to read for a chunk."""
         if len(index) == 2:
             index, chunk_length = index
         else:
             chunk_length = self.max_chunk_length
 
-        key = self.u2c.key[index]
-
         full_seq_length = self.seq_lengths[index]
         assert (
             chunk_length <= full_seq_length
         ), "chunk_length(%d) <= full_seq_length(%d)" % (chunk_length, full_seq_length)
 
-        time_offset = torch.rand(size=(1,)).item() * (full_seq_length - chunk_length)
-        reverb_context = min(self.reverb_context, time_offset)
-        time_offset -= reverb_context
-        read_chunk_length = chunk_length + reverb_context
-
-        # logging.info('get-random-chunk {} {} {} {} {}'.format(index, key, time_offset, chunk_length, full_seq_length ))
-        x, fs = self.r.read([key], time_offset=time_offset, time_durs=read_chunk_length)
-
-        # try:
-        #     x, fs = self.r.read([key], time_offset=time_offset,
-        #                     time_durs=read_chunk_length)
-        # except:
-        #     # some files produce error in the fseek after reading the data,
-        #     # this seems an issue from pysoundfile or soundfile lib itself
-        #     # reading from a sligthly different starting position seems to solve the problem in most cases
-        #     try:
-        #         logging.info('error-1 reading at key={} totol_dur={} offset={} read_chunk_length={}, retrying...'.format(
-        #             key, full_seq_length, time_offset, read_chunk_length))
-        #         time_offset = math.floor(time_offset)
-        #         x, fs = self.r.read([key], time_offset=time_offset,
-        #                             time_durs=read_chunk_length)
-        #     except:
-        #         try:
-        #             # if changing the value of time-offset doesn't solve the issue, we try to read from
-        #             # from time-offset to the end of the file, and remove the extra frames later
-        #             logging.info('error-2 reading at key={} totol_dur={} offset={} retrying reading until end-of-file ...'.format(
-        #                 key, full_seq_length, time_offset))
-        #             x, fs = self.r.read([key], time_offset=time_offset)
-        #             x = [x[0][:int(read_chunk_length * fs[0])]]
-        #         except:
-        #             # try to read the full file
-        #             logging.info('error-3 reading at key={} totol_dur={} retrying reading full file ...'.format(
-        #                 key, full_seq_length))
-        #             x, fs = self.r.read([key])
-        #             x = [x[0][:int(read_chunk_length * fs[0])]]
-
-        x = x[0]
-        fs = fs[0]
+        # with speed perturbation, we read the amount of audio that produces
+        # chunk_length secs after perturbation
+        speed_ratio = 1
+        read_chunk_length = chunk_length
+        if self.augmenter is not None:
+            speed_ratio = self.augmenter.sample_speed_ratio()
+            read_chunk_length = min(speed_ratio * chunk_length, full_seq_length)
 
+        time_offset = torch.rand(size=(1,)).item() * (
+            full_seq_length - read_chunk_length
+        )
+        frame_offset = 0
+        if self.return_chunk_info:
+            frame_offset = int(time_offset / self.chunk_frame_shift)
+            # we add a small fraction of a sample to avoid rounding down
+            # to the previous sample when converting secs to samples
+            time_offset = frame_offset * self.chunk_frame_shift + 1e-6
+        reverb_context = min(speed_ratio * self.reverb_context, time_offset)
+        time_offset -= reverb_context
+        read_chunk_length += reverb_context
+        return {
+            "index": index,
+            "chunk_length": chunk_length,
+            "speed_ratio": speed_ratio,
+            "time_offset": time_offset,
+            "read_chunk_length": read_chunk_length,
+            "frame_offset": frame_offset,
+        }
+
+    def _process_chunk(self, chunk, x, fs):
+        """Augments the audio read for a chunk and crops it to
+        the chunk length."""
+        index = chunk["index"]
+        chunk_length = chunk["chunk_length"]
+        speed_ratio = chunk["speed_ratio"]
+        frame_offset = chunk["frame_offset"]
         x_clean = x
-        logging.info("hola1")
+        aug_info = None
         if self.augmenter is not None:
-            logging.info("hola2")
             chunk_length_samples = int(chunk_length * fs)
-            end_idx = len(x)
+            end_idx = self.augmenter.num_output_samples(len(x), speed_ratio)
             reverb_context_samples = end_idx - chunk_length_samples
-            assert reverb_context_samples >= 0, (
-                "key={} time-offset={}, read-chunk={} "
-                "read-x-samples={}, chunk_samples={}, reverb_context_samples={}"
-            ).format(
-                key,
-                time_offset,
-                read_chunk_length,
-                end_idx,
-                chunk_length_samples,
-                reverb_context_samples,
+            if speed_ratio == 1:
+                assert reverb_context_samples >= 0, (
+                    "key={} time-offset={}, read-chunk={} "
+                    "read-x-samples={}, chunk_samples={}, reverb_context_samples={}"
+                ).format(
+                    self.u2c.key[index],
+                    chunk["time_offset"],
+                    chunk["read_chunk_length"],
+                    end_idx,
+                    chunk_length_samples,
+                    reverb_context_samples,
+                )
+            else:
+                # the chunk can be shorter than chunk_length after
+                # perturbation due to rounding or if the sequence is too short,
+                # the speed augmenter pads it
+                reverb_context_samples = max(reverb_context_samples, 0)
+                end_idx = reverb_context_samples + chunk_length_samples
+
+            x, aug_info = self.augmenter(
+                x, speed_ratio=speed_ratio, num_samples=end_idx
             )
-            # end_idx = reverb_context_samples + chunk_length_samples
-            x, aug_info = self.augmenter(x)
             x = x[reverb_context_samples:end_idx]
             if self.return_clean_aug_pair:
                 x_clean = x_clean[reverb_context_samples:end_idx]
@@ -354,11 +423,13 @@ class AudioDataset(Dataset):
         else:
             r = (x,)
 
-        if not self.return_class:
-            return r
+        if self.return_class:
+            class_idx = self.utt_idx2class[index]
+            r = *r, class_idx
+
+        if self.return_chunk_info:
+            r = *r, self._get_chunk_info(index, frame_offset, aug_info)
 
-        class_idx = self.utt_idx2class[index]
-        r = *r, class_idx
         return r
 
     @staticmethod
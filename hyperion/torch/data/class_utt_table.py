@@ -0,0 +1,111 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import logging
+
+import numpy as np
+
+import torch
+
+
+class ClassUttTable(object):
+    """Class to utterance table in CSR format used by the class weighted
+    samplers to draw batches without loops over classes.
+
+    The utterances of class c are utt_idx[class_offsets[c]:class_offsets[c+1]],
+    sorted by length, so the utterances longer than a given chunk length
+    are a suffix of that range.
+
+    Attributes:
+      utt_idx2class: class index of each utterance.
+      num_classes: number of classes.
+      seq_lengths: length of each utterance (optional).
+      class_weights: sampling weight of each class (optional).
+    """
+
+    def __init__(self, utt_idx2class, num_classes, seq_lengths=None, class_weights=None):
+        utt_idx2class = np.asarray(utt_idx2class, dtype=np.int64)
+        if seq_lengths is None:
+            utt_idx = np.argsort(utt_idx2class, kind="stable")
+        else:
+            seq_lengths = np.asarray(seq_lengths, dtype=np.float64)
+            utt_idx = np.lexsort((seq_lengths, utt_idx2class))
+
+        num_utts = np.bincount(utt_idx2class, minlength=num_classes)
+        self.num_classes = num_classes
+        self.utt_idx = torch.as_tensor(utt_idx)
+        self.class_offsets = torch.as_tensor(
+            np.concatenate(([0], np.cumsum(num_utts))), dtype=torch.long
+        )
+        self.class2num_utt = torch.as_tensor(num_utts, dtype=torch.long)
+
+        if class_weights is None:
+            class_weights = torch.ones((num_classes,))
+        self.class_weights = torch.as_tensor(class_weights, dtype=torch.float)
+        # classes without utterances are never sampled
+        self.class_weights[self.class2num_utt == 0] = 0
+
+        self._sort_keys = None
+        if seq_lengths is not None:
+            # we encode (class, length) in a single sorted key to find the
+            # first utterance of each class longer than a chunk length
+            # with a single binary search for all the classes
+            self._length_norm = 1.01 * (np.max(seq_lengths) + 1e-5)
+            self._sort_keys = (
+                utt_idx2class[utt_idx] + seq_lengths[utt_idx] / self._length_norm
+            )
+
+    @classmethod
+    def from_dataset(cls, dataset, use_lengths=True):
+        seq_lengths = dataset.seq_lengths if use_lengths else None
+        return cls(
+            dataset.utt_idx2class,
+            dataset.num_classes,
+            seq_lengths=seq_lengths,
+            class_weights=dataset.class_weights,
+        )
+
+    def _first_utt_longer_than(self, min_length):
+        """Returns the CSR position of the first utterance of each class
+        with length >= min_length."""
+        keys = np.arange(self.num_classes) + min_length / self._length_norm
+        return torch.as_tensor(np.searchsorted(self._sort_keys, keys, side="left"))
+
+    def sample(
+        self, num_classes, num_egs_per_class=1, min_length=None, generator=None
+    ):
+        """Samples utterances, first it samples the classes with the class weights,
+        then, it samples uniformly the utterances of each class.
+
+        Args:
+          num_classes: number of classes to sample.
+          num_egs_per_class: number of utterances per class.
+          min_length: if not None, we only sample utterances with
+                      length >= min_length.
+          generator: torch.Generator, if None, it uses the global generator.
+
+        Returns:
+          Tensor of utterance indices with num_classes * num_egs_per_class elements.
+        """
+        first = self.class_offsets[:-1]
+        last = self.class_offsets[1:]
+        class_weights = self.class_weights
+        if min_length is not None:
+            first = self._first_utt_longer_than(min_length)
+            class_weights = class_weights * (first < last)
+
+        class_idx = torch.multinomial(
+            class_weights,
+            num_samples=num_classes,
+            replacement=True,
+            generator=generator,
+        )
+        if num_egs_per_class > 1:
+            class_idx = class_idx.repeat(num_egs_per_class)
+
+        first = first[class_idx]
+        num_utts = last[class_idx] - first
+        u = torch.rand(len(class_idx), generator=generator)
+        pos = first + (u * num_utts).long()
+        return self.utt_idx[pos]
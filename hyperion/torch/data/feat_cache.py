@@ -0,0 +1,166 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import os
+import shutil
+import logging
+
+import numpy as np
+
+
+class FeatCache(object):
+    """Memory-mapped cache of the acoustic features, e.g. log-filter-banks,
+    of the clean (not augmented) sequences of a dataset.
+
+    Features are stored by frame, so chunks of the same sequence extracted
+    at different offsets share the cached frames. A frame is only read from
+    the cache when it has been written before, a chunk is a hit if all its
+    frames are in the cache.
+
+    The cache is stored in <cache_path>/feats.bin as a sparse file, so it
+    only uses disk space for the frames written. It is shared by all the
+    processes using the same cache_path.
+
+    Cached frames are an approximation of the frames that would be computed
+    from the chunk being read. They are computed on the chunk that first
+    filled them, and some operations of Wav2Win depend on the whole chunk:
+    the DC offset (remove_dc_offset=True) is the mean of the chunk, the
+    pre-emphasis of the first sample and the reflected frames at the edges
+    (snip_edges=False) depend on where the chunk starts and ends, and the
+    dither noise is drawn once. The features are also rounded to dtype.
+    With logfb features, remove_dc_offset and pre-emphasis, the differences
+    are of the order of 1e-2. Without them and in float32, frames are exact.
+
+    Attributes:
+      cache_path: directory of the cache, if it doesn't exist it is created.
+      num_frames: max. number of frames of each sequence.
+      feat_dim: feature dimension.
+      dtype: data type of the stored features, float16 or float32.
+    """
+
+    def __init__(self, cache_path, num_frames, feat_dim, dtype="float16"):
+        self.cache_path = cache_path
+        self.num_frames = np.asarray(num_frames, dtype=np.int64)
+        self.feat_dim = feat_dim
+        self.dtype = dtype
+        self.offsets = np.concatenate(([0], np.cumsum(self.num_frames)[:-1]))
+        self.total_frames = int(np.sum(self.num_frames))
+        if not os.path.isdir(cache_path):
+            self._build()
+
+        self._load()
+
+    @classmethod
+    def create(cls, cache_path, seq_lengths, frame_shift, feat_dim, dtype="float16"):
+        """Creates a cache for a dataset.
+
+        Args:
+          cache_path: directory of the cache.
+          seq_lengths: lengths of the sequences in secs.
+          frame_shift: frame shift in secs.
+          feat_dim: feature dimension.
+          dtype: data type of the stored features, float16 or float32.
+
+        Returns:
+          FeatCache object.
+        """
+        num_frames = np.floor(np.asarray(seq_lengths) / frame_shift).astype(np.int64) + 1
+        return cls(cache_path, num_frames, feat_dim, dtype)
+
+    def _build(self):
+        logging.info(
+            "building feature cache %s with %d frames"
+            % (self.cache_path, self.total_frames)
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        # we build in a temp dir and rename at the end, so that other
+        # processes never see an incomplete cache
+        tmp_path = "%s.tmp%d" % (self.cache_path, os.getpid())
+        os.makedirs(tmp_path, exist_ok=True)
+        item_size = np.dtype(self.dtype).itemsize
+        with open(os.path.join(tmp_path, "feats.bin"), "wb") as f:
+            f.truncate(self.total_frames * self.feat_dim * item_size)
+        with open(os.path.join(tmp_path, "filled.bin"), "wb") as f:
+            f.truncate(self.total_frames)
+
+        np.savez(
+            os.path.join(tmp_path, "index.npz"),
+            num_frames=self.num_frames,
+            feat_dim=self.feat_dim,
+            dtype=np.asarray(self.dtype),
+        )
+        try:
+            os.rename(tmp_path, self.cache_path)
+        except OSError:
+            # other process built the cache before us
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _load(self):
+        logging.info("loading feature cache %s" % (self.cache_path))
+        index = np.load(os.path.join(self.cache_path, "index.npz"))
+        assert np.all(index["num_frames"] == self.num_frames) and (
+            int(index["feat_dim"]) == self.feat_dim
+        ), "feature cache %s was created for a different dataset" % (self.cache_path)
+        assert str(index["dtype"]) == self.dtype, (
+            "feature cache %s has dtype %s" % (self.cache_path, str(index["dtype"]))
+        )
+        self.feats = np.memmap(
+            os.path.join(self.cache_path, "feats.bin"),
+            dtype=self.dtype,
+            mode="r+",
+            shape=(self.total_frames, self.feat_dim),
+        )
+        self.filled = np.memmap(
+            os.path.join(self.cache_path, "filled.bin"),
+            dtype=np.uint8,
+            mode="r+",
+            shape=(self.total_frames,),
+        )
+
+    def _frame_idx(self, seq_idx, frame_offset, num_frames):
+        seq_idx = np.asarray(seq_idx)
+        frame_offset = np.asarray(frame_offset)
+        valid = frame_offset + num_frames <= self.num_frames[seq_idx]
+        # (batch, num_frames)
+        idx = (self.offsets[seq_idx] + frame_offset)[:, None] + np.arange(num_frames)
+        idx[~valid] = 0
+        return idx, valid
+
+    def read(self, seq_idx, frame_offset, num_frames):
+        """Reads chunks from the cache.
+
+        Args:
+          seq_idx: sequence index of each chunk.
+          frame_offset: first frame of each chunk.
+          num_frames: number of frames of the chunks.
+
+        Returns:
+          Features of the chunks found in the cache with
+          shape=(num_hits, num_frames, feat_dim).
+          Boolean array indicating which chunks were found in the cache.
+        """
+        idx, valid = self._frame_idx(seq_idx, frame_offset, num_frames)
+        hit = valid & np.all(self.filled[idx], axis=-1).astype(bool)
+        feats = self.feats[idx[hit]]
+        return feats, hit
+
+    def write(self, seq_idx, frame_offset, feats):
+        """Writes chunks into the cache.
+
+        Args:
+          seq_idx: sequence index of each chunk.
+          frame_offset: first frame of each chunk.
+          feats: features with shape=(batch, num_frames, feat_dim).
+        """
+        idx, valid = self._frame_idx(seq_idx, frame_offset, feats.shape[1])
+        idx = idx[valid]
+        self.feats[idx] = feats[valid].astype(self.dtype, copy=False)
+        # filled flags are written after the features
+        self.filled[idx] = 1
+
+    @property
+    def fill_ratio(self):
+        """Ratio of the frames stored in the cache."""
+        return np.mean(self.filled)
@@ -187,11 +187,14 @@ class FeatSeqDataset(Dataset):
     def var_chunk_length(self):
         return self.min_chunk_length < self.max_chunk_length
 
-    def get_random_chunk_length(self):
+    def get_random_chunk_length(self, generator=None):
 
         if self.var_chunk_length:
             return torch.randint(
-                low=self.min_chunk_length, high=self.max_chunk_length + 1, size=(1,)
+                low=self.min_chunk_length,
+                high=self.max_chunk_length + 1,
+                size=(1,),
+                generator=generator,
             ).item()
 
         return self.max_chunk_length
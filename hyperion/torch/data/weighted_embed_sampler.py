@@ -11,6 +11,8 @@ import numpy as np
 import torch
 from torch.utils.data import Sampler
 
+from .class_utt_table import ClassUttTable
+
 
 class ClassWeightedEmbedSampler(Sampler):
 
@@ -32,6 +34,7 @@ class ClassWeightedEmbedSampler(Sampler):
         self._num_classes_per_batch = int(math.ceil(
             batch_size/num_egs_per_class))
         logging.info('num classes per batch: %d' % self._num_classes_per_batch)
+        self.table = ClassUttTable.from_dataset(dataset, use_lengths=False)
 
 
     def __len__(self):
@@ -58,24 +61,8 @@ class ClassWeightedEmbedSampler(Sampler):
 
 
     def _get_utt_idx(self):
-        dataset = self.dataset
         num_classes_per_batch = self._num_classes_per_batch
-        if dataset.class_weights is None:
-            class_idx = torch.randint(low=0, high=dataset.num_classes, 
-                                      size=(num_classes_per_batch,))
-        else:
-            class_idx = torch.multinomial(
-                dataset.class_weights, 
-                num_samples=num_classes_per_batch, replacement=True)
-
-        if self.num_egs_per_class > 1:
-            class_idx = class_idx.repeat(self.num_egs_per_class)
-
-        utt_idx = torch.as_tensor([
-            dataset.class2utt_idx[c][
-                torch.randint(low=0, high=int(dataset.class2num_utt[c]), size=(1,))] 
-            for c in class_idx.tolist()])
-
+        utt_idx = self.table.sample(num_classes_per_batch, self.num_egs_per_class)
         utt_idx = self._remove_duplicate_idx(utt_idx)
         return utt_idx
 
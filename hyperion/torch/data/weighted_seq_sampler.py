@@ -13,10 +13,29 @@ import torch
 from torch.utils.data import Sampler
 import torch.distributed as dist
 
-class ClassWeightedSeqSampler(Sampler):
+from .class_utt_table import ClassUttTable
 
+class ClassWeightedSeqSampler(Sampler):
+    """Batch sampler that samples classes with the class weights
+       and then utterances of those classes.
+
+       It uses its own random number generator, which is re-seeded
+       at the beginning of each epoch with seed + epoch. Thus, the batches
+       of an epoch can be reproduced to resume the training in the middle
+       of the epoch.
+
+       Attributes:
+         dataset: AudioDataset or FeatSeqDataset object.
+         batch_size: batch size summed over all the processes.
+         iters_per_epoch: number of times we sample an utterance in each epoch.
+         num_egs_per_class: number of samples per class in batch.
+         num_egs_per_utt: number of samples per utterance in batch.
+         var_batch_size: if True, the batch size depends on the chunk length.
+         seed: random seed, if None, it is drawn from the torch global generator.
+    """
     def __init__(self, dataset, batch_size=1, iters_per_epoch='auto',
-                 num_egs_per_class=1, num_egs_per_utt=1, var_batch_size=False): 
+                 num_egs_per_class=1, num_egs_per_utt=1, var_batch_size=False,
+                 seed=None): 
         
         super().__init__(None)
 
@@ -42,6 +61,13 @@ class ClassWeightedSeqSampler(Sampler):
             # when using ddp
             dummy = torch.rand(1000 * rank)
             del dummy
+
+        if seed is None:
+            seed = torch.randint(2**31, size=(1,)).item()
+        self.seed = seed
+        self.epoch = 0
+        self.start_batch = 0
+        self.rng = torch.Generator()
         
         if iters_per_epoch == 'auto':
             self._compute_iters_auto()
@@ -62,7 +88,10 @@ class ClassWeightedSeqSampler(Sampler):
             batch_size/num_egs_per_class/num_egs_per_utt))
         logging.info('num classes per batch: %d' % self._num_classes_per_batch)
 
-        #self.weights = torch.as_tensor(dataset.class_weights, dtype=torch.double)
+        # class->utt table sorted by length to sample batches without
+        # loops over classes
+        self.table = ClassUttTable.from_dataset(
+            dataset, use_lengths=dataset.short_seq_exist)
         
 
     def _compute_avg_batch_size(self):
@@ -85,89 +114,48 @@ class ClassWeightedSeqSampler(Sampler):
         
 
         
+    def set_epoch(self, epoch, start_batch=0):
+        """Sets the epoch for the next iteration over the sampler.
+
+           Args:
+             epoch: epoch index, the batches of an epoch only depend on
+                    the seed and the epoch.
+             start_batch: first batch to return, the previous batches of
+                          the epoch are skipped to resume training.
+        """
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+
     def __iter__(self):
+        self.rng.manual_seed(self.seed + self.epoch)
         self.batch = 0
+        # we need to draw the skipped batches to restore the generator state
+        for _ in range(min(self.start_batch, self._len)):
+            self._sample_batch()
+
+        self.start_batch = 0
         return self
 
 
     def _get_utt_idx_basic(self, batch_mult=1):
-        dataset = self.dataset
-
         num_classes_per_batch = batch_mult * self._num_classes_per_batch
-
-        if dataset.class_weights is None:
-            class_idx = torch.randint(low=0, high=dataset.num_classes, 
-                                      size=(num_classes_per_batch,))
-        else:
-            class_idx = torch.multinomial(
-                dataset.class_weights, 
-                num_samples=num_classes_per_batch, replacement=True)
-
-        if self.num_egs_per_class > 1:
-            class_idx = class_idx.repeat(self.num_egs_per_class)
-
-        utt_idx = torch.as_tensor([
-            dataset.class2utt_idx[c][
-                torch.randint(low=0, high=int(dataset.class2num_utt[c]), size=(1,))] 
-            for c in class_idx.tolist()])
-    
-        return utt_idx
-
+        return self.table.sample(num_classes_per_batch, self.num_egs_per_class,
+                                 generator=self.rng)
 
 
     def _get_utt_idx_seq_st_max_length(self, chunk_length, batch_mult=1):
-        dataset = self.dataset
-
+        # we only sample classes and utts longer than chunk length
         num_classes_per_batch = batch_mult * self._num_classes_per_batch
+        return self.table.sample(num_classes_per_batch, self.num_egs_per_class,
+                                 min_length=chunk_length, generator=self.rng)
 
-        #first we sample the batch classes
-        class_weights = dataset.class_weights.clone()
-        # get classes with utt shorter than chunk lenght
-        class_weights[dataset.class2max_length < chunk_length] = 0
-        
-        # renormalize weights and sample
-        class_weights /= class_weights.sum()
-        #logging.info(str(class_weights))
-        class_idx = torch.multinomial(
-            class_weights, 
-            num_samples=num_classes_per_batch, replacement=True)
-
-        utt_idx = torch.zeros((len(class_idx)*self.num_egs_per_class,), dtype=torch.long)
-        k=0
-        for c in class_idx.tolist():
-            #for each class we sample an utt between the utt longer than chunk length
-        
-            # get utts for class c
-            utt_idx_c = torch.as_tensor(dataset.class2utt_idx[c])
-
-            # find utts longer than chunk length for class c
-            seq_lengths_c = torch.as_tensor(dataset.seq_lengths[utt_idx_c])
-            utt_weights = torch.ones((int(dataset.class2num_utt[c]),))
-            utt_weights[seq_lengths_c < chunk_length] = 0
-            utt_weights /= utt_weights.sum()
-            
-            #sample utt idx
-            try:
-                utt_idx[k:k+self.num_egs_per_class] = utt_idx_c[
-                    torch.multinomial(
-                        utt_weights, 
-                        num_samples=self.num_egs_per_class, replacement=True)]
-            except:
-                logging.info('{} {}'.format(seq_lengths_c, utt_weights))
-
-            k += self.num_egs_per_class
-    
-        return utt_idx
 
 
 
+    def _sample_batch(self):
 
-    def __next__(self):
-
-        if self.batch == self._len:
-            raise StopIteration
-
-        chunk_length = self.dataset.get_random_chunk_length()
+        chunk_length = self.dataset.get_random_chunk_length(generator=self.rng)
 
         if self.var_batch_size:
             batch_mult = int(self.dataset.max_chunk_length//chunk_length)
@@ -190,6 +178,14 @@ class ClassWeightedSeqSampler(Sampler):
 
         index = [(i, chunk_length) for i in utt_idx]
         return index
+
+
+    def __next__(self):
+
+        if self.batch == self._len:
+            raise StopIteration
+
+        return self._sample_batch()
     
 
     @staticmethod
@@ -11,11 +11,22 @@ from .norm_layer_factory import NormLayer2dFactory, NormLayer1dFactory
 from .pool_factory import GlobalPool1dFactory
 
 from .margin_losses import CosLossOutput, ArcLossOutput, SubCenterArcLossOutput
+from .partial_fc_losses import (
+    PartialFCCosLossOutput,
+    PartialFCArcLossOutput,
+    PartialFCSubCenterArcLossOutput,
+)
 
 from .audio_feats import *
 from .audio_feats_factory import AudioFeatsFactory
 from .spec_augment import AxisMasker, SpecWarper, SpecAugment
 from .mvn import MeanVarianceNorm
+from .batch_speech_augment import (
+    BatchSpeechAugment,
+    BatchSpeedAugment,
+    BatchReverbAugment,
+    BatchNoiseAugment,
+)
 
 from .attention import (
     ScaledDotProdAttV1,
@@ -23,6 +23,7 @@ except:
     _spectrogram = lambda x: x.pow(2).sum(-1).sqrt()
 
 from ...feats.filter_banks import FilterBankFactory as FBF
+from ..utils.misc import seq_lengths_to_mask
 
 # window types
 HAMMING = 'hamming'
@@ -74,7 +75,8 @@ def _get_strided_batch(waveform,
                        window_length,
                        window_shift,
                        snip_edges,
-                       center=False):
+                       center=False,
+                       lengths=None):
     r"""Given a waveform (1D tensor of size ``num_samples``), it returns a 2D tensor (m, ``window_size``)
     representing how the window is shifted along the waveform. Each row is a frame.
 
@@ -87,6 +89,8 @@ def _get_strided_batch(waveform,
             depends only on the frame_shift, and we reflect the data at the ends.
         center (bool): If true, if puts the center of the frame at t*window_shift, starting at t=0,
                        If overwrides snip_edges and set it to False
+        lengths (torch.Tensor): lengths of the signals in the batch, if given,
+                       each signal is reflected at its own end instead of at the end of the batch.
 
     Returns:
         torch.Tensor: 3D tensor of size (m, ``window_size``) where each row is a frame
@@ -118,13 +122,48 @@ def _get_strided_batch(waveform,
 
         #waveform = nn.functional.pad(waveform, (npad_left, npad_right), mode='reflect')
         pad_left = torch.flip(waveform[:, 1:npad_left + 1], (1, ))
-        pad_right = torch.flip(waveform[:, -npad_right - 1:-1], (1, ))
-        waveform = torch.cat((pad_left, waveform, pad_right), dim=1)
+        if lengths is None:
+            pad_right = torch.flip(waveform[:, -npad_right - 1:-1], (1, ))
+            waveform = torch.cat((pad_left, waveform, pad_right), dim=1)
+        else:
+            # samples after the end of each signal mirror the end of the signal
+            t = torch.arange(num_samples + npad_right, device=waveform.device)
+            n = lengths.long().unsqueeze(-1)
+            idx = torch.where(t < n, t, 2 * n - 2 - t).clamp(min=0)
+            waveform = torch.cat((pad_left, torch.gather(waveform, 1, idx)),
+                                 dim=1)
+
+    # unfold returns the same strided view as as_strided, but
+    # the sizes are not constants when the module is traced
+    return waveform.unfold(1, window_length, window_shift)
+
 
-    strides = (waveform.stride(0), window_shift * waveform.stride(1),
-               waveform.stride(1))
-    sizes = (batch_size, num_frames, window_length)
-    return waveform.as_strided(sizes, strides)
+def _get_num_frames(num_samples, window_length, window_shift, snip_edges,
+                    center=False):
+    r"""Returns the number of frames produced by _get_strided_batch
+    for signals with num_samples samples.
+
+    Args:
+        num_samples (torch.Tensor or int): number of samples of each signal.
+        window_size (int): Frame length
+        window_shift (int): Frame shift
+        snip_edges (bool): see _get_strided_batch
+        center (bool): see _get_strided_batch
+
+    Returns:
+        Number of frames (same type as num_samples).
+    """
+    if center:
+        npad = 2 * int(window_length // 2)
+        return 1 + (num_samples + npad - window_length) // window_shift
+
+    if snip_edges:
+        num_frames = 1 + (num_samples - window_length) // window_shift
+        if isinstance(num_frames, torch.Tensor):
+            return num_frames.clamp(min=0)
+        return max(num_frames, 0)
+
+    return (num_samples + (window_shift // 2)) // window_shift
 
 
 def _get_log_energy(x, energy_floor):
@@ -196,7 +235,35 @@ class Wav2Win(nn.Module):
                  self.raw_energy, self.return_log_energy)
         return s
 
-    def forward(self, x):
+    def compute_num_frames(self, x_lengths):
+        """Computes the number of frames of each signal.
+
+        Args:
+          x_lengths: number of samples of each signal.
+
+        Returns:
+          Number of frames of each signal.
+        """
+        return _get_num_frames(x_lengths, self._length, self._shift,
+                               self.snip_edges, self.center)
+
+    def forward(self, x, x_lengths=None):
+        """Splits the signals into windowed frames.
+
+        Args:
+          x: waveforms with shape=(batch, num_samples), signals shorter
+             than num_samples are padded at the end.
+          x_lengths: number of valid samples of each signal, if None
+             all samples are valid.
+
+        Returns:
+          Frames with shape=(batch, num_frames, pad_length).
+          Log-energy of each frame if return_log_energy is True.
+          Number of valid frames of each signal if x_lengths is not None.
+        """
+        mask = None
+        if x_lengths is not None:
+            mask = seq_lengths_to_mask(x_lengths, x.size(-1), dtype=x.dtype)
 
         # Add dither
         if self.dither != 0.0:
@@ -205,16 +272,26 @@ class Wav2Win(nn.Module):
 
         #remove offset
         if self.remove_dc_offset:
-            mu = torch.mean(x, dim=1, keepdim=True)
+            if mask is None:
+                mu = torch.mean(x, dim=1, keepdim=True)
+            else:
+                # offset computed only over the valid samples
+                mu = torch.sum(x * mask, dim=1, keepdim=True) / x_lengths.to(
+                    x.dtype).unsqueeze(-1).clamp(min=1)
             x = x - mu
 
+        if mask is not None:
+            # padding is set to zero so it does not depend on the input padding
+            x = x * mask
+
         if self.return_log_energy and self.raw_energy:
             # Compute the log energy of each frame
             x_strided = _get_strided_batch(x,
                                            self._length,
                                            self._shift,
                                            self.snip_edges,
-                                           center=self.center)
+                                           center=self.center,
+                                           lengths=x_lengths)
             log_energy = _get_log_energy(x_strided,
                                          self.energy_floor)  # size (m)
 
@@ -227,14 +304,15 @@ class Wav2Win(nn.Module):
                                        self._length,
                                        self._shift,
                                        self.snip_edges,
-                                       center=self.center)
+                                       center=self.center,
+                                       lengths=x_lengths)
 
         # Apply window_function to each frame
         x_strided = x_strided * self._window
 
         if self.return_log_energy and not self.raw_energy:
-            signal_log_energy = _get_log_energy(
-                strided_input, self.energy_floor)  # size (batch, m)
+            log_energy = _get_log_energy(
+                x_strided, self.energy_floor)  # size (batch, m)
 
         # Pad columns with zero until we reach size (batch, num_frames, pad_length)
         if self.pad_length != self._length:
@@ -244,6 +322,12 @@ class Wav2Win(nn.Module):
                                                 mode='constant',
                                                 value=0).squeeze(1)
 
+        if x_lengths is not None:
+            f_lengths = self.compute_num_frames(x_lengths)
+            if self.return_log_energy:
+                return x_strided, log_energy, f_lengths
+            return x_strided, f_lengths
+
         if self.return_log_energy:
             return x_strided, log_energy
 
@@ -318,17 +402,36 @@ class Wav2FFT(nn.Module):
     def dither(self):
         return self.wav2win.dither
 
-    def forward(self, x):
+    def compute_num_frames(self, x_lengths):
+        return self.wav2win.compute_num_frames(x_lengths)
 
-        x_strided = self.wav2win(x)
-        if self.use_energy:
-            x_strided, log_e = x_strided
+    def _wav2win(self, x, x_lengths):
+        """Returns windowed frames, log-energy (or None) and number of
+           frames (or None if x_lengths is None)."""
+        out = self.wav2win(x, x_lengths)
+        if not isinstance(out, tuple):
+            return out, None, None
+
+        x_strided = out[0]
+        log_e = out[1] if self.use_energy else None
+        f_lengths = out[-1] if x_lengths is not None else None
+        return x_strided, log_e, f_lengths
+
+    def forward(self, x, x_lengths=None):
+
+        x_strided, log_e, f_lengths = self._wav2win(x, x_lengths)
 
         #X = torch.rfft(x_strided, 1, normalized=False, onesided=True)
         X = _rfft(x_strided)
 
         if self.use_energy:
-            X[:, 0, :, 0] = log_e
+            if X.is_complex():
+                X[:, :, 0] = log_e
+            else:
+                X[:, :, 0, 0] = log_e
+
+        if x_lengths is not None:
+            return X, f_lengths
 
         return X
 
@@ -370,11 +473,9 @@ class Wav2Spec(Wav2FFT):
         else:
             self._to_spec = _pow_spectrogram
 
-    def forward(self, x):
+    def forward(self, x, x_lengths=None):
 
-        x_strided = self.wav2win(x)
-        if self.use_energy:
-            x_strided, log_e = x_strided
+        x_strided, log_e, f_lengths = self._wav2win(x, x_lengths)
 
         #X = torch.rfft(x_strided, 1, normalized=False, onesided=True)
         X = _rfft(x_strided)
@@ -384,7 +485,10 @@ class Wav2Spec(Wav2FFT):
         #     pow_spec = pow_spec.sqrt()
 
         if self.use_energy:
-            pow_spec[:, 0] = log_e
+            pow_spec[:, :, 0] = log_e
+
+        if x_lengths is not None:
+            return pow_spec, f_lengths
 
         return pow_spec
 
@@ -426,11 +530,9 @@ class Wav2LogSpec(Wav2FFT):
         else:
             self._to_spec = _pow_spectrogram
 
-    def forward(self, x):
+    def forward(self, x, x_lengths=None):
 
-        x_strided = self.wav2win(x)
-        if self.use_energy:
-            x_strided, log_e = x_strided
+        x_strided, log_e, f_lengths = self._wav2win(x, x_lengths)
 
         #X = torch.rfft(x_strided, 1, normalized=False, onesided=True)
         X = _rfft(x_strided)
@@ -443,7 +545,10 @@ class Wav2LogSpec(Wav2FFT):
         pow_spec = (pow_spec + 1e-15).log()
 
         if self.use_energy:
-            pow_spec[:, 0] = log_e
+            pow_spec[:, :, 0] = log_e
+
+        if x_lengths is not None:
+            return pow_spec, f_lengths
 
         return pow_spec
 
@@ -501,11 +606,9 @@ class Wav2LogFilterBank(Wav2FFT):
         else:
             self._to_spec = _pow_spectrogram
 
-    def forward(self, x):
+    def forward(self, x, x_lengths=None):
 
-        x_strided = self.wav2win(x)
-        if self.use_energy:
-            x_strided, log_e = x_strided
+        x_strided, log_e, f_lengths = self._wav2win(x, x_lengths)
 
         #X = torch.rfft(x_strided, 1, normalized=False, onesided=True)
         X = _rfft(x_strided)
@@ -528,6 +631,9 @@ class Wav2LogFilterBank(Wav2FFT):
         if self.use_energy:
             pow_spec = torch.cat((log_e.unsqueeze(-1), pow_spec), dim=-1)
 
+        if x_lengths is not None:
+            return pow_spec, f_lengths
+
         return pow_spec
 
 
@@ -620,11 +726,9 @@ class Wav2MFCC(Wav2FFT):
         dct *= math.sqrt(2.0 / float(num_filters))
         return dct
 
-    def forward(self, x):
+    def forward(self, x, x_lengths=None):
 
-        x_strided = self.wav2win(x)
-        if self.use_energy:
-            x_strided, log_e = x_strided
+        x_strided, log_e, f_lengths = self._wav2win(x, x_lengths)
 
         #X = torch.rfft(x_strided, 1, normalized=False, onesided=True)
         X = _rfft(x_strided)
@@ -643,7 +747,10 @@ class Wav2MFCC(Wav2FFT):
             mfcc *= self._lifter
 
         if self.use_energy:
-            mfcc[:, 0] = log_e
+            mfcc[:, :, 0] = log_e
+
+        if x_lengths is not None:
+            return mfcc, f_lengths
 
         return mfcc
 
@@ -687,8 +794,12 @@ class Wav2KanBayashiLogFilterBank(Wav2LogFilterBank):
         # Kan Bayashi uses log10 instead of log
         self.scale = 1. / math.log(10)
 
-    def forward(self, x):
-        return self.scale * super().forward(x)
+    def forward(self, x, x_lengths=None):
+        if x_lengths is None:
+            return self.scale * super().forward(x)
+
+        f, f_lengths = super().forward(x, x_lengths)
+        return self.scale * f, f_lengths
 
 
 class Spec2LogFilterBank():
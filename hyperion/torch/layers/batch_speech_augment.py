@@ -0,0 +1,905 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import logging
+import math
+from copy import deepcopy
+from fractions import Fraction
+
+import yaml
+import numpy as np
+
+import torch
+import torch.nn as nn
+
+from ...io import RandomAccessAudioReader as AR
+from ...io import RandomAccessDataReaderFactory as DRF
+from ...augment.reverb_augment import RIRNormType
+from ...augment.wav_bank import WavBank
+from ...augment.speed_augment import sinc_resample_kernel
+from ..utils.misc import seq_lengths_to_mask
+
+
+class _RNGModule(nn.Module):
+    """Base class for the augmentation modules with a numpy random
+    number generator. The state of the generator is saved in the
+    module state_dict, so the augmentation can be resumed from a checkpoint.
+    """
+
+    def get_extra_state(self):
+        return {"rng_state": self.rng.get_state()}
+
+    def set_extra_state(self, state):
+        self.rng.set_state(state["rng_state"])
+
+
+def _power_db(x, mask=None):
+    if mask is not None:
+        x = x * mask
+    return 10 * torch.log10(torch.sum(x**2, dim=-1) + 1e-5)
+
+
+def _shift_left(y, delay):
+    """Shifts each row of y delay[i] samples to the left,
+    padding with zeros at the end."""
+    T = y.size(-1)
+    idx = torch.arange(T, device=y.device).unsqueeze(0) + delay.unsqueeze(-1)
+    valid = idx < T
+    y = torch.gather(y, -1, idx.clamp(max=T - 1))
+    return y * valid
+
+
+def _sdr(x, y, scale, delay, mask=None):
+    """Batched version of SingleReverbAugment.sdr"""
+    x = scale.unsqueeze(-1) * x
+    y = _shift_left(y, delay)
+    return _power_db(x, mask) - _power_db(y - x, mask)
+
+
+def _get_sinc_resample_kernel(orig_freq, new_freq, device=None, dtype=None):
+    """Computes the polyphase windowed-sinc filter bank
+    to resample from orig_freq to new_freq.
+    It uses the same filters as SpeedAugment.
+
+    Returns:
+      Filters with shape (new_freq, 1, kernel_width) and
+      number of samples of left padding.
+    """
+    kernels, width = sinc_resample_kernel(orig_freq, new_freq)
+    if dtype is None:
+        dtype = torch.get_default_dtype()
+    kernels = torch.as_tensor(kernels, dtype=dtype, device=device)
+    return kernels.unsqueeze(1), width
+
+
+def resample(x, orig_freq, new_freq, kernel, width, num_samples=None):
+    """Resamples a batch of signals with a polyphase filter bank.
+
+    Args:
+      x: signals with shape=(batch, num_samples).
+      orig_freq: original sampling rate (reduced by the gcd).
+      new_freq: new sampling rate (reduced by the gcd).
+      kernel: filter bank from _get_sinc_resample_kernel.
+      width: left padding from _get_sinc_resample_kernel.
+      num_samples: number of output samples to compute,
+                   by default ceil(num_samples*new_freq/orig_freq).
+
+    Returns:
+      Resampled signals with shape=(batch, num_samples).
+    """
+    batch_size, in_samples = x.shape
+    if num_samples is None:
+        num_samples = int(math.ceil(new_freq * in_samples / orig_freq))
+
+    # we only use the input samples needed for num_samples outputs
+    num_frames = int(math.ceil(num_samples / new_freq))
+    pad_samples = (num_frames - 1) * orig_freq + kernel.size(-1)
+    x = x[:, : pad_samples - width]
+    x = nn.functional.pad(x.unsqueeze(1), (width, pad_samples - width - x.size(-1)))
+    y = nn.functional.conv1d(x, kernel, stride=orig_freq)
+    y = y.transpose(1, 2).reshape(batch_size, -1)
+    return y[:, :num_samples]
+
+
+class BatchSpeedAugment(_RNGModule):
+    """Class to augment a batch of speech signals with
+    resampling based speed perturbation (like Kaldi/sox speed).
+
+    Attributes:
+      speed_prob: probability of applying speed perturbation
+      speed_ratios: list of speed pertubation ratios
+      keep_length: if True, the output has the same length as the input
+                   by cropping or padding, otherwise the output length
+                   is the maximum length after perturbation.
+      random_seed: random seed for random number generator
+      rng:     Random number generator returned by
+               np.random.RandomState (optional)
+    """
+
+    def __init__(
+        self,
+        speed_prob,
+        speed_ratios=[0.9, 1.1],
+        keep_length=True,
+        random_seed=112358,
+        rng=None,
+    ):
+        super().__init__()
+        logging.info(
+            (
+                "init batch speed augment with prob={}, "
+                "speed_ratios={}, keep_length={}"
+            ).format(speed_prob, speed_ratios, keep_length)
+        )
+        self.speed_prob = speed_prob
+        self.speed_ratios = speed_ratios
+        self.keep_length = keep_length
+        self._kernels = {}
+
+        if rng is None:
+            self.rng = np.random.RandomState(seed=random_seed)
+        else:
+            self.rng = deepcopy(rng)
+
+    @classmethod
+    def create(cls, cfg, random_seed=112358, rng=None):
+        """Creates a BatchSpeedAugment object from options dictionary or YAML file.
+
+        Args:
+          cfg: YAML file path or dictionary with speed options.
+          rng: Random number generator returned by
+               np.random.RandomState (optional)
+
+        Returns:
+          BatchSpeedAugment object
+        """
+        if isinstance(cfg, str):
+            with open(cfg, "r") as f:
+                cfg = yaml.load(f, Loader=yaml.FullLoader)
+
+        assert isinstance(cfg, dict), "wrong object type for cfg={}".format(cfg)
+
+        return cls(
+            speed_prob=cfg["speed_prob"],
+            speed_ratios=cfg["speed_ratios"],
+            keep_length=cfg.get("keep_length", True),
+            random_seed=random_seed,
+            rng=rng,
+        )
+
+    @staticmethod
+    def _ratio_to_freqs(r):
+        # speed r is equivalent to resample from fs to fs/r
+        f = Fraction(r).limit_denominator(1000)
+        return f.numerator, f.denominator
+
+    def _get_kernel(self, orig_freq, new_freq, device, dtype):
+        key = (orig_freq, new_freq, str(device), dtype)
+        if key not in self._kernels:
+            self._kernels[key] = _get_sinc_resample_kernel(
+                orig_freq, new_freq, device=device, dtype=dtype
+            )
+        return self._kernels[key]
+
+    def change_speed(self, x, r, num_samples=None):
+        """Changes the speed of a batch of signals.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          r: speed ratio.
+          num_samples: number of output samples to compute (optional).
+
+        Returns:
+          Signals with shape=(batch, ceil(num_samples/r))
+        """
+        orig_freq, new_freq = self._ratio_to_freqs(r)
+        kernel, width = self._get_kernel(orig_freq, new_freq, x.device, x.dtype)
+        return resample(x, orig_freq, new_freq, kernel, width, num_samples)
+
+    def forward(self, x, x_lengths=None):
+        """Applies speed perturbation.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          x_lengths: number of valid samples of each signal (optional).
+
+        Returns:
+          Perturbed signals.
+          Info dictionary with the speed_ratio of each signal.
+          Number of valid samples after perturbation (if x_lengths is not None).
+        """
+        batch_size, num_samples = x.shape
+        p = self.rng.random_sample(size=(batch_size,))
+        speed_idx = self.rng.choice(len(self.speed_ratios), size=(batch_size,))
+        ratios = np.asarray(self.speed_ratios, dtype=float)[speed_idx]
+        ratios[p > self.speed_prob] = 1
+        info = {"speed_ratio": torch.as_tensor(ratios, dtype=torch.float)}
+
+        if x_lengths is None:
+            lengths = np.full((batch_size,), num_samples)
+        else:
+            lengths = x_lengths.cpu().numpy()
+        y_lengths = np.ceil(lengths / ratios).astype(np.int64)
+
+        if self.keep_length:
+            out_samples = num_samples
+            y_lengths = np.minimum(y_lengths, num_samples)
+        else:
+            out_samples = max(int(np.max(y_lengths)), num_samples)
+
+        y = torch.zeros((batch_size, out_samples), dtype=x.dtype, device=x.device)
+        for r in np.unique(ratios):
+            idx = np.nonzero(ratios == r)[0]
+            idx_t = torch.as_tensor(idx, device=x.device)
+            if r == 1:
+                y_r = x[idx_t]
+            else:
+                # we only compute the samples that we keep
+                orig_freq, new_freq = self._ratio_to_freqs(r)
+                n = int(math.ceil(new_freq * num_samples / orig_freq))
+                y_r = self.change_speed(x[idx_t], r, min(n, out_samples))
+            n = min(y_r.size(-1), out_samples)
+            y[idx_t, :n] = y_r[:, :n]
+
+        y_lengths = torch.as_tensor(y_lengths, device=x.device)
+        mask = seq_lengths_to_mask(y_lengths, out_samples, dtype=x.dtype)
+        if x_lengths is None:
+            # we add some dither in the padding
+            dither = torch.max(x.abs(), dim=-1, keepdim=True)[0] / 2**15
+            y = y * mask + dither * (1 - mask)
+            return y, info
+
+        return y * mask, info, y_lengths
+
+
+class BatchSingleNoiseAugment(_RNGModule):
+    """Class to augment a batch of speech signals with additive noise
+    of a single type, e.g., music, babble, ...
+
+    Attributes:
+      noise_type: string label indicating the noise type.
+      noise_path: path to Kaldi style wav.scp file indicating the path
+                  to the noise wav files.
+      min_snr: mininimum SNR(dB) to sample from.
+      max_snr: maximum SNR(dB) to sample from.
+      bank_path: directory of a memory-mapped noise bank shared by all
+                 the processes, it is created if it doesn't exist.
+                 If None, noises are read from noise_path on each call.
+      bank_dtype: data type of the noise bank (float32 or float16).
+      rng:     Random number generator returned by
+               np.random.RandomState (optional)
+    """
+
+    def __init__(
+        self,
+        noise_type,
+        noise_path,
+        min_snr,
+        max_snr,
+        bank_path=None,
+        bank_dtype="float32",
+        random_seed=112358,
+        rng=None,
+    ):
+        super().__init__()
+        logging.info(
+            "init batch noise_augment with noise={} noise_path={} snr={}-{}".format(
+                noise_type, noise_path, min_snr, max_snr
+            )
+        )
+
+        self.noise_type = noise_type
+        if bank_path is None:
+            self.r = AR(noise_path)
+            self.bank = None
+            self.noise_keys = self.r.keys
+        else:
+            self.r = None
+            self.bank = WavBank.create_from_audio(noise_path, bank_path, bank_dtype)
+            self.noise_keys = self.bank.keys
+        self.min_snr = min_snr
+        self.max_snr = max_snr
+        # index and position of the noise segment left from the previous call
+        self.cache = None
+        self.cache_idx = None
+        self.cache_offset = 0
+        if rng is None:
+            self.rng = np.random.RandomState(seed=random_seed)
+        else:
+            self.rng = deepcopy(rng)
+
+    def get_extra_state(self):
+        state = super().get_extra_state()
+        if self.cache is not None:
+            state["cache"] = (self.cache_idx, self.cache_offset)
+        return state
+
+    def set_extra_state(self, state):
+        super().set_extra_state(state)
+        self.cache = None
+        if "cache" in state:
+            self.cache_idx, self.cache_offset = state["cache"]
+            self.cache = self._read_noise(self.cache_idx)[self.cache_offset :]
+
+    def _read_noise(self, noise_idx):
+        if self.bank is None:
+            key = self.noise_keys[noise_idx]
+            noise, fs = self.r.read([key])
+            return noise[0]
+
+        return self.bank.read(noise_idx)
+
+    def read_noise(self, num_samples):
+        """Reads a noise segment with num_samples samples, it continues
+        from the previous segment if there are samples left.
+        """
+        noise = []
+        n = 0
+        while n < num_samples:
+            if self.cache is None:
+                self.cache_idx = self.rng.randint(len(self.noise_keys))
+                self.cache_offset = 0
+                self.cache = self._read_noise(self.cache_idx)
+
+            need_samples = min(num_samples - n, self.cache.shape[0])
+            noise.append(self.cache[:need_samples])
+            n += need_samples
+            self.cache_offset += need_samples
+            if need_samples < self.cache.shape[0]:
+                self.cache = self.cache[need_samples:]
+            else:
+                self.cache = None
+
+        return np.concatenate(noise)
+
+    def sample_snr(self, num_snrs):
+        return self.rng.uniform(self.min_snr, self.max_snr, size=(num_snrs,))
+
+
+class BatchNoiseAugment(_RNGModule):
+    """Class to augment a batch of speech signals with additive noise
+    from multiple types, e.g., music, babble, ...
+    It will randomly choose which noise type to add to each signal.
+
+    Attributes:
+      noise_prob: probability of adding noise
+      noise_types: dictionary of options with one entry per noise-type,
+                  Each entry is also a dictiory with the following entries:
+                  weight, max_snr, min_snr, noise_path. The weight parameter
+                  is proportional to how often we want to sample a given noise
+                  type.
+      rng:     Random number generator returned by
+               np.random.RandomState (optional)
+    """
+
+    def __init__(self, noise_prob, noise_types, random_seed=112358, rng=None):
+        super().__init__()
+        logging.info("init batch noise augment")
+        self.noise_prob = noise_prob
+        assert isinstance(noise_types, dict)
+
+        augmenters = []
+        self.weights = np.zeros((len(noise_types),))
+        for count, (key, opts) in enumerate(noise_types.items()):
+            self.weights[count] = opts["weight"]
+            aug = BatchSingleNoiseAugment(
+                key,
+                opts["noise_path"],
+                opts["min_snr"],
+                opts["max_snr"],
+                bank_path=opts.get("bank_path", None),
+                bank_dtype=opts.get("bank_dtype", "float32"),
+                random_seed=random_seed,
+                rng=rng,
+            )
+            augmenters.append(aug)
+
+        self.weights /= np.sum(self.weights)
+        # ModuleList, so the generators of the augmenters go in the state_dict
+        self.augmenters = nn.ModuleList(augmenters)
+
+        if rng is None:
+            self.rng = np.random.RandomState(seed=random_seed)
+        else:
+            self.rng = deepcopy(rng)
+
+    @classmethod
+    def create(cls, cfg, random_seed=112358, rng=None):
+        """Creates a BatchNoiseAugment object from options dictionary or YAML file.
+
+        Args:
+          cfg: YAML file path or dictionary with noise options.
+          rng: Random number generator returned by
+               np.random.RandomState (optional)
+
+        Returns:
+          BatchNoiseAugment object
+        """
+        if isinstance(cfg, str):
+            with open(cfg, "r") as f:
+                cfg = yaml.load(f, Loader=yaml.FullLoader)
+
+        assert isinstance(cfg, dict), "wrong object type for cfg={}".format(cfg)
+
+        return cls(
+            noise_prob=cfg["noise_prob"],
+            noise_types=cfg["noise_types"],
+            random_seed=random_seed,
+            rng=rng,
+        )
+
+    def forward(self, x, x_lengths=None):
+        """Adds noise to the signals.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          x_lengths: number of valid samples of each signal (optional).
+
+        Returns:
+          Noisy signals.
+          Info dictionary with noise_type and snr of each signal.
+        """
+        batch_size, num_samples = x.shape
+        p = self.rng.random_sample(size=(batch_size,))
+        noise_idx = self.rng.choice(
+            len(self.weights), size=(batch_size,), p=self.weights
+        )
+        noise_idx[p > self.noise_prob] = -1
+
+        snr = np.full((batch_size,), 100.0)
+        noise_type = [None] * batch_size
+        noise = np.zeros((batch_size, num_samples), dtype=np.float32)
+        for k, aug in enumerate(self.augmenters):
+            idx = np.nonzero(noise_idx == k)[0]
+            if len(idx) == 0:
+                continue
+            snr[idx] = aug.sample_snr(len(idx))
+            for i in idx:
+                noise[i] = aug.read_noise(num_samples)
+                noise_type[i] = aug.noise_type
+
+        info = {
+            "noise_type": noise_type,
+            "snr": torch.as_tensor(snr, dtype=torch.float),
+        }
+        if np.all(noise_idx == -1):
+            return x, info
+
+        noise = torch.as_tensor(noise, device=x.device, dtype=x.dtype)
+        mask = None
+        if x_lengths is not None:
+            mask = seq_lengths_to_mask(x_lengths, num_samples, dtype=x.dtype)
+            noise = noise * mask
+
+        target_snr = torch.as_tensor(snr, device=x.device, dtype=x.dtype)
+        cur_snr = _power_db(x, mask) - _power_db(noise, mask)
+        scale = 10 ** ((cur_snr - target_snr) / 20)
+        scale[torch.as_tensor(noise_idx == -1, device=x.device)] = 0
+        return x + scale.unsqueeze(-1) * noise, info
+
+
+class BatchSingleReverbAugment(_RNGModule):
+    """Class to augment a batch of speech signals with reverberation
+    using RIR from a single type, e.g., small room, medium room, large room
+
+    Attributes:
+      rir_type: string label indicating the RIR type.
+      rir_path: Kaldi style rspecifier to Ark or H5 file containing RIRs
+      rir_norm: RIR normalization method between None, 'max' or 'energy'
+      comp_delay: compensate the delay introduced by the RIR if any,
+                  this delay will happen if the maximum of the RIR is not in
+                  its first sample.
+      preload_rirs: if True all RIRS are loaded into RAM
+      bank_path: directory of a memory-mapped RIR bank shared by all
+                 the processes, it is created if it doesn't exist.
+                 It overrides preload_rirs.
+      bank_dtype: data type of the RIR bank (float32 or float16).
+      rng:     Random number generator returned by
+               np.random.RandomState (optional)
+    """
+
+    def __init__(
+        self,
+        rir_type,
+        rir_path,
+        rir_norm=None,
+        comp_delay=True,
+        preload_rirs=True,
+        bank_path=None,
+        bank_dtype="float32",
+        random_seed=112358,
+        rng=None,
+    ):
+        super().__init__()
+        self.rir_type = rir_type
+        logging.info(
+            (
+                "init batch reverb_augment with RIR={} rir_path={} "
+                "rir_norm={} comp_delay={}"
+            ).format(rir_type, rir_path, rir_norm, comp_delay)
+        )
+        self.preload_rirs = preload_rirs or bank_path is not None
+        if self.preload_rirs:
+            # RIRs with precomputed peaks and energies
+            self.bank = WavBank.create_from_data(rir_path, bank_path, bank_dtype)
+            self.rir_keys = self.bank.keys
+            self.r = None
+        else:
+            self.bank = None
+            self.r = DRF.create(rir_path)
+            self.rir_keys = self.r.keys
+
+        if rir_norm is None:
+            self.rir_norm = RIRNormType.NONE
+        elif rir_norm == "max":
+            self.rir_norm = RIRNormType.MAX
+        elif rir_norm == "energy":
+            self.rir_norm = RIRNormType.ENERGY
+
+        self.comp_delay = comp_delay
+
+        if rng is None:
+            self.rng = np.random.RandomState(seed=random_seed)
+        else:
+            self.rng = deepcopy(rng)
+
+    def _norm_rir(self, h):
+        if self.rir_norm == RIRNormType.NONE:
+            return h
+        if self.rir_norm == RIRNormType.MAX:
+            idx = np.argmax(np.abs(h))
+            return h / h[idx]
+
+        return h / np.sum(h**2)
+
+    def _norm_scale(self, peak, energy):
+        if self.rir_norm == RIRNormType.NONE:
+            return np.ones_like(peak)
+        if self.rir_norm == RIRNormType.MAX:
+            return 1 / peak
+
+        return 1 / energy
+
+    def sample_rirs(self, num_rirs):
+        """Samples num_rirs normalized RIRs.
+
+        Returns:
+          List of RIRs, position of the maximum of each RIR,
+          value of the maximum of each normalized RIR and
+          scale that needs to be applied to the RIRs to normalize them.
+        """
+        rir_idx = self.rng.randint(len(self.rir_keys), size=(num_rirs,))
+        if self.bank is None:
+            h = self.r.read([self.rir_keys[i] for i in rir_idx])
+            h = [self._norm_rir(h_i) for h_i in h]
+            h_delay = np.array([np.argmax(np.abs(h_i)) for h_i in h])
+            h_max = np.array([h_i[d] for h_i, d in zip(h, h_delay)])
+            return h, h_delay, h_max, np.ones((num_rirs,))
+
+        h_delay = self.bank.peak_idx[rir_idx]
+        scale = self._norm_scale(self.bank.peak[rir_idx], self.bank.energy[rir_idx])
+        h_max = self.bank.peak[rir_idx] * scale
+        # the scale is applied after moving the RIRs to the device
+        h = [self.bank.read(i) for i in rir_idx]
+        return h, h_delay, h_max, scale
+
+
+class BatchReverbAugment(_RNGModule):
+    """Class to augment a batch of speech signals with reverberation
+    with RIRS from multiple types, e.g., small room, medium room, large room.
+    It will randomly choose which RIR type to add to each signal.
+    The convolutions are computed with batched FFTs in the device of the input.
+
+    Attributes:
+      reverb_prob: probability of adding reverberation
+      rir_types: dictionary of options with one entry per RIR-type,
+                  Each entry is also a dictiory with the following entries:
+                  weight, rir_norm, comp_delay, rir_path. The weight parameter
+                  is proportional to how often we want to sample a given RIR
+                  type.
+      max_reverb_context: number of samples required as left context
+                          for the convolution operation.
+      rng:     Random number generator returned by
+               np.random.RandomState (optional)
+    """
+
+    def __init__(
+        self,
+        reverb_prob,
+        rir_types,
+        max_reverb_context=0,
+        random_seed=112358,
+        rng=None,
+    ):
+        super().__init__()
+        logging.info("init batch reverb_augment")
+        self.reverb_prob = reverb_prob
+        assert isinstance(rir_types, dict)
+
+        augmenters = []
+        self.weights = np.zeros((len(rir_types),))
+        val_opts = (
+            "rir_path",
+            "rir_norm",
+            "comp_delay",
+            "preload_rirs",
+            "bank_path",
+            "bank_dtype",
+        )
+        for count, (key, opts) in enumerate(rir_types.items()):
+            self.weights[count] = opts["weight"]
+            opts_i = dict((k, opts[k]) for k in val_opts if k in opts)
+            aug = BatchSingleReverbAugment(
+                key, **opts_i, random_seed=random_seed, rng=rng
+            )
+            augmenters.append(aug)
+
+        self.max_reverb_context = max_reverb_context
+        self.weights /= np.sum(self.weights)
+        # ModuleList, so the generators of the augmenters go in the state_dict
+        self.augmenters = nn.ModuleList(augmenters)
+
+        if rng is None:
+            self.rng = np.random.RandomState(seed=random_seed)
+        else:
+            self.rng = deepcopy(rng)
+
+    @classmethod
+    def create(cls, cfg, random_seed=112358, rng=None):
+        """Creates a BatchReverbAugment object from options dictionary or YAML file.
+
+        Args:
+          cfg: YAML file path or dictionary with reverb options.
+          rng: Random number generator returned by
+               np.random.RandomState (optional)
+
+        Returns:
+          BatchReverbAugment object
+        """
+        if isinstance(cfg, str):
+            with open(cfg, "r") as f:
+                cfg = yaml.load(f, Loader=yaml.FullLoader)
+
+        assert isinstance(cfg, dict), "wrong object type for cfg={}".format(cfg)
+
+        return cls(
+            reverb_prob=cfg["reverb_prob"],
+            rir_types=cfg["rir_types"],
+            max_reverb_context=cfg.get("max_reverb_context", 0),
+            random_seed=random_seed,
+            rng=rng,
+        )
+
+    @staticmethod
+    def sdr(x, y, scale, delay, mask=None):
+        """Batched signal-to-reverberation ratio, see SingleReverbAugment.sdr"""
+        return _sdr(x, y, scale, delay, mask)
+
+    @staticmethod
+    def convolve(x, h):
+        """Convolves each signal with its RIR using FFTs.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          h: RIRs with shape=(batch, rir_length).
+
+        Returns:
+          Signals with shape=(batch, num_samples + rir_length - 1).
+        """
+        num_samples = x.size(-1) + h.size(-1) - 1
+        nfft = 2 ** int(math.ceil(math.log2(num_samples)))
+        X = torch.fft.rfft(x, n=nfft)
+        H = torch.fft.rfft(h, n=nfft)
+        return torch.fft.irfft(X * H, n=nfft)[:, :num_samples]
+
+    def forward(self, x, x_lengths=None):
+        """Adds reverberation to the signals.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          x_lengths: number of valid samples of each signal (optional).
+
+        Returns:
+          Reverberated signals with the same shape as the input.
+          Info dictionary with rir_type, srr, h_max and h_delay of each signal.
+        """
+        batch_size, num_samples = x.shape
+        p = self.rng.random_sample(size=(batch_size,))
+        rir_idx = self.rng.choice(
+            len(self.weights), size=(batch_size,), p=self.weights
+        )
+        rir_idx[p > self.reverb_prob] = -1
+
+        rir_type = [None] * batch_size
+        srr = torch.full((batch_size,), 100.0)
+        h_max = torch.ones((batch_size,))
+        h_delay = torch.zeros((batch_size,), dtype=torch.long)
+        info = {"rir_type": rir_type, "srr": srr, "h_max": h_max, "h_delay": h_delay}
+        idx = np.nonzero(rir_idx >= 0)[0]
+        if len(idx) == 0:
+            return x, info
+
+        h = [None] * batch_size
+        comp_delay = np.zeros((batch_size,), dtype=bool)
+        delay = np.zeros((batch_size,), dtype=np.int64)
+        scale = np.ones((batch_size,))
+        norm_scale = np.ones((batch_size,))
+        for k, aug in enumerate(self.augmenters):
+            idx_k = np.nonzero(rir_idx == k)[0]
+            if len(idx_k) == 0:
+                continue
+            h_k, delay[idx_k], scale[idx_k], norm_scale[idx_k] = aug.sample_rirs(
+                len(idx_k)
+            )
+            for i, h_i in zip(idx_k, h_k):
+                h[i] = h_i
+                rir_type[i] = aug.rir_type
+                comp_delay[i] = aug.comp_delay
+
+        h = [h[i] for i in idx]
+        delay = delay[idx]
+        scale = scale[idx]
+        max_length = max(h_i.shape[0] for h_i in h)
+        h_pad = np.zeros((len(h), max_length), dtype=np.float32)
+        for i, h_i in enumerate(h):
+            h_pad[i, : h_i.shape[0]] = h_i
+
+        idx_t = torch.as_tensor(idx, device=x.device)
+        mask = None
+        if x_lengths is not None:
+            mask = seq_lengths_to_mask(x_lengths[idx_t], num_samples, dtype=x.dtype)
+
+        h_pad = torch.as_tensor(h_pad, device=x.device, dtype=x.dtype)
+        h_pad = h_pad * torch.as_tensor(
+            norm_scale[idx], device=x.device, dtype=x.dtype
+        ).unsqueeze(-1)
+        delay_t = torch.as_tensor(delay, device=x.device)
+        scale_t = torch.as_tensor(scale, device=x.device, dtype=x.dtype)
+        x_idx = x[idx_t] if mask is None else x[idx_t] * mask
+        y = self.convolve(x_idx, h_pad)
+        y_comp = _shift_left(y, delay_t)[:, :num_samples]
+        srr[idx] = self.sdr(
+            x_idx, y_comp, scale_t, torch.zeros_like(delay_t), mask
+        ).cpu().to(srr.dtype)
+
+        comp_delay_t = torch.as_tensor(comp_delay[idx], device=x.device).unsqueeze(-1)
+        y = torch.where(comp_delay_t, y_comp, y[:, :num_samples])
+        if mask is not None:
+            y = y * mask
+
+        x = x.clone()
+        x[idx_t] = y
+        h_max[idx] = torch.as_tensor(scale, dtype=h_max.dtype)
+        h_delay[idx] = torch.as_tensor(np.where(comp_delay[idx], 0, delay))
+        return x, info
+
+
+class BatchSpeechAugment(nn.Module):
+    """Class to add speed perturbation, reverberation and noise
+    to a batch of signals after collation, e.g., in the GPU.
+    It uses the same configuration format as hyperion.augment.SpeechAugment.
+
+    Attributes:
+       speed_aug: BatchSpeedAugment object
+       reverb_aug: BatchReverbAugment object
+       noise_aug: BatchNoiseAugment object
+    """
+
+    def __init__(self, speed_aug=None, reverb_aug=None, noise_aug=None):
+        super().__init__()
+        self.speed_aug = speed_aug
+        self.reverb_aug = reverb_aug
+        self.noise_aug = noise_aug
+
+    @classmethod
+    def create(cls, cfg, random_seed=112358, rng=None):
+        if isinstance(cfg, str):
+            with open(cfg, "r") as f:
+                cfg = yaml.load(f, Loader=yaml.FullLoader)
+
+        assert isinstance(cfg, dict), "wrong object type for cfg={}".format(cfg)
+
+        speed_aug = None
+        if "speed_aug" in cfg:
+            speed_aug = BatchSpeedAugment.create(
+                cfg["speed_aug"], random_seed=random_seed, rng=rng
+            )
+
+        reverb_aug = None
+        if "reverb_aug" in cfg:
+            reverb_aug = BatchReverbAugment.create(
+                cfg["reverb_aug"], random_seed=random_seed, rng=rng
+            )
+
+        noise_aug = None
+        if "noise_aug" in cfg:
+            noise_aug = BatchNoiseAugment.create(
+                cfg["noise_aug"], random_seed=random_seed, rng=rng
+            )
+
+        return cls(speed_aug=speed_aug, reverb_aug=reverb_aug, noise_aug=noise_aug)
+
+    @property
+    def max_reverb_context(self):
+        if self.reverb_aug is None:
+            return 0
+
+        return self.reverb_aug.max_reverb_context
+
+    @staticmethod
+    def is_augmented(info):
+        """Returns a boolean tensor indicating which signals
+        were modified, from the info dictionary returned by forward."""
+        rir_type = info["reverb"]["rir_type"]
+        noise_type = info["noise"]["noise_type"]
+        augmented = torch.as_tensor(
+            [r is not None or n is not None for r, n in zip(rir_type, noise_type)]
+        )
+        if "speed" in info:
+            augmented |= info["speed"]["speed_ratio"] != 1
+
+        return augmented
+
+    def forward(self, x, x_lengths=None):
+        """Augments a batch of signals.
+
+        Args:
+          x: signals with shape=(batch, num_samples).
+          x_lengths: number of valid samples of each signal (optional).
+
+        Returns:
+          Augmented signals.
+          Info dictionary with entries speed, reverb, noise and sdr,
+          each entry contains a tensor or list with one element per signal.
+          Number of valid samples of the augmented signals (if x_lengths is not None).
+        """
+        batch_size = x.size(0)
+        info = {}
+        if self.speed_aug is not None:
+            if x_lengths is None:
+                x, speed_info = self.speed_aug(x)
+            else:
+                x, speed_info, x_lengths = self.speed_aug(x, x_lengths)
+            info["speed"] = speed_info
+
+        x_speed = x
+
+        if self.reverb_aug is not None:
+            x, reverb_info = self.reverb_aug(x, x_lengths)
+            info["reverb"] = reverb_info
+        else:
+            info["reverb"] = {
+                "rir_type": [None] * batch_size,
+                "srr": torch.full((batch_size,), 100.0),
+                "h_max": torch.ones((batch_size,)),
+                "h_delay": torch.zeros((batch_size,), dtype=torch.long),
+            }
+
+        if self.noise_aug is not None:
+            x, noise_info = self.noise_aug(x, x_lengths)
+            info["noise"] = noise_info
+        else:
+            info["noise"] = {
+                "noise_type": [None] * batch_size,
+                "snr": torch.full((batch_size,), 100.0),
+            }
+
+        if self.noise_aug is None:
+            info["sdr"] = info["reverb"]["srr"]
+        elif self.reverb_aug is None:
+            info["sdr"] = info["noise"]["snr"]
+        else:
+            # we calculate SNR(dB) of the combined reverb + noise
+            mask = None
+            if x_lengths is not None:
+                mask = seq_lengths_to_mask(x_lengths, x.size(-1), dtype=x.dtype)
+            scale = info["reverb"]["h_max"].to(device=x.device, dtype=x.dtype)
+            delay = info["reverb"]["h_delay"].to(device=x.device)
+            info["sdr"] = self.reverb_aug.sdr(x_speed, x, scale, delay, mask).cpu()
+
+        if x_lengths is None:
+            return x, info
+
+        return x, info, x_lengths
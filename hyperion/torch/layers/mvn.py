@@ -7,6 +7,8 @@ from jsonargparse import ArgumentParser, ActionParser
 import torch
 import torch.nn as nn
 
+from ..utils.misc import seq_lengths_to_mask
+
 
 class MeanVarianceNorm(nn.Module):
     def __init__(self,
@@ -32,7 +34,20 @@ class MeanVarianceNorm(nn.Module):
             self.left_context, self.right_context, self.dim)
         return s
 
-    def forward(self, x):
+    def forward(self, x, x_lengths=None):
+        """Normalizes the features.
+
+        Args:
+          x: features with shape=(batch, time, feat_dim) if dim=1.
+          x_lengths: number of valid frames of each sequence, if None
+             all frames are valid. Padding frames are ignored when computing
+             the statistics and set to zero in the output.
+
+        Returns:
+          Normalized features.
+        """
+        if x_lengths is not None:
+            return self.normalize_masked(x, x_lengths)
 
         T = x.shape[self.dim]
         if (self.left_context == 0 and self.right_context
@@ -92,6 +107,84 @@ class MeanVarianceNorm(nn.Module):
 
         return x.contiguous()
 
+    def normalize_masked(self, x, x_lengths):
+        """Normalizes a batch of padded sequences.
+        The result for each sequence is the same as normalizing
+        the sequence without padding.
+        """
+        if self.dim != 1:
+            x = x.transpose(self.dim, 1)
+
+        T = x.size(1)
+        mask = seq_lengths_to_mask(x_lengths, T, dtype=x.dtype)
+        mask = mask.view(mask.shape + (1, ) * (x.dim() - 2))
+        n = x_lengths.to(x.dtype).clamp(min=1).view((-1, ) + (1, ) *
+                                                   (x.dim() - 1))
+
+        # global mean/var norm.
+        x = x * mask
+        m_x = torch.sum(x, dim=1, keepdim=True) / n
+        if self.norm_mean:
+            x = (x - m_x) * mask
+
+        y = x
+        if self.norm_var:
+            d_x = x if self.norm_mean else (x - m_x) * mask
+            s_x = torch.sqrt(
+                torch.sum(d_x**2, dim=1, keepdim=True) /
+                (n - 1).clamp(min=1)).clamp(min=1e-5)
+            y = x / s_x
+
+        total_context = self.left_context + self.right_context + 1
+        if total_context > 1:
+            # short-time norm. for the sequences longer than the context
+            use_st = x_lengths > total_context
+            # when tracing, the branch has to be kept for any input length
+            if torch.jit.is_tracing() or torch.any(use_st):
+                y_st = self._normalize_cumsum_masked(x, x_lengths,
+                                                     total_context)
+                use_st = use_st.view((-1, ) + (1, ) * (x.dim() - 1))
+                y = torch.where(use_st, y_st, y)
+
+        y = y * mask
+        if self.dim != 1:
+            y = y.transpose(self.dim, 1)
+
+        return y.contiguous()
+
+    def _normalize_cumsum_masked(self, x, x_lengths, total_context):
+        # reflects each sequence at its own end to reproduce
+        # the padding used by normalize_cumsum
+        T = x.size(1)
+        t = torch.arange(-self.left_context,
+                         T + self.right_context,
+                         device=x.device).unsqueeze(0)
+        last = (x_lengths.to(x.device) - 1).unsqueeze(1)
+        idx = t.abs()
+        idx = torch.where(idx > last, 2 * last - idx, idx).clamp(0, T - 1)
+        idx = idx.view(idx.shape + (1, ) * (x.dim() - 2)).expand(
+            (-1, -1) + x.shape[2:])
+        xx = torch.gather(x, 1, idx)
+
+        if self.norm_mean:
+            c_x = torch.cumsum(xx, dim=1)
+            m_x = (c_x[:, total_context - 1:] -
+                   c_x[:, :-total_context + 1]) / total_context
+            x = x - m_x
+
+        if self.norm_var:
+            c_x = torch.cumsum(xx**2, dim=1)
+            m_x2 = (c_x[:, total_context - 1:] -
+                    c_x[:, :-total_context + 1]) / total_context
+            if not self.norm_mean:
+                c_x = torch.cumsum(xx, dim=1)
+                m_x = (c_x[:, total_context - 1:] -
+                       c_x[:, :-total_context + 1]) / total_context
+            s_x = torch.sqrt((m_x2 - m_x**2).clamp(min=1e-5))
+            x = x / s_x
+
+        return x
+
     @staticmethod
     def filter_args(**kwargs):
         """Filters ST-CMVN args from arguments dictionary.
@@ -0,0 +1,448 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import logging
+import math
+
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+import torch.cuda.amp as amp
+
+from .margin_losses import _l2_norm
+
+
+class _AllGather(torch.autograd.Function):
+    """All-gather along the first dimension with gradient.
+    The gradient of the input of each rank is the sum of
+    the gradients of its copies in all the ranks.
+    """
+
+    @staticmethod
+    def forward(ctx, x):
+        ctx.rank = dist.get_rank()
+        ctx.batch_size = x.shape[0]
+        xs = [torch.empty_like(x) for _ in range(dist.get_world_size())]
+        dist.all_gather(xs, x.contiguous())
+        return torch.cat(xs, dim=0)
+
+    @staticmethod
+    def backward(ctx, grad):
+        # we use all_reduce instead of reduce_scatter
+        # since it is supported by all the backends
+        grad = grad.clone()
+        dist.all_reduce(grad)
+        first = ctx.rank * ctx.batch_size
+        return grad[first : first + ctx.batch_size]
+
+
+def _all_gather_nograd(x):
+    xs = [torch.empty_like(x) for _ in range(dist.get_world_size())]
+    dist.all_gather(xs, x.contiguous())
+    return torch.cat(xs, dim=0)
+
+
+class PartialFCLossOutput(nn.Module):
+    """Base class for margin softmax output layers with Partial-FC
+
+    X. An et al., "Partial FC: Training 10 Million Identities on a Single Machine,"
+    ICCV Workshops 2021.
+
+    In training, the logits are only computed for a subset of the classes:
+    the classes present in the batch (positives) plus randomly sampled
+    negative classes. The logits of the rest of classes are set to a large
+    negative value, so they don't contribute to the cross-entropy and
+    the layer can be used as a replacement of the full margin softmax layers.
+
+    In distributed training, the class kernel is sharded across ranks.
+    Each rank samples classes of its shard and computes their logits for the
+    examples of all the ranks. The kernel shards are not synchronized by DDP,
+    the trainer has to call consolidate_state_dict() in all the ranks before
+    calling state_dict() to get the full kernel.
+
+    Attributes:
+      in_feats: input feature dimension.
+      num_classes: number of classes.
+      num_subcenters: number of subcenters per class.
+      s: scale.
+      margin: margin.
+      margin_warmup_epochs: number of epochs to anneal the margin from 0 to margin.
+      sample_rate: ratio of classes sampled in each step, the positive classes
+                   are always sampled.
+    """
+
+    def __init__(
+        self,
+        in_feats,
+        num_classes,
+        num_subcenters=1,
+        s=64,
+        margin=0.3,
+        margin_warmup_epochs=0,
+        sample_rate=0.1,
+    ):
+        super().__init__()
+        self.in_feats = in_feats
+        self.num_classes = num_classes
+        self.num_subcenters = num_subcenters
+        self.s = s
+        self.margin = margin
+        self.margin_warmup_epochs = margin_warmup_epochs
+        self.sample_rate = sample_rate
+        if margin_warmup_epochs == 0:
+            self.cur_margin = margin
+        else:
+            self.cur_margin = 0
+
+        self._compute_aux()
+
+        self.rank = 0
+        self.world_size = 1
+        if dist.is_available() and dist.is_initialized():
+            self.rank = dist.get_rank()
+            self.world_size = dist.get_world_size()
+
+        # all the shards have the same number of classes,
+        # the last shard is padded with classes that are never sampled
+        self.shard_size = int(math.ceil(num_classes / self.world_size))
+        self.class_offset = self.rank * self.shard_size
+        self.num_shard_classes = max(
+            min(self.shard_size, num_classes - self.class_offset), 0
+        )
+        self.kernel = nn.Parameter(
+            torch.Tensor(in_feats, self.shard_size * num_subcenters)
+        )
+        self.kernel.data.uniform_(-1, 1).renorm_(2, 1, 1e-5).mul_(1e5)
+        self._full_kernel = None
+        if self.is_sharded:
+            # DDP doesn't average the gradients of the shard,
+            # we average them here to match non-sharded training
+            self.kernel.is_sharded = True
+            self.kernel.shard_dim = 1
+            self.kernel.register_hook(self._average_shard_grad)
+            self._register_state_dict_hook(self._state_dict_hook)
+            self._register_load_state_dict_pre_hook(self._load_state_dict_pre_hook)
+
+    @property
+    def is_sharded(self):
+        return self.world_size > 1
+
+    def _average_shard_grad(self, grad):
+        return grad / self.world_size
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        s = (
+            "%s(in_feats=%d, num_classes=%d, num_subcenters=%d, s=%.2f, margin=%.2f, "
+            "margin_warmup_epochs=%d, sample_rate=%.2f, world_size=%d)"
+        ) % (
+            self.__class__.__name__,
+            self.in_feats,
+            self.num_classes,
+            self.num_subcenters,
+            self.s,
+            self.margin,
+            self.margin_warmup_epochs,
+            self.sample_rate,
+            self.world_size,
+        )
+        return s
+
+    def _compute_aux(self):
+        pass
+
+    def update_margin(self, epoch):
+
+        if self.margin_warmup_epochs == 0:
+            return
+
+        if epoch < self.margin_warmup_epochs:
+            self.cur_margin = self.margin * epoch / self.margin_warmup_epochs
+        else:
+            if self.cur_margin != self.margin:
+                self.cur_margin = self.margin
+            else:
+                return
+
+        logging.info(
+            "updating %s margin=%.2f" % (self.__class__.__name__, self.cur_margin)
+        )
+        self._compute_aux()
+
+    def _add_margin(self, cos_theta, pos):
+        """Adds the margin to the logits of the positive classes.
+
+        Args:
+          cos_theta: cosine scores (batch, num_sampled_classes)
+          pos: boolean tensor with the positive classes (batch, num_sampled_classes)
+        """
+        raise NotImplementedError()
+
+    def _sample_classes(self, y=None):
+        """Samples classes of the local shard.
+
+        Args:
+          y: class labels of the examples of all the ranks,
+             if None, it returns all the classes.
+
+        Returns:
+          Indices of the sampled classes in the shard.
+        """
+        device = self.kernel.device
+        if y is None or self.sample_rate >= 1:
+            return torch.arange(self.shard_size, device=device)
+
+        y = y - self.class_offset
+        y = y[(y >= 0) & (y < self.num_shard_classes)]
+        # positives get the highest score, padding classes the lowest
+        scores = torch.rand(self.shard_size, device=device)
+        scores[self.num_shard_classes :] = -1
+        scores[y] = 2
+        num_pos = int(torch.sum(scores == 2).item())
+        num_sampled = max(
+            int(math.ceil(self.sample_rate * self.num_shard_classes)), num_pos
+        )
+        if self.is_sharded:
+            # all the shards sample the same number of classes
+            num_sampled = torch.as_tensor(num_sampled, device=device)
+            dist.all_reduce(num_sampled, op=dist.ReduceOp.MAX)
+            num_sampled = int(num_sampled.item())
+
+        return torch.topk(scores, num_sampled, sorted=False)[1]
+
+    def _class_ids(self, idx):
+        """Global class ids of the sampled classes, -1 for padding classes."""
+        ids = idx + self.class_offset
+        ids[idx >= self.num_shard_classes] = -1
+        return ids
+
+    def _cos_theta(self, x, idx):
+        """Cosine scores between the normalized embeddings and
+        the sampled class centers."""
+        kernel = self.kernel.view(self.in_feats, self.shard_size, self.num_subcenters)
+        kernel = kernel[:, idx].reshape(self.in_feats, -1)
+        kernel_norm = _l2_norm(kernel, axis=0)
+        cos_theta = torch.mm(x, kernel_norm).float()
+        if self.num_subcenters > 1:
+            cos_theta = torch.max(
+                cos_theta.view(-1, len(idx), self.num_subcenters), dim=-1
+            )[0]
+
+        return cos_theta.clamp(-1, 1)  # for numerical stability
+
+    def _sharded_cos_theta(self, x, y=None):
+        """Computes the cosine scores of the local examples versus the
+        classes sampled in all the shards."""
+        batch_size = x.shape[0]
+        batch_sizes = _all_gather_nograd(
+            torch.as_tensor([batch_size], device=x.device)
+        )
+        max_batch_size = int(torch.max(batch_sizes).item())
+        pad = max_batch_size - batch_size
+        if pad > 0:
+            x = torch.cat((x, x.new_zeros((pad, x.shape[1]))), dim=0)
+
+        x = _AllGather.apply(x)
+        if y is not None:
+            if pad > 0:
+                y = torch.cat((y, y.new_full((pad,), -1)), dim=0)
+            y = _all_gather_nograd(y)
+            y = y[y >= 0]
+
+        idx = self._sample_classes(y)
+        # (world_size * max_batch_size, num_sampled)
+        cos_theta = self._cos_theta(x, idx)
+        num_sampled = cos_theta.shape[1]
+        # every rank keeps the scores of its examples versus the classes
+        # sampled in all the shards
+        cos_theta = _AllGather.apply(cos_theta).view(
+            self.world_size, self.world_size, max_batch_size, num_sampled
+        )
+        cos_theta = cos_theta[:, self.rank, :batch_size]
+        cos_theta = cos_theta.transpose(0, 1).reshape(batch_size, -1)
+        class_ids = _all_gather_nograd(self._class_ids(idx))
+        return cos_theta, class_ids
+
+    def _scatter_output(self, output, class_ids):
+        """Puts the logits of the sampled classes in a tensor with
+        the logits of all the classes."""
+        if len(class_ids) == self.num_classes:
+            # all the classes were sampled
+            return output
+
+        valid = class_ids >= 0
+        if not torch.all(valid):
+            class_ids = class_ids[valid]
+            output = output[:, valid]
+            if len(class_ids) == self.num_classes:
+                return output
+
+        full_output = output.new_full((output.shape[0], self.num_classes), -1e4)
+        return full_output.index_copy(1, class_ids, output)
+
+    def forward(self, x, y=None):
+        with amp.autocast(enabled=False):
+            x = _l2_norm(x.float())
+            if not self.training:
+                y = None
+
+            if self.is_sharded:
+                cos_theta, class_ids = self._sharded_cos_theta(x, y)
+            else:
+                idx = self._sample_classes(y)
+                cos_theta = self._cos_theta(x, idx)
+                class_ids = self._class_ids(idx)
+
+            if y is not None:
+                pos = class_ids[None, :] == y[:, None]
+                output = self._add_margin(cos_theta, pos)
+            else:
+                output = cos_theta
+
+            output = output * self.s  # scale up in order to make softmax work
+            return self._scatter_output(output, class_ids)
+
+    def consolidate_state_dict(self, recipient_rank=0):
+        """Gathers the kernel shards of all the ranks, so the next call
+        to state_dict() returns the full kernel.
+        It has to be called by all the ranks.
+
+        Args:
+          recipient_rank: rank that keeps the full kernel,
+                          if None, all the ranks keep it.
+        """
+        if not self.is_sharded:
+            return
+
+        shards = [torch.empty_like(self.kernel.data) for _ in range(self.world_size)]
+        dist.all_gather(shards, self.kernel.data.contiguous())
+        if recipient_rank is None or recipient_rank == self.rank:
+            self._full_kernel = torch.cat(shards, dim=1)[
+                :, : self.num_classes * self.num_subcenters
+            ]
+
+    @staticmethod
+    def _state_dict_hook(module, state_dict, prefix, local_metadata):
+        if module._full_kernel is None:
+            logging.warning(
+                "state_dict of %s only contains the kernel shard of rank %d"
+                % (module.__class__.__name__, module.rank)
+            )
+            return
+
+        state_dict[prefix + "kernel"] = module._full_kernel
+        module._full_kernel = None
+
+    def _load_state_dict_pre_hook(
+        self,
+        state_dict,
+        prefix,
+        local_metadata,
+        strict,
+        missing_keys,
+        unexpected_keys,
+        error_msgs,
+    ):
+        key = prefix + "kernel"
+        if key not in state_dict:
+            return
+
+        kernel = state_dict[key]
+        if kernel.shape[1] != self.num_classes * self.num_subcenters:
+            return
+
+        # we take the shard of this rank from the full kernel
+        first = self.class_offset * self.num_subcenters
+        last = first + self.num_shard_classes * self.num_subcenters
+        shard = kernel.new_zeros((kernel.shape[0], self.kernel.shape[1]))
+        shard[:, : last - first] = kernel[:, first:last]
+        state_dict[key] = shard
+
+
+class PartialFCArcLossOutput(PartialFCLossOutput):
+    """Additive angular margin softmax (ArcFace) with Partial-FC."""
+
+    def __init__(
+        self,
+        in_feats,
+        num_classes,
+        s=64,
+        margin=0.3,
+        margin_warmup_epochs=0,
+        sample_rate=0.1,
+    ):
+        super().__init__(
+            in_feats,
+            num_classes,
+            num_subcenters=1,
+            s=s,
+            margin=margin,
+            margin_warmup_epochs=margin_warmup_epochs,
+            sample_rate=sample_rate,
+        )
+
+    def _compute_aux(self):
+        self.cos_m = math.cos(self.cur_margin)
+        self.sin_m = math.sin(self.cur_margin)
+
+    def _add_margin(self, cos_theta, pos):
+        cos_theta_2 = torch.pow(cos_theta, 2)
+        sin_theta_2 = (1 + 1e-10) - cos_theta_2
+        sin_theta = torch.sqrt(sin_theta_2)
+        cos_theta_m = cos_theta * self.cos_m - sin_theta * self.sin_m
+        return torch.where(pos, cos_theta_m, cos_theta)
+
+
+class PartialFCCosLossOutput(PartialFCLossOutput):
+    """Additive margin softmax (CosFace) with Partial-FC."""
+
+    def __init__(
+        self,
+        in_feats,
+        num_classes,
+        s=64,
+        margin=0.3,
+        margin_warmup_epochs=0,
+        sample_rate=0.1,
+    ):
+        super().__init__(
+            in_feats,
+            num_classes,
+            num_subcenters=1,
+            s=s,
+            margin=margin,
+            margin_warmup_epochs=margin_warmup_epochs,
+            sample_rate=sample_rate,
+        )
+
+    def _add_margin(self, cos_theta, pos):
+        return torch.where(pos, cos_theta - self.cur_margin, cos_theta)
+
+
+class PartialFCSubCenterArcLossOutput(PartialFCArcLossOutput):
+    """Sub-center additive angular margin softmax with Partial-FC."""
+
+    def __init__(
+        self,
+        in_feats,
+        num_classes,
+        num_subcenters=2,
+        s=64,
+        margin=0.3,
+        margin_warmup_epochs=0,
+        sample_rate=0.1,
+    ):
+        PartialFCLossOutput.__init__(
+            self,
+            in_feats,
+            num_classes,
+            num_subcenters=num_subcenters,
+            s=s,
+            margin=margin,
+            margin_warmup_epochs=margin_warmup_epochs,
+            sample_rate=sample_rate,
+        )
@@ -61,11 +61,13 @@ class AxisMasker(nn.Module):
         )
         return s
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
         """Apply mask along time or freq dimension
 
         Args:
            x: spectrogram (batch, *, time, freq)
+           lengths: length ratios in (0, 1] along the masked dimension,
+                    the masks are placed inside the valid part of each sequence.
 
         Returns:
            Masked spectrogram (batch, *, time, freq)
@@ -77,28 +79,49 @@ class AxisMasker(nn.Module):
         ndim = x.dim()
         if ndim > 3:
             x = x.view(-1, x.shape[-2], x.shape[-1])
+            if lengths is not None:
+                lengths = lengths.repeat_interleave(x.shape[0] // in_shape[0])
 
         batch_size = x.shape[0]
         masked_dim_length = x.shape[self.dim]
-        # select how many masks
+        max_num_masks = self.max_num_masks
+        # select how many masks for each example
+        # (batch, 1)
         num_masks = torch.randint(
-            self.min_num_masks, self.max_num_masks + 1, size=(1,), device=x.device
-        )[0]
-        # (batch, num_mask, 1)
+            self.min_num_masks,
+            max_num_masks + 1,
+            size=(batch_size, 1),
+            device=x.device,
+        )
+        # (batch, max_num_mask)
+        mask_valid = torch.arange(max_num_masks, device=x.device) < num_masks
+        # (batch, 1)
+        if lengths is None:
+            valid_length = torch.full(
+                (batch_size, 1), masked_dim_length, device=x.device
+            )
+        else:
+            valid_length = (lengths * masked_dim_length).long().unsqueeze(-1)
+            valid_length = valid_length.clamp(1, masked_dim_length)
+
+        # (batch, max_num_mask)
         widths = torch.randint(
             self.min_width,
             self.max_width + 1,
-            size=(batch_size, num_masks),
+            size=(batch_size, max_num_masks),
             device=x.device,
-        ).unsqueeze(-1)
+        )
+        widths = torch.minimum(widths, valid_length) * mask_valid
 
-        max_start_pos = masked_dim_length - torch.max(widths) + 1
-        # (batch, num_mask, 1)
-        start_pos = torch.randint(
-            0, max_start_pos, size=(batch_size, num_masks), device=x.device
-        ).unsqueeze(-1)
+        # (batch, max_num_mask)
+        max_start_pos = valid_length - widths + 1
+        start_pos = (
+            torch.rand((batch_size, max_num_masks), device=x.device) * max_start_pos
+        ).long()
         # (1, 1, masked_dim_length)
         ref = torch.arange(masked_dim_length, device=x.device).view(1, 1, -1)
+        start_pos = start_pos.unsqueeze(-1)
+        widths = widths.unsqueeze(-1)
         # (batch, num_mask, mask_dim_length)
         mask = (start_pos <= ref) * (ref < (start_pos + widths))
         # (batch, mask_dim_length)
@@ -129,6 +152,12 @@ class SpecWarper(nn.Module):
         self.window = window
         self.mode = mode
         self.dim = dim
+        # all examples are warped with a single grid_sample call,
+        # which only supports these modes
+        if mode in ["linear", "bilinear", "trilinear"]:
+            self.grid_mode = "bilinear"
+        else:
+            self.grid_mode = mode
 
     def __repr__(self):
         s = ("{}(window={}, mode={}, dim={}").format(
@@ -136,6 +165,22 @@ class SpecWarper(nn.Module):
         )
         return s
 
+    def _get_warp_points(self, valid_length):
+        """Samples the warping center and its warped position
+        for each example.
+        """
+        batch_size = valid_length.shape[0]
+        device = valid_length.device
+        r = torch.rand((2, batch_size), device=device)
+        # sequences shorter than the warping window are not warped
+        can_warp = valid_length > 2 * self.window
+        center = self.window + (r[0] * (valid_length - 2 * self.window)).long()
+        warped = center - self.window + (r[1] * 2 * self.window).long() + 1
+        no_warp = torch.div(valid_length, 2, rounding_mode="floor")
+        center = torch.where(can_warp, center, no_warp).clamp(min=1)
+        warped = torch.where(can_warp, warped, no_warp).clamp(min=1)
+        return center, warped
+
     def forward(self, x, lengths=None):
         """warps x along time or freq dimension
 
@@ -162,40 +207,55 @@ class SpecWarper(nn.Module):
         if dim == -1:
             x = x.transpose(-1, -2)
 
-        # to make it batcheable we are going to warp
-        # the first n frames where n is the length of the
-        # shortest utterance
-        # the end of the utterance will not be warped
+        batch_size, _, num_rows, num_cols = x.shape
+        # each example is warped inside its valid length,
+        # the padding is not warped
         if dim == -1 or lengths is None:
-            warp_length = x.shape[-2]
+            valid_length = torch.full((batch_size,), num_rows, device=x.device)
         else:
-            warp_length = int(x.shape[-2] * torch.min(lengths))
-
-        center = torch.randint(self.window, warp_length - self.window, (1,))[0]
-        warped = torch.randint(center - self.window, center + self.window, (1,))[0] + 1
-
-        # (batch, C, warped, freq)
-        left = nnf.interpolate(
-            x[:, :, :center], (warped, x.shape[3]), mode=self.mode, align_corners=False
-        )
-        # (batch, C, time - warped, Freq)
-        right = torch.nn.functional.interpolate(
-            x[:, :, center:warp_length],
-            (warp_length - warped, x.shape[3]),
-            mode=self.mode,
+            valid_length = (lengths * num_rows).long().clamp(1, num_rows)
+
+        # (batch, 1)
+        center, warped = [p.unsqueeze(-1) for p in self._get_warp_points(valid_length)]
+        valid_length = valid_length.unsqueeze(-1)
+        # (1, rows)
+        t = torch.arange(num_rows, device=x.device, dtype=x.dtype).unsqueeze(0) + 0.5
+        # piece-wise linear map from output to input positions,
+        # [0, warped) -> [0, center) and [warped, length) -> [center, length)
+        t_left = t * center / warped
+        t_right = center + (t - warped) * (valid_length - center) / (
+            valid_length - warped
+        ).clamp(min=1)
+        t_in = torch.where(t < warped, t_left, t_right)
+        # (batch, 1, rows, 1)
+        is_valid = (t < valid_length).view(batch_size, 1, num_rows, 1)
+
+        # we only warp the rows, so we move the columns to the channel
+        # dimension and sample a (rows x 1) grid, this is
+        # cheaper than sampling a 2D grid.
+        # (batch, C * cols, rows, 1)
+        x_in = x
+        x = x.permute(0, 1, 3, 2).reshape(batch_size, -1, num_rows, 1)
+        # grid in normalized coordinates (batch, rows, 1, 2),
+        # last dim is (col, row)
+        grid_rows = 2 * t_in / num_rows - 1
+        grid = torch.stack((torch.zeros_like(grid_rows), grid_rows), dim=-1)
+        x = nnf.grid_sample(
+            x,
+            grid.unsqueeze(2),
+            mode=self.grid_mode,
+            padding_mode="border",
             align_corners=False,
         )
-
-        if warp_length != x.shape[-2]:
-            right_nowarp = x[:, :, warp_length:]
-            x = torch.cat([left, right, right_nowarp], dim=-2)
-        else:
-            x = torch.cat([left, right], dim=-2)
+        x = x.view(batch_size, -1, num_cols, num_rows).transpose(-1, -2)
+        # the padding is copied from the input, since grid_sample
+        # doesn't return the exact input values
+        x = torch.where(is_valid, x, x_in)
 
         if dim == -1:
             x = x.transpose(-1, -2)
 
-        x = x.view(in_shape)
+        x = x.reshape(in_shape)
         return x
 
 
@@ -305,7 +365,7 @@ class SpecAugment(nn.Module):
             # ax.imshow(x.cpu().numpy()[0].T)
 
         if self.time_mask_prob > r[1]:
-            x = self.time_masker(x)
+            x = self.time_masker(x, lengths)
             # ax = plt.subplot(223)
             # ax.imshow(x.cpu().numpy()[0].T)
 
@@ -112,6 +112,8 @@ class ProgLogger(Logger):
             if self.metrics is None or k in self.metrics:
                 info += ' %s: %.6f' % (k, v)
 
+        logging.info(info)
+
 
     def estimate_epoch_time(self):
         t1 = time.time()
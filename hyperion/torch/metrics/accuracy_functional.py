@@ -9,6 +9,10 @@ import torch
 
 
 def categorical_accuracy(input, target, weight=None, reduction='mean'):
+    """Computes the classification accuracy.
+       It returns a tensor in the same device as the input
+       to avoid synchronizing with the device.
+    """
 
     dim = input.dim()
     if dim < 2:
@@ -38,15 +42,18 @@ def categorical_accuracy(input, target, weight=None, reduction='mean'):
             weight_mean = weight.mean()
 
         if reduction == 'sum':
-            return ok.sum().item()
+            return ok.sum()
 
         acc = ok.mean()/weight_mean
 
-    return acc.item()
+    return acc
 
 
 
 def binary_accuracy(input, target, weight=None, reduction='mean', thr=0.5):
+    """Computes the binary classification accuracy.
+       It returns a tensor in the same device as the input.
+    """
 
     dim = input.dim()
     if dim < 2:
@@ -81,11 +88,11 @@ def binary_accuracy(input, target, weight=None, reduction='mean', thr=0.5):
 
     
         if reduction == 'sum':
-            return ok.sum().item()
+            return ok.sum()
 
         acc = ok.mean()/weight_mean
 
-    return ok.item()
+    return acc
 
 
 
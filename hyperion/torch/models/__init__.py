@@ -11,6 +11,7 @@ from .xvectors.efficient_net_xvector import EfficientNetXVector
 from .xvectors.transformer_xvector_v1 import TransformerXVectorV1
 from .xvectors.spinenet_xvector import SpineNetXVector
 from .xvectors.resnet1d_xvector import ResNet1dXVector
+from .xvectors.xvector_inference import XVectorInference, ExportedXVector
 
 from .vae.vae import VAE
 from .vae.vq_vae import VQVAE
@@ -27,6 +27,7 @@ class ResNet1dXVector(XVector):
         margin=0.3,
         margin_warmup_epochs=0,
         num_subcenters=2,
+        partial_fc_rate=None,
         dropout_rate=0,
         norm_layer=None,
         head_norm_layer=None,
@@ -53,6 +54,7 @@ class ResNet1dXVector(XVector):
             margin=margin,
             margin_warmup_epochs=margin_warmup_epochs,
             num_subcenters=num_subcenters,
+            partial_fc_rate=partial_fc_rate,
             norm_layer=norm_layer,
             head_norm_layer=head_norm_layer,
             use_norm=use_norm,
@@ -39,6 +39,7 @@ class ResNetXVector(XVector):
                  margin=0.3,
                  margin_warmup_epochs=0,
                  num_subcenters=2,
+                 partial_fc_rate=None,
                  dropout_rate=0,
                  norm_layer=None,
                  head_norm_layer=None,
@@ -49,7 +50,8 @@ class ResNetXVector(XVector):
                  proj_feats=None,
                  se_r=16,
                  res2net_scale=4,
-                 res2net_width_factor=1):
+                 res2net_width_factor=1,
+                 act_checkpoint_stages=None):
 
         logging.info('making %s encoder network', resnet_type)
         encoder_net = RNF.create(
@@ -71,7 +73,8 @@ class ResNetXVector(XVector):
             se_r=se_r,
             in_feats=in_feats,
             res2net_scale=res2net_scale,
-            res2net_width_factor=res2net_width_factor)
+            res2net_width_factor=res2net_width_factor,
+            act_checkpoint_stages=act_checkpoint_stages)
 
         super().__init__(encoder_net,
                          num_classes,
@@ -84,6 +87,7 @@ class ResNetXVector(XVector):
                          margin=margin,
                          margin_warmup_epochs=margin_warmup_epochs,
                          num_subcenters=num_subcenters,
+                         partial_fc_rate=partial_fc_rate,
                          norm_layer=norm_layer,
                          head_norm_layer=head_norm_layer,
                          use_norm=use_norm,
@@ -147,6 +151,10 @@ class ResNetXVector(XVector):
     def res2net_width_factor(self):
         return self.encoder_net.res2net_width_factor
 
+    @property
+    def act_checkpoint_stages(self):
+        return self.encoder_net.act_checkpoint_stages
+
     def get_config(self):
 
         base_config = super().get_config()
@@ -168,7 +176,8 @@ class ResNetXVector(XVector):
             'in_norm': self.in_norm,
             'se_r': self.se_r,
             'res2net_scale': self.res2net_scale,
-            'res2net_width_factor': self.res2net_width_factor
+            'res2net_width_factor': self.res2net_width_factor,
+            'act_checkpoint_stages': self.act_checkpoint_stages
         }
 
         config.update(base_config)
@@ -5,6 +5,7 @@
 """
 
 import logging
+from jsonargparse import ArgumentParser, ActionParser
 
 import torch
 import torch.nn as nn
@@ -43,6 +44,7 @@ class SpineNetXVector(XVector):
                  margin=0.3,
                  margin_warmup_epochs=0,
                  num_subcenters=2,
+                 partial_fc_rate=None,
                  dropout_rate=0,
                  norm_layer=None,
                  head_norm_layer=None,
@@ -53,7 +55,8 @@ class SpineNetXVector(XVector):
                  proj_feats=None,
                  se_r=16,
                  res2net_scale=4,
-                 res2net_width_factor=1):
+                 res2net_width_factor=1,
+                 act_checkpoint_stages=None):
 
         logging.info('making %s encoder network', spinenet_type)
         encoder_net = SNF.create(spinenet_type,
@@ -78,7 +81,8 @@ class SpineNetXVector(XVector):
                                  se_r=se_r,
                                  in_feats=in_feats,
                                  res2net_scale=res2net_scale,
-                                 res2net_width_factor=res2net_width_factor)
+                                 res2net_width_factor=res2net_width_factor,
+                                 act_checkpoint_stages=act_checkpoint_stages)
 
         super().__init__(encoder_net,
                          num_classes,
@@ -91,6 +95,7 @@ class SpineNetXVector(XVector):
                          margin=margin,
                          margin_warmup_epochs=margin_warmup_epochs,
                          num_subcenters=num_subcenters,
+                         partial_fc_rate=partial_fc_rate,
                          norm_layer=norm_layer,
                          head_norm_layer=head_norm_layer,
                          use_norm=use_norm,
@@ -170,6 +175,10 @@ class SpineNetXVector(XVector):
     def res2net_width_factor(self):
         return self.encoder_net.res2net_width_factor
 
+    @property
+    def act_checkpoint_stages(self):
+        return self.encoder_net.act_checkpoint_stages
+
     def get_config(self):
 
         base_config = super().get_config()
@@ -195,6 +204,7 @@ class SpineNetXVector(XVector):
             'in_norm': self.in_norm,
             'res2net_scale': self.res2net_scale,
             'res2net_width_factor': self.res2net_width_factor,
+            'act_checkpoint_stages': self.act_checkpoint_stages,
             'se_r': self.se_r
         }
 
@@ -25,6 +25,7 @@ class TDNNXVector(XVector):
                  loss_type='arc-softmax',
                  s=64, margin=0.3, margin_warmup_epochs=0,
                  num_subcenters=2,
+                 partial_fc_rate=None,
                  dropout_rate=0,
                  norm_layer=None, head_norm_layer=None,
                  use_norm=True, norm_before=False, in_norm=False, 
@@ -46,6 +47,7 @@ class TDNNXVector(XVector):
             hid_act=hid_act, loss_type=loss_type, 
             s=s, margin=margin, margin_warmup_epochs=margin_warmup_epochs,
             num_subcenters=num_subcenters,
+            partial_fc_rate=partial_fc_rate,
             norm_layer=norm_layer, head_norm_layer=head_norm_layer,
             use_norm=use_norm, norm_before=norm_before, 
             dropout_rate=dropout_rate,
@@ -31,6 +31,7 @@ class TransformerXVectorV1(XVector):
       enc_concat_after: if True, if concats attention input and output and apply linear transform, i.e.,
                              y = x + linear(concat(x, att(x)))
                     if False, y = x + att(x)
+      enc_act_checkpoint_blocks: indices of the encoder blocks that use activation checkpointing
       pool_net: pooling block configuration string or dictionary of params
       embed_dim: x-vector  dimension
       num_embed_layers: number of hidden layers in classification head
@@ -63,6 +64,7 @@ class TransformerXVectorV1(XVector):
                  enc_ff_kernel_size=1,
                  in_layer_type='conv2d-sub',
                  enc_concat_after=False,
+                 enc_act_checkpoint_blocks=None,
                  pool_net='mean+stddev',
                  embed_dim=256,
                  num_embed_layers=1,
@@ -75,6 +77,7 @@ class TransformerXVectorV1(XVector):
                  margin=0.3,
                  margin_warmup_epochs=0,
                  num_subcenters=2,
+                 partial_fc_rate=None,
                  dropout_rate=0.1,
                  pos_dropout_rate=0.1,
                  att_dropout_rate=0.0,
@@ -102,6 +105,7 @@ class TransformerXVectorV1(XVector):
                          in_layer_type=in_layer_type,
                          norm_before=norm_before,
                          concat_after=enc_concat_after,
+                         act_checkpoint_blocks=enc_act_checkpoint_blocks,
                          in_time_dim=-1,
                          out_time_dim=-1)
 
@@ -116,6 +120,7 @@ class TransformerXVectorV1(XVector):
                          margin=margin,
                          margin_warmup_epochs=margin_warmup_epochs,
                          num_subcenters=num_subcenters,
+                         partial_fc_rate=partial_fc_rate,
                          norm_layer=norm_layer,
                          head_norm_layer=head_norm_layer,
                          use_norm=use_norm,
@@ -173,6 +178,10 @@ class TransformerXVectorV1(XVector):
     def enc_concat_after(self):
         return self.encoder_net.concat_after
 
+    @property
+    def enc_act_checkpoint_blocks(self):
+        return self.encoder_net.act_checkpoint_blocks
+
     @property
     def enc_ff_type(self):
         return self.encoder_net.ff_type
@@ -204,7 +213,8 @@ class TransformerXVectorV1(XVector):
             'pos_dropout_rate': self.pos_dropout_rate,
             'att_dropout_rate': self.att_dropout_rate,
             'in_layer_type': self.in_layer_type,
-            'enc_concat_after': self.enc_concat_after
+            'enc_concat_after': self.enc_concat_after,
+            'enc_act_checkpoint_blocks': self.enc_act_checkpoint_blocks
         }
         #'in_norm': self.in_norm }
 
@@ -246,7 +256,7 @@ class TransformerXVectorV1(XVector):
                       'num_enc_heads', 'enc_att_type', 'enc_att_context',
                       'enc_ff_type', 'enc_d_ff', 'enc_ff_kernel_size',
                       'pos_dropout_rate', 'att_dropout_rate', 'in_layer_type',
-                      'enc_concat_after')
+                      'enc_concat_after', 'enc_act_checkpoint_blocks')
 
         child_args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
         base_args.update(child_args)
@@ -328,6 +338,14 @@ class TransformerXVectorV1(XVector):
             action='store_true',
             help='concatenate attention input and output instead of adding')
 
+        parser.add_argument(
+            '--enc-act-checkpoint-blocks',
+            default=None,
+            type=int,
+            nargs='+',
+            help=('indices of the encoder blocks that use activation '
+                  'checkpointing to save memory in training'))
+
         # parser.add_argument('--in-norm', default=False, action='store_true',
         #                     help='batch normalization at the input')
         if prefix is not None:
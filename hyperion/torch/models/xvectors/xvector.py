@@ -12,7 +12,11 @@ from ...layers import GlobalPool1dFactory as PF
 from ...layer_blocks import TDNNBlock
 from ...narchs import ClassifHead, TorchNALoader
 from ...torch_model import TorchModel
-from ...utils import eval_nnet_by_chunks
+from ...utils import (
+    eval_nnet_by_chunks,
+    eval_nnet_with_lengths,
+    seq_lengths_to_mask,
+)
 
 
 class XVector(TorchModel):
@@ -31,6 +35,7 @@ class XVector(TorchModel):
         margin=0.3,
         margin_warmup_epochs=0,
         num_subcenters=2,
+        partial_fc_rate=None,
         norm_layer=None,
         head_norm_layer=None,
         use_norm=True,
@@ -113,6 +118,7 @@ class XVector(TorchModel):
             margin=margin,
             margin_warmup_epochs=margin_warmup_epochs,
             num_subcenters=num_subcenters,
+            partial_fc_rate=partial_fc_rate,
             norm_layer=head_norm_layer,
             use_norm=use_norm,
             norm_before=norm_before,
@@ -159,6 +165,10 @@ class XVector(TorchModel):
     def num_subcenters(self):
         return self.classif_net.num_subcenters
 
+    @property
+    def partial_fc_rate(self):
+        return self.classif_net.partial_fc_rate
+
     @property
     def loss_type(self):
         return self.classif_net.loss_type
@@ -288,29 +298,58 @@ class XVector(TorchModel):
 
         return h_enc, h_classif
 
-    def extract_embed(self, x, chunk_length=0, embed_layer=None, detach_chunks=False):
+    def extract_embed(
+        self,
+        x,
+        chunk_length=0,
+        embed_layer=None,
+        detach_chunks=False,
+        x_lengths=None,
+    ):
+        """Extracts x-vector embeddings
+
+        Args:
+          x: input features tensor with shape=(batch, in_feats, time)
+          chunk_length: if > 0, the encoder is evaluated by chunks
+          embed_layer: index of the classification layer to extract
+          detach_chunks: detach the chunks from the graph
+          x_lengths: number of valid frames of each sequence in the batch,
+            if None all frames are valid. The embeddings are the same
+            as extracting each sequence on its own, see
+            eval_nnet_with_lengths.
+
+        Returns:
+          embeddings tensor with shape=(batch, embed_dim)
+        """
         if embed_layer is None:
             embed_layer = self.embed_layer
 
         x = self._pre_enc(x)
-        # if self.encoder_net.in_dim() == 4 and x.dim() == 3:
-        #     x = x.view(x.size(0), 1, x.size(1), x.size(2))
-        x = eval_nnet_by_chunks(
-            x, self.encoder_net, chunk_length, detach_chunks=detach_chunks
-        )
+        weights = None
+        if x_lengths is None:
+            x = eval_nnet_by_chunks(
+                x, self.encoder_net, chunk_length, detach_chunks=detach_chunks
+            )
+        else:
+            x, lengths = eval_nnet_with_lengths(
+                x,
+                self.encoder_net,
+                x_lengths,
+                chunk_length,
+                detach_chunks=detach_chunks,
+            )
+            weights = seq_lengths_to_mask(
+                lengths.clamp(min=1), x.size(-1), dtype=x.dtype
+            )
 
         if x.device != self.device:
             x = x.to(self.device)
+            if weights is not None:
+                weights = weights.to(self.device)
 
         x = self._post_enc(x)
 
-        # if self.encoder_net.out_dim() == 4:
-        #     x = x.view(x.size(0), -1, x.size(-1))
-
-        # if self.proj is not None:
-        #     x = self.proj(x)
-
-        p = self.pool_net(x)
+        p = self.pool_net(x, weights=weights)
         y = self.classif_net.extract_embed(p, embed_layer)
         return y
 
@@ -461,6 +500,7 @@ class XVector(TorchModel):
             "margin": self.margin,
             "margin_warmup_epochs": self.margin_warmup_epochs,
             "num_subcenters": self.num_subcenters,
+            "partial_fc_rate": self.partial_fc_rate,
             "norm_layer": self.norm_layer,
             "head_norm_layer": self.head_norm_layer,
             "use_norm": self.use_norm,
@@ -494,6 +534,7 @@ class XVector(TorchModel):
         s=64,
         margin=0.3,
         margin_warmup_epochs=10,
+        partial_fc_rate=None,
     ):
         if (self.num_classes is not None and self.num_classes != num_classes) or (
             self.loss_type != loss_type
@@ -501,11 +542,17 @@ class XVector(TorchModel):
             # if we change the number of classes or the loss-type
             # we need to reinitiate the last layer
             self.classif_net.rebuild_output_layer(
-                num_classes, loss_type, s, margin, margin_warmup_epochs
+                num_classes,
+                loss_type,
+                s,
+                margin,
+                margin_warmup_epochs,
+                partial_fc_rate=partial_fc_rate,
             )
             return
 
         # otherwise we just change the values of s, margin and margin_warmup
+        self.classif_net.set_partial_fc_rate(partial_fc_rate)
         self.classif_net.set_margin(margin)
         self.classif_net.set_margin_warmup_epochs(margin_warmup_epochs)
         self.classif_net.set_s(s)
@@ -577,6 +624,7 @@ class XVector(TorchModel):
             "margin",
             "margin_warmup_epochs",
             "num_subcenters",
+            "partial_fc_rate",
             "use_norm",
             "norm_before",
             "in_feats",
@@ -686,6 +734,17 @@ class XVector(TorchModel):
             help="number of subcenters in subcenter losses",
         )
 
+        parser.add_argument(
+            "--partial-fc-rate",
+            default=None,
+            type=float,
+            help=(
+                "if not None, margin losses use Partial-FC sampling this "
+                "ratio of the classes in each step, and the output layer "
+                "is sharded across ranks in distributed training"
+            ),
+        )
+
         try:
             parser.add_argument(
                 "--norm-layer",
@@ -769,7 +828,13 @@ class XVector(TorchModel):
 
     @staticmethod
     def filter_finetune_args(**kwargs):
-        valid_args = ("loss_type", "s", "margin", "margin_warmup_epochs")
+        valid_args = (
+            "loss_type",
+            "s",
+            "margin",
+            "margin_warmup_epochs",
+            "partial_fc_rate",
+        )
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
 
         return args
@@ -807,6 +872,17 @@ class XVector(TorchModel):
             help="number of subcenters in subcenter losses",
         )
 
+        parser.add_argument(
+            "--partial-fc-rate",
+            default=None,
+            type=float,
+            help=(
+                "if not None, margin losses use Partial-FC sampling this "
+                "ratio of the classes in each step, and the output layer "
+                "is sharded across ranks in distributed training"
+            ),
+        )
+
         if prefix is not None:
             outer_parser.add_argument("--" + prefix, action=ActionParser(parser=parser))
             # help='xvector finetune opts')
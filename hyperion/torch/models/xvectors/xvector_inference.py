@@ -0,0 +1,295 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import json
+import logging
+import zipfile
+
+import torch
+import torch.nn as nn
+
+from ...utils import (
+    prepare_int8,
+    convert_int8,
+    quantize_dynamic_int8,
+    can_mask_padding,
+)
+
+
+class XVectorInference(nn.Module):
+    """Inference graph of an x-vector embedding extractor.
+    It contains the feature frontend, the encoder, the pooling and
+    the embedding layer. It can be exported to a frozen TorchScript
+    file with dynamic batch size and time length, which is loaded
+    without the python model classes.
+
+    Attributes:
+      feat_extractor: AudioFeatsMVN object created with trans=False.
+      xvector: XVector object.
+      embed_layer: classifier layer to get the embedding from,
+                   if None, it uses the layer set in training phase.
+      chunk_length: number of frames used in each forward pass
+                    of the encoder, if 0 the full utterance is used.
+                    Only used in eager mode, exported graphs
+                    process the full utterance.
+      precision: precision of the x-vector network in (float32, bfloat16),
+                 bfloat16 runs the network with autocast. int8 models
+                 are obtained calling quantize_int8. The features
+                 are always computed in float32.
+    """
+
+    config_file = "xvector_inference.json"
+
+    def __init__(
+        self,
+        feat_extractor,
+        xvector,
+        embed_layer=None,
+        chunk_length=0,
+        precision="float32",
+    ):
+        super().__init__()
+        assert precision in ("float32", "bfloat16"), "wrong precision %s" % precision
+        self.feat_extractor = feat_extractor
+        self.xvector = xvector
+        self.embed_layer = embed_layer
+        self.chunk_length = chunk_length
+        self.precision = precision
+
+    @property
+    def embed_dim(self):
+        return self.xvector.embed_dim
+
+    @property
+    def fs(self):
+        return self.feat_extractor.fs
+
+    def extract_feats(self, x, x_lengths):
+        """Computes the normalized acoustic features.
+
+        Args:
+          x: waveforms with shape=(batch, num_samples).
+          x_lengths: waveform lengths in samples.
+
+        Returns:
+          Features with shape=(batch, num_frames, feat_dim).
+          Feature lengths in frames.
+        """
+        return self.feat_extractor(x, x_lengths=x_lengths)
+
+    def extract_embed(self, x, x_lengths):
+        """Computes the embeddings from the features.
+
+        Args:
+          x: features with shape=(batch, feat_dim, num_frames).
+          x_lengths: feature lengths in frames.
+
+        Returns:
+          Embeddings with shape=(batch, embed_dim).
+        """
+        if self.precision == "bfloat16":
+            with torch.autocast(device_type=x.device.type, dtype=torch.bfloat16):
+                y = self._extract_embed(x, x_lengths)
+            return y.float()
+
+        return self._extract_embed(x, x_lengths)
+
+    def _extract_embed(self, x, x_lengths):
+        return self.xvector.extract_embed(
+            x,
+            chunk_length=self.chunk_length,
+            embed_layer=self.embed_layer,
+            x_lengths=x_lengths,
+        )
+
+    def forward(self, x, x_lengths):
+        """Computes the embeddings from the waveforms.
+
+        Args:
+          x: waveforms with shape=(batch, num_samples).
+          x_lengths: waveform lengths in samples.
+
+        Returns:
+          Embeddings with shape=(batch, embed_dim).
+        """
+        f, f_lengths = self.extract_feats(x, x_lengths)
+        return self.extract_embed(f.transpose(1, 2), f_lengths)
+
+    def quantize_int8(self, calib_data, backend="fbgemm"):
+        """Int8 quantization of the x-vector network. The ResNet stages of
+        the encoder are fused and quantized with post-training static
+        quantization, the ranges of the activations are calibrated on a
+        few utterances. The embedding layers of the classification head
+        use dynamic quantization. Quantized models only run on CPU.
+
+        Args:
+          calib_data: iterable of (x, x_lengths) waveform batches.
+          backend: quantized engine in (fbgemm, qnnpack).
+        """
+        self.eval()
+        self.precision = "float32"
+        net = self.xvector
+        prepare_int8(net.encoder_net, backend=backend)
+        num_utts = 0
+        with torch.no_grad():
+            for x, x_lengths in calib_data:
+                self(x, x_lengths)
+                num_utts += x.shape[0]
+
+        logging.info("calibrated int8 quantization with %d utterances" % num_utts)
+        convert_int8(net.encoder_net)
+        quantize_dynamic_int8(net.classif_net.fc_blocks)
+        self.precision = "int8"
+
+    def get_config(self):
+        return {
+            "embed_dim": self.embed_dim,
+            "fs": self.fs,
+            "frame_length": self.feat_extractor.frame_length,
+            "frame_shift": self.feat_extractor.frame_shift,
+            "embed_layer": self.embed_layer,
+        }
+
+    def _example_input(self, batch_size, num_secs, device):
+        num_samples = int(num_secs * self.fs)
+        x = torch.randn(batch_size, num_samples, device=device)
+        x_lengths = torch.linspace(
+            num_samples, num_samples // 2, batch_size, device=device
+        ).long()
+        return x, x_lengths
+
+    def export(self, file_path, example_secs=10.0, check_secs=7.3, freeze=True):
+        """Traces the inference graph and saves it as TorchScript.
+        The methods forward, extract_feats and extract_embed are traced,
+        then, the module is frozen, i.e., the parameters are inlined
+        as constants, and batch norms are fused with the convolutions.
+
+        Args:
+          file_path: output file path.
+          example_secs: duration of the example waveforms used for tracing,
+                        it has to be longer than the MVN context window.
+          check_secs: duration of the waveforms used to check that the
+                      exported graph works for other lengths.
+          freeze: if True, the traced module is frozen.
+
+        Returns:
+          Exported TorchScript module.
+        """
+        assert self.precision == "float32", "only float32 models can be exported"
+        if self.chunk_length > 0:
+            logging.warning(
+                "exported graphs don't evaluate by chunks, chunk_length is ignored"
+            )
+            self.chunk_length = 0
+
+        if not can_mask_padding(self.xvector.encoder_net):
+            logging.warning(
+                "the padding of a batch leaks into the valid frames in this "
+                "encoder, the exported graph is only exact for batch-size=1"
+            )
+
+        self.eval()
+        device = next(self.parameters()).device
+        with torch.no_grad():
+            x, x_lengths = self._example_input(2, example_secs, device)
+            f, f_lengths = self.extract_feats(x, x_lengths)
+            f = f.transpose(1, 2).contiguous()
+            inputs = {
+                "forward": (x, x_lengths),
+                "extract_feats": (x, x_lengths),
+                "extract_embed": (f, f_lengths),
+            }
+            model = torch.jit.trace_module(self, inputs, check_trace=False)
+            if freeze:
+                model = torch.jit.freeze(
+                    model, preserved_attrs=["extract_feats", "extract_embed"]
+                )
+
+            # the same seed is used to get the same dither noise
+            x, x_lengths = self._example_input(3, check_secs, device)
+            torch.manual_seed(1024)
+            y = self(x, x_lengths)
+            torch.manual_seed(1024)
+            y_exp = model(x, x_lengths)
+            err = torch.max(torch.abs(y - y_exp)) / torch.max(torch.abs(y))
+            if err > 1e-3:
+                logging.warning(
+                    "exported graph differs from eager model, rel. error=%.2e" % err
+                )
+            else:
+                logging.info("exported graph rel. error=%.2e" % err)
+
+        config = json.dumps(self.get_config())
+        logging.info("saving exported model to %s" % file_path)
+        torch.jit.save(model, file_path, _extra_files={self.config_file: config})
+        return model
+
+    @classmethod
+    def is_exported(cls, file_path):
+        """Returns True if the file contains a graph exported with export."""
+        if not zipfile.is_zipfile(file_path):
+            return False
+        with zipfile.ZipFile(file_path) as f:
+            suffix = "extra/" + cls.config_file
+            return any(name.endswith(suffix) for name in f.namelist())
+
+    @classmethod
+    def load(cls, file_path, map_location=None):
+        """Loads a graph exported with export.
+
+        Args:
+          file_path: exported file path.
+          map_location: device where the graph is loaded.
+
+        Returns:
+          ExportedXVector object.
+        """
+        extra_files = {cls.config_file: ""}
+        model = torch.jit.load(
+            file_path, map_location=map_location, _extra_files=extra_files
+        )
+        config = json.loads(extra_files[cls.config_file])
+        return ExportedXVector(model, **config)
+
+
+class ExportedXVector(object):
+    """Wrapper of an exported x-vector inference graph with the same
+    interface as XVectorInference, so the extraction scripts
+    can use either of them.
+
+    Attributes:
+      model: TorchScript module.
+      embed_dim: embedding dimension.
+      fs: sampling frequency of the input waveforms.
+      frame_length: frame length in msecs.
+      frame_shift: frame shift in msecs.
+      embed_layer: layer the embedding is extracted from.
+    """
+
+    def __init__(
+        self, model, embed_dim, fs, frame_length, frame_shift, embed_layer=None
+    ):
+        self.model = model
+        self.embed_dim = embed_dim
+        self.fs = fs
+        self.frame_length = frame_length
+        self.frame_shift = frame_shift
+        self.embed_layer = embed_layer
+
+    def __call__(self, x, x_lengths):
+        return self.model(x, x_lengths)
+
+    def extract_feats(self, x, x_lengths):
+        return self.model.extract_feats(x, x_lengths)
+
+    def extract_embed(self, x, x_lengths):
+        return self.model.extract_embed(x, x_lengths)
+
+    def __repr__(self):
+        return "%s(embed_dim=%d, fs=%d, embed_layer=%s)" % (
+            self.__class__.__name__,
+            self.embed_dim,
+            self.fs,
+            self.embed_layer,
+        )
@@ -56,13 +56,51 @@ class AudioFeatsMVN(NetArch):
     def frame_shift(self):
         return self.audio_feats.frame_shift
 
-    def forward(self, x, lengths=None):
-        f = self.audio_feats(x)
+    def forward(self, x, lengths=None, x_lengths=None):
+        """Computes the normalized features.
+
+        Args:
+          x: waveforms with shape=(batch, num_samples).
+          lengths: relative lengths of the signals in (0, 1] used by spec_augment,
+            if None, they are obtained from x_lengths.
+          x_lengths: number of valid samples of each signal. If not None,
+            the padding is ignored by the feature extractor and the normalization,
+            and the number of valid frames is returned.
+
+        Returns:
+          Features tensor.
+          Number of valid frames of each sequence if x_lengths is not None.
+        """
+        f_lengths = None
+        if x_lengths is None:
+            f = self.audio_feats(x)
+        else:
+            f, f_lengths = self.audio_feats(x, x_lengths)
+
+        return self.process_feats(f, lengths, f_lengths)
+
+    def process_feats(self, f, lengths=None, f_lengths=None):
+        """Applies SpecAugment and normalization to features computed
+        by the audio_feats layer, e.g., features read from a cache.
+
+        Args:
+          f: features with shape=(batch, num_frames, feat_dim).
+          lengths: relative lengths of the signals in (0, 1] used by spec_augment,
+            if None, they are obtained from f_lengths.
+          f_lengths: number of valid frames of each sequence (optional).
+
+        Returns:
+          Features tensor.
+          Number of valid frames of each sequence if f_lengths is not None.
+        """
+        if lengths is None and f_lengths is not None:
+            lengths = f_lengths.float() / f.size(1)
+
         if self.spec_augment is not None and not self.aug_after_mvn:
             f = self.spec_augment(f, lengths)
 
         if self.mvn is not None:
-            f = self.mvn(f)
+            f = self.mvn(f, f_lengths)
 
         if self.spec_augment is not None and self.aug_after_mvn:
             f = self.spec_augment(f, lengths)
@@ -70,6 +108,9 @@ class AudioFeatsMVN(NetArch):
         if self.trans:
             f = f.transpose(1, 2).contiguous()
 
+        if f_lengths is not None:
+            return f, f_lengths
+
         return f
 
     def get_config(self):
@@ -9,6 +9,11 @@ import torch.nn as nn
 from torch.nn import Linear
 
 from ..layers import CosLossOutput, ArcLossOutput, SubCenterArcLossOutput
+from ..layers import (
+    PartialFCCosLossOutput,
+    PartialFCArcLossOutput,
+    PartialFCSubCenterArcLossOutput,
+)
 from ..layers import NormLayer1dFactory as NLF
 from ..layer_blocks import FCBlock
 from .net_arch import NetArch
@@ -29,6 +34,9 @@ class ClassifHead(NetArch):
        margin: margin parameter for cos-softmax and arc-softmax
        margin_warmup_epochs: number of epochs to anneal the margin from 0 to margin
        num_subcenters: number of subcenters in subcenter losses
+       partial_fc_rate: if not None, margin losses use Partial-FC, sampling this ratio of
+                        the classes in each training step, and in distributed training,
+                        the output layer is sharded across ranks.
        norm_layer: norm_layer object or str indicating type norm layer, if None it uses BatchNorm1d
        use_norm: it True it uses layer/batch-normalization
        norm_before: if True, layer-norm is before the activation function
@@ -47,6 +55,7 @@ class ClassifHead(NetArch):
                  margin=0.3,
                  margin_warmup_epochs=0,
                  num_subcenters=2,
+                 partial_fc_rate=None,
                  norm_layer=None,
                  use_norm=True,
                  norm_before=True,
@@ -78,6 +87,7 @@ class ClassifHead(NetArch):
         self.margin = margin
         self.margin_warmup_epochs = margin_warmup_epochs
         self.num_subcenters = num_subcenters
+        self.partial_fc_rate = partial_fc_rate
 
         prev_feats = in_feats
         fc_blocks = []
@@ -108,30 +118,7 @@ class ClassifHead(NetArch):
         self.fc_blocks = nn.ModuleList(fc_blocks)
 
         # output layer
-        if loss_type == 'softmax':
-            self.output = Linear(embed_dim, num_classes)
-        elif loss_type == 'cos-softmax':
-            self.output = CosLossOutput(
-                embed_dim,
-                num_classes,
-                s=s,
-                margin=margin,
-                margin_warmup_epochs=margin_warmup_epochs)
-        elif loss_type == 'arc-softmax':
-            self.output = ArcLossOutput(
-                embed_dim,
-                num_classes,
-                s=s,
-                margin=margin,
-                margin_warmup_epochs=margin_warmup_epochs)
-        elif loss_type == 'subcenter-arc-softmax':
-            self.output = SubCenterArcLossOutput(
-                embed_dim,
-                num_classes,
-                num_subcenters,
-                s=s,
-                margin=margin,
-                margin_warmup_epochs=margin_warmup_epochs)
+        self.output = self._make_output_layer()
 
     def rebuild_output_layer(self,
                              num_classes,
@@ -139,34 +126,72 @@ class ClassifHead(NetArch):
                              s,
                              margin,
                              margin_warmup_epochs,
-                             num_subcenters=2):
+                             num_subcenters=2,
+                             partial_fc_rate=None):
 
-        embed_dim = self.embed_dim
         self.num_classes = num_classes
         self.loss_type = loss_type
         self.s = s
         self.margin = margin
         self.margin_warmup_epochs = margin_warmup_epochs
         self.num_subcenters = num_subcenters
+        self.partial_fc_rate = partial_fc_rate
+        self.output = self._make_output_layer()
 
+    def _make_output_layer(self):
+        embed_dim = self.embed_dim
+        num_classes = self.num_classes
+        loss_type = self.loss_type
+        s = self.s
+        margin = self.margin
+        margin_warmup_epochs = self.margin_warmup_epochs
+        num_subcenters = self.num_subcenters
         if loss_type == 'softmax':
-            self.output = Linear(embed_dim, num_classes)
-        elif loss_type == 'cos-softmax':
-            self.output = CosLossOutput(
+            return Linear(embed_dim, num_classes)
+
+        if self.partial_fc_rate is not None:
+            if loss_type == 'cos-softmax':
+                return PartialFCCosLossOutput(
+                    embed_dim,
+                    num_classes,
+                    s=s,
+                    margin=margin,
+                    margin_warmup_epochs=margin_warmup_epochs,
+                    sample_rate=self.partial_fc_rate)
+            elif loss_type == 'arc-softmax':
+                return PartialFCArcLossOutput(
+                    embed_dim,
+                    num_classes,
+                    s=s,
+                    margin=margin,
+                    margin_warmup_epochs=margin_warmup_epochs,
+                    sample_rate=self.partial_fc_rate)
+            elif loss_type == 'subcenter-arc-softmax':
+                return PartialFCSubCenterArcLossOutput(
+                    embed_dim,
+                    num_classes,
+                    num_subcenters,
+                    s=s,
+                    margin=margin,
+                    margin_warmup_epochs=margin_warmup_epochs,
+                    sample_rate=self.partial_fc_rate)
+
+        if loss_type == 'cos-softmax':
+            return CosLossOutput(
                 embed_dim,
                 num_classes,
                 s=s,
                 margin=margin,
                 margin_warmup_epochs=margin_warmup_epochs)
         elif loss_type == 'arc-softmax':
-            self.output = ArcLossOutput(
+            return ArcLossOutput(
                 embed_dim,
                 num_classes,
                 s=s,
                 margin=margin,
                 margin_warmup_epochs=margin_warmup_epochs)
         elif loss_type == 'subcenter-arc-softmax':
-            self.output = SubCenterArcLossOutput(
+            return SubCenterArcLossOutput(
                 embed_dim,
                 num_classes,
                 num_subcenters,
@@ -174,6 +199,18 @@ class ClassifHead(NetArch):
                 margin=margin,
                 margin_warmup_epochs=margin_warmup_epochs)
 
+    def set_partial_fc_rate(self, partial_fc_rate):
+        if self.loss_type == 'softmax' or self.partial_fc_rate == partial_fc_rate:
+            return
+
+        # we keep the class centers of the current output layer
+        if hasattr(self.output, 'consolidate_state_dict'):
+            self.output.consolidate_state_dict(recipient_rank=None)
+        state_dict = self.output.state_dict()
+        self.partial_fc_rate = partial_fc_rate
+        self.output = self._make_output_layer()
+        self.output.load_state_dict(state_dict)
+
     def set_margin(self, margin):
         if self.loss_type == 'softmax':
             return
@@ -264,6 +301,7 @@ class ClassifHead(NetArch):
             'margin': self.margin,
             'margin_warmup_epochs': self.margin_warmup_epochs,
             'num_subcenters': self.num_subcenters,
+            'partial_fc_rate': self.partial_fc_rate,
             'norm_layer': self.norm_layer,
             'use_norm': self.use_norm,
             'norm_before': self.norm_before,
@@ -286,7 +324,8 @@ class ClassifHead(NetArch):
 
         valid_args = ('num_classes', 'embed_dim', 'num_embed_layers',
                       'hid_act', 'loss_type', 's', 'margin',
-                      'margin_warmup_epochs', 'num_subcenters', 'use_norm',
+                      'margin_warmup_epochs', 'num_subcenters',
+                      'partial_fc_rate', 'use_norm',
                       'norm_before', 'dropout_rate', 'norm_layer')
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
         return args
@@ -346,6 +385,14 @@ class ClassifHead(NetArch):
                             type=int,
                             help='number of subcenters in subcenter losses')
 
+        parser.add_argument(
+            '--partial-fc-rate',
+            default=None,
+            type=float,
+            help=('if not None, margin losses use Partial-FC sampling this '
+                  'ratio of the classes in each step, and the output layer '
+                  'is sharded across ranks in distributed training'))
+
         try:
             parser.add_argument(
                 '--norm-layer',
@@ -13,6 +13,7 @@ from ..layers import NormLayer1dFactory as NLF
 from ..layers import PosEncoder, RelPosEncoder, NoPosEncoder
 from ..layer_blocks import ConformerEncoderBlockV1 as EBlock
 from ..layer_blocks import TransformerConv2dSubsampler as Conv2dSubsampler
+from ..utils import act_checkpoint
 from .net_arch import NetArch
 
 class ConformerEncoderV1(NetArch):
@@ -67,6 +68,8 @@ class ConformerEncoderV1(NetArch):
       padding_idx: padding idx for embed layer
       in_time_dim: time dimension in the input Tensor
       out_time_dim: dimension that we want to be time in the output tensor
+      act_checkpoint_blocks: indices of the blocks that use activation checkpointing,
+                             i.e., their activations are recomputed in the backward pass
       rel_pos_enc: if True, use relative postional encodings, absolute encodings otherwise. (deprecated)
       red_lnorm: (deprecated)
     """
@@ -83,7 +86,7 @@ class ConformerEncoderV1(NetArch):
                  conv_norm_layer=None, se_r=None,
                  ff_macaron=True, red_lnorms=False, concat_after=False,
                  padding_idx=-1, in_time_dim=-1, out_time_dim=1, 
-                 rel_pos_enc=True, red_lnorm=False):
+                 rel_pos_enc=True, red_lnorm=False, act_checkpoint_blocks=None):
 
         super().__init__()
         self.in_feats = in_feats
@@ -118,6 +121,8 @@ class ConformerEncoderV1(NetArch):
         self.in_time_dim = in_time_dim
         self.out_time_dim = out_time_dim
         self.hid_act = hid_act
+        self.act_checkpoint_blocks = (
+            [] if act_checkpoint_blocks is None else list(act_checkpoint_blocks))
 
         self.conv_norm_layer = conv_norm_layer
         norm_groups = None
@@ -227,7 +232,10 @@ class ConformerEncoderV1(NetArch):
             b_args = {}
 
         for i in range(len(self.blocks)):
-            x, mask = self.blocks[i](x, mask=mask, **b_args)
+            if i in self.act_checkpoint_blocks:
+                x, mask = act_checkpoint(self.blocks[i], x, mask=mask, **b_args)
+            else:
+                x, mask = self.blocks[i](x, mask=mask, **b_args)
 
         if not self.red_lnorms:
             x = self.norm_out(x)
@@ -272,7 +280,8 @@ class ConformerEncoderV1(NetArch):
                   'concat_after': self.concat_after,
                   'padding_idx': self.padding_idx,
                   'in_time_dim': self.in_time_dim,
-                  'out_time_dim': self.out_time_dim }
+                  'out_time_dim': self.out_time_dim,
+                  'act_checkpoint_blocks': self.act_checkpoint_blocks }
         
         base_config = super().get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -363,7 +372,8 @@ class ConformerEncoderV1(NetArch):
                       'se_r',
                       'ff_macaron',
                       'red_lnorms',
-                      'concat_after')
+                      'concat_after',
+                      'act_checkpoint_blocks')
 
         return dict((k, kwargs[k])
                     for k in valid_args if k in kwargs)
@@ -481,6 +491,10 @@ class ConformerEncoderV1(NetArch):
         parser.add_argument('--concat-after', default=False, action='store_true',
                             help='concatenate attention input and output instead of adding')
 
+        parser.add_argument('--act-checkpoint-blocks', default=None, type=int, nargs='+',
+                            help=('indices of the blocks that use activation checkpointing '
+                                  'to save memory in training'))
+
         # parser.add_argument('--in-norm', default=False, action='store_true',
         #                     help='batch normalization at the input')
         if prefix is not None:
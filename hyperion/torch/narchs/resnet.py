@@ -22,6 +22,7 @@ from ..layer_blocks import (
     Res2NetBNBlock,
 )
 from ..layer_blocks import ResNetEndpointBlock
+from ..utils import act_checkpoint
 from .net_arch import NetArch
 
 
@@ -57,6 +58,9 @@ class ResNet(NetArch):
                instead of time-freq dimension or HxW dimensions
       in_feats: input feature size (number of components in dimension of 2 of input tensor), this is only
                 required when time_se=True to calculcate the size of the squeeze excitation matrices.
+      act_checkpoint_stages: list of stages, from 0 (input block) to 4, that use activation checkpointing
+                             in training to save memory, the activations of each residual block of these
+                             stages are recomputed in the backward pass.
 
     """
 
@@ -87,6 +91,7 @@ class ResNet(NetArch):
         in_feats=None,
         res2net_scale=4,
         res2net_width_factor=1,
+        act_checkpoint_stages=None,
     ):
 
         super().__init__()
@@ -137,6 +142,9 @@ class ResNet(NetArch):
         self.in_feats = in_feats
         self.res2net_scale = res2net_scale
         self.res2net_width_factor = res2net_width_factor
+        self.act_checkpoint_stages = (
+            [] if act_checkpoint_stages is None else list(act_checkpoint_stages)
+        )
 
         self.multilevel = multilevel
         self.endpoint_channels = endpoint_channels
@@ -329,6 +337,20 @@ class ResNet(NetArch):
 
         return nn.Sequential(*layers)
 
+    def _forward_stage(self, stage, x):
+        """Forward function of the input block (stage=0)
+        or one of the residual layers (stage=1-4)."""
+        layer = self.in_block if stage == 0 else getattr(self, "layer%d" % stage)
+        if stage not in self.act_checkpoint_stages:
+            return layer(x)
+
+        if stage == 0:
+            return act_checkpoint(layer, x)
+
+        for block in layer:
+            x = act_checkpoint(block, x)
+        return x
+
     def _compute_out_size(self, in_size):
         """Computes output size given input size.
            Output size is not the same as input size because of
@@ -418,15 +440,15 @@ class ResNet(NetArch):
         if self.in_norm:
             x = self.in_bn(x)
         feats = []
-        x = self.in_block(x)
-        x = self.layer1(x)
-        x = self.layer2(x)
+        x = self._forward_stage(0, x)
+        x = self._forward_stage(1, x)
+        x = self._forward_stage(2, x)
         if self.multilevel:
             feats.append(x)
-        x = self.layer3(x)
+        x = self._forward_stage(3, x)
         if self.multilevel:
             feats.append(x)
-        x = self.layer4(x)
+        x = self._forward_stage(4, x)
         if self.multilevel:
             feats.append(x)
 
@@ -473,19 +495,19 @@ class ResNet(NetArch):
         if self.in_norm:
             x = self.in_bn(x)
 
-        x = self.in_block(x)
+        x = self._forward_stage(0, x)
         if 0 in layers:
             h.append(x)
         if last_layer == 0:
             return h
 
-        x = self.layer1(x)
+        x = self._forward_stage(1, x)
         if 1 in layers:
             h.append(x)
         if last_layer == 1:
             return h
 
-        x = self.layer2(x)
+        x = self._forward_stage(2, x)
         if 2 in layers:
             h.append(x)
         if last_layer == 2:
@@ -493,7 +515,7 @@ class ResNet(NetArch):
         if return_output and self.multilevel:
             feats.append(x)
 
-        x = self.layer3(x)
+        x = self._forward_stage(3, x)
         if 3 in layers:
             h.append(x)
         if last_layer == 3:
@@ -501,7 +523,7 @@ class ResNet(NetArch):
         if return_output and self.multilevel:
             feats.append(x)
 
-        x = self.layer4(x)
+        x = self._forward_stage(4, x)
         if 4 in layers:
             h.append(x)
         if return_output and self.multilevel:
@@ -550,6 +572,7 @@ class ResNet(NetArch):
             "in_feats": self.in_feats,
             "res2net_scale": self.res2net_scale,
             "res2net_width_factor": self.res2net_width_factor,
+            "act_checkpoint_stages": self.act_checkpoint_stages,
         }
 
         base_config = super().get_config()
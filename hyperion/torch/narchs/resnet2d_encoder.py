@@ -14,6 +14,7 @@ from ..layers import NormLayer2dFactory as NLF
 from ..layer_blocks import ResNet2dBasicBlock, ResNet2dBNBlock, DC2dEncBlock
 from ..layer_blocks import SEResNet2dBasicBlock, SEResNet2dBNBlock
 from ..layer_blocks import Res2Net2dBasicBlock, Res2Net2dBNBlock
+from ..utils import act_checkpoint
 from .net_arch import NetArch
 
 
@@ -43,6 +44,7 @@ class ResNet2dEncoder(NetArch):
         use_norm=True,
         norm_layer=None,
         norm_before=True,
+        act_checkpoint_stages=None,
     ):
 
         super().__init__()
@@ -100,6 +102,10 @@ class ResNet2dEncoder(NetArch):
         self.in_feats = in_feats
         self.res2net_width_factor = res2net_width_factor
         self.res2net_scale = res2net_scale
+        # stage 0 is the input block, stage i is the i-th superblock
+        self.act_checkpoint_stages = (
+            [] if act_checkpoint_stages is None else list(act_checkpoint_stages)
+        )
 
         self.norm_layer = norm_layer
         norm_groups = None
@@ -127,6 +133,7 @@ class ResNet2dEncoder(NetArch):
 
         # middle blocks
         self.blocks = nn.ModuleList([])
+        self._block_stages = []
         for i in range(num_superblocks):
             repeats_i = self.resb_repeats[i]
             channels_i = self.resb_channels[i]
@@ -155,6 +162,7 @@ class ResNet2dEncoder(NetArch):
             )
 
             self.blocks.append(block_i)
+            self._block_stages.append(i + 1)
             self._context += block_i.context * self._downsample_factor
             self._downsample_factor *= block_i.downsample_factor
 
@@ -175,6 +183,7 @@ class ResNet2dEncoder(NetArch):
                 )
 
                 self.blocks.append(block_i)
+                self._block_stages.append(i + 1)
                 self._context += block_i.context * self._downsample_factor
 
             cur_in_channels = channels_i
@@ -270,9 +279,16 @@ class ResNet2dEncoder(NetArch):
 
     def forward(self, x):
 
-        x = self.in_block(x)
+        if 0 in self.act_checkpoint_stages:
+            x = act_checkpoint(self.in_block, x)
+        else:
+            x = self.in_block(x)
+
         for idx, block in enumerate(self.blocks):
-            x = block(x)
+            if self._block_stages[idx] in self.act_checkpoint_stages:
+                x = act_checkpoint(block, x)
+            else:
+                x = block(x)
 
         if self.head_channels > 0:
             x = self.head_block(x)
@@ -307,6 +323,7 @@ class ResNet2dEncoder(NetArch):
             "use_norm": self.use_norm,
             "norm_layer": self.norm_layer,
             "norm_before": self.norm_before,
+            "act_checkpoint_stages": self.act_checkpoint_stages,
         }
 
         base_config = super().get_config()
@@ -346,6 +363,7 @@ class ResNet2dEncoder(NetArch):
             "use_norm",
             "norm_layer",
             "norm_before",
+            "act_checkpoint_stages",
         )
 
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
@@ -528,6 +546,17 @@ class ResNet2dEncoder(NetArch):
             help=("res2net scaling parameter "),
         )
 
+        parser.add_argument(
+            "--act-checkpoint-stages",
+            default=None,
+            type=int,
+            nargs="+",
+            help=(
+                "stages, 0 for the input block and i for the i-th superblock, "
+                "that use activation checkpointing to save memory in training"
+            ),
+        )
+
         if prefix is not None:
             outer_parser.add_argument("--" + prefix, action=ActionParser(parser=parser))
             # help='ResNet2d encoder options')
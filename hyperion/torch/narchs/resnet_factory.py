@@ -108,6 +108,7 @@ class ResNetFactory(object):
         in_feats=None,
         res2net_scale=4,
         res2net_width_factor=1,
+        act_checkpoint_stages=None,
     ):
 
         try:
@@ -136,6 +137,7 @@ class ResNetFactory(object):
             in_feats=in_feats,
             res2net_scale=res2net_scale,
             res2net_width_factor=res2net_width_factor,
+            act_checkpoint_stages=act_checkpoint_stages,
         )
 
         return resnet
@@ -170,6 +172,7 @@ class ResNetFactory(object):
             "se_r",
             "res2net_scale",
             "res2net_width_factor",
+            "act_checkpoint_stages",
         )
 
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
@@ -286,6 +289,17 @@ class ResNetFactory(object):
             help=("multiplicative factor for the internal width of res2net"),
         )
 
+        parser.add_argument(
+            "--act-checkpoint-stages",
+            default=None,
+            type=int,
+            nargs="+",
+            help=(
+                "stages, from 0 (input block) to 4, that use activation "
+                "checkpointing to save memory in training"
+            ),
+        )
+
         try:
             parser.add_argument("--hid-act", default="relu6", help="hidden activation")
         except:
@@ -14,6 +14,7 @@ from ..layers import NormLayer2dFactory as NLF
 from ..layer_blocks import ResNetInputBlock, ResNetBasicBlock, ResNetBNBlock
 from ..layer_blocks import Res2NetBNBlock, Res2NetBasicBlock
 from ..layer_blocks import BlockSpec, SpineResample, SpineEndpoints, SpineConv
+from ..utils import act_checkpoint
 from .net_arch import NetArch
 
 SPINENET_BLOCK_SPECS = [
@@ -128,7 +129,8 @@ class SpineNet(NetArch):
                  has_se=False,
                  is_res2net=False,
                  res2net_scale=4,
-                 res2net_width_factor=1):
+                 res2net_width_factor=1,
+                 act_checkpoint_stages=None):
         """
         Base class for the SpineNet structure. Based on the paper
         SpineNet: Learning Scale-Permuted Backbone for Recognition and Localization
@@ -149,6 +151,9 @@ class SpineNet(NetArch):
         size is the biggest feature map)
         :param filter_size_scale: SpineNet parameter, that additionally rescales the number of channels of the SpineNet
         blocks(needed for bigger structures like SpineNet96 and higher or for SpineNet49S)
+        :param act_checkpoint_stages: list of stages that use activation checkpointing, i.e., their
+        activations are recomputed in the backward pass instead of being stored. Stage 0 is the
+        input block and the stem, stage i>0 is the i-th scale-permuted block
         """
         super().__init__()
         self.in_channels = in_channels
@@ -169,6 +174,8 @@ class SpineNet(NetArch):
         self.res2net_scale = res2net_scale
         self.res2net_width_factor = res2net_width_factor
         self.is_res2net = is_res2net
+        self.act_checkpoint_stages = [] if act_checkpoint_stages is None else list(
+            act_checkpoint_stages)
 
         self.se_r = se_r
         self.time_se = time_se
@@ -607,10 +614,15 @@ class SpineNet(NetArch):
         if self.in_norm:
             x = self.in_bn(x)
 
-        x = self.in_block(x)
+        if 0 in self.act_checkpoint_stages:
+            x = act_checkpoint(self.in_block, x)
+            feat0 = act_checkpoint(self.stem0, x)
+            feat1 = act_checkpoint(self.stem1, feat0)
+        else:
+            x = self.in_block(x)
+            feat0 = self.stem0(x)
+            feat1 = self.stem1(feat0)
 
-        feat0 = self.stem0(x)
-        feat1 = self.stem1(feat0)
         feats = [feat0, feat1]
 
         output_feats = {}
@@ -637,7 +649,10 @@ class SpineNet(NetArch):
 
             target_feat = self.connections[idx][2](
                 target_feat)  # pass input through the activation function
-            x = self.blocks[idx](target_feat)
+            if idx + 1 in self.act_checkpoint_stages:
+                x = act_checkpoint(self.blocks[idx], target_feat)
+            else:
+                x = self.blocks[idx](target_feat)
 
             feats.append(x)
             num_outgoing_connections.append(0)
@@ -711,7 +726,8 @@ class SpineNet(NetArch):
             'se_r': self.se_r,
             'in_feats': self.in_feats,
             'res2net_scale': self.res2net_scale,
-            'res2net_width_factor': self.res2net_width_factor
+            'res2net_width_factor': self.res2net_width_factor,
+            'act_checkpoint_stages': self.act_checkpoint_stages
         }
 
         base_config = super().get_config()
@@ -60,7 +60,8 @@ class SpineNetFactory(object):
                se_r=16,
                in_feats=None,
                res2net_scale=4,
-               res2net_width_factor=1):
+               res2net_width_factor=1,
+               act_checkpoint_stages=None):
         try:
             spinenet_class = spinenet_dict[spinenet_type]
         except:
@@ -90,7 +91,8 @@ class SpineNetFactory(object):
                                   se_r=se_r,
                                   in_feats=in_feats,
                                   res2net_scale=res2net_scale,
-                                  res2net_width_factor=res2net_width_factor)
+                                  res2net_width_factor=res2net_width_factor,
+                                  act_checkpoint_stages=act_checkpoint_stages)
 
         return spinenet
 
@@ -111,7 +113,8 @@ class SpineNetFactory(object):
                       'in_kernel_size', 'in_stride', 'zero_init_residual',
                       'groups', 'dropout_rate', 'in_norm', 'norm_layer',
                       'norm_before', 'do_maxpool', 'se_r', 'res2net_scale',
-                      'res2net_width_factor', 'in_feats')
+                      'res2net_width_factor', 'in_feats',
+                      'act_checkpoint_stages')
 
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
         return args
@@ -208,6 +211,15 @@ class SpineNetFactory(object):
             type=float,
             help=('multiplicative factor for the internal width of res2net'))
 
+        parser.add_argument(
+            '--act-checkpoint-stages',
+            default=None,
+            type=int,
+            nargs='+',
+            help=('stages, 0 for the stem and i for the i-th scale-permuted '
+                  'block, that use activation checkpointing to save memory '
+                  'in training'))
+
         try:
             parser.add_argument('--hid-act',
                                 default='relu6',
@@ -12,6 +12,7 @@ from ..layers import ActivationFactory as AF
 from ..layers import PosEncoder, RelPosEncoder
 from ..layer_blocks import TransformerEncoderBlockV1 as EBlock
 from ..layer_blocks import TransformerConv2dSubsampler as Conv2dSubsampler
+from ..utils import act_checkpoint
 from .net_arch import NetArch
 
 class TransformerEncoderV1(NetArch):
@@ -43,6 +44,8 @@ class TransformerEncoderV1(NetArch):
       padding_idx: padding idx for embed layer
       in_time_dim: time dimension in the input Tensor
       out_time_dim: dimension that we want to be time in the output tensor
+      act_checkpoint_blocks: indices of the blocks that use activation checkpointing,
+                             i.e., their activations are recomputed in the backward pass
 
     """
 
@@ -64,7 +67,8 @@ class TransformerEncoderV1(NetArch):
                  hid_act='relu6',
                  norm_before=True,
                  concat_after=False,
-                 padding_idx=-1, in_time_dim=-1, out_time_dim=1):
+                 padding_idx=-1, in_time_dim=-1, out_time_dim=1,
+                 act_checkpoint_blocks=None):
 
         super().__init__()
         self.in_feats = in_feats
@@ -90,6 +94,8 @@ class TransformerEncoderV1(NetArch):
         self.in_time_dim = in_time_dim
         self.out_time_dim = out_time_dim
         self.hid_act = hid_act
+        self.act_checkpoint_blocks = (
+            [] if act_checkpoint_blocks is None else list(act_checkpoint_blocks))
 
         self._make_in_layer()
 
@@ -181,7 +187,10 @@ class TransformerEncoderV1(NetArch):
             b_args = {}
 
         for i in range(len(self.blocks)):
-            x, mask = self.blocks[i](x, mask=mask, **b_args)
+            if i in self.act_checkpoint_blocks:
+                x, mask = act_checkpoint(self.blocks[i], x, mask=mask, **b_args)
+            else:
+                x, mask = self.blocks[i](x, mask=mask, **b_args)
 
         if self.norm_before:
             x = self.norm(x)
@@ -220,7 +229,8 @@ class TransformerEncoderV1(NetArch):
                   'concat_after': self.concat_after,
                   'padding_idx': self.padding_idx,
                   'in_time_dim': self.in_time_dim,
-                  'out_time_dim': self.out_time_dim }
+                  'out_time_dim': self.out_time_dim,
+                  'act_checkpoint_blocks': self.act_checkpoint_blocks }
         
         base_config = super().get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -301,7 +311,8 @@ class TransformerEncoderV1(NetArch):
                       'hid_act',
                       'rel_pos_enc',
                       'causal_pos_enc',
-                      'concat_after')
+                      'concat_after',
+                      'act_checkpoint_blocks')
 
         return dict((k, kwargs[k])
                     for k in valid_args if k in kwargs)
@@ -384,6 +395,10 @@ class TransformerEncoderV1(NetArch):
         parser.add_argument('--concat-after', default=False, action='store_true',
                             help='concatenate attention input and output instead of adding')
 
+        parser.add_argument('--act-checkpoint-blocks', default=None, type=int, nargs='+',
+                            help=('indices of the blocks that use activation checkpointing '
+                                  'to save memory in training'))
+
         if prefix is not None:
             outer_parser.add_argument(
                 '--' + prefix,
@@ -48,6 +48,11 @@ class PLDATrainer(TorchTrainer):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
     """
 
     def __init__(
@@ -79,6 +84,11 @@ class PLDATrainer(TorchTrainer):
         swa_lr=1e-3,
         swa_anneal_epochs=10,
         cpu_offload=False,
+        ddp_bucket_cap_mb=25,
+        ddp_grad_as_bucket_view=False,
+        prof={},
+        save_interval_steps=0,
+        save_interval_mins=0,
     ):
 
         if loss is None:
@@ -109,6 +119,11 @@ class PLDATrainer(TorchTrainer):
             swa_lr=swa_lr,
             swa_anneal_epochs=swa_anneal_epochs,
             cpu_offload=cpu_offload,
+            ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+            ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+            prof=prof,
+            save_interval_steps=save_interval_steps,
+            save_interval_mins=save_interval_mins,
         )
 
         self.loss_bce = BCEWithLLR(p_tar)
@@ -130,13 +145,16 @@ class PLDATrainer(TorchTrainer):
         metric_acc = MetricAcc()
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
         for batch, (data, target) in enumerate(data_loader):
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp("h2d")
             batch_size = data.shape[0]
 
             if return_bin:
@@ -160,29 +178,33 @@ class PLDATrainer(TorchTrainer):
                     loss = loss + self.loss_weights["bin"] * loss_bin
 
                 loss = loss / self.grad_acc_steps
+            self.step_prof.stamp("forward")
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp("backward")
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp("optim")
 
-            batch_metrics["loss"] = loss.item() * self.grad_acc_steps
+            batch_metrics["loss"] = loss.detach().double() * self.grad_acc_steps
             if return_bin:
-                batch_metrics["loss_bin"] = loss_bin.item()
+                batch_metrics["loss_bin"] = loss_bin.detach()
             if return_multi:
-                batch_metrics["loss_multi"] = loss_multi.item()
+                batch_metrics["loss_multi"] = loss_multi.detach()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output["multi"], target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs["lr"] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
 
         logs = metric_acc.metrics
         logs["lr"] = self._get_lr()
@@ -228,11 +250,11 @@ class PLDATrainer(TorchTrainer):
                         loss_bin = self.loss_bce(output_bin, target_bin).mean()
                         loss = loss + self.loss_weights["bin"] * loss_bin
 
-                batch_metrics["loss"] = loss.item()
+                batch_metrics["loss"] = loss.detach()
                 if return_bin:
-                    batch_metrics["loss_bin"] = loss_bin.item()
+                    batch_metrics["loss_bin"] = loss_bin.detach()
                 if return_multi:
-                    batch_metrics["loss_multi"] = loss_multi.item()
+                    batch_metrics["loss_multi"] = loss_multi.detach()
                     for k, metric in self.metrics.items():
                         batch_metrics[k] = metric(output["multi"], target)
 
@@ -4,11 +4,15 @@
 """
 
 import os
+import copy
+import glob
 import contextlib
+import threading
 from collections import OrderedDict as ODict
 from enum import Enum
 from jsonargparse import ArgumentParser, ActionParser
 import logging
+import time
 from pathlib import Path
 
 import torch
@@ -19,7 +23,7 @@ import torch.distributed as dist
 
 from fairscale.optim.grad_scaler import ShardedGradScaler
 
-from ..utils import MetricAcc, TorchDDP, FairShardedDDP, FairFullyShardedDDP
+from ..utils import MetricAcc, StepProfiler, TorchDDP, FairShardedDDP, FairFullyShardedDDP
 from ..loggers import LoggerList, CSVLogger, ProgLogger, TensorBoardLogger, WAndBLogger
 from ..optim import OptimizerFactory as OF
 from ..lr_schedulers import LRSchedulerFactory as LRSF
@@ -65,6 +69,14 @@ class TorchTrainer(object):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp.
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp
+                                  buckets, which saves a copy and memory.
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints,
+                              if 0, they are not saved based on steps.
+         save_interval_mins: minutes between mid-epoch checkpoints,
+                             if 0, they are not saved based on time.
     """
 
     def __init__(
@@ -94,6 +106,11 @@ class TorchTrainer(object):
         swa_lr=1e-3,
         swa_anneal_epochs=10,
         cpu_offload=False,
+        ddp_bucket_cap_mb=25,
+        ddp_grad_as_bucket_view=False,
+        prof={},
+        save_interval_steps=0,
+        save_interval_mins=0,
     ):
 
         self.model = model
@@ -103,6 +120,7 @@ class TorchTrainer(object):
         self.cur_epoch = cur_epoch
         self.grad_acc_steps = grad_acc_steps
         self.exp_path = Path(exp_path)
+        self.log_interval = log_interval
 
         if loggers is None:
             self.loggers = self._default_loggers(
@@ -126,6 +144,16 @@ class TorchTrainer(object):
         self.swa_lr = swa_lr
         self.swa_anneal_epochs = swa_anneal_epochs
         self.amp_args = {}
+        self.step_prof = StepProfiler(**prof, trace_path=self.exp_path / "prof")
+        self._ckpt_time = 0
+        self.save_interval_steps = save_interval_steps
+        self.save_interval_mins = save_interval_mins
+        # first batch of the epoch when resuming from a mid-epoch checkpoint
+        self.start_batch = 0
+        self._last_save_time = time.time()
+        self._save_thread = None
+        self._step_ckpt_path = None
+        self._sharded_optim_state = None
 
         if device is not None:
             self.model.to(device)
@@ -139,19 +167,42 @@ class TorchTrainer(object):
         if ddp:
             self.rank = dist.get_rank()
             self.world_size = dist.get_world_size()
+            # cpu processes use gloo, which doesn't support sync batchnorm,
+            # each process keeps its own batchnorm stats
+            on_gpu = device is not None and torch.device(device).type == "cuda"
+            sharded_params = self._get_sharded_params(self.model)
+            assert not sharded_params or ddp_type == DDPType.DDP, (
+                "layers sharded across ranks, e.g. partial-fc, "
+                "are only supported with ddp_type=ddp"
+            )
             if ddp_type == DDPType.DDP or ddp_type == DDPType.OSS_DDP:
-                self.model = nn.SyncBatchNorm.convert_sync_batchnorm(self.model)
+                if on_gpu:
+                    self.model = nn.SyncBatchNorm.convert_sync_batchnorm(self.model)
+                if sharded_params:
+                    # each rank updates its own shard
+                    TorchDDP._set_params_and_buffers_to_ignore_for_model(
+                        self.model, sharded_params
+                    )
                 if self.rank == 0:
                     logging.info(
-                        "training in multiple gpus with distributed-data-parallel"
+                        "training in multiple %s with distributed-data-parallel"
+                        % ("gpus" if on_gpu else "cpu processes")
                     )
                 oss = False if ddp_type == DDPType.DDP else True
                 self.optimizer = self._make_optimizer(optim, self.model, oss=oss)
+                # cpu modules must not set device_ids
+                ddp_devices = (
+                    {"device_ids": [device], "output_device": device} if on_gpu else {}
+                )
                 self.model = TorchDDP(
-                    self.model, device_ids=[device], output_device=device
+                    self.model,
+                    bucket_cap_mb=ddp_bucket_cap_mb,
+                    gradient_as_bucket_view=ddp_grad_as_bucket_view,
+                    **ddp_devices
                 )
             elif ddp_type == DDPType.OSS_SHARDED_DDP:
-                self.model = nn.SyncBatchNorm.convert_sync_batchnorm(self.model)
+                if on_gpu:
+                    self.model = nn.SyncBatchNorm.convert_sync_batchnorm(self.model)
                 if self.rank == 0:
                     logging.info(
                         "training in multiple gpus with fair sharded-distributed-data-parallel"
@@ -220,23 +271,27 @@ class TorchTrainer(object):
             self.in_swa = True
 
         val_logs = {}
+        self._last_save_time = time.time()
         self.loggers.on_train_begin(epochs=self.epochs)
         for epoch in range(self.cur_epoch, self.epochs):
 
-            self.loggers.on_epoch_begin(epoch, batches=len(train_data))
+            self._set_sampler_epoch(train_data, epoch)
+            self.loggers.on_epoch_begin(
+                epoch, batches=len(train_data) - self.start_batch
+            )
             if self.lr_scheduler is not None:
                 # this is needed by cosine scheduler
                 epoch_updates = int(len(train_data) / self.grad_acc_steps)
                 self.lr_scheduler.on_epoch_begin(epoch, epoch_updates=epoch_updates)
 
             logs = self.train_epoch(train_data)
+            self.start_batch = 0
             if val_data is not None:
                 val_logs = self.validation_epoch(val_data)
                 logs.update(val_logs)
 
             self.cur_epoch += 1
 
-            self.loggers.on_epoch_end(logs)
             if self.do_swa and self.cur_epoch >= self.swa_start:
                 self.in_swa = True
                 self.swa_model.update_parameters(self.model)
@@ -245,9 +300,16 @@ class TorchTrainer(object):
                 if self.lr_scheduler is not None:
                     self.lr_scheduler.on_epoch_end(logs)
 
+            t1 = time.time()
             self.save_checkpoint(logs)
+            self._ckpt_time = time.time() - t1
+            self._remove_step_checkpoint()
+            logs.update(self._get_prof_logs())
+            self.loggers.on_epoch_end(logs)
 
+        self._wait_save()
         if self.in_swa:
+            self._set_sampler_epoch(train_data, self.cur_epoch)
             self.loggers.on_epoch_begin(self.cur_epoch, batches=len(train_data))
             self.model = self.swa_model.module
             logs = self.bn_update_epoch(train_data)
@@ -260,6 +322,23 @@ class TorchTrainer(object):
             self.loggers.on_epoch_end(logs)
             self.save_swa_model(logs)
 
+    def _set_sampler_epoch(self, data_loader, epoch):
+        """Sets the epoch and the first batch in the sampler,
+        so the batches of the epoch can be reproduced when resuming training.
+        """
+        sampler = data_loader.batch_sampler
+        if not hasattr(sampler, "set_epoch"):
+            sampler = data_loader.sampler
+
+        if hasattr(sampler, "set_epoch"):
+            sampler.set_epoch(epoch, self.start_batch)
+        elif self.start_batch > 0:
+            logging.warning(
+                "the sampler cannot skip batches, epoch %d starts from the beginning",
+                epoch + 1,
+            )
+            self.start_batch = 0
+
     def set_train_mode(self):
         if self.train_mode == "train":
             self.model.train()
@@ -275,36 +354,42 @@ class TorchTrainer(object):
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
         for batch, (data, target) in enumerate(data_loader):
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp("h2d")
             batch_size = data.shape[0]
             with self.amp_autocast():
                 output = self.model(data)
                 loss = self.loss(output, target).mean() / self.grad_acc_steps
+            self.step_prof.stamp("forward")
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp("backward")
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp("optim")
 
-            self._reduce_metric(loss)
-            batch_metrics["loss"] = loss.item() * self.grad_acc_steps
+            batch_metrics["loss"] = loss.detach().double() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs["lr"] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
             # total_batches += 1
 
         logs = metric_acc.metrics
@@ -337,7 +422,7 @@ class TorchTrainer(object):
                     output = self.model(data, **self.amp_args)
                     loss = self.loss(output, target)
 
-                batch_metrics["loss"] = loss.mean().item()
+                batch_metrics["loss"] = loss.mean().detach()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output, target)
 
@@ -347,14 +432,209 @@ class TorchTrainer(object):
         logs = ODict((log_tag + k, v) for k, v in logs.items())
         return logs
 
+    def _get_batch_logs(self, metric_acc, batch, prefix=""):
+        """Gets the logs passed to the loggers at the end of a batch.
+           To avoid synchronizing with the device every batch, the metrics
+           are only reduced every log_interval batches and transferred to
+           host when the loggers read them.
+
+        Args:
+          metric_acc: MetricAcc object.
+          batch: batch index.
+          prefix: prefix added to the metric names.
+        """
+        if (batch + 1) % self.log_interval == 0:
+            metric_acc.reduce()
+
+        logs = metric_acc.get_lazy_metrics(prefix)
+        logs["lr"] = self._get_lr()
+        if self.step_prof.stages:
+            logs.update((prefix + k, v) for k, v in self.step_prof.metrics.items())
+        return logs
+
+    def _get_prof_logs(self):
+        """Gets the average time per step of the training stages
+        and the time to save the checkpoint in the last epoch.
+        """
+        logs = ODict()
+        if not self.step_prof.stages:
+            return logs
+
+        logs.update(("train_" + k, v) for k, v in self.step_prof.metrics.items())
+        logs["time_ckpt"] = self._ckpt_time
+        return logs
+
     def bn_update_epoch(self, data_loader):
         logs = self.validation_epoch(data_loader, swa_update_bn=True)
         logs["lr"] = self._get_lr()
         return logs
 
+    @staticmethod
+    def _get_sharded_params(model):
+        return [
+            name
+            for name, param in model.named_parameters()
+            if getattr(param, "is_sharded", False)
+        ]
+
+    @staticmethod
+    def _consolidate_sharded_layers(model):
+        """Gathers the parameters of the layers sharded across ranks
+        before saving the model, it has to be called by all the ranks."""
+        for module in model.modules():
+            if getattr(module, "is_sharded", False):
+                module.consolidate_state_dict()
+
+    def _sharded_optim_params(self):
+        """Returns the sharded parameters of the optimizer
+        as a dict indexed by their id in the optimizer state_dict."""
+        ids = self.optimizer.state_dict()["param_groups"]
+        params = {}
+        for group, group_ids in zip(self.optimizer.param_groups, ids):
+            for param, param_id in zip(group["params"], group_ids["params"]):
+                if getattr(param, "is_sharded", False):
+                    params[param_id] = param
+        return params
+
+    def _consolidate_sharded_optim_state(self, recipient_rank=0):
+        """Gathers the optimizer state of the parameters sharded across ranks,
+        e.g., the momentum of the partial-fc kernel,
+        it has to be called by all the ranks.
+        The shards are concatenated along the dimension param.shard_dim.
+        """
+        self._sharded_optim_state = None
+        params = self._sharded_optim_params()
+        if not params:
+            return
+
+        full_state = {}
+        for param_id, param in params.items():
+            dim = getattr(param, "shard_dim", -1)
+            state = self.optimizer.state.get(param, {})
+            full_state[param_id] = {}
+            for k, v in sorted(state.items()):
+                # only the state tensors with the shape of the param are sharded,
+                # the rest, e.g., step counters, are the same in all the ranks
+                if not isinstance(v, torch.Tensor) or v.shape != param.shape:
+                    continue
+                shards = [torch.empty_like(v) for _ in range(self.world_size)]
+                dist.all_gather(shards, v.contiguous())
+                if self.rank == recipient_rank:
+                    full_state[param_id][k] = torch.cat(shards, dim=dim).cpu()
+
+        if self.rank == recipient_rank:
+            self._sharded_optim_state = full_state
+
+    def _optimizer_state_dict(self):
+        """Returns the optimizer state_dict with the full state
+        of the sharded parameters if it has been consolidated."""
+        state_dict = self.optimizer.state_dict()
+        if self._sharded_optim_state is None:
+            return state_dict
+
+        state_dict = copy.copy(state_dict)
+        state_dict["state"] = copy.copy(state_dict["state"])
+        for param_id, full_state in self._sharded_optim_state.items():
+            if param_id in state_dict["state"]:
+                param_state = copy.copy(state_dict["state"][param_id])
+                param_state.update(full_state)
+                state_dict["state"][param_id] = param_state
+
+        self._sharded_optim_state = None
+        return state_dict
+
+    def _shard_optimizer_state_dict(self, state_dict, shards_info):
+        """Takes the shard of this rank from the full state of the
+        sharded parameters in an optimizer state_dict.
+        If the checkpoint doesn't contain the full state or it was
+        sharded with a different number of ranks, the state of those
+        parameters is reset.
+
+        Args:
+          state_dict: optimizer state_dict loaded from the checkpoint.
+          shards_info: dict with the world_size and the ids of the sharded
+                       params when the checkpoint was saved, None if the
+                       checkpoint has no sharded params.
+        """
+        params = self._sharded_optim_params()
+        if shards_info is None:
+            shards_info = {"world_size": None, "param_ids": []}
+
+        param_ids = set(params.keys()) | set(shards_info["param_ids"])
+        if not param_ids:
+            return state_dict
+
+        state_dict = copy.copy(state_dict)
+        state_dict["state"] = copy.copy(state_dict["state"])
+        if shards_info["world_size"] != self.world_size or set(
+            shards_info["param_ids"]
+        ) != set(params.keys()):
+            logging.warning(
+                (
+                    "optimizer state of the sharded params in the checkpoint "
+                    "was saved with world_size=%s != %d, resetting it"
+                )
+                % (str(shards_info["world_size"]), self.world_size)
+            )
+            for param_id in param_ids:
+                state_dict["state"].pop(param_id, None)
+            return state_dict
+
+        for param_id, param in params.items():
+            if param_id not in state_dict["state"]:
+                continue
+            dim = getattr(param, "shard_dim", -1)
+            shard_size = param.shape[dim]
+            param_state = copy.copy(state_dict["state"][param_id])
+            for k, v in param_state.items():
+                if (
+                    isinstance(v, torch.Tensor)
+                    and v.dim() == param.dim()
+                    and v.shape[dim] == shard_size * self.world_size
+                ):
+                    param_state[k] = v.narrow(
+                        dim, self.rank * shard_size, shard_size
+                    ).clone()
+            state_dict["state"][param_id] = param_state
+
+        return state_dict
+
+    @staticmethod
+    def _clip_sharded_grad_norm(model, grad_clip, grad_clip_norm):
+        """Clips the gradients when some parameters are sharded across ranks,
+        the norm includes the gradients of the shards of all the ranks."""
+        params = [p for p in model.parameters() if p.grad is not None]
+        if len(params) == 0:
+            return
+
+        norm_type = float(grad_clip_norm)
+        is_sharded = [getattr(p, "is_sharded", False) for p in params]
+        norms = torch.stack([torch.norm(p.grad.detach(), norm_type) for p in params])
+        is_sharded = torch.as_tensor(is_sharded, device=norms.device)
+        if norm_type == float("inf"):
+            sharded_norm = torch.max(norms * is_sharded)
+            dist.all_reduce(sharded_norm, op=dist.ReduceOp.MAX)
+            total_norm = torch.max(torch.max(norms), sharded_norm)
+        else:
+            norms = norms ** norm_type
+            sharded_norm = torch.sum(norms * is_sharded)
+            dist.all_reduce(sharded_norm)
+            total_norm = (torch.sum(norms * ~is_sharded) + sharded_norm) ** (
+                1.0 / norm_type
+            )
+
+        clip_coef = grad_clip / (total_norm + 1e-6)
+        if clip_coef < 1:
+            for p in params:
+                p.grad.detach().mul_(clip_coef)
+
     def _clip_grad_norm(self, model, optim, grad_clip, grad_clip_norm):
         if self.ddp:
             if self.ddp_type == DDPType.DDP:
+                if self._get_sharded_params(model):
+                    self._clip_sharded_grad_norm(model, grad_clip, grad_clip_norm)
+                    return
+
                 nn.utils.clip_grad_norm_(
                     model.parameters(), grad_clip, norm_type=grad_clip_norm
                 )
@@ -445,34 +725,46 @@ class TorchTrainer(object):
         Args:
           logs: logs containing the current value of the metrics.
         """
+        # the full state of the sharded params is only saved
+        # if it was gathered by _consolidate_state
+        optim_shards = None
+        if self._sharded_optim_state is not None:
+            optim_shards = {
+                "world_size": self.world_size,
+                "param_ids": list(self._sharded_optim_state.keys()),
+            }
+
         checkpoint = {
             "epoch": self.cur_epoch,
             "rng_state": torch.get_rng_state(),
             "model_cfg": self.model.get_config(),
             "model_state_dict": self.model.state_dict(),
-            "optimizer_state_dict": self.optimizer.state_dict(),
+            "optimizer_state_dict": self._optimizer_state_dict(),
             "loss_state_dict": self.loss.state_dict()
             if self.loss is not None
             else None,
         }
+        if optim_shards is not None:
+            checkpoint["optimizer_shards"] = optim_shards
+
         if self.lr_scheduler is not None:
             checkpoint["lr_scheduler_state_dict"] = self.lr_scheduler.state_dict()
 
         if logs is not None:
             checkpoint["logs"] = logs
 
+        if self.use_amp:
+            checkpoint["grad_scaler_state_dict"] = self.grad_scaler.state_dict()
+
         if self.in_swa:
             checkpoint["swa_model_state_dict"] = self.swa_model.state_dict()
             checkpoint["swa_scheduler_state_dict"] = self.swa_scheduler.state_dict()
 
         return checkpoint
 
-    def save_checkpoint(self, logs=None):
-        """Saves a checkpoint of the training status
-
-        Args:
-          logs: logs containing the current value of the metrics.
-        """
+    def _consolidate_state(self):
+        """Gathers the optimizer and layer states sharded across ranks
+        before saving a checkpoint, it has to be called by all the ranks."""
         if self.ddp and (
             self.ddp_type == DDPType.OSS_DDP or self.ddp_type == DDPType.OSS_SHARDED_DDP
         ):
@@ -483,19 +775,147 @@ class TorchTrainer(object):
             # optimizer = cast(OSS, optimizer)
             self.optimizer.consolidate_state_dict()
 
+        if self.ddp:
+            self._consolidate_sharded_layers(self.model)
+            if self.in_swa:
+                self._consolidate_sharded_layers(self.swa_model)
+            self._consolidate_sharded_optim_state()
+
+    def save_checkpoint(self, logs=None):
+        """Saves a checkpoint of the training status
+
+        Args:
+          logs: logs containing the current value of the metrics.
+        """
+        self._consolidate_state()
         if self.rank != 0:
             return
         checkpoint = self.checkpoint(logs)
         file_path = "%s/model_ep%04d.pth" % (self.exp_path, self.cur_epoch)
 
+        self._wait_save()
         torch.save(checkpoint, file_path)
 
+    def _maybe_save_step_checkpoint(self, batch):
+        """Saves a mid-epoch checkpoint when save_interval_steps or
+        save_interval_mins have been reached since the last checkpoint.
+        It has to be called by all the ranks at the end of each training batch.
+
+        Args:
+          batch: batch index in the current pass over the data loader.
+        """
+        num_batches = self.start_batch + batch + 1
+        # we only save after optimizer steps
+        if (batch + 1) % self.grad_acc_steps == 0:
+            save = (
+                self.save_interval_steps > 0
+                and num_batches % self.save_interval_steps == 0
+            )
+            # time is only checked every log_interval batches
+            # to avoid synchronizing the ranks every batch
+            if (
+                not save
+                and self.save_interval_mins > 0
+                and (batch + 1) % self.log_interval == 0
+            ):
+                elapsed = time.time() - self._last_save_time
+                save = elapsed >= 60 * self.save_interval_mins
+                if self.ddp:
+                    # all the ranks take the decision of rank 0
+                    save = torch.as_tensor(int(save), device=self.device)
+                    dist.broadcast(save, 0)
+                    save = bool(save.item())
+
+            if save:
+                self.save_step_checkpoint(num_batches)
+
+        self.step_prof.stamp("step_ckpt")
+
+    def save_step_checkpoint(self, num_batches):
+        """Saves a mid-epoch checkpoint, the checkpoint is
+        written to disk in a background thread.
+
+        Args:
+          num_batches: number of batches of the current epoch already trained.
+        """
+        self._consolidate_state()
+        self._last_save_time = time.time()
+        if self.rank != 0:
+            return
+
+        checkpoint = self.checkpoint()
+        checkpoint["batch"] = num_batches
+        file_path = "%s/model_ep%04d_batch%07d.pth" % (
+            self.exp_path,
+            self.cur_epoch + 1,
+            num_batches,
+        )
+        logging.info("saving mid-epoch checkpoint %s" % (file_path))
+
+        self._wait_save()
+        # the tensors are copied to cpu, so the training can continue
+        # while the checkpoint is written to disk
+        checkpoint = self._copy_to_cpu(checkpoint)
+        prev_file_path = self._step_ckpt_path
+        self._step_ckpt_path = file_path
+        self._save_thread = threading.Thread(
+            target=self._save_step_file, args=(checkpoint, file_path, prev_file_path)
+        )
+        self._save_thread.start()
+
+    @staticmethod
+    def _save_step_file(checkpoint, file_path, prev_file_path=None):
+        try:
+            # we write to a temporary file, so a job killed while saving
+            # does not leave a corrupted checkpoint
+            tmp_path = file_path + ".tmp"
+            torch.save(checkpoint, tmp_path)
+            os.replace(tmp_path, file_path)
+            if prev_file_path is not None and os.path.isfile(prev_file_path):
+                os.remove(prev_file_path)
+        except Exception as e:
+            logging.error("failed to save checkpoint %s: %s" % (file_path, str(e)))
+
+    def _wait_save(self):
+        """Waits until the background thread finishes writing the last checkpoint."""
+        if self._save_thread is not None:
+            self._save_thread.join()
+            self._save_thread = None
+
+    def _remove_step_checkpoint(self):
+        """Removes the last mid-epoch checkpoint once the epoch checkpoint
+        has been saved."""
+        self._wait_save()
+        if self.rank == 0 and self._step_ckpt_path is not None:
+            if os.path.isfile(self._step_ckpt_path):
+                os.remove(self._step_ckpt_path)
+
+        self._step_ckpt_path = None
+
+    @staticmethod
+    def _copy_to_cpu(x):
+        if isinstance(x, torch.Tensor):
+            return x.detach().to("cpu", copy=True)
+
+        if isinstance(x, dict):
+            # shallow copy keeps the dict class and attributes, e.g., _metadata
+            y = copy.copy(x)
+            for k, v in y.items():
+                y[k] = TorchTrainer._copy_to_cpu(v)
+            return y
+
+        if isinstance(x, (list, tuple)) and type(x) in (list, tuple):
+            return type(x)(TorchTrainer._copy_to_cpu(v) for v in x)
+
+        return copy.deepcopy(x)
+
     def save_swa_model(self, logs=None):
         """Saves a checkpoint of the training status
 
         Args:
           logs: logs containing the current value of the metrics.
         """
+        self._consolidate_state()
         if self.rank != 0:
             return
 
@@ -522,15 +942,26 @@ class TorchTrainer(object):
             del dummy
 
         self.cur_epoch = checkpoint["epoch"]
+        # mid-epoch checkpoints contain the number of batches trained in the epoch
+        self.start_batch = checkpoint.get("batch", 0)
+        if self.start_batch > 0:
+            self._step_ckpt_path = file_path
         try:
             self.model.load_state_dict(checkpoint["model_state_dict"])
         except:
             self.model.module.load_state_dict(checkpoint["model_state_dict"])
-        self.optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
+        optimizer_state_dict = self._shard_optimizer_state_dict(
+            checkpoint["optimizer_state_dict"],
+            checkpoint.get("optimizer_shards", None),
+        )
+        self.optimizer.load_state_dict(optimizer_state_dict)
         if self.loss is not None:
             self.loss.load_state_dict(checkpoint["loss_state_dict"])
         if self.lr_scheduler is not None:
             self.lr_scheduler.load_state_dict(checkpoint["lr_scheduler_state_dict"])
+        if self.use_amp and "grad_scaler_state_dict" in checkpoint:
+            self.grad_scaler.load_state_dict(checkpoint["grad_scaler_state_dict"])
+        self._load_extra_state(checkpoint)
 
         # if self.use_amp:
         #    amp.load_state_dict(checkpoint['amp'])
@@ -557,14 +988,26 @@ class TorchTrainer(object):
 
         return logs
 
+    def _load_extra_state(self, checkpoint):
+        """Loads the state of objects added to the checkpoint by
+        derived classes, e.g., data augmentation.
+        """
+        pass
+
     def load_last_checkpoint(self):
         """Loads the last training checkpoint in the experiment dir.
+        It can be the checkpoint at the end of an epoch or a mid-epoch checkpoint.
         """
         for epoch in range(self.epochs, 0, -1):
             file_path = "%s/model_ep%04d.pth" % (self.exp_path, epoch)
             if os.path.isfile(file_path):
                 return self.load_checkpoint(file_path)
 
+            # mid-epoch checkpoints saved while training this epoch
+            file_paths = glob.glob("%s/model_ep%04d_batch*.pth" % (self.exp_path, epoch))
+            if file_paths:
+                return self.load_checkpoint(sorted(file_paths)[-1])
+
         return None
 
     @staticmethod
@@ -583,9 +1026,14 @@ class TorchTrainer(object):
             "optim",
             "lrsched",
             "cpu_offload",
+            "ddp_bucket_cap_mb",
+            "ddp_grad_as_bucket_view",
             "use_tensorboard",
             "use_wandb",
             "wandb",
+            "prof",
+            "save_interval_steps",
+            "save_interval_mins",
         )
         args = dict((k, kwargs[k]) for k in valid_args if k in kwargs)
 
@@ -656,6 +1104,18 @@ class TorchTrainer(object):
             default=False,
             help="CPU offload of gradients when using fully_sharded_ddp",
         )
+        parser.add_argument(
+            "--ddp-bucket-cap-mb",
+            type=float,
+            default=25,
+            help="size in MB of the gradient buckets all-reduced together in ddp",
+        )
+        parser.add_argument(
+            "--ddp-grad-as-bucket-view",
+            action="store_true",
+            default=False,
+            help="gradients are views of the ddp buckets to save memory copies",
+        )
         parser.add_argument(
             "--grad-clip", type=float, default=0, help="gradient clipping norm value"
         )
@@ -681,6 +1141,39 @@ class TorchTrainer(object):
             help="SWA learning rate anneal epochs",
         )
 
+        parser.add_argument(
+            "--prof.stages",
+            action="store_true",
+            default=False,
+            help="measures the time per step of the training stages",
+        )
+        parser.add_argument(
+            "--prof.sync",
+            action="store_true",
+            default=False,
+            help="synchronizes with the GPU before each time stamp of the profiler",
+        )
+        parser.add_argument(
+            "--prof.trace-steps",
+            type=int,
+            nargs=2,
+            default=None,
+            help="first and last global steps traced with torch.profiler",
+        )
+
+        parser.add_argument(
+            "--save-interval-steps",
+            type=int,
+            default=0,
+            help="number of steps between mid-epoch checkpoints, if 0 it is not used",
+        )
+        parser.add_argument(
+            "--save-interval-mins",
+            type=float,
+            default=0,
+            help="minutes between mid-epoch checkpoints, if 0 it is not used",
+        )
+
         parser.add_argument("--exp-path", help="experiment path")
 
         if prefix is not None:
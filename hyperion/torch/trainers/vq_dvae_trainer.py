@@ -6,7 +6,6 @@ import os
 from collections import OrderedDict as ODict
 
 import logging
-import math
 
 import torch
 import torch.nn as nn
@@ -43,6 +42,11 @@ class VQDVAETrainer(DVAETrainer):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
 
     """
     def __init__(self,
@@ -69,7 +73,12 @@ class VQDVAETrainer(DVAETrainer):
                  swa_start=0,
                  swa_lr=1e-3,
                  swa_anneal_epochs=10,
-                 cpu_offload=False):
+                 cpu_offload=False,
+                 ddp_bucket_cap_mb=25,
+                 ddp_grad_as_bucket_view=False,
+                 prof={},
+                 save_interval_steps=0,
+                 save_interval_mins=0):
 
         super().__init__(model,
                          optim,
@@ -94,13 +103,19 @@ class VQDVAETrainer(DVAETrainer):
                          swa_start=swa_start,
                          swa_lr=swa_lr,
                          swa_anneal_epochs=swa_anneal_epochs,
-                         cpu_offload=cpu_offload)
+                         cpu_offload=cpu_offload,
+                         ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                         ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                         prof=prof,
+                         save_interval_steps=save_interval_steps,
+                         save_interval_mins=save_interval_mins)
 
     def train_epoch(self, data_loader):
 
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
 
         for batch, data in enumerate(data_loader):
 
@@ -109,12 +124,14 @@ class VQDVAETrainer(DVAETrainer):
             x_target = data[1]
 
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             x = x.to(self.device)
             x_target = x_target.to(self.device)
+            self.step_prof.stamp('h2d')
             batch_size = x.shape[0]
 
             with self.amp_autocast():
@@ -122,29 +139,33 @@ class VQDVAETrainer(DVAETrainer):
                 loss = output['loss']
                 x_hat = output['x_mean']
                 loss = loss.mean() / self.grad_acc_steps
+            self.step_prof.stamp('forward')
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp('backward')
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp('optim')
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach().double() * self.grad_acc_steps
             for metric in ['elbo', 'log_px', 'kldiv_z', 'vq_loss']:
-                batch_metrics[metric] = output[metric].mean().item()
-            batch_metrics['perplexity'] = math.exp(
-                output['log_perplexity'].mean().item())
+                batch_metrics[metric] = output[metric].mean().detach()
+            batch_metrics['perplexity'] = torch.exp(
+                output['log_perplexity'].mean().detach().double())
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(x_hat, x_target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
 
         logs = metric_acc.metrics
         logs = ODict(('train_' + k, v) for k, v in logs.items())
@@ -180,9 +201,9 @@ class VQDVAETrainer(DVAETrainer):
 
                 x_hat = output['x_mean']
                 for metric in ['loss', 'elbo', 'log_px', 'kldiv_z', 'vq_loss']:
-                    batch_metrics[metric] = output[metric].mean().item()
-                batch_metrics['perplexity'] = math.exp(
-                    output['log_perplexity'].mean().item())
+                    batch_metrics[metric] = output[metric].mean().detach()
+                batch_metrics['perplexity'] = torch.exp(
+                    output['log_perplexity'].mean().detach().double())
 
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(x_hat, x_target)
@@ -48,6 +48,13 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
+         wav_augment: BatchSpeechAugment object to augment the training
+                      waveforms after collation in the training device.
     """
     def __init__(self,
                  model,
@@ -78,7 +85,13 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
                  swa_start=0,
                  swa_lr=1e-3,
                  swa_anneal_epochs=10,
-                 cpu_offload=False):
+                 cpu_offload=False,
+                 ddp_bucket_cap_mb=25,
+                 ddp_grad_as_bucket_view=False,
+                 prof={},
+                 save_interval_steps=0,
+                 save_interval_mins=0,
+                 wav_augment=None):
 
         super().__init__(model,
                          feat_extractor,
@@ -105,7 +118,13 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
                          swa_start=swa_start,
                          swa_lr=swa_lr,
                          swa_anneal_epochs=swa_anneal_epochs,
-                         cpu_offload=cpu_offload)
+                         cpu_offload=cpu_offload,
+                         ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                         ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                         prof=prof,
+                         save_interval_steps=save_interval_steps,
+                         save_interval_mins=save_interval_mins,
+                         wav_augment=wav_augment)
 
         self.attack = attack
         self.attack.to(device)
@@ -132,12 +151,18 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
 
         for batch, (data, target) in enumerate(data_loader):
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp('h2d')
             batch_size = data.shape[0]
+            if self.wav_augment is not None:
+                with torch.no_grad():
+                    data, _ = self.wav_augment(data)
 
             if batch % self.grad_acc_steps == 0:
                 if torch.rand(1) < self.p_attack:
@@ -153,32 +178,38 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
                     self.set_train_mode()
 
                 self.optimizer.zero_grad()
+            self.step_prof.stamp('adv')
 
             with torch.no_grad():
                 feats = self.feat_extractor(data)
+            self.step_prof.stamp('feats')
 
             with self.amp_autocast():
                 output = self.model(feats, target)
                 loss = self.loss(output, target).mean() / self.grad_acc_steps
+            self.step_prof.stamp('forward')
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp('backward')
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp('optim')
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach().double() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
 
         logs = metric_acc.metrics
         logs = ODict(('train_' + k, v) for k, v in logs.items())
@@ -214,7 +245,7 @@ class XVectorAdvTrainerFromWav(XVectorTrainerFromWav):
                     output = self.model(feats)
                     loss = self.loss(output, target)
 
-            batch_metrics['loss'] = loss.mean().item()
+            batch_metrics['loss'] = loss.mean().detach()
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
@@ -58,7 +58,7 @@ class XVectorFinetuner(XVectorTrainer):
                     self.lr_scheduler.on_opt_step()
                 self.optimizer.step()
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach().double() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
             
@@ -87,8 +87,7 @@ class XVectorFinetuner(XVectorTrainer):
             #     #logging.info(str(torch.sum(torch.isnan(output))))
                 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
             #total_batches +=1
 
@@ -70,6 +70,11 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
     """
     def __init__(self,
                  model,
@@ -102,7 +107,12 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
                  swa_start=0,
                  swa_lr=1e-3,
                  swa_anneal_epochs=10,
-                 cpu_offload=False):
+                 cpu_offload=False,
+                 ddp_bucket_cap_mb=25,
+                 ddp_grad_as_bucket_view=False,
+                 prof={},
+                 save_interval_steps=0,
+                 save_interval_mins=0):
 
         super().__init__(model,
                          optim,
@@ -128,7 +138,12 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
                          swa_start=swa_start,
                          swa_lr=swa_lr,
                          swa_anneal_epochs=swa_anneal_epochs,
-                         cpu_offload=cpu_offload)
+                         cpu_offload=cpu_offload,
+                         ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                         ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                         prof=prof,
+                         save_interval_steps=save_interval_steps,
+                         save_interval_mins=save_interval_mins)
 
         self.prior_model = prior_model
         if reg_loss is None or reg_loss == 'l1':
@@ -168,14 +183,17 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
 
         for batch, (data, target) in enumerate(data_loader):
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp('h2d')
             batch_size = data.shape[0]
 
             with self.amp_autocast():
@@ -193,7 +211,7 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
 
                 loss = self.loss(output, target).mean(
                 )  # you need to take the mean here because of the multi-gpu training
-                batch_metrics['loss-classif'] = loss.item()
+                batch_metrics['loss-classif'] = loss.detach().clone()
 
                 prior_outputs = self.prior_model(data,
                                                  target,
@@ -210,7 +228,7 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
                     l = self.reg_layers_enc[i]
                     loss_i = self.reg_loss(h_enc[i], prior_h_enc[i]).mean()
                     loss_name = 'reg-h-enc-%d' % l
-                    batch_metrics[loss_name] = loss_i.item()
+                    batch_metrics[loss_name] = loss_i.detach()
                     loss += loss_scale * loss_i
 
                 n_classif = len(h_classif)
@@ -221,30 +239,33 @@ class XVectorTrainerDeepFeatReg(XVectorTrainer):
                     loss_i = self.reg_loss(h_classif[i],
                                            prior_h_classif[i]).mean()
                     loss_name = 'reg-h-classif-%d' % l
-                    batch_metrics[loss_name] = loss_i.item()
+                    batch_metrics[loss_name] = loss_i.detach()
                     loss += loss_scale * loss_i
 
-                batch_metrics['loss'] = loss.item()
+                batch_metrics['loss'] = loss.detach()
                 loss = loss / self.grad_acc_steps
+            self.step_prof.stamp('forward')
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp('backward')
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp('optim')
 
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs = ODict(('train_' + k, v) for k, v in logs.items())
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch, prefix='train_')
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
             #total_batches +=1
 
         logs = metric_acc.metrics
@@ -50,6 +50,13 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
+         wav_augment: BatchSpeechAugment object to augment the training
+                      waveforms after collation in the training device.
     """
     def __init__(self,
                  model,
@@ -83,7 +90,13 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
                  swa_start=0,
                  swa_lr=1e-3,
                  swa_anneal_epochs=10,
-                 cpu_offload=False):
+                 cpu_offload=False,
+                 ddp_bucket_cap_mb=25,
+                 ddp_grad_as_bucket_view=False,
+                 prof={},
+                 save_interval_steps=0,
+                 save_interval_mins=0,
+                 wav_augment=None):
 
         super().__init__(model,
                          prior_model,
@@ -115,12 +128,19 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
                          swa_start=swa_start,
                          swa_lr=swa_lr,
                          swa_anneal_epochs=swa_anneal_epochs,
-                         cpu_offload=cpu_offload)
+                         cpu_offload=cpu_offload,
+                         ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                         ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                         prof=prof,
+                         save_interval_steps=save_interval_steps,
+                         save_interval_mins=save_interval_mins)
 
         self.feat_extractor = feat_extractor
         if device is not None:
             self.feat_extractor.to(device)
 
+        self.wav_augment = wav_augment
+
         # if data_parallel:
         #     self.feat_extractor = TorchDataParallel(self.feat_extractor)
 
@@ -135,18 +155,24 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
 
         for batch, (data, target) in enumerate(data_loader):
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp('h2d')
             batch_size = data.shape[0]
 
             with torch.no_grad():
+                if self.wav_augment is not None:
+                    data, _ = self.wav_augment(data)
                 feats = self.feat_extractor(data)
+            self.step_prof.stamp('feats')
 
             with self.amp_autocast():
                 # h_enc, h_classif, output = self.model_wrapper(
@@ -163,7 +189,7 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
 
                 loss = self.loss(output, target).mean(
                 )  # you need to take the mean here because of the multi-gpu training
-                batch_metrics['loss-classif'] = loss.item()
+                batch_metrics['loss-classif'] = loss.detach().clone()
 
                 # prior_h_enc, prior_h_classif = self.prior_model_wrapper(
                 #     feats, target, self.reg_layers_enc, self.reg_layers_classif,
@@ -183,7 +209,7 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
                     l = self.reg_layers_enc[i]
                     loss_i = self.reg_loss(h_enc[i], prior_h_enc[i]).mean()
                     loss_name = 'reg-h-enc-%d' % l
-                    batch_metrics[loss_name] = loss_i.item()
+                    batch_metrics[loss_name] = loss_i.detach()
                     loss += loss_scale * loss_i
 
                 n_classif = len(h_classif)
@@ -194,29 +220,33 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
                     loss_i = self.reg_loss(h_classif[i],
                                            prior_h_classif[i]).mean()
                     loss_name = 'reg-h-classif-%d' % l
-                    batch_metrics[loss_name] = loss_i.item()
+                    batch_metrics[loss_name] = loss_i.detach()
                     loss += loss_scale * loss_i
 
-                batch_metrics['loss'] = loss.item()
+                batch_metrics['loss'] = loss.detach()
                 loss = loss / self.grad_acc_steps
+            self.step_prof.stamp('forward')
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp('backward')
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp('optim')
 
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
 
         logs = metric_acc.metrics
         logs = ODict(('train_' + k, v) for k, v in logs.items())
@@ -248,7 +278,7 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
                     output = self.model(feats)
                     loss = self.loss(output, target)
 
-                batch_metrics['loss'] = loss.mean().item()
+                batch_metrics['loss'] = loss.mean().detach()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output, target)
 
@@ -257,3 +287,19 @@ class XVectorTrainerDeepFeatRegFromWav(XVectorTrainerDeepFeatReg):
         logs = metric_acc.metrics
         logs = ODict((log_tag + k, v) for k, v in logs.items())
         return logs
+
+    def checkpoint(self, logs=None):
+        """Creates a checkpoint of the training, to save and posterior recovery.
+           It includes the random state of the batch augmentation.
+
+        Args:
+          logs: logs containing the current value of the metrics.
+        """
+        checkpoint = super().checkpoint(logs)
+        if self.wav_augment is not None:
+            checkpoint['wav_augment_state_dict'] = self.wav_augment.state_dict()
+        return checkpoint
+
+    def _load_extra_state(self, checkpoint):
+        if self.wav_augment is not None and 'wav_augment_state_dict' in checkpoint:
+            self.wav_augment.load_state_dict(checkpoint['wav_augment_state_dict'])
@@ -7,6 +7,8 @@ from collections import OrderedDict as ODict
 
 import logging
 
+import numpy as np
+
 import torch
 import torch.nn as nn
 
@@ -44,6 +46,17 @@ class XVectorTrainerFromWav(XVectorTrainer):
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
          cpu_offload: CPU offload of gradients when using fully sharded ddp
+         ddp_bucket_cap_mb: size of the gradient buckets all-reduced together in ddp
+         ddp_grad_as_bucket_view: if True, the gradients are views of the ddp buckets
+         prof: options dictionary for the step profiler, see StepProfiler
+         save_interval_steps: number of training steps between mid-epoch checkpoints
+         save_interval_mins: minutes between mid-epoch checkpoints
+         wav_augment: BatchSpeechAugment object to augment the training
+                      waveforms after collation in the training device.
+         feat_cache: FeatCache object to store the features of the clean
+                     training chunks. It requires a data loader returning
+                     chunk info, see AudioDataset.return_chunk_info.
+         val_feat_cache: FeatCache object for the validation chunks.
     """
     def __init__(self,
                  model,
@@ -71,7 +84,15 @@ class XVectorTrainerFromWav(XVectorTrainer):
                  swa_start=0,
                  swa_lr=1e-3,
                  swa_anneal_epochs=10,
-                 cpu_offload=False):
+                 cpu_offload=False,
+                 ddp_bucket_cap_mb=25,
+                 ddp_grad_as_bucket_view=False,
+                 prof={},
+                 save_interval_steps=0,
+                 save_interval_mins=0,
+                 wav_augment=None,
+                 feat_cache=None,
+                 val_feat_cache=None):
 
         super().__init__(model,
                          optim,
@@ -97,15 +118,86 @@ class XVectorTrainerFromWav(XVectorTrainer):
                          swa_start=swa_start,
                          swa_lr=swa_lr,
                          swa_anneal_epochs=swa_anneal_epochs,
-                         cpu_offload=cpu_offload)
+                         cpu_offload=cpu_offload,
+                         ddp_bucket_cap_mb=ddp_bucket_cap_mb,
+                         ddp_grad_as_bucket_view=ddp_grad_as_bucket_view,
+                         prof=prof,
+                         save_interval_steps=save_interval_steps,
+                         save_interval_mins=save_interval_mins)
 
         self.feat_extractor = feat_extractor
         if device is not None:
             self.feat_extractor.to(device)
 
+        self.wav_augment = wav_augment
+        self.feat_cache = feat_cache
+        self.val_feat_cache = val_feat_cache
+
         # if ddp:
         #     self.feat_extractor = TorchDDP(self.feat_extractor)
 
+    @staticmethod
+    def _split_batch(batch_data):
+        data, target = batch_data[:2]
+        chunk_info = batch_data[2] if len(batch_data) > 2 else None
+        return data, target, chunk_info
+
+    def extract_feats(self, data, chunk_info=None, feat_cache=None, augmented=None):
+        """Computes the features of a batch of chunks.
+        When there is a feature cache, the features of the clean chunks
+        are read from the cache if they were computed before. The rest
+        are computed by the feature extractor, and the clean ones are
+        written into the cache.
+
+        Args:
+          data: waveforms with shape=(batch, num_samples).
+          chunk_info: chunk info dictionary returned by the data loader.
+          feat_cache: FeatCache object.
+          augmented: boolean tensor indicating the chunks augmented
+                     in the training device (optional).
+
+        Returns:
+          Features tensor.
+        """
+        if feat_cache is None or chunk_info is None:
+            return self.feat_extractor(data)
+
+        clean = ~chunk_info['augmented'].cpu().numpy()
+        if augmented is not None:
+            clean &= ~augmented.cpu().numpy()
+
+        seq_idx = chunk_info['seq_idx'].numpy()
+        frame_offset = chunk_info['frame_offset'].numpy()
+        batch_size = data.shape[0]
+        num_frames = int(
+            self.feat_extractor.audio_feats.compute_num_frames(data.shape[-1]))
+        feats = torch.empty((batch_size, num_frames, feat_cache.feat_dim),
+                            dtype=data.dtype, device=data.device)
+
+        hit = np.zeros((batch_size, ), dtype=bool)
+        clean_idx = np.nonzero(clean)[0]
+        if len(clean_idx) > 0:
+            cached_feats, clean_hit = feat_cache.read(
+                seq_idx[clean_idx], frame_offset[clean_idx], num_frames)
+            hit[clean_idx[clean_hit]] = True
+            if np.any(clean_hit):
+                hit_idx = torch.as_tensor(np.nonzero(hit)[0], device=data.device)
+                feats[hit_idx] = torch.as_tensor(
+                    cached_feats, device=data.device).to(dtype=data.dtype)
+
+        miss = np.nonzero(~hit)[0]
+        if len(miss) > 0:
+            miss_idx = torch.as_tensor(miss, device=data.device)
+            miss_feats = self.feat_extractor.audio_feats(data[miss_idx])
+            feats[miss_idx] = miss_feats
+            write = clean[miss]
+            if np.any(write):
+                feat_cache.write(seq_idx[miss[write]], frame_offset[miss[write]],
+                                 miss_feats[torch.as_tensor(write, device=data.device)]
+                                 .cpu().numpy())
+
+        return self.feat_extractor.process_feats(feats)
+
     def train_epoch(self, data_loader):
         """Training epoch loop
 
@@ -118,39 +210,53 @@ class XVectorTrainerFromWav(XVectorTrainer):
         metric_acc = MetricAcc(device=self.device)
         batch_metrics = ODict()
         self.set_train_mode()
+        self.step_prof.start_epoch()
 
-        for batch, (data, target) in enumerate(data_loader):
+        for batch, batch_data in enumerate(data_loader):
+            data, target, chunk_info = self._split_batch(batch_data)
             self.loggers.on_batch_begin(batch)
+            self.step_prof.start_step()
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
 
             data, target = data.to(self.device), target.to(self.device)
+            self.step_prof.stamp('h2d')
             batch_size = data.shape[0]
             with torch.no_grad():
-                feats = self.feat_extractor(data)
+                augmented = None
+                if self.wav_augment is not None:
+                    data, aug_info = self.wav_augment(data)
+                    augmented = self.wav_augment.is_augmented(aug_info)
+                feats = self.extract_feats(data, chunk_info, self.feat_cache,
+                                           augmented)
+            self.step_prof.stamp('feats')
 
             with self.amp_autocast():
                 output = self.model(feats, target)
                 loss = self.loss(output, target).mean() / self.grad_acc_steps
+            self.step_prof.stamp('forward')
 
             if self.use_amp:
                 self.grad_scaler.scale(loss).backward()
             else:
                 loss.backward()
+            self.step_prof.stamp('backward')
 
             if (batch + 1) % self.grad_acc_steps == 0:
                 if self.lr_scheduler is not None and not self.in_swa:
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
+            self.step_prof.stamp('optim')
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach().double() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            logs = self._get_batch_logs(metric_acc, batch)
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
+            self._maybe_save_step_checkpoint(batch)
+            self.step_prof.end_step()
 
         logs = metric_acc.metrics
         logs = ODict(('train_' + k, v) for k, v in logs.items())
@@ -173,16 +279,18 @@ class XVectorTrainerFromWav(XVectorTrainer):
                 log_tag = 'val_'
                 self.model.eval()
 
-            for batch, (data, target) in enumerate(data_loader):
+            for batch, batch_data in enumerate(data_loader):
+                data, target, chunk_info = self._split_batch(batch_data)
                 data, target = data.to(self.device), target.to(self.device)
                 batch_size = data.shape[0]
 
-                feats = self.feat_extractor(data)
+                feat_cache = self.feat_cache if swa_update_bn else self.val_feat_cache
+                feats = self.extract_feats(data, chunk_info, feat_cache)
                 with self.amp_autocast():
                     output = self.model(feats, **self.amp_args)
                     loss = self.loss(output, target)
 
-                batch_metrics['loss'] = loss.mean().item()
+                batch_metrics['loss'] = loss.mean().detach()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output, target)
 
@@ -191,3 +299,19 @@ class XVectorTrainerFromWav(XVectorTrainer):
         logs = metric_acc.metrics
         logs = ODict((log_tag + k, v) for k, v in logs.items())
         return logs
+
+    def checkpoint(self, logs=None):
+        """Creates a checkpoint of the training, to save and posterior recovery.
+           It includes the random state of the batch augmentation.
+
+        Args:
+          logs: logs containing the current value of the metrics.
+        """
+        checkpoint = super().checkpoint(logs)
+        if self.wav_augment is not None:
+            checkpoint['wav_augment_state_dict'] = self.wav_augment.state_dict()
+        return checkpoint
+
+    def _load_extra_state(self, checkpoint):
+        if self.wav_augment is not None and 'wav_augment_state_dict' in checkpoint:
+            self.wav_augment.load_state_dict(checkpoint['wav_augment_state_dict'])
@@ -4,8 +4,25 @@
 """
 
 from .devices import open_device
+from .misc import seq_lengths_to_mask
+from .act_checkpoint import act_checkpoint
 from .metric_acc import MetricAcc
-from .eval_utils import eval_nnet_by_chunks, eval_nnet_overlap_add
+from .step_profiler import StepProfiler
+from .quantization import (
+    QuantizedRegion,
+    QuantizedResidualBlock,
+    QuantizedSwish,
+    QuantizedSEBlock2d,
+    prepare_int8,
+    convert_int8,
+    quantize_dynamic_int8,
+)
+from .eval_utils import (
+    eval_nnet_by_chunks,
+    eval_nnet_overlap_add,
+    eval_nnet_with_lengths,
+    can_mask_padding,
+)
 from .data_parallel import TorchDataParallel
 from .ddp import TorchDDP, FairShardedDDP, FairFullyShardedDDP
 
@@ -0,0 +1,60 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import contextlib
+
+import torch
+import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
+
+
+@contextlib.contextmanager
+def _frozen_norm_stats(module):
+    """Freezes the running statistics of the batch-norm layers of a module,
+    so they are not updated twice when the forward is recomputed.
+    """
+    norm_layers = [
+        m for m in module.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm)
+    ]
+    momentums = [m.momentum for m in norm_layers]
+    num_batches = [
+        None if m.num_batches_tracked is None else m.num_batches_tracked.clone()
+        for m in norm_layers
+    ]
+    for m in norm_layers:
+        m.momentum = 0.0
+    try:
+        yield
+    finally:
+        for m, momentum, n in zip(norm_layers, momentums, num_batches):
+            m.momentum = momentum
+            if n is not None:
+                m.num_batches_tracked.copy_(n)
+
+
+def act_checkpoint(module, *args, **kwargs):
+    """Calls a module with activation checkpointing.
+    The module activations are not stored for the backward pass,
+    they are recomputed during backward. This saves memory at the cost
+    of an extra forward of the module.
+
+    It does a normal forward call in eval mode or when gradients are disabled.
+
+    Args:
+      module: nn.Module.
+      args, kwargs: arguments of the module forward function.
+
+    Returns:
+      Module outputs.
+    """
+    if not (module.training and torch.is_grad_enabled()):
+        return module(*args, **kwargs)
+
+    return checkpoint(
+        module,
+        *args,
+        use_reentrant=False,
+        context_fn=lambda: (contextlib.nullcontext(), _frozen_norm_stats(module)),
+        **kwargs
+    )
@@ -26,16 +26,90 @@ def add_ddp_args(parser):
                         help='address of the master node')
     parser.add_argument('--master-port', default='1234',
                         help='port of the master node, if None it will be random')
+    parser.add_argument('--num-cpu-procs', type=int, default=1,
+                        help=('number of training processes per node when '
+                              'num-gpus=0, they communicate with the gloo backend'))
+    parser.add_argument('--num-threads-per-proc', type=int, default=0,
+                        help=('number of intra-op threads of each cpu process, '
+                              'if 0, the cores are split among the processes'))
+    parser.add_argument('--bind-cpus', default=False, action='store_true',
+                        help='binds each cpu process to its own subset of cores')
 
 
 def filter_ddp_args(**kwargs):
-    valid_args = ('num_gpus', 'node_id', 'num_nodes', 'master_addr', 'master_port')
+    valid_args = ('num_gpus', 'node_id', 'num_nodes', 'master_addr', 'master_port',
+                  'num_cpu_procs', 'num_threads_per_proc', 'bind_cpus')
     args = dict((k, kwargs[k])
                 for k in valid_args if k in kwargs)
     return args
 
 
-def ddp_init(gpu_id, num_gpus, node_id=0, num_nodes=1, master_addr='localhost', master_port=None):
+def get_num_local_procs(num_gpus, num_cpu_procs=1, **kwargs):
+    """Returns the number of training processes per node."""
+    return num_gpus if num_gpus > 0 else num_cpu_procs
+
+
+def set_cpu_threads(local_rank, num_local_procs, num_threads=0, bind_cpus=False):
+    """Sets the number of intra-op threads of a cpu training process.
+
+    Args:
+      local_rank: rank of the process in the node.
+      num_local_procs: number of processes in the node.
+      num_threads: number of threads, if 0, the cores available
+                   are split among the processes.
+      bind_cpus: if True, the process is bound to its own subset of cores,
+                 so the threads of the processes don't compete for the cores.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count()))
+
+    cpus_per_proc = max(len(cpus) // num_local_procs, 1)
+    if bind_cpus and hasattr(os, 'sched_setaffinity'):
+        first = (local_rank * cpus_per_proc) % len(cpus)
+        proc_cpus = cpus[first:first + cpus_per_proc]
+        os.sched_setaffinity(0, proc_cpus)
+        logging.info('local_rank=%d bound to cpus %s' % (local_rank, proc_cpus))
+
+    if num_threads == 0 and num_local_procs > 1:
+        num_threads = cpus_per_proc
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    logging.info('local_rank=%d uses %d threads' % (
+        local_rank, torch.get_num_threads()))
+
+
+def ddp_init_cpu(local_rank, num_cpu_procs=1, node_id=0, num_nodes=1,
+                 master_addr='localhost', master_port=None,
+                 num_threads_per_proc=0, bind_cpus=False):
+    """Initializes cpu distributed data parallel training with the gloo backend.
+
+    Returns:
+      cpu device, rank and world size.
+    """
+    rank = node_id * num_cpu_procs + local_rank
+    world_size = num_nodes * num_cpu_procs
+    set_cpu_threads(local_rank, num_cpu_procs, num_threads_per_proc, bind_cpus)
+    device = open_device(num_gpus=0)
+    if world_size == 1:
+        return device, 0, 1
+
+    os.environ['MASTER_ADDR'] = master_addr
+    os.environ['MASTER_PORT'] = master_port
+
+    logging.info(f'init gloo ddp rank={rank} world_size={world_size} master={master_addr}:{master_port}')
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    return device, rank, world_size
+
+
+def ddp_init(gpu_id, num_gpus, node_id=0, num_nodes=1, master_addr='localhost', master_port=None,
+             num_cpu_procs=1, num_threads_per_proc=0, bind_cpus=False):
+
+    if num_gpus == 0:
+        return ddp_init_cpu(gpu_id, num_cpu_procs, node_id, num_nodes,
+                            master_addr, master_port, num_threads_per_proc, bind_cpus)
 
     rank = node_id * num_gpus + gpu_id
     world_size = num_nodes * num_gpus
@@ -3,8 +3,15 @@
  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
 """
 
+import logging
 import math
+import warnings
+import weakref
+
 import torch
+import torch.nn as nn
+
+from .misc import seq_lengths_to_mask
 
 def eval_nnet_by_chunks(x, nnet, chunk_length=0, detach_chunks=True, time_dim=-1):
     # model_device = next(nnet.parameters()).device
@@ -350,3 +357,177 @@ def eval_nnet_overlap_add(x, nnet, chunk_length=0, chunk_overlap=None, detach_ch
 
 #     return y
     
+
+
+def _conv_out_lengths(conv, lengths):
+    """Number of valid output frames of a conv layer along the last dim."""
+    padding = conv.padding
+    if isinstance(padding, str):
+        if padding == "same":
+            return lengths
+        padding = 0
+    else:
+        padding = padding[-1]
+    k = conv.kernel_size[-1]
+    s = conv.stride[-1]
+    d = conv.dilation[-1]
+    return torch.div(lengths + 2 * padding - d * (k - 1) - 1, s,
+                     rounding_mode="floor") + 1
+
+
+def _maskable_layer_types():
+    from ..layers.swish import Swish
+    from ..layers.dropout import Dropout1d, DropConnect1d, DropConnect2d
+
+    return (
+        nn.Conv1d, nn.Conv2d, nn.BatchNorm1d, nn.BatchNorm2d,
+        nn.Identity, nn.Dropout, nn.Dropout2d, Dropout1d,
+        DropConnect1d, DropConnect2d, Swish, nn.ReLU, nn.ReLU6,
+        nn.LeakyReLU, nn.PReLU, nn.RReLU, nn.ELU, nn.SELU, nn.CELU,
+        nn.GELU, nn.SiLU, nn.Hardswish, nn.Hardtanh, nn.Sigmoid,
+        nn.Tanh, nn.Softplus)
+
+
+def can_mask_padding(nnet):
+    """Checks whether the padding of a batch can be kept from leaking into
+    the valid frames by zeroing the padded frames at the input of the convs.
+    This is the case for networks made of convolutions with zero padding and
+    frame-wise layers (batch norm, activations). Networks with layers that use
+    global context, e.g., squeeze-excitation or attention, can't be masked.
+    """
+    from ..layer_blocks.se_blocks import SEBlock1d, SEBlock2D, TSEBlock2D
+
+    layer_types = _maskable_layer_types()
+    for m in nnet.modules():
+        if isinstance(m, (SEBlock1d, SEBlock2D, TSEBlock2D)):
+            return False
+        if len(list(m.children())) > 0:
+            continue
+        if type(m) not in layer_types:
+            return False
+        if isinstance(m, nn.modules.conv._ConvNd) and m.padding_mode != "zeros":
+            return False
+
+    return True
+
+
+def _time_size(x):
+    if not torch.jit.is_tracing():
+        return x.size(-1)
+
+    # when tracing, sizes are tensors, they are only used as dict keys,
+    # so the data flow doesn't depend on them being constants
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", torch.jit.TracerWarning)
+        return int(x.size(-1))
+
+
+def _eval_nnet_masked(x, nnet, x_lengths):
+    # lengths of the valid frames indexed by the size of the time dim,
+    # parallel branches at the same resolution have the same lengths
+    in_time = _time_size(x)
+    lengths = {in_time: x_lengths}
+
+    def get_lengths(x):
+        time = _time_size(x)
+        if time not in lengths:
+            # resolution not produced by a conv, e.g., interpolation
+            lengths[time] = torch.ceil(x_lengths * time / in_time).long()
+        return lengths[time]
+
+    def pre_hook(m, inputs):
+        x = inputs[0]
+        mask = seq_lengths_to_mask(
+            get_lengths(x), x.size(-1), dtype=x.dtype, time_dim=x.dim() - 1)
+        return (x * mask,) + tuple(inputs[1:])
+
+    def post_hook(m, inputs, y):
+        lengths[_time_size(y)] = _conv_out_lengths(m, get_lengths(inputs[0]))
+
+    handles = []
+    for m in nnet.modules():
+        if isinstance(m, (nn.Conv1d, nn.Conv2d)):
+            handles.append(m.register_forward_pre_hook(pre_hook))
+            handles.append(m.register_forward_hook(post_hook))
+    try:
+        y = nnet(x)
+    finally:
+        for h in handles:
+            h.remove()
+
+    return y, get_lengths(y)
+
+
+# networks that already logged that they are evaluated utterance by utterance
+_per_utt_nnets = weakref.WeakSet()
+
+
+def _log_per_utt(nnet, chunk_length, by_chunks):
+    if nnet in _per_utt_nnets:
+        return
+
+    _per_utt_nnets.add(nnet)
+    if by_chunks:
+        reason = "it is evaluated by chunks of %d frames" % chunk_length
+    else:
+        reason = "the padding can't be masked in %s" % nnet.__class__.__name__
+    logging.info("evaluating the batch utterance by utterance, since %s" % reason)
+
+
+def eval_nnet_with_lengths(
+    x, nnet, x_lengths, chunk_length=0, detach_chunks=True
+):
+    """Evaluates a network on a zero-padded batch of sequences
+    with different lengths, so that the valid frames of the output
+    are the same as evaluating each sequence on its own.
+
+    If the network can be masked (see can_mask_padding), the batch is
+    evaluated at once zeroing the padded frames at the input of the convs.
+    Otherwise, or if the sequences are evaluated by chunks,
+    the sequences are evaluated one by one.
+
+    Args:
+      x: input tensor with shape=(batch, ..., time).
+      nnet: network.
+      x_lengths: number of valid frames of each sequence.
+      chunk_length: if > 0, sequences are evaluated by chunks.
+      detach_chunks: detach the outputs from the graph.
+
+    Returns:
+      Output tensor with shape=(batch, ..., out_time),
+      zero-padded or with garbage in the padded frames.
+      Number of valid output frames of each sequence.
+    """
+    device = None if nnet.device == x.device else nnet.device
+    if device is not None:
+        x = x.to(device)
+        x_lengths = x_lengths.to(device)
+
+    by_chunks = chunk_length > 0 and x.size(-1) > chunk_length
+    if not by_chunks:
+        if torch.jit.is_tracing() or can_mask_padding(nnet):
+            # traced graphs can't loop over the batch,
+            # non maskable networks get the padded batch
+            y, y_lengths = _eval_nnet_masked(x, nnet, x_lengths)
+            if detach_chunks:
+                y = y.detach()
+            return y, y_lengths
+
+    _log_per_utt(nnet, chunk_length, by_chunks)
+    y = []
+    y_lengths = []
+    for i in range(x.size(0)):
+        x_i = x[i : i + 1, ..., : int(x_lengths[i])]
+        y_i = eval_nnet_by_chunks(
+            x_i, nnet, chunk_length, detach_chunks=detach_chunks
+        )
+        y.append(y_i)
+        y_lengths.append(y_i.size(-1))
+
+    max_length = max(y_lengths)
+    y = torch.cat(
+        [nn.functional.pad(y_i, (0, max_length - y_i.size(-1))) for y_i in y],
+        dim=0,
+    )
+    y_lengths = torch.as_tensor(y_lengths, dtype=torch.long, device=y.device)
+    return y, y_lengths
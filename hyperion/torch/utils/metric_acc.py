@@ -4,6 +4,7 @@
 """
 import logging
 from collections import OrderedDict as ODict
+from collections.abc import MutableMapping
 import numpy as np
 
 import torch
@@ -11,12 +12,19 @@ import torch.distributed as dist
 
 class MetricAcc(object):
     """Class to accumulate metrics during an epoch.
+
+       The metrics of each batch can be device tensors, they are
+       kept in the device until the metrics are reduced,
+       so the training loop doesn't need to synchronize with the
+       device every batch.
     """
     def __init__(self, device=None):
         self.keys = None
         self.acc = None
         self.count = 0
         self.device = device
+        self._pending_values = []
+        self._pending_samples = []
         try:
             rank = dist.get_rank()
             world_size = dist.get_world_size()
@@ -31,64 +39,154 @@ class MetricAcc(object):
         """Resets the accumulators.
         """
         self.count = 0
+        self._pending_values = []
+        self._pending_samples = []
         if self.acc is not None:
             self.acc[:] = 0
 
 
-    def _reduce(self, metrics):
-        if self.world_size == 1:
+    def reduce(self):
+        """Reduces the metrics of the batches received since the last call
+           across processes and adds them to the accumulators.
+
+           When using DDP, all the processes need to call this method at the same time.
+        """
+        if len(self._pending_values) == 0:
+            return
+
+        device = 'cpu' if self.device is None else self.device
+        metrics_tensor = torch.stack([
+            torch.stack([torch.as_tensor(v, dtype=torch.float64, device=device)
+                         for v in values]) for values in self._pending_values])
+        num_samples = self._pending_samples
+        self._pending_values = []
+        self._pending_samples = []
+        if self.world_size > 1:
+            dist.reduce(metrics_tensor, 0, op=dist.ReduceOp.SUM)
+            metrics_tensor /= self.world_size
+
+        if self.rank != 0:
             return
 
-        metrics_list = [v for k,v in metrics.items()]
-        metrics_tensor = torch.tensor(metrics_list, device=self.device)
-        dist.reduce(metrics_tensor, 0, op=dist.ReduceOp.SUM)
-        metrics_tensor /= self.world_size
-        for i,k in enumerate(metrics.keys()):
-            metrics[k] = metrics_tensor[i]
-        
-            
-        
+        if self.acc is None:
+            self.acc = np.zeros((len(self.keys),))
+
+        metrics_tensor = metrics_tensor.cpu().numpy()
+        for n, metrics in zip(num_samples, metrics_tensor):
+            self.count += n
+            r = n/self.count
+            for i in range(len(self.keys)):
+                self.acc[i] += r * (metrics[i] - self.acc[i])
+
+
     def update(self, metrics, num_samples=1):
         """Updates the values of the metric
 
            It uses recursive formula, it may be more numerically stable
 
                m^(i) = m^(i-1) + n^(i)/sum(n^(i)) (x^(i) - m^(i-1))
-               
-              where i is the batch number, 
+
+              where i is the batch number,
               m^(i) is the accumulated average of the metric at batch i,
               x^(i) is the average of the metric at batch i,
               n^(i) is the batch_size at batch i.
-              
+
+           The accumulators are not updated until the metrics are reduced.
+
            Args:
-               metrics: dictionary with metrics for current batch
+               metrics: dictionary with metrics for current batch,
+                        the values can be floats or scalar tensors.
                num_samples: number of samples in current batch (batch_size)
         """
-        self._reduce(metrics)
-        if self.rank != 0:
-            return
-
         if self.keys is None:
-            self.keys = metrics.keys()
-            self.acc = np.zeros((len(self.keys),))
+            self.keys = list(metrics.keys())
 
-        self.count += num_samples
-        r = num_samples/self.count
-        for i, k in enumerate(self.keys):
-            self.acc[i] += r * (metrics[k] - self.acc[i])
+        values = []
+        for k in self.keys:
+            v = metrics[k]
+            if isinstance(v, torch.Tensor):
+                v = v.detach()
+            values.append(v)
 
+        self._pending_values.append(values)
+        self._pending_samples.append(num_samples)
 
 
-    @property
-    def metrics(self):
-        """ Returns metrics dictionary
-        """
-        if self.rank != 0:
-            return {}
+    def _get_metrics(self):
+        if self.rank != 0 or self.acc is None:
+            return ODict()
+
         logs = ODict()
         for i,k in enumerate(self.keys):
             logs[k] = self.acc[i]
 
         return logs
-                                
-        
+
+
+    @property
+    def metrics(self):
+        """ Returns metrics dictionary.
+            When using DDP, all the processes need to call it at the same time.
+        """
+        self.reduce()
+        return self._get_metrics()
+
+
+    def get_lazy_metrics(self, prefix=''):
+        """ Returns metrics dictionary whose values are only transferred
+            to host when they are read.
+
+            When using DDP, it contains the metrics at the last call of reduce,
+            so it can be read by a single process.
+
+            Args:
+              prefix: prefix added to the metric names.
+        """
+        get_metrics = (lambda: self.metrics) if self.world_size == 1 else self._get_metrics
+        return LazyMetrics(
+            lambda: ODict((prefix + k, v) for k, v in get_metrics().items()))
+
+
+
+class LazyMetrics(MutableMapping):
+    """Dictionary of metrics that are computed the first time
+       that they are read.
+
+       Attributes:
+         get_metrics: function returning the metrics dictionary.
+    """
+    def __init__(self, get_metrics):
+        self._get_metrics = get_metrics
+        self._metrics = None
+        self._extra = ODict()
+
+
+    @property
+    def _items(self):
+        if self._metrics is None:
+            self._metrics = self._get_metrics()
+            self._metrics.update(self._extra)
+        return self._metrics
+
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+
+    def __setitem__(self, key, value):
+        if self._metrics is None:
+            self._extra[key] = value
+        else:
+            self._metrics[key] = value
+
+
+    def __delitem__(self, key):
+        del self._items[key]
+
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+    def __len__(self):
+        return len(self._items)
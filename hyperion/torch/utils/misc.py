@@ -54,3 +54,35 @@ def get_selfsim_tarnon(y, return_mask=False):
 
 
 
+
+
+def seq_lengths_to_mask(lengths, max_length=None, dtype=None, time_dim=1):
+    """Creates a binary mask with the valid frames of each sequence.
+
+    Args:
+      lengths: sequence lengths with shape=(batch,)
+      max_length: maximum length of the sequences, by default max(lengths).
+      dtype: dtype of the mask, by default torch.bool.
+      time_dim: dimension of the time axis (> 0), the mask has ones in
+                the dimensions between the batch and time dimensions, so
+                it can be broadcasted to features with shape=(batch, ..., time).
+
+    Returns:
+      Mask with shape=(batch, max_length) if time_dim=1, or with
+      shape=(batch, 1, ..., 1, max_length) otherwise.
+    """
+    if max_length is None:
+        max_length = int(lengths.max())
+    idx = torch.arange(max_length, dtype=lengths.dtype, device=lengths.device)
+    mask = idx.unsqueeze(0) < lengths.unsqueeze(1)
+
+    if time_dim != 1:
+        assert time_dim > 0
+        # unsqueeze instead of view, so traced graphs keep dynamic shapes
+        for _ in range(time_dim - 1):
+            mask = mask.unsqueeze(1)
+
+    if dtype is not None:
+        mask = mask.to(dtype)
+
+    return mask
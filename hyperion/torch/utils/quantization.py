@@ -0,0 +1,464 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import logging
+
+import torch
+import torch.nn as nn
+import torch.ao.quantization as tq
+
+
+class QuantizedRegion(nn.Module):
+    """Runs a group of layers, e.g., a residual stage, with int8 weights and
+    activations in post-training static quantization. The input is
+    quantized once before the first layer and the output is dequantized
+    after the last one, so the activations stay in int8 between the layers.
+
+    Attributes:
+      layers: module that runs on quantized tensors.
+      out_channels: output channels of the block that it replaces.
+    """
+
+    def __init__(self, layers, out_channels=None):
+        super().__init__()
+        self.quant = tq.QuantStub()
+        self.layers = layers
+        self.dequant = tq.DeQuantStub()
+        self.out_channels = out_channels
+
+    def __getitem__(self, idx):
+        # it can be indexed like the stage that it replaces
+        return self.layers[idx]
+
+    def __len__(self):
+        return len(self.layers)
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.layers(x)
+        # quantized convs can return channels-last tensors,
+        # which break the views of the layers after them
+        return self.dequant(x.contiguous())
+
+
+class QuantizedResidualBlock(nn.Module):
+    """Residual block with the conv, batchnorm and relu layers
+    fused for int8 inference, e.g., ResNet, ResETDNN or MBConv blocks.
+    The residual connection is added with a quantized add,
+    so the block runs on quantized tensors.
+
+    Attributes:
+      convs: fused layers of the main branch.
+      downsample: fused layers of the residual branch or None.
+      act: activation after the residual addition or None.
+      post: layers after the activation, e.g., batchnorm after
+            the activation, or None.
+      out_channels: output channels of the block.
+    """
+
+    def __init__(self, convs, downsample=None, act=None, post=None, out_channels=None):
+        super().__init__()
+        self.convs = convs
+        self.downsample = downsample
+        self.act = act
+        self.post = post
+        self.out_channels = out_channels
+        self.skip_add = nn.quantized.FloatFunctional()
+
+    def forward(self, x):
+        residual = x if self.downsample is None else self.downsample(x)
+        x = self.convs(x)
+        if _is_relu(self.act):
+            x = self.skip_add.add_relu(x, residual)
+        else:
+            x = self.skip_add.add(x, residual)
+            if self.act is not None:
+                x = self.act(x)
+
+        if self.post is not None:
+            x = self.post(x)
+        return x
+
+
+class QuantizedSwish(nn.Module):
+    """Swish activation x * sigmoid(x) on quantized tensors."""
+
+    def __init__(self):
+        super().__init__()
+        self.mul = nn.quantized.FloatFunctional()
+
+    def forward(self, x):
+        return self.mul.mul(x, torch.sigmoid(x))
+
+
+class QuantizedSEBlock2d(nn.Module):
+    """Squeeze-excitation block on quantized tensors.
+
+    Attributes:
+      conv1: fused conv(-relu) of the squeeze layer.
+      act: activation of the squeeze layer or None if fused with conv1.
+      conv2: conv of the excitation layer.
+      num_channels_1d: if not None, the pooling is only done in time
+                       like in TSEBlock2D.
+    """
+
+    def __init__(self, conv1, act, conv2, num_channels_1d=None):
+        super().__init__()
+        self.conv1 = conv1
+        self.act = act
+        self.conv2 = conv2
+        self.num_channels_1d = num_channels_1d
+        self.mul = nn.quantized.FloatFunctional()
+
+    def forward(self, x):
+        if self.num_channels_1d is None:
+            z = torch.mean(x, dim=(2, 3), keepdim=True)
+        else:
+            z = torch.mean(x, dim=-1, keepdim=True)
+            z = z.reshape(-1, self.num_channels_1d, 1, 1)
+
+        z = self.conv1(z)
+        if self.act is not None:
+            z = self.act(z)
+        scale = torch.sigmoid(self.conv2(z))
+        if self.num_channels_1d is not None:
+            scale = scale.reshape(-1, x.shape[1], x.shape[2], 1)
+        return self.mul.mul(scale, x)
+
+
+class _NotQuantizable(Exception):
+    pass
+
+
+# activations with int8 kernels
+_quant_act_types = (
+    nn.ReLU,
+    nn.ReLU6,
+    nn.Hardtanh,
+    nn.LeakyReLU,
+    nn.ELU,
+    nn.Hardswish,
+    nn.Sigmoid,
+    nn.Tanh,
+)
+
+
+def _is_relu(act):
+    return type(act) == nn.ReLU
+
+
+def _quant_act(act):
+    """Returns a version of the activation that runs on quantized tensors."""
+    # avoids circular imports
+    from ..layers.swish import Swish
+
+    if act is None or type(act) in _quant_act_types:
+        return act
+    if type(act) in (Swish, nn.SiLU):
+        return QuantizedSwish()
+    raise _NotQuantizable()
+
+
+def _fuse(*layers):
+    """Fuses conv + batchnorm (+ relu) into a single float layer."""
+    names = [str(i) for i in range(len(layers))]
+    return tq.fuse_modules(nn.Sequential(*layers).eval(), [names])[0]
+
+
+class BatchNorm1dAs2d(nn.Module):
+    """Runs a BatchNorm1d as a BatchNorm2d, which has an int8 kernel.
+
+    Attributes:
+      bn: BatchNorm2d with the parameters and statistics of the BatchNorm1d.
+    """
+
+    def __init__(self, bn):
+        super().__init__()
+        self.bn = _bn_as_2d(bn)
+
+    def forward(self, x):
+        return self.bn(x.unsqueeze(-1)).squeeze(-1)
+
+
+def _bn_as_2d(bn):
+    """Copies a batchnorm into an affine BatchNorm2d in eval mode."""
+    bn2d = nn.BatchNorm2d(bn.num_features, eps=bn.eps)
+    bn2d.running_mean.copy_(bn.running_mean)
+    bn2d.running_var.copy_(bn.running_var)
+    if bn.affine:
+        bn2d.weight.data.copy_(bn.weight.data)
+        bn2d.bias.data.copy_(bn.bias.data)
+    return bn2d.eval()
+
+
+def _bn_after_act(bn):
+    """Batchnorm after the activation, it can't be fused with the conv,
+    so it runs with the int8 batchnorm kernel."""
+    if type(bn) == nn.BatchNorm1d:
+        return BatchNorm1dAs2d(bn)
+    if type(bn) == nn.BatchNorm2d:
+        return _bn_as_2d(bn)
+    raise _NotQuantizable()
+
+
+def _fuse_conv_bn_act(conv, bn=None, act=None, norm_before=True):
+    """Returns a list of layers equivalent to conv -> bn -> act if
+    norm_before=True or to conv -> act -> bn otherwise,
+    that run on quantized tensors."""
+    if bn is not None and (
+        type(bn) not in (nn.BatchNorm1d, nn.BatchNorm2d) or bn.running_mean is None
+    ):
+        raise _NotQuantizable()
+
+    if bn is None or not norm_before:
+        layers = [_fuse(conv, act)] if _is_relu(act) else [conv, _quant_act(act)]
+        if bn is not None:
+            layers.append(_bn_after_act(bn))
+    elif _is_relu(act):
+        layers = [_fuse(conv, bn, act)]
+    else:
+        layers = [_fuse(conv, bn), _quant_act(act)]
+
+    return [layer for layer in layers if layer is not None]
+
+
+def _fuse_se_block(se_layer):
+    from ..layer_blocks import SEBlock2D, TSEBlock2D
+
+    if type(se_layer) not in (SEBlock2D, TSEBlock2D):
+        raise _NotQuantizable()
+
+    conv1 = _fuse_conv_bn_act(se_layer.conv1, act=se_layer.act)
+    act = conv1[1] if len(conv1) > 1 else None
+    num_channels_1d = getattr(se_layer, "num_channels_1d", None)
+    return QuantizedSEBlock2d(conv1[0], act, se_layer.conv2, num_channels_1d)
+
+
+def _fuse_resnet_block(block):
+    norm_before = block.norm_before
+    if hasattr(block, "conv3"):
+        # bottleneck block
+        convs = _fuse_conv_bn_act(block.conv1, block.bn1, block.act1, norm_before)
+        convs += _fuse_conv_bn_act(block.conv2, block.bn2, block.act2, norm_before)
+        conv_out, bn_out, act_out = block.conv3, block.bn3, block.act3
+    else:
+        convs = _fuse_conv_bn_act(block.conv1, block.bn1, block.act1, norm_before)
+        conv_out, bn_out, act_out = block.conv2, block.bn2, block.act2
+
+    convs += _fuse_conv_bn_act(conv_out, bn_out if norm_before else None)
+    if hasattr(block, "se_layer"):
+        convs.append(_fuse_se_block(block.se_layer))
+
+    downsample = block.downsample
+    if downsample is not None and norm_before:
+        downsample = _fuse(*downsample)
+
+    post = None if norm_before else _bn_after_act(bn_out)
+    # dropout is the identity in eval mode
+    return QuantizedResidualBlock(
+        nn.Sequential(*convs),
+        downsample,
+        _quant_act(act_out),
+        post,
+        block.out_channels,
+    )
+
+
+def _fuse_tdnn_block(block, residual=False):
+    norm_before = block.norm_before
+    bn1 = getattr(block, "bn1", None)
+    if hasattr(block, "conv2"):
+        # ETDNN or ResETDNN block
+        bn2 = getattr(block, "bn2", None)
+        convs = _fuse_conv_bn_act(block.conv1, bn1, block.activation1, norm_before)
+        if not residual:
+            convs += _fuse_conv_bn_act(
+                block.conv2, bn2, block.activation2, norm_before
+            )
+            return nn.Sequential(*convs)
+
+        convs += _fuse_conv_bn_act(block.conv2, bn2 if norm_before else None)
+        post = None if norm_before or bn2 is None else _bn_after_act(bn2)
+        return QuantizedResidualBlock(
+            nn.Sequential(*convs), None, _quant_act(block.activation2), post
+        )
+
+    return nn.Sequential(
+        *_fuse_conv_bn_act(block.conv1, bn1, block.activation, norm_before)
+    )
+
+
+def _fuse_mbconv_block(block):
+    if not hasattr(block, "conv_dw"):
+        # input and output blocks
+        return nn.Sequential(*_fuse_conv_bn_act(block.conv, block.bn, block.act))
+
+    convs = []
+    if block.expansion > 1:
+        convs += _fuse_conv_bn_act(block.conv_exp, block.bn_exp, block.act)
+    convs += _fuse_conv_bn_act(block.conv_dw, block.bn_dw, block.act)
+    if block.has_se:
+        convs.append(_fuse_se_block(block.se_layer))
+    convs += _fuse_conv_bn_act(block.conv_proj, block.bn_proj)
+
+    downsample = block.downsample
+    if downsample is not None:
+        downsample = _fuse(*downsample)
+
+    # drop-connect is the identity in eval mode
+    return QuantizedResidualBlock(
+        nn.Sequential(*convs), downsample, out_channels=block.out_channels
+    )
+
+
+def _fuse_block(block):
+    """Returns the fused version of a block to run in int8,
+    or None if the block type is not supported."""
+    # avoids circular imports
+    from ..layer_blocks import (
+        ResNetInputBlock,
+        ResNetBasicBlock,
+        ResNetBNBlock,
+        SEResNetBasicBlock,
+        SEResNetBNBlock,
+        TDNNBlock,
+        ETDNNBlock,
+        ResETDNNBlock,
+        MBConvBlock,
+        MBConvInOutBlock,
+    )
+
+    try:
+        if type(block) == ResNetInputBlock:
+            layers = _fuse_conv_bn_act(
+                block.conv, block.bn, block.act, block.norm_before
+            )
+            if block.do_maxpool:
+                layers.append(block.maxpool)
+            return nn.Sequential(*layers)
+
+        if type(block) in (
+            ResNetBasicBlock,
+            ResNetBNBlock,
+            SEResNetBasicBlock,
+            SEResNetBNBlock,
+        ):
+            return _fuse_resnet_block(block)
+
+        if type(block) in (TDNNBlock, ETDNNBlock, ResETDNNBlock):
+            return _fuse_tdnn_block(block, residual=type(block) == ResETDNNBlock)
+
+        if type(block) in (MBConvBlock, MBConvInOutBlock):
+            return _fuse_mbconv_block(block)
+
+    except _NotQuantizable:
+        pass
+
+    return None
+
+
+def _fuse_region(module):
+    """Fuses a block or a sequence of blocks, returns None if
+    some of the blocks are not supported."""
+    if type(module) != nn.Sequential:
+        return _fuse_block(module)
+
+    blocks = [_fuse_block(block) for block in module]
+    if len(blocks) == 0 or any(block is None for block in blocks):
+        return None
+    return nn.Sequential(*blocks)
+
+
+def _wrap_regions(module, qconfig):
+    num_regions = 0
+    for name, child in module.named_children():
+        region = _fuse_region(child)
+        if region is None:
+            num_regions += _wrap_regions(child, qconfig)
+            continue
+
+        region = QuantizedRegion(region, getattr(child, "out_channels", None))
+        region.qconfig = qconfig
+        setattr(module, name, region)
+        num_regions += 1
+
+    return num_regions
+
+
+def _float_convs(module):
+    """Counts the conv layers that are not in a quantized region."""
+    if isinstance(module, QuantizedRegion):
+        return 0
+    n = int(isinstance(module, (nn.Conv1d, nn.Conv2d)))
+    return n + sum(_float_convs(child) for child in module.children())
+
+
+def prepare_int8(model, backend="fbgemm"):
+    """Prepares a model for post-training static int8 quantization.
+    The conv, batchnorm and relu layers of the ResNet, SE-ResNet,
+    TDNN, ETDNN, ResETDNN and EfficientNet blocks are fused and each
+    block or sequence of blocks, e.g., a residual stage, is wrapped with
+    a QuantizedRegion, so it runs in int8 with a single pair of
+    quant/dequant stubs. Batchnorms after the activation use the int8
+    batchnorm kernel and other activations than relu, e.g., relu6
+    or swish, run on the quantized tensors.
+    Observers are inserted to measure the ranges of the activations.
+    Then, the model has to be run on some calibration data before
+    calling convert_int8.
+
+    Args:
+      model: float model in eval mode, it is modified in place.
+      backend: quantized engine in (fbgemm, qnnpack).
+
+    Returns:
+      Model with observers.
+    """
+    torch.backends.quantized.engine = backend
+    qconfig = tq.get_default_qconfig(backend)
+    num_float_convs = _float_convs(model)
+    num_regions = _wrap_regions(model, qconfig)
+    if num_regions == 0:
+        raise ValueError(
+            "%s has no blocks supported by int8 static quantization"
+            % (model.__class__.__name__)
+        )
+
+    num_float_convs_q = _float_convs(model)
+    if num_float_convs_q > 0:
+        logging.warning(
+            "%d/%d conv layers of %s are not supported by int8 quantization, "
+            "they will run in float"
+            % (num_float_convs_q, num_float_convs, model.__class__.__name__)
+        )
+    return tq.prepare(model, inplace=True)
+
+
+def convert_int8(model):
+    """Converts a model calibrated after prepare_int8 to int8.
+    Quantized layers only run on CPU.
+
+    Args:
+      model: calibrated model, it is modified in place.
+
+    Returns:
+      Quantized model.
+    """
+    return tq.convert(model, inplace=True)
+
+
+def quantize_dynamic_int8(model, layer_types=(nn.Linear,)):
+    """Dynamic int8 quantization, the weights are stored in int8 and
+    the activations are quantized on the fly, so it doesn't need
+    calibration. It is suited for the linear embedding layers.
+
+    Args:
+      model: float model in eval mode, it is modified in place.
+      layer_types: types of the layers to quantize.
+
+    Returns:
+      Quantized model.
+    """
+    return tq.quantize_dynamic(
+        model, set(layer_types), dtype=torch.qint8, inplace=True
+    )
@@ -0,0 +1,140 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+import time
+import logging
+from collections import OrderedDict as ODict
+
+import torch
+import torch.distributed as dist
+
+
+class StepProfiler(object):
+    """Measures the time spent in the stages of the training steps,
+    e.g., waiting for data, host to device copy, forward, backward, optimizer.
+
+    The training loop calls start_step() when it receives the batch,
+    stamp(stage) at the end of each stage and end_step() at the end of the step.
+    The time since the previous step ended until start_step is the data wait time.
+
+    Attributes:
+      stages: if True, it measures the time of the stages.
+      sync: if True, it synchronizes with the CUDA device before each time stamp,
+            so the GPU time is assigned to the stage that launched the kernels.
+            Otherwise, it measures host time.
+      trace_steps: (first, last) global steps traced with torch.profiler,
+                   if None, no trace is recorded.
+      trace_path: directory where the traces are saved.
+    """
+
+    def __init__(self, stages=False, sync=False, trace_steps=None, trace_path="./prof"):
+        self.stages = stages
+        self.sync = sync and torch.cuda.is_available()
+        self.trace_steps = trace_steps
+        self.trace_path = trace_path
+        self.global_step = 0
+        self._trace = None
+        self.reset()
+
+    def reset(self):
+        """Resets the accumulated times."""
+        self.times = ODict()
+        self.num_steps = 0
+        self._t = None
+        self._t_end = None
+
+    def _now(self):
+        if self.sync:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _add(self, stage, t):
+        self.times[stage] = self.times.get(stage, 0) + t
+
+    def start_epoch(self):
+        """Resets the accumulators and starts counting the data wait time."""
+        self.reset()
+        if self.stages:
+            self._t_end = self._now()
+
+    def start_step(self):
+        """Starts a step after the batch has been received."""
+        if self.trace_steps is not None and self.global_step == self.trace_steps[0]:
+            self._start_trace()
+
+        if not self.stages:
+            return
+
+        self._t = self._now()
+        if self._t_end is not None:
+            self._add("data", self._t - self._t_end)
+
+    def stamp(self, stage):
+        """Assigns the time since the last stamp to a stage."""
+        if not self.stages:
+            return
+
+        t = self._now()
+        self._add(stage, t - self._t)
+        self._t = t
+
+    def end_step(self):
+        """Ends the step, the time since the last stamp is assigned
+        to the "other" stage."""
+        if self.stages:
+            self.stamp("other")
+            self._t_end = self._t
+            self.num_steps += 1
+
+        if self.trace_steps is not None and self.global_step == self.trace_steps[1]:
+            self._stop_trace()
+
+        self.global_step += 1
+
+    def _start_trace(self):
+        from torch.profiler import profile, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        logging.info("start tracing step %d" % (self.global_step))
+        self._trace = profile(activities=activities, record_shapes=True)
+        self._trace.start()
+
+    def _stop_trace(self):
+        if self._trace is None:
+            return
+
+        self._trace.stop()
+        try:
+            rank = dist.get_rank()
+        except:
+            rank = 0
+
+        os.makedirs(self.trace_path, exist_ok=True)
+        file_path = "%s/trace_steps%d-%d_rank%d.json" % (
+            self.trace_path,
+            self.trace_steps[0],
+            self.trace_steps[1],
+            rank,
+        )
+        logging.info("saving profiler trace to %s" % (file_path))
+        self._trace.export_chrome_trace(file_path)
+        self._trace = None
+
+    @property
+    def metrics(self):
+        """Returns a dictionary with the average time per step
+        of each stage and the total step time in secs."""
+        logs = ODict()
+        if self.num_steps == 0:
+            return logs
+
+        for k, v in self.times.items():
+            logs["time_" + k] = v / self.num_steps
+
+        logs["time_step"] = sum(self.times.values()) / self.num_steps
+        return logs
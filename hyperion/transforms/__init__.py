@@ -3,6 +3,7 @@
  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
 """
 
+from .suff_stats import GaussStats, ClassStats, partial_fit_from_reader
 from .cent_whiten import CentWhiten
 from .lnorm import LNorm
 from .sb_sw import SbSw
@@ -15,6 +16,7 @@ from .coral import CORAL
 from .gaussianizer import Gaussianizer
 from .skl_tsne import SklTSNE
 from .transform_list import TransformList
+from .fused_transform_list import FusedTransformList
 
 from .cent_whiten_up import CentWhitenUP
 from .lnorm_up import LNormUP
@@ -10,6 +10,7 @@ import scipy.linalg as la
 
 from ..hyp_model import HypModel
 from ..pdfs import Normal
+from .suff_stats import GaussStats
 
 class CentWhiten(HypModel):
     """Class to do centering and whitening of i-vectors.
@@ -20,6 +21,7 @@ class CentWhiten(HypModel):
         self.T = T
         self.update_mu = update_mu
         self.update_T = update_T
+        self.stats = None
 
 
         
@@ -28,7 +30,7 @@ class CentWhiten(HypModel):
             x = x - self.mu
         if self.T is not None:
             if self.T.ndim == 1:
-                x = x*T
+                x = x*self.T
             else:
                 x = np.dot(x, self.T)
         return x
@@ -66,6 +68,35 @@ class CentWhiten(HypModel):
 
 
 
+    def partial_fit(self, x, sample_weight=None):
+        """Accumulates statistics from a chunk of data,
+           call finalize() after the last chunk to compute the transform.
+        """
+        if self.stats is None:
+            self.stats = GaussStats()
+        self.stats.accum(x, sample_weight)
+
+
+
+    def merge_stats(self, stats):
+        """Adds GaussStats accumulated somewhere else, e.g., other process."""
+        if self.stats is None:
+            self.stats = GaussStats()
+        self.stats.merge(stats)
+
+
+
+    def finalize(self):
+        """Computes the transform from the accumulated statistics."""
+        stats = self.stats
+        if stats.N > stats.x_dim:
+            self.fit(mu=stats.mu, S=stats.Sigma)
+        else:
+            self.fit(mu=stats.mu, S=np.eye(stats.x_dim))
+        self.stats = None
+
+
+
     def get_config(self):
         config = {'update_mu': self.update_mu,
                   'update_t': self.update_T }
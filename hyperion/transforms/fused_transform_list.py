@@ -0,0 +1,270 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import logging
+import os
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import h5py
+
+from ..hyp_model import HypModel
+
+from .cent_whiten import CentWhiten
+from .cent_whiten_up import CentWhitenUP
+from .lnorm import LNorm
+from .lnorm_up import LNormUP
+from .pca import PCA
+from .lda import LDA
+from .nda import NDA
+from .nap import NAP
+from .mvn import MVN
+from .coral import CORAL
+from .gaussianizer import Gaussianizer
+
+
+class FusedTransformList(HypModel):
+    """Class to apply a compiled list of transformations.
+
+    Consecutive affine transforms (CentWhiten, PCA, LDA, NDA, NAP, MVN, CORAL)
+    are merged into a single y = x A + b. Length normalization is applied
+    in-place after the affine stage preceding it. Other transforms
+    (e.g. Gaussianizer) are kept as they are. Data is processed by blocks
+    of rows in a pool of threads.
+
+    Attributes:
+      stages: list of (stage_type, params) tuples, where stage_type is
+              'affine' with params=(A, b), 'lnorm' with params=None or
+              'transform' with params=transform object.
+      dtype: float type used for the computations.
+      block_size: number of rows processed at once by each thread.
+      num_threads: number of threads, if None it uses min(8, num_cores).
+    """
+
+    def __init__(self, stages, dtype='float32', block_size=16384,
+                 num_threads=None, **kwargs):
+        super().__init__(**kwargs)
+        self.stages = stages
+        self.dtype = dtype
+        self.block_size = block_size
+        self.num_threads = num_threads
+        self._cast_stages()
+        self.update_names()
+
+
+    def _cast_stages(self):
+        stages = []
+        for stage_type, params in self.stages:
+            if stage_type == 'affine':
+                A, b = params
+                params = (np.asarray(A, dtype=self.dtype),
+                          np.asarray(b, dtype=self.dtype))
+            stages.append((stage_type, params))
+        self.stages = stages
+
+
+    def update_names(self):
+        for i, (stage_type, t) in enumerate(self.stages):
+            if stage_type == 'transform':
+                t.name = self._stage_name(i)
+
+
+    def _stage_name(self, i):
+        if self.name is None:
+            return 'stage%d' % i
+        return '%s/stage%d' % (self.name, i)
+
+
+    @staticmethod
+    def _get_affine(t):
+        """Returns (A, b) such that t.predict(x) = x A + b
+           or None if the transform is not affine.
+           For LNorm, it returns the affine part applied before
+           the length normalization.
+        """
+        t_type = type(t)
+        if t_type in (CentWhiten, LNorm, PCA, LDA, NDA, CORAL):
+            if t_type == CORAL and t.T is None:
+                t._compute_T()
+            mu = t.mu
+            T = t.T
+            if T is not None and T.ndim == 1:
+                T = np.diag(T)
+            if mu is None and T is None:
+                return None
+            if T is None:
+                return np.eye(len(mu)), -mu
+            if mu is None:
+                return T, np.zeros((T.shape[1],))
+            return T, -np.dot(mu, T)
+
+        if t_type == NAP:
+            A = np.eye(t.U.shape[1]) - np.dot(t.U.T, t.U)
+            return A, np.zeros((A.shape[1],))
+
+        if t_type == MVN:
+            mu = t.mu
+            s = t.s
+            if mu is None and s is None:
+                return None
+            if s is None:
+                return np.eye(len(mu)), -mu
+            A = np.diag(1/s)
+            if mu is None:
+                return A, np.zeros((len(s),))
+            return A, -mu/s
+
+        return None
+
+
+    @staticmethod
+    def _merge_affine(affine1, affine2):
+        if affine1 is None:
+            return affine2
+        A1, b1 = affine1
+        A2, b2 = affine2
+        return np.dot(A1, A2), np.dot(b1, A2) + b2
+
+
+    @classmethod
+    def compile(cls, transforms, dtype='float32', block_size=16384,
+                num_threads=None, name=None):
+        """Compiles a list of transforms into a FusedTransformList.
+
+        Args:
+          transforms: list of transforms or TransformList object.
+          dtype: float type used for the computations.
+          block_size: number of rows processed at once by each thread.
+          num_threads: number of threads.
+          name: name of the fused model.
+
+        Returns:
+          FusedTransformList object.
+        """
+        if hasattr(transforms, 'transforms'):
+            if name is None:
+                name = transforms.name
+            transforms = transforms.transforms
+
+        stages = []
+        affine = None
+        for t in transforms:
+            affine_t = cls._get_affine(t)
+            if affine_t is not None:
+                affine = cls._merge_affine(affine, affine_t)
+
+            if type(t) == LNorm:
+                if affine is not None:
+                    stages.append(('affine', affine))
+                    affine = None
+                stages.append(('lnorm', None))
+            elif affine_t is None:
+                if affine is not None:
+                    stages.append(('affine', affine))
+                    affine = None
+                stages.append(('transform', deepcopy(t)))
+
+        if affine is not None:
+            stages.append(('affine', affine))
+
+        logging.debug('compiled %d transforms into %d stages' % (
+            len(transforms), len(stages)))
+        return cls(stages, dtype=dtype, block_size=block_size,
+                   num_threads=num_threads, name=name)
+
+
+    def _predict_block(self, x):
+        x = x.astype(self.dtype, copy=True)
+        for stage_type, params in self.stages:
+            if stage_type == 'affine':
+                A, b = params
+                x = np.dot(x, A)
+                x += b
+            elif stage_type == 'lnorm':
+                mx = np.sqrt(np.sum(x**2, axis=1, keepdims=True))
+                mx += 1e-10
+                np.divide(np.sqrt(x.shape[1]), mx, out=mx)
+                x *= mx
+            else:
+                x = params.predict(x).astype(self.dtype, copy=False)
+        return x
+
+
+    def predict(self, x):
+        num_rows = x.shape[0]
+        if num_rows <= self.block_size:
+            return self._predict_block(x)
+
+        num_threads = self.num_threads
+        if num_threads is None:
+            num_threads = min(8, os.cpu_count())
+
+        blocks = [(i, min(i+self.block_size, num_rows))
+                  for i in range(0, num_rows, self.block_size)]
+        y = None
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            futures = [pool.submit(self._predict_block, x[i1:i2])
+                       for i1, i2 in blocks]
+            for (i1, i2), future in zip(blocks, futures):
+                y_b = future.result()
+                if y is None:
+                    y = np.empty((num_rows, y_b.shape[1]), dtype=y_b.dtype)
+                y[i1:i2] = y_b
+
+        return y
+
+
+    def get_config(self):
+        config_s = {}
+        for i, (stage_type, params) in enumerate(self.stages):
+            config_i = {'stage_type': stage_type}
+            if stage_type == 'transform':
+                config_i['transform'] = params.get_config()
+            config_s[i] = config_i
+
+        config = {'stages': config_s,
+                  'dtype': self.dtype,
+                  'block_size': self.block_size,
+                  'num_threads': self.num_threads}
+        base_config = super().get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+    def save_params(self, f):
+        for i, (stage_type, params) in enumerate(self.stages):
+            if stage_type == 'affine':
+                A, b = params
+                prefix = self._stage_name(i)
+                f.create_dataset(prefix + '/A', data=A)
+                f.create_dataset(prefix + '/b', data=b)
+            elif stage_type == 'transform':
+                params.save_params(f)
+
+
+    @classmethod
+    def load_params(cls, f, config):
+        config_s = config['stages']
+        name = config['name']
+        stages = []
+        for i in range(len(config_s)):
+            config_i = config_s[str(i)]
+            stage_type = config_i['stage_type']
+            prefix = 'stage%d' % i if name is None else '%s/stage%d' % (name, i)
+            if stage_type == 'affine':
+                A = np.asarray(f[prefix + '/A'])
+                b = np.asarray(f[prefix + '/b'])
+                params = (A, b)
+            elif stage_type == 'transform':
+                config_t = config_i['transform']
+                class_t = globals()[config_t['class_name']]
+                params = class_t.load_params(f, config_t)
+            else:
+                params = None
+            stages.append((stage_type, params))
+
+        return cls(stages, dtype=config['dtype'],
+                   block_size=config['block_size'],
+                   num_threads=config['num_threads'], name=name)
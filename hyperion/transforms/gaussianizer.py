@@ -10,88 +10,468 @@ import h5py
 import scipy.linalg as la
 from scipy.special import erfinv
 
-from ..hyp_defs import float_cpu
+from ..hyp_defs import float_cpu, float_save
 from ..hyp_model import HypModel
 
 
+class _ColumnTables(object):
+    """Look-up tables with one sorted column per dimension.
+       The tables are flattened, so the column i starts at i x table_size,
+       and all the dimensions are searched at once with a vectorized
+       binary search instead of one search per dimension.
+       The columns are padded with inf up to a power of two, so the
+       search never needs to clip the indices.
+
+    Attributes:
+      xp: tables (num_points, dim), each column is sorted.
+      dtype: data type of the search and the interpolation.
+    """
+    # number of values and table points searched at once,
+    # so the temporary arrays and the tables fit in the cache
+    chunk_size = 16384
+    chunk_table_size = 262144
+
+    def __init__(self, xp, dtype='float32'):
+        xp = np.asarray(xp)
+        self.num_points, dim = xp.shape
+        self.table_size = 1 << self.num_points.bit_length()
+        self.offset = np.arange(dim, dtype=np.int32) * self.table_size
+        self.dtype = dtype
+        self.xp = self._flatten(xp, np.inf)
+
+
+
+    def _flatten(self, t, pad_value):
+        t_flat = np.full((t.shape[1], self.table_size), pad_value,
+                         dtype=self.dtype)
+        t_flat[:, :self.num_points] = t.T
+        return t_flat.ravel()
+
+
+
+    def _chunks(self, x):
+        """Splits x in blocks of rows and columns."""
+        num_rows, dim = x.shape
+        if x.size <= self.chunk_size:
+            yield slice(None), slice(None)
+            return
+
+        num_cols = max(1, self.chunk_table_size // self.table_size)
+        num_cols = min(dim, num_cols)
+        chunk_rows = max(1, self.chunk_size // num_cols)
+        for j in range(0, dim, num_cols):
+            for i in range(0, num_rows, chunk_rows):
+                yield slice(i, i + chunk_rows), slice(j, j + num_cols)
+
+
+
+    def _search(self, x, offset, side):
+        """Returns the indices in the flattened tables of the last
+           table points before x."""
+        idx = np.empty(x.shape, dtype=np.int32)
+        idx[:] = offset - 1
+        step = self.table_size >> 1
+        while step > 0:
+            xp = self.xp[idx + step]
+            before = xp < x if side == 'left' else xp <= x
+            before = before.view(np.int8).astype(np.int32)
+            before *= step
+            idx += before
+            step >>= 1
+        return idx
+
+
+
+    def searchsorted(self, x, side='left'):
+        """Finds the indices where the columns of x would be inserted
+           in the columns of the tables, like np.searchsorted.
+
+        Args:
+          x: values to search (num_samples, dim).
+          side: left or right, like in np.searchsorted.
+
+        Returns:
+          Indices in the columns (num_samples, dim).
+        """
+        x = x.astype(self.dtype, copy=False)
+        if side == 'right':
+            # inf is only used for the padding
+            x = np.minimum(x, np.finfo(self.dtype).max)
+
+        idx = np.empty(x.shape, dtype=np.int32)
+        for rows, cols in self._chunks(x):
+            offset = self.offset[cols]
+            idx_c = self._search(x[rows, cols], offset, side)
+            idx[rows, cols] = idx_c - (offset - 1)
+        return idx
+
+
+
+    def _interp(self, x, fp, offset):
+        idx = self._search(x, offset, 'right')
+        idx -= offset
+        np.clip(idx, 0, self.num_points - 2, out=idx)
+        if fp.ndim == 1:
+            y = fp[idx]
+            dy = fp[idx + 1]
+            idx += offset
+        else:
+            idx += offset
+            y = fp[idx]
+            dy = fp[idx + 1]
+        dy -= y
+
+        x0 = self.xp[idx]
+        dx = self.xp[idx + 1]
+        dx -= x0
+        t = x - x0
+        # repeated points only happen at the ends of the tables
+        t = np.divide(t, dx, out=(t >= 0).astype(self.dtype), where=dx > 0)
+        np.clip(t, 0, 1, out=t)
+        dy *= t
+        y += dy
+        return y
+
+
+
+    def interp(self, x, fp):
+        """Piecewise-linear interpolation of each column with its own table,
+           like np.interp applied column by column.
+
+        Args:
+          x: values to interpolate (num_samples, dim).
+          fp: y-coordinates (num_points,) shared by all columns or
+              (num_points, dim).
+
+        Returns:
+          Interpolated values (num_samples, dim), values outside the
+          table range are clipped to fp[0] and fp[-1].
+        """
+        x = np.minimum(x, np.finfo(self.dtype).max, dtype=self.dtype)
+        fp = np.asarray(fp, dtype=self.dtype)
+        if fp.ndim == 2:
+            fp = self._flatten(fp, 0)
+
+        y = np.empty(x.shape, dtype=self.dtype)
+        for rows, cols in self._chunks(x):
+            y[rows, cols] = self._interp(x[rows, cols], fp, self.offset[cols])
+        return y
+
+
+
+def _interp(x, xp, fp):
+    """Piecewise-linear interpolation of each column with its own table,
+       like np.interp applied column by column.
+
+    Args:
+      x: values to interpolate (num_samples, dim).
+      xp: x-coordinates (num_points, dim), each column is sorted.
+      fp: y-coordinates (num_points,) shared by all columns or
+          (num_points, dim).
+
+    Returns:
+      Interpolated values (num_samples, dim), values outside the
+      table range are clipped to fp[0] and fp[-1].
+    """
+    return _ColumnTables(xp, np.result_type(x, fp)).interp(x, fp)
+
+
+
 class Gaussianizer(HypModel):
     """Class to make i-vector distribution standard Normal.
+
+       The training data is summarized in a quantile table q of size
+       (num_quantiles, x_dim) computed with a streaming quantile sketch,
+       so the training data does not need to be sorted or fit in memory.
+       predict maps x to Normal quantiles by piecewise-linear interpolation
+       between the points of the table. Optionally, the map can be
+       resampled on a uniform grid of approx_grid_size points per dimension,
+       which reduces the look-up of all the dimensions to a single
+       vectorized gather + linear interpolation in float32.
+
+       Models trained with older versions store the sorted
+       training vectors in r and use a step function.
+
+    Attributes:
+      max_vectors: maximum number of background vectors (old models),
+                   used as num_quantiles if num_quantiles is None.
+      r: sorted background vectors (old models).
+      num_quantiles: size of the quantile table.
+      q: quantile table (num_quantiles, x_dim).
+      approx_grid_size: if not None, predict uses a uniform grid
+                        with this number of points.
+      sketch_factor: the quantile sketch keeps sketch_factor x num_quantiles
+                     points per dimension while training.
+      block_size: number of rows processed at once in predict.
     """
-    def __init__(self, max_vectors=None, r=None, **kwargs):
+    def __init__(self, max_vectors=None, r=None, num_quantiles=None, q=None,
+                 approx_grid_size=None, sketch_factor=8, block_size=16384,
+                 **kwargs):
         super(Gaussianizer, self).__init__(**kwargs)
         self.max_vectors = max_vectors
         self.r = r
+        if num_quantiles is None:
+            num_quantiles = 1000 if max_vectors is None else max_vectors
+        self.num_quantiles = num_quantiles
+        self.q = q
+        self.approx_grid_size = approx_grid_size
+        self.sketch_factor = sketch_factor
+        self.block_size = block_size
+        self._sketch = None
+        self._y_map = None
+        self._grid = None
+        self._tables = None
+
+
+
+    @property
+    def y_map(self):
+        """Normal quantiles corresponding to the rows of q or r."""
+        if self._y_map is None:
+            if self.q is not None:
+                n = self.q.shape[0]
+                px_cum = (np.arange(n) + 1)/(n + 1)
+            else:
+                px_cum = np.linspace(0, 1, self.r.shape[0]+2)[1:-1]
+            self._y_map = (erfinv(2*px_cum-1)*np.sqrt(2)).astype('float32')
+        return self._y_map
+
+
+
+    def _compute_grid(self):
+        """Resamples the piecewise-linear map on a uniform grid.
+           The grid is stored transposed (x_dim, approx_grid_size+1) with
+           the last point repeated, so the look-up never needs to clip the
+           index of the upper point.
+        """
+        q = self.q.astype('float64')
+        x_min = q[0]
+        x_max = q[-1]
+        num_points = self.approx_grid_size
+        step = (x_max - x_min) / (num_points - 1)
+        step[step <= 0] = 1
+        t = np.arange(num_points)[:, None]
+        y_grid = _interp(x_min + t * step, q, self.y_map.astype('float64'))
+        y_grid = np.vstack((y_grid, y_grid[-1:]))
+        y_grid = np.ascontiguousarray(y_grid.T, dtype='float32')
+        offset = np.arange(0, y_grid.size, num_points + 1, dtype=np.int32)
+        self._grid = (x_min.astype('float32'),
+                      (1/step).astype('float32'),
+                      y_grid.ravel(), offset)
+
+
+
+    def _predict_grid_block(self, x):
+        if self._grid is None:
+            self._compute_grid()
+        x_min, inv_step, y_grid, offset = self._grid
+        t = x - x_min
+        t *= inv_step
+        np.clip(t, 0, self.approx_grid_size - 1, out=t)
+        idx = t.astype(np.int32)
+        t -= idx
+        idx += offset
+        y = np.take(y_grid, idx)
+        idx += 1
+        y2 = np.take(y_grid, idx)
+        y2 -= y
+        y2 *= t
+        y += y2
+        return y
 
-        
 
-    def predict(self, x):
-        px_cum = np.linspace(0, 1, self.r.shape[0]+2)[1:-1]
-        y_map = erfinv(2*px_cum-1)*np.sqrt(2)
-
-        r=self.r[1:]
-        y = np.zeros_like(x)
-        for i in range(x.shape[1]):
-            y_index = np.searchsorted(r[:,i], x[:,i])
-            logging.debug(y_index)
-            y[:,i] = y_map[y_index]
-            
-        return y
 
+    @property
+    def tables(self):
+        """Flattened look-up tables of q or r."""
+        if self._tables is None:
+            xp = self.r[1:] if self.q is None else self.q
+            self._tables = _ColumnTables(xp)
+        return self._tables
 
-    
-    def fit(self, x):
 
-        r = np.sort(x, axis=0, kind='heapsort')
 
-        x = np.zeros((1, x.shape[-1]), dtype=float_cpu())
+    def _predict_block(self, x):
+        x = x.astype('float32', copy=False)
+        if self.q is None:
+            # old models, step function
+            return self.y_map[self.tables.searchsorted(x)]
 
-        if r.shape[0] > self.max_vectors:
-            index = np.round(np.linspace(0, r.shape[0]-1, self.max_vectors, dtype=float)).astype(int)
-            r = r[index, :]
+        if self.approx_grid_size is not None:
+            return self._predict_grid_block(x)
+
+        return self.tables.interp(x, self.y_map)
+
+
+
+    def predict(self, x):
+        if x.shape[0] <= self.block_size:
+            return self._predict_block(x)
+
+        y = np.empty(x.shape, dtype='float32')
+        for i in range(0, x.shape[0], self.block_size):
+            y[i:i+self.block_size] = self._predict_block(x[i:i+self.block_size])
+        return y
+
+
+
+    @staticmethod
+    def _sketch_quantiles(v, w, p):
+        """Interpolates the empirical CDF of the sketch.
+
+        Args:
+          v: sorted sketch values (x_dim, num_points).
+          w: sketch weights (x_dim, num_points) or None if all weights are 1.
+          p: cumulative weights to interpolate (x_dim, num_out) or (num_out,).
+
+        Returns:
+          Quantiles (x_dim, num_out).
+        """
+        if w is None:
+            cw_mid = np.arange(v.shape[1]) + 0.5
+        else:
+            cw_mid = np.cumsum(w, axis=1)
+            cw_mid -= w/2
+
+        q = np.empty((v.shape[0], p.shape[-1]))
+        for i in range(v.shape[0]):
+            p_i = p if p.ndim == 1 else p[i]
+            cw_i = cw_mid if cw_mid.ndim == 1 else cw_mid[i]
+            q[i] = np.interp(p_i, cw_i, v[i])
+        return q
+
+
+
+    def _compress_sketch(self, v, w, num_points):
+        """Compresses a weighted sample into num_points points per dimension
+           by interpolating the empirical CDF. Points are denser in the tails,
+           like in t-digest, to keep the extreme quantiles accurate.
+        """
+        w_tot = v.shape[1] if w is None else np.sum(w, axis=1, keepdims=True)
+        b = (1 - np.cos(np.pi * np.arange(num_points+1)/num_points))/2
+        b = b * w_tot
+        w_c = np.diff(b, axis=-1)
+        p = b[..., :-1] + w_c/2
+        v_c = self._sketch_quantiles(v, w, p)
+        w_c = np.broadcast_to(w_c, v_c.shape).copy()
+        return v_c, w_c
+
+
+
+    def partial_fit(self, x):
+        """Updates the quantile sketch with a chunk of data,
+           call finalize() after the last chunk to compute the quantile table.
+        """
+        # the sketch is stored transposed (x_dim, num_points) so all the
+        # operations along the samples are on contiguous memory
+        v = np.array(x, dtype='float64', order='C').T.copy()
+        v.sort(axis=1)
+        w = None
+        if self._sketch is not None:
+            v_s, w_s = self._sketch
+            w = np.ones_like(v)
+            v = np.concatenate((v_s, v), axis=1)
+            w = np.concatenate((w_s, w), axis=1)
+            idx = np.argsort(v, axis=1, kind='stable')
+            v = np.take_along_axis(v, idx, axis=1)
+            w = np.take_along_axis(w, idx, axis=1)
+
+        sketch_size = self.sketch_factor * self.num_quantiles
+        if v.shape[1] > sketch_size:
+            v, w = self._compress_sketch(v, w, sketch_size)
+        elif w is None:
+            w = np.ones_like(v)
+
+        self._sketch = (v, w)
+
+
+
+    def finalize(self):
+        """Computes the quantile table from the sketch."""
+        v, w = self._sketch
+        w_tot = np.sum(w, axis=1, keepdims=True)
+        n = self.num_quantiles
+        p = (np.arange(n) + 1) / (n + 1) * w_tot
+        self.q = self._sketch_quantiles(v, w, p).T.astype(float_cpu())
+        self.r = None
+        self._sketch = None
+        self._y_map = None
+        self._grid = None
+        self._tables = None
+
+
+
+    def fit(self, x, chunk_size=100000):
+        self._sketch = None
+        for i in range(0, x.shape[0], chunk_size):
+            self.partial_fit(x[i:i+chunk_size])
+        self.finalize()
 
-        self.r = np.vstack((x, r))
-        
 
 
     def get_config(self):
-        config = {'max_vectors': self.max_vectors}
+        config = {'max_vectors': self.max_vectors,
+                  'num_quantiles': self.num_quantiles,
+                  'approx_grid_size': self.approx_grid_size,
+                  'sketch_factor': self.sketch_factor,
+                  'block_size': self.block_size}
 
         base_config = super(Gaussianizer, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
-        
+
     def save_params(self, f):
-        params = {'r': self.r }
-        self._save_params_from_dict(f, params)
+        params = {'r': self.r,
+                  'q': self.q}
+        dtypes = {'r': float_save(), 'q': 'float64'}
+        self._save_params_from_dict(f, params, dtypes)
+
 
 
-        
     @classmethod
     def load_params(cls, f, config):
-        param_list = ['r']
-        params = cls._load_params_to_dict(f, config['name'], param_list)
-        return cls(r=params['r'], max_vectors=config['max_vectors'], name=config['name'])
+        param_list = ['r', 'q']
+        dtypes = {'r': float_cpu(), 'q': 'float64'}
+        params = cls._load_params_to_dict(f, config['name'], param_list, dtypes)
+        return cls(r=params['r'], q=params['q'],
+                   max_vectors=config['max_vectors'],
+                   num_quantiles=config.get('num_quantiles', None),
+                   approx_grid_size=config.get('approx_grid_size', None),
+                   sketch_factor=config.get('sketch_factor', 8),
+                   block_size=config.get('block_size', 16384),
+                   name=config['name'])
+
+
 
-    
-    
     @classmethod
     def load_mat(cls, file_path):
         with h5py.File(file_path, 'r') as f:
+            if 'q' in f:
+                q = np.asarray(f['q'], dtype='float64')
+                return cls(num_quantiles=q.shape[0], q=q)
             r = np.asarray(f['r'], dtype='float32')
             return cls(r=r)
 
-        
-        
+
+
     def save_mat(self, file_path):
+        """Saves the quantile table q, or the sorted background
+           vectors r for old models.
+        """
         with h5py.File(file_path, 'w') as f:
-            f.create_dataset('r', data=self.r)
+            if self.q is not None:
+                f.create_dataset('q', data=self.q)
+            elif self.r is not None:
+                f.create_dataset('r', data=self.r)
+            else:
+                raise ValueError('Gaussianizer is not trained, nothing to save')
 
 
 
     @staticmethod
     def filter_args(**kwargs):
-        valid_args = ('max_vectors', 'name')
+        valid_args = ('max_vectors', 'num_quantiles', 'approx_grid_size', 'name')
         return dict((k, kwargs[k])
                     for k in valid_args if k in kwargs)
 
@@ -103,12 +483,23 @@ class Gaussianizer(HypModel):
             p1 = '--'
         else:
             p1 = '--' + prefix + '.'
-            
+
         parser.add_argument(p1+'max-vectors', default=None,
                             type=int,
                             help=('maximum number of background vectors'))
 
+        parser.add_argument(p1+'num-quantiles', default=None,
+                            type=int,
+                            help=('size of the quantile table, '
+                                  'if None, max-vectors or 1000'))
+
+        parser.add_argument(p1+'approx-grid-size', default=None,
+                            type=int,
+                            help=('if not None, approximates the map with '
+                                  'a uniform grid with this number of points'))
+
         parser.add_argument(p1+'name', default='gauss')
 
 
+    add_argparse_args = add_class_args
     add_arparse_args = add_class_args
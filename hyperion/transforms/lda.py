@@ -24,6 +24,7 @@ class LDA(HypModel):
             self.lda_dim = T.shape[1]
         self.update_mu = update_mu
         self.update_T = update_T
+        self.sbsw = None
 
 
         
@@ -68,6 +69,35 @@ class LDA(HypModel):
         self.T = V
 
 
+    def partial_fit(self, x, y, class_counts=None):
+        """Accumulates statistics from a chunk of data,
+           call finalize() after the last chunk to compute the transform.
+           See SbSw.partial_fit.
+        """
+        if self.sbsw is None:
+            self.sbsw = SbSw()
+        self.sbsw.partial_fit(x, y, class_counts)
+
+
+    def merge_stats(self, stats):
+        """Adds ClassStats accumulated somewhere else, e.g., other process."""
+        if self.sbsw is None:
+            self.sbsw = SbSw()
+        self.sbsw.merge_stats(stats)
+
+
+    @property
+    def stats(self):
+        return None if self.sbsw is None else self.sbsw.stats
+
+
+    def finalize(self):
+        """Computes the transform from the accumulated statistics."""
+        self.sbsw.finalize()
+        self.fit(None, None, mu=self.sbsw.mu, Sb=self.sbsw.Sb, Sw=self.sbsw.Sw)
+        self.sbsw = None
+
+
     def get_config(self):
         config = { 'lda_dim': self.lda_dim,
                    'update_mu': self.update_mu,
@@ -9,6 +9,7 @@ import h5py
 import scipy.linalg as la
 
 from ..hyp_model import HypModel
+from .suff_stats import GaussStats
 
 class MVN(HypModel):
     """Class to do global mean and variance normalization.
@@ -17,6 +18,7 @@ class MVN(HypModel):
         super(MVN, self).__init__(**kwargs)
         self.mu = mu
         self.s = s
+        self.stats = None
 
         
     def predict(self, x):
@@ -31,6 +33,29 @@ class MVN(HypModel):
         self.s = np.std(x, axis=0)
 
         
+    def partial_fit(self, x):
+        """Accumulates statistics from a chunk of data,
+           call finalize() after the last chunk to compute mu and s.
+        """
+        if self.stats is None:
+            self.stats = GaussStats(diag_cov=True)
+        self.stats.accum(x)
+
+
+    def merge_stats(self, stats):
+        """Adds GaussStats accumulated somewhere else, e.g., other process."""
+        if self.stats is None:
+            self.stats = GaussStats(diag_cov=True)
+        self.stats.merge(stats)
+
+
+    def finalize(self):
+        """Computes mu and s from the accumulated statistics."""
+        self.mu = self.stats.mu
+        self.s = np.sqrt(np.maximum(self.stats.Sigma, 0))
+        self.stats = None
+
+
     def save_params(self, f):
         params = {'mu': self.mu,
                   's': self.s}
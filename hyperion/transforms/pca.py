@@ -9,6 +9,7 @@ from numpy.linalg import matrix_rank
 import scipy.linalg as la
 
 from ..hyp_model import HypModel
+from .suff_stats import GaussStats
 
 
 class PCA(HypModel):
@@ -36,6 +37,7 @@ class PCA(HypModel):
         self.pca_var_r = pca_var_r
         self.pca_min_dim = pca_min_dim
         self.whiten = whiten
+        self.stats = None
 
     def predict(self, x):
         if self.mu is not None:
@@ -104,6 +106,25 @@ class PCA(HypModel):
 
             self.T = V
 
+    def partial_fit(self, x, sample_weight=None):
+        """Accumulates statistics from a chunk of data,
+        call finalize() after the last chunk to compute the transform.
+        """
+        if self.stats is None:
+            self.stats = GaussStats()
+        self.stats.accum(x, sample_weight)
+
+    def merge_stats(self, stats):
+        """Adds GaussStats accumulated somewhere else, e.g., other process."""
+        if self.stats is None:
+            self.stats = GaussStats()
+        self.stats.merge(stats)
+
+    def finalize(self):
+        """Computes the transform from the accumulated statistics."""
+        self.fit(mu=self.stats.mu, S=self.stats.Sigma)
+        self.stats = None
+
     def get_config(self):
         config = {
             "update_mu": self.update_mu,
@@ -10,16 +10,18 @@ from sklearn.neighbors import BallTree
 
 from ..hyp_model import HypModel
 from ..hyp_defs import float_cpu
+from .suff_stats import ClassStats
 
 class SbSw(HypModel):
     """Class to compute between and within class matrices
     """
     def __init__(self, Sb=None, Sw=None, mu=None, num_classes=0, **kwargs):
         super(SbSw, self).__init__(**kwargs)
-        self.Sb = None
-        self.Sw = None
-        self.mu = None
+        self.Sb = Sb
+        self.Sw = Sw
+        self.mu = mu
         self.num_classes = num_classes
+        self.stats = None
 
         
     def fit(self, x, class_ids, sample_weight=None, class_weights=None, normalize=True):
@@ -53,6 +55,40 @@ class SbSw(HypModel):
         self.Sw /= self.num_classes
 
 
+
+    def partial_fit(self, x, class_ids, class_counts=None):
+        """Accumulates statistics from a chunk of data,
+           call finalize() after the last chunk to compute Sb and Sw.
+
+           Args:
+             x: data matrix.
+             class_ids: integer class ids.
+             class_counts: total number of samples per class in the
+                           full dataset, needed to weight all classes
+                           equally in Sw as fit does. If None, Sw is the
+                           pooled within-class covariance.
+        """
+        if self.stats is None:
+            self.stats = ClassStats()
+        self.stats.accum(x, class_ids, class_counts)
+
+
+
+    def merge_stats(self, stats):
+        """Adds ClassStats accumulated somewhere else, e.g., other process."""
+        if self.stats is None:
+            self.stats = ClassStats()
+        self.stats.merge(stats)
+
+
+
+    def finalize(self):
+        """Computes Sb and Sw from the accumulated statistics."""
+        self.mu, self.Sb, self.Sw = self.stats.compute_sb_sw()
+        self.num_classes = self.stats.num_classes
+        self.stats = None
+
+
         
     @classmethod
     def accum_stats(cls, stats):
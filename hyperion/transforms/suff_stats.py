@@ -0,0 +1,296 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import logging
+
+import numpy as np
+
+from ..hyp_model import HypModel
+
+
+class GaussStats(HypModel):
+    """Class to accumulate zero, first and second order statistics
+       to train transforms by chunks of data.
+
+       Statistics accumulated in different processes can be
+       saved and merged later.
+
+    Attributes:
+      N: accumulated weight (number of samples).
+      F: first order stats sum_i w_i x_i.
+      S: second order stats sum_i w_i x_i x_i^T,
+         or sum_i w_i x_i^2 if diag_cov is True.
+      diag_cov: if True, it only accumulates the diagonal of S.
+    """
+    def __init__(self, N=0, F=None, S=None, diag_cov=False, **kwargs):
+        super().__init__(**kwargs)
+        self.N = N
+        self.F = F
+        self.S = S
+        self.diag_cov = diag_cov
+
+
+    @property
+    def x_dim(self):
+        return None if self.F is None else len(self.F)
+
+
+    def accum(self, x, sample_weight=None):
+        """Accumulates the statistics of a chunk of data.
+
+        Args:
+          x: data matrix (num_samples, x_dim).
+          sample_weight: weight of each sample.
+        """
+        x = np.asarray(x, dtype='float64')
+        if self.F is None:
+            x_dim = x.shape[1]
+            self.F = np.zeros((x_dim,))
+            if self.diag_cov:
+                self.S = np.zeros((x_dim,))
+            else:
+                self.S = np.zeros((x_dim, x_dim))
+
+        if sample_weight is None:
+            self.N += x.shape[0]
+            xw = x
+        else:
+            self.N += np.sum(sample_weight)
+            xw = x * sample_weight[:, None]
+
+        self.F += np.sum(xw, axis=0)
+        if self.diag_cov:
+            self.S += np.sum(xw*x, axis=0)
+        else:
+            self.S += np.dot(xw.T, x)
+
+
+    def merge(self, other):
+        """Adds the statistics of other GaussStats object."""
+        if other.F is None:
+            return
+        if self.F is None:
+            self.F = np.zeros_like(other.F)
+            self.S = np.zeros_like(other.S)
+        assert self.diag_cov == other.diag_cov
+        self.N += other.N
+        self.F += other.F
+        self.S += other.S
+
+
+    @classmethod
+    def merge_list(cls, stats):
+        """Merges a list of GaussStats objects."""
+        merged = cls(diag_cov=stats[0].diag_cov)
+        for s in stats:
+            merged.merge(s)
+        return merged
+
+
+    @property
+    def mu(self):
+        return self.F/self.N
+
+
+    @property
+    def Sigma(self):
+        """ML covariance (or variance if diag_cov is True)."""
+        mu = self.mu
+        if self.diag_cov:
+            return self.S/self.N - mu**2
+        return self.S/self.N - np.outer(mu, mu)
+
+
+    def get_config(self):
+        config = {'diag_cov': self.diag_cov}
+        base_config = super().get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+    def save_params(self, f):
+        params = {'N': self.N,
+                  'F': self.F,
+                  'S': self.S}
+        dtypes = dict((k, 'float64') for k in params)
+        self._save_params_from_dict(f, params, dtypes)
+
+
+    @classmethod
+    def load_params(cls, f, config):
+        param_list = ['N', 'F', 'S']
+        dtypes = dict((k, 'float64') for k in param_list)
+        params = cls._load_params_to_dict(f, config['name'], param_list, dtypes)
+        return cls(N=float(params['N']), F=params['F'], S=params['S'],
+                   diag_cov=config['diag_cov'], name=config['name'])
+
+
+
+class ClassStats(HypModel):
+    """Class to accumulate per-class statistics to compute between
+       and within class covariances by chunks of data.
+
+       Class ids must be integers, the samples of one class can be
+       split among several chunks. Statistics accumulated in different
+       processes can be saved and merged later.
+
+    Attributes:
+      N: number of samples per class (num_classes,).
+      F: first order stats per class (num_classes, x_dim).
+      S: second order stats sum_i w_i x_i x_i^T, where w_i=1/N_c for
+         sample i of class c if the total class counts were given
+         to accum, otherwise w_i=1.
+      class_norm: True if S was normalized by the class counts.
+    """
+    def __init__(self, N=None, F=None, S=None, class_norm=False, **kwargs):
+        super().__init__(**kwargs)
+        self.N = N
+        self.F = F
+        self.S = S
+        self.class_norm = class_norm
+
+
+    @property
+    def num_classes(self):
+        return 0 if self.N is None else np.sum(self.N > 0)
+
+
+    def _resize(self, num_classes, x_dim):
+        if self.N is None:
+            self.N = np.zeros((num_classes,))
+            self.F = np.zeros((num_classes, x_dim))
+            self.S = np.zeros((x_dim, x_dim))
+        elif num_classes > len(self.N):
+            delta = num_classes - len(self.N)
+            self.N = np.concatenate((self.N, np.zeros((delta,))))
+            self.F = np.concatenate((self.F, np.zeros((delta, x_dim))))
+
+
+    def accum(self, x, class_ids, class_counts=None):
+        """Accumulates the statistics of a chunk of data.
+
+        Args:
+          x: data matrix (num_samples, x_dim).
+          class_ids: integer class id of each sample.
+          class_counts: total number of samples of each class in
+                        the full dataset. If given, classes are weighted
+                        equally in the within-class covariance as
+                        in SbSw.fit, otherwise samples are weighted equally.
+        """
+        x = np.asarray(x, dtype='float64')
+        class_ids = np.asarray(class_ids, dtype=int)
+        if self.N is None:
+            self.class_norm = class_counts is not None
+        else:
+            assert self.class_norm == (class_counts is not None)
+
+        self._resize(np.max(class_ids)+1, x.shape[1])
+        np.add.at(self.N, class_ids, 1)
+        np.add.at(self.F, class_ids, x)
+        if self.class_norm:
+            w = 1/np.asarray(class_counts, dtype='float64')[class_ids]
+            self.S += np.dot(x.T * w, x)
+        else:
+            self.S += np.dot(x.T, x)
+
+
+    def merge(self, other):
+        """Adds the statistics of other ClassStats object."""
+        if other.N is None:
+            return
+        if self.N is None:
+            self.class_norm = other.class_norm
+        assert self.class_norm == other.class_norm
+        self._resize(len(other.N), other.F.shape[1])
+        num_classes = len(other.N)
+        self.N[:num_classes] += other.N
+        self.F[:num_classes] += other.F
+        self.S += other.S
+
+
+    @classmethod
+    def merge_list(cls, stats):
+        """Merges a list of ClassStats objects."""
+        merged = cls()
+        for s in stats:
+            merged.merge(s)
+        return merged
+
+
+    def compute_sb_sw(self):
+        """Computes between and within class covariances.
+
+        Returns:
+          Mean of the class means, between-class and within-class
+          covariance matrices.
+        """
+        idx = self.N > 0
+        N = self.N[idx]
+        mu_c = self.F[idx] / N[:, None]
+        num_classes = len(N)
+        mu = np.mean(mu_c, axis=0)
+        Sb = np.dot(mu_c.T, mu_c)/num_classes - np.outer(mu, mu)
+        if self.class_norm:
+            Sw = (self.S - np.dot(mu_c.T, mu_c))/num_classes
+        else:
+            Sw = (self.S - np.dot(mu_c.T * N, mu_c))/np.sum(N)
+        return mu, Sb, Sw
+
+
+    def get_config(self):
+        config = {'class_norm': self.class_norm}
+        base_config = super().get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+    def save_params(self, f):
+        params = {'N': self.N,
+                  'F': self.F,
+                  'S': self.S}
+        dtypes = dict((k, 'float64') for k in params)
+        self._save_params_from_dict(f, params, dtypes)
+
+
+    @classmethod
+    def load_params(cls, f, config):
+        param_list = ['N', 'F', 'S']
+        dtypes = dict((k, 'float64') for k in param_list)
+        params = cls._load_params_to_dict(f, config['name'], param_list, dtypes)
+        return cls(N=params['N'], F=params['F'], S=params['S'],
+                   class_norm=config['class_norm'], name=config['name'])
+
+
+
+def partial_fit_from_reader(model, reader, num_records=1000,
+                            class_ids=None, class_counts=None, preproc=None):
+    """Accumulates the statistics of a transform reading the data by chunks
+       from a sequential data reader and finalizes the training.
+
+    Args:
+      model: transform with partial_fit and finalize methods.
+      reader: SequentialDataReader object.
+      num_records: number of records read at once.
+      class_ids: dictionary mapping keys to integer class ids, needed to
+                 train transforms with class labels (LDA, SbSw).
+      class_counts: total number of samples per class,
+                    see ClassStats.accum.
+      preproc: transform applied to the data before accumulating.
+
+    Returns:
+      Trained model.
+    """
+    while not reader.eof():
+        keys, x = reader.read(num_records, squeeze=True)
+        if len(keys) == 0:
+            break
+        if preproc is not None:
+            x = preproc.predict(x)
+        if class_ids is None:
+            model.partial_fit(x)
+        else:
+            y = np.asarray([class_ids[k] for k in keys], dtype=int)
+            model.partial_fit(x, y, class_counts=class_counts)
+        logging.debug('accumulated stats for %d records' % len(keys))
+
+    model.finalize()
+    return model
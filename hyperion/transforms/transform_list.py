@@ -20,6 +20,7 @@ from .nda import NDA
 from .nap import NAP
 from .mvn import MVN
 from .gaussianizer import Gaussianizer
+from .fused_transform_list import FusedTransformList
 
 
 
@@ -48,6 +49,14 @@ class TransformList(HypModel):
         return x
 
     
+    def compile(self, dtype='float32', block_size=16384, num_threads=None):
+        """Merges consecutive affine transforms into a FusedTransformList
+           that runs by blocks in multiple threads.
+        """
+        return FusedTransformList.compile(
+            self, dtype=dtype, block_size=block_size, num_threads=num_threads)
+
+
     def update_names(self):
         if self.name is not None:
             for t in self.transforms:
@@ -70,6 +79,9 @@ class TransformList(HypModel):
 
     @classmethod
     def load_params(cls, f, config):
+        if config['class_name'] == 'FusedTransformList':
+            return FusedTransformList.load_params(f, config)
+
         config_ts = config['transforms']
         transforms = []
         for i in range(len(config_ts)):
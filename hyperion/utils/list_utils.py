@@ -118,6 +118,57 @@ def split_list(a, idx, num_parts):
 
 
 
+def partition_list_balanced(weights, num_parts):
+    """Assigns the elements of a list to several parts with similar
+       total weight.
+       Elements are assigned greedily from the heaviest to the lightest
+       to the part with the lowest accumulated weight, so heavy elements
+       tend to be alone in their part while light ones are packed together.
+
+    Args:
+       weights: weight (cost) of each element of the list.
+       num_parts: number of parts to split the list.
+
+    Returns:
+       Part index from 0 to num_parts-1 of each element.
+    """
+    weights = np.asarray(weights, dtype=float)
+    sort_idx = np.argsort(-weights, kind='stable')
+    part_weights = np.zeros((num_parts,), dtype=float)
+    part_ids = np.zeros((len(weights),), dtype='int64')
+    for i in sort_idx:
+        j = np.argmin(part_weights)
+        part_ids[i] = j
+        part_weights[j] += weights[i]
+
+    return part_ids
+
+
+
+def split_list_balanced(a, weights, idx, num_parts):
+    """Split a list into several parts with similar total weight
+       and returns one of the parts.
+       See partition_list_balanced, when several parts are needed
+       it is cheaper to partition the list only once.
+
+    Args:
+       a: list to split.
+       weights: weight (cost) of each element of a.
+       idx: index of the part that we want to get from 1 to num_parts
+       num_parts: number of parts to split the list.
+
+    Returns:
+       A sublist of a.
+    """
+    if not(isinstance(a, np.ndarray)):
+        a = np.asarray(a)
+    assert len(a) == len(weights)
+    part_ids = partition_list_balanced(weights, num_parts)
+    loc = (part_ids == idx - 1).nonzero()[0]
+    return a[loc], loc
+
+
+
 def split_list_group_by_key(a, idx, num_parts, key = None):
     """Split a list into several parts and returns one of the parts.
        It groups the elements of a with the same key into the same part.
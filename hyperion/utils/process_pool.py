@@ -0,0 +1,99 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def ordered_imap(fn, iterable, num_workers=1, max_pending=None,
+                 initializer=None, initargs=(), mp_context='spawn'):
+    """Applies fn to the items of iterable in a pool of processes
+       and yields the results in the same order as the inputs.
+
+       Contrary to multiprocessing.Pool.imap, the inputs are consumed
+       lazily: at most max_pending items are submitted to the pool before
+       the oldest result is collected, which limits the memory used when
+       the reader is faster than the workers or the writer.
+
+    Args:
+      fn: picklable function to apply to each item.
+      iterable: input items.
+      num_workers: number of worker processes, if <= 1 the function is
+                   evaluated in the calling process.
+      max_pending: maximum number of items inside the pool,
+                   by default 4 x num_workers.
+      initializer: function called once at the start of each worker,
+                   it is also called in the main process if num_workers <= 1.
+      initargs: arguments for the initializer.
+      mp_context: multiprocessing start method.
+
+    Yields:
+      fn(item) for each item in iterable.
+    """
+    if num_workers is None or num_workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in iterable:
+            yield fn(item)
+        return
+
+    if max_pending is None:
+        max_pending = 4 * num_workers
+
+    ctx = multiprocessing.get_context(mp_context)
+    pending = deque()
+    with ProcessPoolExecutor(num_workers, mp_context=ctx,
+                             initializer=initializer,
+                             initargs=initargs) as pool:
+        for item in iterable:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, item))
+
+        while len(pending) > 0:
+            yield pending.popleft().result()
+
+
+
+class WorkerRTF(object):
+    """Accumulates processing time and signal duration per worker
+       to report the real-time factor of each worker.
+    """
+    def __init__(self):
+        self.proc_time = {}
+        self.duration = {}
+        self.count = {}
+
+
+    def update(self, worker_id, proc_time, duration):
+        self.proc_time[worker_id] = self.proc_time.get(worker_id, 0) + proc_time
+        self.duration[worker_id] = self.duration.get(worker_id, 0) + duration
+        self.count[worker_id] = self.count.get(worker_id, 0) + 1
+
+
+    def report(self, elapsed_time=None):
+        """Logs the real-time factor of each worker and the total."""
+        for i, worker_id in enumerate(sorted(self.proc_time.keys())):
+            logging.info(
+                'worker %d (pid=%d) processed %d files, duration=%.2f s. '
+                'processing-time=%.2f s. real-time-factor=%.4f' % (
+                    i, worker_id, self.count[worker_id],
+                    self.duration[worker_id], self.proc_time[worker_id],
+                    self.proc_time[worker_id]/max(self.duration[worker_id], 1e-10)))
+
+        duration = sum(self.duration.values())
+        proc_time = sum(self.proc_time.values())
+        if elapsed_time is None:
+            logging.info('total duration=%.2f s. processing-time=%.2f s.' % (
+                duration, proc_time))
+            return
+        logging.info(
+            'total duration=%.2f s. processing-time=%.2f s. elapsed-time=%.2f s. '
+            'real-time-factor=%.4f speed-up=%.2f' % (
+                duration, proc_time, elapsed_time,
+                elapsed_time/max(duration, 1e-10),
+                proc_time/max(elapsed_time, 1e-10)))
@@ -0,0 +1,98 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import shutil
+import pickle
+import numpy as np
+from numpy.testing import assert_allclose
+from scipy import signal
+
+from hyperion.io import DataWriterFactory as DWF
+from hyperion.augment import WavBank
+from hyperion.augment.partitioned_conv import (
+    partition_spectra, partitioned_convolve, PartitionedRIRBank)
+from hyperion.augment.reverb_augment import SingleReverbAugment
+
+output_dir = './tests/data_out/augment'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+rir_path = output_dir + '/rirs_part'
+
+
+def create_rirs(num_rirs=10, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    keys = ['rir%d' % i for i in range(num_rirs)]
+    rirs = []
+    for i in range(num_rirs):
+        n = rng.randint(500, 5000)
+        h = rng.randn(n) * np.exp(-np.arange(n) / 500)
+        h[:rng.randint(0, 20)] = 0
+        rirs.append(h.astype('float32'))
+
+    with DWF.create('ark,scp:%s.ark,%s.scp' % (rir_path, rir_path)) as w:
+        w.write(keys, rirs)
+
+    return keys, rirs
+
+
+@pytest.mark.parametrize('block_size', [64, 256, 1024])
+def test_partitioned_convolve(block_size):
+    rng = np.random.RandomState(seed=1)
+    x = rng.randn(10000).astype('float32')
+    h = rng.randn(3000).astype('float32')
+    H = partition_spectra(h, block_size)
+    y_ref = signal.fftconvolve(x, h)
+    y = partitioned_convolve(x, H, block_size)
+    assert_allclose(y[:len(y_ref)], y_ref, rtol=1e-4, atol=1e-3)
+    y = partitioned_convolve(x, H, block_size, 5000)
+    assert len(y) == 5000
+    assert_allclose(y, y_ref[:5000], rtol=1e-4, atol=1e-3)
+
+
+def test_rir_bank_convolve():
+    keys, rirs = create_rirs()
+    bank_path = output_dir + '/rir_bank_part'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    bank = WavBank.create_from_data('scp:%s.scp' % rir_path, bank_path)
+    part_bank1 = PartitionedRIRBank(bank, [128, 512])
+    part_bank2 = PartitionedRIRBank(bank, [128, 512], bank_path)
+    assert os.path.isfile(bank_path + '/spec_512.bin')
+    # spectra are reopened from disk when unpickled
+    part_bank3 = pickle.loads(pickle.dumps(part_bank2))
+    assert isinstance(part_bank3.spectra[128], np.memmap)
+
+    x = np.random.RandomState(seed=1).randn(6000).astype('float32')
+    for part_bank in [part_bank1, part_bank2, part_bank3]:
+        for i, h in enumerate(rirs):
+            y_ref = signal.fftconvolve(x, h)
+            for B in [None, 128, 512]:
+                y, _ = part_bank.convolve(x, i, block_size=B)
+                assert_allclose(y, y_ref, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize('rir_norm', [None, 'max', 'energy'])
+@pytest.mark.parametrize('comp_delay', [True, False])
+def test_reverb_partitioned(rir_norm, comp_delay):
+    create_rirs()
+    aug1 = SingleReverbAugment('small', 'scp:%s.scp' % rir_path, rir_norm=rir_norm,
+                               comp_delay=comp_delay)
+    aug2 = SingleReverbAugment('small', 'scp:%s.scp' % rir_path, rir_norm=rir_norm,
+                               comp_delay=comp_delay, conv_block_sizes=[256, 1024])
+    x = np.random.RandomState(seed=1).randn(8000)
+    for i in range(5):
+        y1, info1 = aug1(x)
+        y2, info2 = aug2(x)
+        assert y1.shape == y2.shape
+        assert_allclose(y1, y2, rtol=1e-4, atol=1e-3)
+        assert info1['h_delay'] == info2['h_delay']
+        assert_allclose(info1['h_max'], info2['h_max'], rtol=1e-5)
+        assert_allclose(info1['srr'], info2['srr'], rtol=1e-3, atol=1e-3)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
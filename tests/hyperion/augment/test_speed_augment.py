@@ -0,0 +1,62 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import math
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.augment import SpeedAugment
+
+
+def generate_signal(num_samples=16000, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    return rng.randn(num_samples).astype('float32')
+
+
+@pytest.mark.parametrize('r', [0.9, 1.1, 1.05])
+def test_speed_frequency(r):
+    fs = 16000
+    t = np.arange(fs) / fs
+    x = np.sin(2 * np.pi * 1000 * t).astype('float32')
+    aug = SpeedAugment(1, [r])
+    y, info = aug(x)
+    assert info['speed_ratio'] == r
+    assert len(y) == math.ceil(len(x) / r)
+    # speed perturbation scales the frequencies by r
+    f = np.argmax(np.abs(np.fft.rfft(y))) * fs / len(y)
+    assert_allclose(f, 1000 * r, rtol=1e-2)
+
+
+@pytest.mark.parametrize('r', [0.9, 1.1])
+def test_speed_num_samples(r):
+    x = generate_signal()
+    aug = SpeedAugment(1, [r])
+    y, _ = aug(x, speed_ratio=r)
+    # reading only the source samples needed for the output chunk gives
+    # the same result as perturbing the full signal
+    num_samples = 4000
+    x_read = x[:int(math.ceil(r * num_samples)) + 20]
+    y2, _ = aug(x_read, speed_ratio=r, num_samples=num_samples)
+    assert len(y2) == num_samples
+    assert_allclose(y2, y[:num_samples], atol=1e-6)
+
+
+@pytest.mark.parametrize('mode', ['resample', 'time_stretch'])
+def test_speed_keep_length(mode):
+    x = generate_signal()
+    aug = SpeedAugment(1, [0.9, 1.1], keep_length=True, mode=mode)
+    for i in range(4):
+        y, info = aug(x)
+        assert len(y) == len(x)
+
+    aug = SpeedAugment(0, [0.9, 1.1], mode=mode)
+    y, info = aug(x)
+    assert info['speed_ratio'] == 1
+    assert_allclose(y, x)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
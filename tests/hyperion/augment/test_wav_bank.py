@@ -0,0 +1,139 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import shutil
+import pickle
+import numpy as np
+from numpy.testing import assert_allclose
+import soundfile as sf
+
+from hyperion.hyp_defs import float_cpu
+from hyperion.io import DataWriterFactory as DWF
+from hyperion.augment import WavBank
+from hyperion.augment.reverb_augment import SingleReverbAugment
+from hyperion.augment.noise_augment import SingleNoiseAugment
+
+output_dir = './tests/data_out/augment'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+rir_path = output_dir + '/rirs'
+noise_path = output_dir + '/noise'
+
+
+def create_rirs(num_rirs=10, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    keys = ['rir%d' % i for i in range(num_rirs)]
+    rirs = []
+    for i in range(num_rirs):
+        n = rng.randint(500, 2000)
+        h = rng.randn(n) * np.exp(-np.arange(n) / 200)
+        h[:rng.randint(0, 20)] = 0
+        rirs.append(h.astype('float32'))
+
+    with DWF.create('ark,scp:%s.ark,%s.scp' % (rir_path, rir_path)) as w:
+        w.write(keys, rirs)
+
+    return keys, rirs
+
+
+def create_noises(num_noises=5, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    with open(noise_path + '.scp', 'w') as f:
+        for i in range(num_noises):
+            x = (rng.randn(rng.randint(4000, 8000)) * 1000).astype('int16')
+            file_path = '%s%d.wav' % (noise_path, i)
+            sf.write(file_path, x, 16000)
+            f.write('noise%d %s\n' % (i, file_path))
+
+
+def test_rir_bank():
+    keys, rirs = create_rirs()
+    bank_path = output_dir + '/rir_bank'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    bank1 = WavBank.create_from_data('scp:%s.scp' % rir_path)
+    bank2 = WavBank.create_from_data('scp:%s.scp' % rir_path, bank_path)
+    assert os.path.isdir(bank_path)
+    assert isinstance(bank2.data, np.memmap)
+    # load again from disk
+    bank3 = WavBank.create_from_data('scp:%s.scp' % rir_path, bank_path)
+
+    for bank in [bank1, bank2, bank3]:
+        assert len(bank) == len(keys)
+        assert list(bank.keys) == keys
+        for i, h in enumerate(rirs):
+            assert_allclose(bank.read(i), h)
+            d = np.argmax(np.abs(h))
+            assert bank.peak_idx[i] == d
+            assert_allclose(bank.peak[i], h[d])
+            assert_allclose(bank.energy[i], np.sum(h**2), rtol=1e-5)
+
+        assert_allclose(bank.read_segment(3, 10, 50), rirs[3][10:60])
+
+
+def test_bank_pickle():
+    create_rirs()
+    bank_path = output_dir + '/rir_bank_pickle'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    bank = WavBank.create_from_data('scp:%s.scp' % rir_path, bank_path)
+    # the memory-mapped bank is not serialized, only its path
+    s = pickle.dumps(bank)
+    assert len(s) < bank.data.nbytes
+    bank2 = pickle.loads(s)
+    assert isinstance(bank2.data, np.memmap)
+    for i in range(len(bank)):
+        assert_allclose(bank.read(i), bank2.read(i))
+
+
+def test_noise_bank_float16():
+    create_noises()
+    bank_path = output_dir + '/noise_bank'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    bank = WavBank.create_from_audio(noise_path + '.scp', bank_path, 'float16')
+    ref = WavBank.create_from_audio(noise_path + '.scp')
+    assert bank.data.dtype == np.float16
+    for i in range(len(bank)):
+        x = bank.read(i)
+        assert x.dtype == float_cpu()
+        assert_allclose(x, ref.read(i), rtol=1e-3, atol=1e-3)
+
+
+@pytest.mark.parametrize('rir_norm', [None, 'max', 'energy'])
+def test_reverb_with_bank(rir_norm):
+    create_rirs()
+    bank_path = output_dir + '/rir_bank_reverb'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    aug1 = SingleReverbAugment('small', 'scp:%s.scp' % rir_path, rir_norm=rir_norm,
+                               preload_rirs=False)
+    aug2 = SingleReverbAugment('small', 'scp:%s.scp' % rir_path, rir_norm=rir_norm,
+                               bank_path=bank_path)
+    x = np.random.RandomState(seed=1).randn(8000)
+    for i in range(5):
+        y1, info1 = aug1(x)
+        y2, info2 = aug2(x)
+        assert_allclose(y1, y2, rtol=1e-4, atol=1e-4)
+        assert_allclose(info1['h_max'], info2['h_max'], rtol=1e-5)
+        assert_allclose(info1['srr'], info2['srr'], rtol=1e-4)
+
+
+def test_noise_with_bank():
+    create_noises()
+    bank_path = output_dir + '/noise_bank_aug'
+    shutil.rmtree(bank_path, ignore_errors=True)
+    aug1 = SingleNoiseAugment('noise', noise_path + '.scp', 0, 10)
+    aug2 = SingleNoiseAugment('noise', noise_path + '.scp', 0, 10,
+                              bank_path=bank_path)
+    x = np.random.RandomState(seed=1).randn(10000)
+    for i in range(5):
+        y1, info1 = aug1(x)
+        y2, info2 = aug2(x)
+        assert_allclose(y1, y2, rtol=1e-5, atol=1e-5)
+        assert info1['snr'] == info2['snr']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -34,3 +34,28 @@ def test_vad():
 
     assert np.mean(vad[:len(vad_est)]==vad_est) > 0.9
     
+
+
+def stream_vad(e_vad, x, chunk_size=1234):
+    y = []
+    for i in range(0, len(x), chunk_size):
+        y.append(e_vad.accept_waveform(x[i:i+chunk_size]))
+    y.append(e_vad.flush())
+    return np.concatenate(y)
+
+
+def test_vad_stream():
+    # without mean scale, the streaming VAD is the same as the offline one
+    e_vad = EnergyVAD(dither=0, vad_energy_mean_scale=0,
+                      vad_energy_threshold=15, vad_frames_context=2)
+    vad_ref = e_vad.compute(s)
+    e_vad.reset()
+    vad_est = stream_vad(e_vad, s)
+    assert np.all(vad_est == vad_ref)
+
+    # with mean scale, the threshold adapts as the signal arrives,
+    # so we only check after the first speech frames
+    e_vad = EnergyVAD()
+    vad_est = stream_vad(e_vad, s)
+    assert len(vad_est) == len(vad_ref)
+    assert np.mean(vad[200:len(vad_est)]==vad_est[200:]) > 0.9
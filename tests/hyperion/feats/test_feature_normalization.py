@@ -101,3 +101,37 @@ def test_mvn_cum_backward():
 
 
     
+
+
+def stream_normalize(mvn, x, chunk_size=37):
+    y = []
+    for i in range(0, x.shape[0], chunk_size):
+        y.append(mvn.accept_frames(x[i:i+chunk_size]))
+    y.append(mvn.flush())
+    return np.concatenate(y, axis=0)
+
+
+def test_stmvn_stream():
+
+    mvn = MeanVarianceNorm(norm_mean=True, norm_var=False,
+                           left_context=150, right_context=50)
+    x_ref = mvn.normalize_cumsum(x)
+    x_norm = stream_normalize(mvn, x)
+    assert_allclose(x_norm, x_ref, atol=1e-10)
+
+    mvn = MeanVarianceNorm(norm_mean=True, norm_var=True,
+                           left_context=150, right_context=50)
+    x_ref = mvn.normalize_cumsum(x)
+    x_norm = stream_normalize(mvn, x)
+    assert_allclose(x_norm, x_ref, rtol=1e-5, atol=1e-5)
+
+
+def test_mvn_cum_forward_stream():
+
+    mvn = MeanVarianceNorm(norm_mean=True, norm_var=True,
+                           left_context=None, right_context=0)
+    x_ref = mvn.normalize_cumsum(x)
+    x_norm = stream_normalize(mvn, x)
+    assert_allclose(x_norm, x_ref, rtol=1e-5, atol=1e-5)
+    # the buffer does not grow
+    assert mvn._stream_x.shape[0] == 0
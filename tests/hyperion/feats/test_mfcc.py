@@ -90,3 +90,16 @@ def test_mfcc_from_logfb():
 
     
     
+
+
+def test_mfcc_stream():
+
+    for output_step in ['spec', 'logfb', 'mfcc']:
+        mfcc = MFCC(window_type=window_type, dither=0, output_step=output_step)
+        P = mfcc.compute(s)
+        mfcc.reset()
+        P2 = []
+        for i in range(0, len(s), 1000):
+            P2.append(mfcc.accept_waveform(s[i:i+1000]))
+        P2 = np.concatenate(P2, axis=0)
+        assert_allclose(P, P2, rtol=1e-4, atol=1e-4)
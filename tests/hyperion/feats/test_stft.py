@@ -74,3 +74,28 @@ def test_strft_povey_10hz():
 
 
     
+def test_frame_signal():
+
+    frames = frame_signal(s, frame_length=400, frame_shift=160)
+    n = int(np.floor((len(s) - 400 + 160)/160))
+    assert frames.shape == (n, 400)
+    for i in [0, 1, n//2, n-1]:
+        assert_allclose(frames[i], s[i*160:i*160+400])
+
+
+def test_strft_vs_loop():
+
+    w = FWF.create('povey', 400)
+    X = strft(s, frame_length=400, frame_shift=160, fft_length=512, window=w)
+    assert X.dtype == np.complex64
+    for i in [0, 1, X.shape[0]//2, X.shape[0]-1]:
+        X_i = np.fft.rfft(s[i*160:i*160+400]*w, n=512)
+        assert_allclose(X[i], X_i, rtol=1e-4, atol=1e-2*np.max(np.abs(X_i)))
+
+
+def test_st_logE_vs_loop():
+
+    logE = st_logE(s, frame_length=400, frame_shift=160)
+    for i in [0, 1, len(logE)//2, len(logE)-1]:
+        e_i = np.log(np.sum(s[i*160:i*160+400]**2)+1e-15)
+        assert_allclose(logE[i], e_i, rtol=1e-6)
@@ -147,3 +147,31 @@ def test_read_rar_with_segments():
 
     for s_i, s1_i in zip(s_seg, s1):
         assert_allclose(s_i, s1_i, atol=1)
+
+
+def test_read_rar_chunks():
+
+    # chunks of the same files in random order are grouped by file
+    keys1 = [keys[2], keys[0], keys[2], keys[1], keys[0]]
+    s_idx = [2, 0, 2, 1, 0]
+    offsets = [0.5, 0.2, 0.1, 0., 0.6]
+    durs = [0.25, 0.3, 0.2, 0.5, 0.]
+    with RAR(wav_scp_file) as r:
+        s1, fs1 = r.read(keys1, time_offset=offsets, time_durs=durs)
+
+    for i, s1_i in enumerate(s1):
+        s_beg = int(offsets[i] * fs)
+        s_end = s_beg + int(durs[i] * fs) if durs[i] > 0 else fs
+        assert fs1[i] == fs
+        assert_allclose(s[s_idx[i]][s_beg:s_end], s1_i, atol=1)
+
+
+def test_read_rar_chunks_with_segments():
+
+    keys1 = keys_seg[::-1]
+    s1_ref = s_seg[::-1]
+    with RAR(wav_scp_file, segments_file) as r:
+        s1, fs1 = r.read(keys1, time_offset=0.01, time_durs=0.05)
+
+    for s_i, s1_i in zip(s1_ref, s1):
+        assert_allclose(s_i[int(0.01 * fs):int(0.06 * fs)], s1_i, atol=1)
@@ -0,0 +1,151 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import itertools
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.utils.math import logsumexp
+from hyperion.pdfs import HMM
+
+num_states = 3
+seq_lengths = [7, 5, 2]
+
+
+def create_hmm():
+    rng = np.random.RandomState(seed=0)
+    pi = rng.dirichlet(np.ones((num_states,)))
+    trans = rng.dirichlet(np.ones((num_states,)), size=(num_states,))
+    model = HMM(pi=pi, trans=trans, chunk_length=3)
+    return model
+
+
+def create_data():
+    rng = np.random.RandomState(seed=1)
+    x = [10 * rng.randn(n, num_states) for n in seq_lengths]
+    return x
+
+
+def naive_forward(model, x):
+    log_alpha = np.zeros_like(x)
+    log_alpha[0] = model.log_pi + x[0]
+    for n in range(1, x.shape[0]):
+        log_alpha[n] = x[n] + logsumexp(
+            log_alpha[n-1][:, None] + model.log_trans, axis=0)
+    return log_alpha
+
+
+def naive_backward(model, x):
+    log_beta = np.zeros_like(x)
+    for n in range(x.shape[0]-2, -1, -1):
+        r = log_beta[n+1] + x[n+1] + model.log_trans
+        log_beta[n] = logsumexp(r, axis=-1)
+    return log_beta
+
+
+def naive_Nzz(model, x):
+    log_alpha = naive_forward(model, x)
+    log_beta = naive_backward(model, x)
+    log_px = logsumexp(log_alpha[-1])
+    zz = (log_alpha[:-1, :, None] + model.log_trans +
+          x[1:, None, :] + log_beta[1:, None, :]) - log_px
+    return np.sum(np.exp(zz), axis=0)
+
+
+def brute_force_best_path(model, x):
+    best = -np.inf
+    for path in itertools.product(range(num_states), repeat=x.shape[0]):
+        s = model.log_pi[path[0]] + x[0, path[0]]
+        for n in range(1, x.shape[0]):
+            s += model.log_trans[path[n-1], path[n]] + x[n, path[n]]
+        if s > best:
+            best = s
+            best_path = path
+    return np.asarray(best_path), best
+
+
+def test_forward_backward():
+    model = create_hmm()
+    x = create_data()
+    log_alpha = model.forward(x)
+    log_beta = model.backward(x)
+    for i, x_i in enumerate(x):
+        n = x_i.shape[0]
+        assert_allclose(model.forward(x_i), naive_forward(model, x_i),
+                        rtol=1e-5, atol=1e-5)
+        assert_allclose(log_alpha[i, :n], naive_forward(model, x_i),
+                        rtol=1e-5, atol=1e-5)
+        assert_allclose(log_beta[i, :n], naive_backward(model, x_i),
+                        rtol=1e-5, atol=1e-5)
+
+
+def test_compute_pz():
+    model = create_hmm()
+    x = create_data()
+    pz, Nzz, log_px = model.compute_pz(x, return_Nzz=True, return_log_px=True)
+    Nzz_naive = 0
+    for i, x_i in enumerate(x):
+        n = x_i.shape[0]
+        log_alpha = naive_forward(model, x_i)
+        log_beta = naive_backward(model, x_i)
+        log_px_naive = logsumexp(log_alpha[-1])
+        pz_naive = np.exp(log_alpha + log_beta - log_px_naive)
+        assert_allclose(pz[i, :n], pz_naive, rtol=1e-5, atol=1e-8)
+        assert_allclose(pz[i, n:], 0)
+        assert_allclose(log_px[i], log_px_naive, rtol=1e-6)
+        Nzz_naive += naive_Nzz(model, x_i)
+
+    assert_allclose(Nzz, Nzz_naive, rtol=1e-5, atol=1e-8)
+    assert_allclose(np.sum(Nzz), np.sum(np.asarray(seq_lengths)-1))
+
+
+def test_log_predictive():
+    model = create_hmm()
+    x = create_data()[0]
+    log_pred = model.log_predictive(x)
+    log_px = [logsumexp(naive_forward(model, x[:n])[-1])
+              for n in range(1, x.shape[0]+1)]
+    assert_allclose(log_pred, np.diff(log_px), rtol=1e-5)
+
+
+def test_viterbi_decode():
+    model = create_hmm()
+    x = create_data()
+    paths, log_pxz = model.viterbi_decode(x)
+    for i, x_i in enumerate(x):
+        n = x_i.shape[0]
+        best_path, best = brute_force_best_path(model, x_i)
+        assert np.all(paths[i, 0, :n] == best_path)
+        assert np.all(paths[i, 0, n:] == -1)
+        assert_allclose(log_pxz[i, 0], best, rtol=1e-6)
+
+    paths, log_pxz = model.viterbi_decode(x[1], nbest=2)
+    assert paths.shape == (2, seq_lengths[1])
+    assert log_pxz[0] >= log_pxz[1]
+
+
+def test_fit():
+    model = create_hmm()
+    x = model.sample(200, 20)
+    rng = np.random.RandomState(seed=2)
+    # noisy observations of the sampled states
+    log_px = np.log(0.8 * x + 0.2 / num_states)
+    model2 = HMM(num_states=num_states)
+    model2.pi = rng.dirichlet(np.ones((num_states,)))
+    model2.trans = rng.dirichlet(np.ones((num_states,)), size=(num_states,))
+    elbo, _ = model2.fit(log_px, epochs=5, batch_size=64)
+    assert elbo[-1] > elbo[0]
+
+
+def test_estep_elbo():
+    model = create_hmm()
+    x = create_data()
+    pz, stats, elbo = model.Estep(x, return_elbo=True)
+    assert_allclose(elbo, model.elbo(x), rtol=1e-6)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,89 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import numpy as np
+
+import torch
+
+from hyperion.torch.data.class_utt_table import ClassUttTable
+
+num_classes = 10
+
+
+def create_table(class_weights=None):
+    rng = np.random.RandomState(0)
+    num_utts = 300
+    # classes 3 and 7 have no utterances
+    valid_classes = np.setdiff1d(np.arange(num_classes), [3, 7])
+    utt_idx2class = rng.choice(valid_classes, size=(num_utts,))
+    seq_lengths = rng.uniform(1, 10, size=(num_utts,))
+    # all the utterances of class 5 are short
+    seq_lengths[utt_idx2class == 5] = rng.uniform(
+        1, 2, size=(np.sum(utt_idx2class == 5),)
+    )
+    table = ClassUttTable(
+        utt_idx2class, num_classes, seq_lengths=seq_lengths, class_weights=class_weights
+    )
+    return table, utt_idx2class, seq_lengths
+
+
+def test_csr():
+    table, utt_idx2class, seq_lengths = create_table()
+    for c in range(num_classes):
+        first, last = table.class_offsets[c], table.class_offsets[c + 1]
+        utts = table.utt_idx[first:last].numpy()
+        assert np.all(utt_idx2class[utts] == c)
+        assert np.all(np.diff(seq_lengths[utts]) >= 0)
+        assert len(utts) == np.sum(utt_idx2class == c)
+
+
+@pytest.mark.parametrize("min_length", [None, 1.5, 3.0, 9.5])
+def test_sample_min_length(min_length):
+    table, utt_idx2class, seq_lengths = create_table()
+    g = torch.Generator()
+    g.manual_seed(0)
+    utts = table.sample(100, num_egs_per_class=3, min_length=min_length, generator=g)
+    assert utts.shape == (300,)
+    classes = utt_idx2class[utts.numpy()]
+    # classes without utterances are never drawn
+    assert not np.any(np.isin(classes, [3, 7]))
+    if min_length is not None:
+        assert np.all(seq_lengths[utts.numpy()] >= min_length)
+        if min_length > 2:
+            # classes without utterances long enough are never drawn
+            assert not np.any(classes == 5)
+
+    # the utterances of the same class are repeated num_egs_per_class times
+    classes = classes.reshape(3, 100)
+    assert np.all(classes == classes[0])
+
+
+def test_sample_min_length_all_utts():
+    table, utt_idx2class, seq_lengths = create_table()
+    g = torch.Generator()
+    g.manual_seed(0)
+    utts = table.sample(20000, min_length=5, generator=g).numpy()
+    # all the eligible utterances are drawn
+    eligible = np.nonzero(seq_lengths >= 5)[0]
+    assert np.array_equal(np.unique(utts), eligible)
+
+
+def test_sample_class_weights():
+    class_weights = np.arange(1, num_classes + 1, dtype=np.float64)
+    table, utt_idx2class, _ = create_table(class_weights)
+    g = torch.Generator()
+    g.manual_seed(0)
+    num_samples = 50000
+    utts = table.sample(num_samples, generator=g)
+    counts = np.bincount(utt_idx2class[utts.numpy()], minlength=num_classes)
+    class_weights[[3, 7]] = 0
+    expected = class_weights / np.sum(class_weights)
+    assert np.all(counts[[3, 7]] == 0)
+    np.testing.assert_allclose(counts / num_samples, expected, atol=0.01)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
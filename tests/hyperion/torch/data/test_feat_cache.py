@@ -0,0 +1,140 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import shutil
+import numpy as np
+from numpy.testing import assert_allclose
+
+import torch
+
+from hyperion.torch.data import FeatCache
+from hyperion.torch.layers.audio_feats import Wav2LogFilterBank
+
+output_dir = './tests/data_out/torch/data/feat_cache'
+
+fs = 16000
+frame_shift = 160
+feat_dim = 24
+seq_lengths = [3., 2.5]
+
+
+def create_cache(name, dtype='float32'):
+    cache_path = os.path.join(output_dir, name)
+    if os.path.exists(cache_path):
+        shutil.rmtree(cache_path)
+    return FeatCache.create(cache_path, seq_lengths, 0.01, feat_dim, dtype)
+
+
+def create_feats(seq_idx, frame_offset, num_frames):
+    # features that encode sequence and frame index
+    seq_idx = np.asarray(seq_idx)[:, None, None]
+    frames = np.asarray(frame_offset)[:, None, None] + np.arange(num_frames)[:, None]
+    return (1000 * seq_idx + frames + np.arange(feat_dim) / feat_dim).astype('float32')
+
+
+def test_miss_write_hit():
+    cache = create_cache('miss_write_hit')
+    seq_idx = [0, 1]
+    offset = [10, 20]
+    feats, hit = cache.read(seq_idx, offset, 50)
+    assert not np.any(hit)
+    assert feats.shape == (0, 50, feat_dim)
+    assert cache.fill_ratio == 0
+
+    x = create_feats(seq_idx, offset, 50)
+    cache.write(seq_idx, offset, x)
+    feats, hit = cache.read(seq_idx, offset, 50)
+    assert np.all(hit)
+    assert_allclose(feats, x)
+
+    # same frames in other sequence are not in the cache
+    _, hit = cache.read([1, 0], offset, 50)
+    assert not np.any(hit)
+
+    # the cache is shared with other processes opening the same path
+    cache2 = FeatCache.create(cache.cache_path, seq_lengths, 0.01, feat_dim, 'float32')
+    feats, hit = cache2.read(seq_idx, offset, 50)
+    assert np.all(hit)
+    assert_allclose(feats, x)
+
+
+def test_chunk_boundaries():
+    cache = create_cache('chunk_boundaries', 'float16')
+    cache.write([0], [0], create_feats([0], [0], 100))
+
+    # chunk inside the written frames
+    feats, hit = cache.read([0, 0], [0, 30], 60)
+    assert np.all(hit)
+    assert_allclose(feats, create_feats([0, 0], [0, 30], 60), rtol=1e-3)
+
+    # chunk crossing the end of the written frames
+    _, hit = cache.read([0], [70], 60)
+    assert not np.any(hit)
+
+    # after writing an overlapping chunk, frames of both chunks are filled
+    cache.write([0], [90], create_feats([0], [90], 60))
+    feats, hit = cache.read([0], [70], 60)
+    assert np.all(hit)
+    assert_allclose(feats, create_feats([0], [70], 60), rtol=1e-3)
+    assert cache.fill_ratio == 150 / np.sum(cache.num_frames)
+
+    # chunks past the end of the sequence are never read or written
+    num_frames = cache.num_frames[1]
+    x = create_feats([1], [num_frames - 10], 20)
+    cache.write([1], [num_frames - 10], x)
+    _, hit = cache.read([1], [num_frames - 10], 20)
+    assert not np.any(hit)
+    assert cache.fill_ratio == 150 / np.sum(cache.num_frames)
+
+
+def read_or_compute(cache, feat_extractor, wavs, seq_idx, frame_offset, chunk_length):
+    # same steps as XVectorTrainerFromWav.extract_feats with clean chunks
+    x = torch.stack([torch.as_tensor(wavs[s][o * frame_shift:o * frame_shift + chunk_length])
+                     for s, o in zip(seq_idx, frame_offset)])
+    num_frames = int(feat_extractor.compute_num_frames(chunk_length))
+    with torch.no_grad():
+        f = feat_extractor(x).numpy()
+    cached_f, hit = cache.read(seq_idx, frame_offset, num_frames)
+    f_out = f.copy()
+    f_out[hit] = cached_f
+    miss = ~hit
+    cache.write(np.asarray(seq_idx)[miss], np.asarray(frame_offset)[miss], f[miss])
+    return f_out, f, hit
+
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_cached_vs_recomputed(exact):
+    if exact:
+        feat_extractor = Wav2LogFilterBank(
+            num_filters=feat_dim, use_energy=False, dither=0,
+            remove_dc_offset=False, preemph_coeff=0)
+    else:
+        feat_extractor = Wav2LogFilterBank(
+            num_filters=feat_dim, use_energy=False, dither=0)
+
+    rng = np.random.RandomState(seed=123)
+    wavs = [1000 * rng.randn(int(fs * l)).astype('float32') for l in seq_lengths]
+    cache = create_cache('cached_vs_recomputed_%d' % exact)
+
+    # long chunks fill the cache
+    _, _, hit = read_or_compute(cache, feat_extractor, wavs, [0, 1], [0, 30], 2 * fs)
+    assert not np.any(hit)
+
+    # shorter chunks inside the long ones are read from the cache
+    f, f_ref, hit = read_or_compute(
+        cache, feat_extractor, wavs, [0, 1, 1], [20, 60, 120], fs)
+    assert np.all(hit)
+    if exact:
+        assert_allclose(f, f_ref, atol=1e-5)
+    else:
+        # the DC offset and pre-emphasis depend on the chunk
+        assert not np.allclose(f, f_ref, atol=1e-5)
+        assert_allclose(f, f_ref, atol=0.1)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,72 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import numpy as np
+
+import torch
+
+from hyperion.torch.data import ClassWeightedSeqSampler
+
+
+class DummyDataset(object):
+    """Minimum dataset interface needed by the sampler."""
+
+    def __init__(self, num_seqs=200, num_classes=20, seed=0):
+        rng = np.random.RandomState(seed)
+        self.num_seqs = num_seqs
+        self.num_classes = num_classes
+        self.utt_idx2class = rng.randint(num_classes, size=(num_seqs,))
+        self.seq_lengths = rng.uniform(1, 10, size=(num_seqs,))
+        self.class_weights = None
+        self.min_chunk_length = 2
+        self.max_chunk_length = 4
+        self.short_seq_exist = True
+
+    def get_random_chunk_length(self, generator=None):
+        return (
+            torch.rand(size=(1,), generator=generator).item()
+            * (self.max_chunk_length - self.min_chunk_length)
+            + self.min_chunk_length
+        )
+
+
+def create_sampler(seed=1234):
+    return ClassWeightedSeqSampler(
+        DummyDataset(), batch_size=8, iters_per_epoch=2, seed=seed
+    )
+
+
+@pytest.mark.parametrize("start_batch", [0, 1, 7, 49, 50])
+def test_set_epoch_start_batch(start_batch):
+    sampler = create_sampler()
+    assert len(sampler) == 50
+    sampler.set_epoch(3)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+
+    # a new sampler with the same seed reproduces the tail of the epoch
+    sampler = create_sampler()
+    sampler.set_epoch(3, start_batch)
+    assert list(sampler) == batches[start_batch:]
+
+    # the start batch is only used in the first iteration after set_epoch
+    assert list(sampler) == batches
+
+
+def test_epochs_differ():
+    sampler = create_sampler()
+    sampler.set_epoch(0)
+    batches0 = list(sampler)
+    sampler.set_epoch(1)
+    batches1 = list(sampler)
+    assert batches0 != batches1
+
+    sampler.set_epoch(0)
+    assert list(sampler) == batches0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,59 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+
+import torch
+
+from hyperion.torch.layers.audio_feats import Wav2Win, Wav2LogFilterBank
+
+fs = 16000
+
+
+def generate_signals():
+    torch.manual_seed(0)
+    x_lengths = torch.as_tensor([16000, 12345, 8000, 401])
+    x = torch.randn(len(x_lengths), int(x_lengths.max())) * 1000
+    for i, n in enumerate(x_lengths):
+        x[i, n:] = 0
+    return x, x_lengths
+
+
+@pytest.mark.parametrize(
+    "snip_edges, center", [(True, False), (False, False), (False, True)]
+)
+def test_wav2win_lengths(snip_edges, center):
+    x, x_lengths = generate_signals()
+    wav2win = Wav2Win(
+        fs, dither=0, snip_edges=snip_edges, center=center, return_log_energy=True
+    )
+    y, log_e, y_lengths = wav2win(x, x_lengths)
+    assert torch.equal(y_lengths, wav2win.compute_num_frames(x_lengths))
+    assert y.size(1) == int(y_lengths.max())
+    for i, n in enumerate(x_lengths):
+        y_i, log_e_i = wav2win(x[i : i + 1, :n])
+        m = int(y_lengths[i])
+        assert y_i.size(1) == m
+        torch.testing.assert_close(y[i : i + 1, :m], y_i, rtol=1e-4, atol=1e-2)
+        torch.testing.assert_close(
+            log_e[i : i + 1, :m], log_e_i, rtol=1e-4, atol=1e-4
+        )
+
+
+@pytest.mark.parametrize("snip_edges", [True, False])
+def test_logfb_lengths(snip_edges):
+    x, x_lengths = generate_signals()
+    wav2fb = Wav2LogFilterBank(fs, dither=0, num_filters=40, snip_edges=snip_edges)
+    y, y_lengths = wav2fb(x, x_lengths)
+    assert y.size(1) == int(y_lengths.max())
+    for i, n in enumerate(x_lengths):
+        y_i = wav2fb(x[i : i + 1, :n])
+        m = int(y_lengths[i])
+        assert y_i.size(1) == m
+        torch.testing.assert_close(y[i : i + 1, :m], y_i, rtol=1e-4, atol=1e-3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,196 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import math
+import numpy as np
+from numpy.testing import assert_allclose
+import soundfile as sf
+from scipy import signal
+
+import torch
+
+from hyperion.io import DataWriterFactory as DWF
+from hyperion.augment import SpeedAugment
+from hyperion.torch.layers.batch_speech_augment import (
+    BatchSpeedAugment,
+    BatchNoiseAugment,
+    BatchReverbAugment,
+    BatchSpeechAugment,
+)
+from hyperion.torch.utils.misc import seq_lengths_to_mask
+
+output_dir = "./tests/data_out/augment"
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+rir_path = output_dir + "/batch_rirs"
+noise_path = output_dir + "/batch_noise"
+
+
+def create_rirs(num_rirs=5, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    keys = ["rir%d" % i for i in range(num_rirs)]
+    rirs = []
+    for i in range(num_rirs):
+        n = rng.randint(200, 800)
+        h = rng.randn(n) * np.exp(-np.arange(n) / 100)
+        h[: rng.randint(0, 20)] = 0
+        rirs.append(h.astype("float32"))
+
+    with DWF.create("ark,scp:%s.ark,%s.scp" % (rir_path, rir_path)) as w:
+        w.write(keys, rirs)
+
+
+def create_noises(num_noises=3, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    with open(noise_path + ".scp", "w") as f:
+        for i in range(num_noises):
+            x = (rng.randn(rng.randint(4000, 8000)) * 1000).astype("int16")
+            file_path = "%s%d.wav" % (noise_path, i)
+            sf.write(file_path, x, 16000)
+            f.write("noise%d %s\n" % (i, file_path))
+
+
+def noise_cfg(snr=5):
+    create_noises()
+    return {
+        "noise_prob": 1,
+        "noise_types": {
+            "noise": {
+                "weight": 1,
+                "noise_path": noise_path + ".scp",
+                "min_snr": snr,
+                "max_snr": snr,
+            }
+        },
+    }
+
+
+def reverb_cfg():
+    create_rirs()
+    return {
+        "reverb_prob": 1,
+        "rir_types": {
+            "rir": {"weight": 1, "rir_path": "scp:%s.scp" % rir_path},
+        },
+    }
+
+
+def generate_signals(batch_size=4, num_samples=8000, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    x_lengths = rng.randint(num_samples // 2, num_samples, size=(batch_size,))
+    x_lengths[0] = num_samples
+    x = 1000 * rng.randn(batch_size, num_samples).astype("float32")
+    x_lengths = torch.as_tensor(x_lengths)
+    mask = seq_lengths_to_mask(x_lengths, num_samples, dtype=torch.float)
+    return torch.as_tensor(x) * mask, x_lengths
+
+
+def assert_zero_padding(x, x_lengths):
+    mask = seq_lengths_to_mask(x_lengths, x.size(-1), dtype=torch.bool)
+    assert torch.all(x[~mask] == 0)
+
+
+@pytest.mark.parametrize("snr", [0, 5, 15])
+def test_noise_snr(snr):
+    x, x_lengths = generate_signals()
+    aug = BatchNoiseAugment.create(noise_cfg(snr))
+    y, info = aug(x, x_lengths)
+    assert_allclose(info["snr"].numpy(), snr)
+    assert_zero_padding(y, x_lengths)
+    # the snr is measured over the valid samples of each signal
+    for i, n in enumerate(x_lengths):
+        x_i = x[i, :n].double()
+        noise_i = y[i, :n].double() - x_i
+        snr_i = 10 * torch.log10(torch.sum(x_i**2) / torch.sum(noise_i**2))
+        assert_allclose(snr_i.item(), snr, atol=1e-2)
+
+
+def test_reverb_convolve():
+    rng = np.random.RandomState(seed=1)
+    x = rng.randn(3, 1000)
+    h = rng.randn(3, 300) * np.exp(-np.arange(300) / 50)
+    y = BatchReverbAugment.convolve(torch.as_tensor(x), torch.as_tensor(h))
+    for i in range(3):
+        assert_allclose(y[i].numpy(), signal.fftconvolve(x[i], h[i]), atol=1e-8)
+
+
+def test_reverb_padding():
+    x, x_lengths = generate_signals()
+    aug = BatchReverbAugment.create(reverb_cfg())
+    y, info = aug(x, x_lengths)
+    assert y.shape == x.shape
+    assert all(r == "rir" for r in info["rir_type"])
+    assert_zero_padding(y, x_lengths)
+
+
+@pytest.mark.parametrize("r", [0.9, 1.1])
+def test_speed_lengths(r):
+    x, x_lengths = generate_signals()
+    aug = BatchSpeedAugment(1, [r], keep_length=False)
+    y, info, y_lengths = aug(x, x_lengths)
+    assert_allclose(info["speed_ratio"].numpy(), r, rtol=1e-6)
+    # same number of samples as the non-batched SpeedAugment
+    y_lengths_ref = [math.ceil(n / r) for n in x_lengths.tolist()]
+    assert y_lengths.tolist() == y_lengths_ref
+    assert y.size(-1) == max(max(y_lengths_ref), x.size(-1))
+    assert_zero_padding(y, y_lengths)
+
+    aug_ref = SpeedAugment(1, [r], keep_length=False)
+    for i, n in enumerate(x_lengths.tolist()):
+        y_ref, _ = aug_ref(x[i, :n].numpy(), speed_ratio=r)
+        assert_allclose(y[i, : y_lengths[i]].numpy(), y_ref, rtol=1e-4, atol=1e-2)
+
+
+def test_speed_keep_length():
+    x, x_lengths = generate_signals()
+    aug = BatchSpeedAugment(1, [0.9], keep_length=True)
+    y, _, y_lengths = aug(x, x_lengths)
+    assert y.shape == x.shape
+    assert torch.all(y_lengths <= x.size(-1))
+    assert_zero_padding(y, y_lengths)
+
+
+def test_speech_augment():
+    x, x_lengths = generate_signals()
+    cfg = {
+        "speed_aug": {"speed_prob": 1, "speed_ratios": [0.9, 1.1]},
+        "reverb_aug": reverb_cfg(),
+        "noise_aug": noise_cfg(),
+    }
+    aug = BatchSpeechAugment.create(cfg)
+    y, info, y_lengths = aug(x, x_lengths)
+    assert y.shape == x.shape
+    assert torch.all(aug.is_augmented(info))
+    assert info["sdr"].shape == (x.size(0),)
+    assert_zero_padding(y, y_lengths)
+
+
+def test_rng_state_dict():
+    x, x_lengths = generate_signals()
+    cfg = {
+        "speed_aug": {"speed_prob": 0.5, "speed_ratios": [0.9, 1.1]},
+        "reverb_aug": reverb_cfg(),
+        "noise_aug": noise_cfg(),
+    }
+    aug = BatchSpeechAugment.create(cfg)
+    aug(x, x_lengths)
+    # the state of the generators goes in the extra state of the modules
+    state_dict = aug.state_dict()
+    assert any(k.endswith("_extra_state") for k in state_dict)
+    y, info, y_lengths = aug(x, x_lengths)
+
+    aug2 = BatchSpeechAugment.create(cfg, random_seed=1234)
+    aug2.load_state_dict(state_dict)
+    y2, info2, y2_lengths = aug2(x, x_lengths)
+    assert torch.equal(y_lengths, y2_lengths)
+    assert_allclose(y2.numpy(), y.numpy(), atol=1e-5)
+    assert torch.equal(info["sdr"], info2["sdr"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,55 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+
+import torch
+
+from hyperion.torch.layers import MeanVarianceNorm as MVN
+
+feat_dim = 20
+
+
+def generate_feats():
+    torch.manual_seed(0)
+    # the last sequences are shorter than the short-time context
+    x_lengths = torch.as_tensor([500, 351, 120, 60, 1])
+    x = torch.randn(len(x_lengths), int(x_lengths.max()), feat_dim) * 3 + 5
+    for i, n in enumerate(x_lengths):
+        # garbage in the padding to check that it is not used in the stats
+        x[i, n:] = 1000
+    return x, x_lengths
+
+
+@pytest.mark.parametrize("norm_var", [False, True])
+@pytest.mark.parametrize("context", [0, 50])
+def test_normalize_masked(norm_var, context):
+    x, x_lengths = generate_feats()
+    mvn = MVN(
+        norm_mean=True, norm_var=norm_var, left_context=context, right_context=context
+    )
+    y = mvn(x, x_lengths)
+    assert y.shape == x.shape
+    for i, n in enumerate(x_lengths):
+        assert torch.all(y[i, n:] == 0)
+        if n == 1 and norm_var:
+            # the std of a single frame is nan without padding
+            assert torch.all(y[i, :n] == 0)
+            continue
+
+        y_i = mvn(x[i : i + 1, :n])
+        torch.testing.assert_close(y[i : i + 1, :n], y_i, rtol=1e-4, atol=1e-4)
+
+
+def test_normalize_masked_stats():
+    # global cmn, the means over the valid frames are zero
+    x, x_lengths = generate_feats()
+    y = MVN(norm_mean=True, norm_var=False)(x, x_lengths)
+    mu = torch.sum(y, dim=1) / x_lengths.unsqueeze(-1)
+    torch.testing.assert_close(mu, torch.zeros_like(mu), rtol=0, atol=1e-4)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,283 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import os
+import math
+import pytest
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from hyperion.torch.layers.margin_losses import (
+    ArcLossOutput,
+    CosLossOutput,
+    SubCenterArcLossOutput,
+)
+from hyperion.torch.layers.partial_fc_losses import (
+    PartialFCArcLossOutput,
+    PartialFCCosLossOutput,
+    PartialFCSubCenterArcLossOutput,
+)
+
+in_feats = 16
+num_classes = 23
+batch_size = 12
+
+
+def create_layers(layer_type, sample_rate=1):
+    torch.manual_seed(0)
+    if layer_type == "arc":
+        full = ArcLossOutput(in_feats, num_classes, s=30, margin=0.3)
+        partial = PartialFCArcLossOutput(
+            in_feats, num_classes, s=30, margin=0.3, sample_rate=sample_rate
+        )
+    elif layer_type == "cos":
+        full = CosLossOutput(in_feats, num_classes, s=30, margin=0.3)
+        partial = PartialFCCosLossOutput(
+            in_feats, num_classes, s=30, margin=0.3, sample_rate=sample_rate
+        )
+    else:
+        full = SubCenterArcLossOutput(
+            in_feats, num_classes, num_subcenters=3, s=30, margin=0.3
+        )
+        partial = PartialFCSubCenterArcLossOutput(
+            in_feats,
+            num_classes,
+            num_subcenters=3,
+            s=30,
+            margin=0.3,
+            sample_rate=sample_rate,
+        )
+
+    partial.load_state_dict(full.state_dict())
+    return full, partial
+
+
+def create_batch():
+    torch.manual_seed(1)
+    x = torch.randn(batch_size, in_feats)
+    y = torch.randint(num_classes, (batch_size,))
+    return x, y
+
+
+@pytest.mark.parametrize("layer_type", ["arc", "cos", "subcenter-arc"])
+def test_sample_rate_1(layer_type):
+    full, partial = create_layers(layer_type)
+    x, y = create_batch()
+
+    # training with margin
+    x1 = x.clone().requires_grad_()
+    x2 = x.clone().requires_grad_()
+    out1 = full(x1, y)
+    out2 = partial(x2, y)
+    assert torch.allclose(out1, out2, atol=1e-4)
+
+    loss = nn.CrossEntropyLoss()
+    loss(out1, y).backward()
+    loss(out2, y).backward()
+    assert torch.allclose(x1.grad, x2.grad, atol=1e-5)
+    assert torch.allclose(full.kernel.grad, partial.kernel.grad, atol=1e-5)
+
+    # evaluation without margin
+    full.eval()
+    partial.eval()
+    with torch.no_grad():
+        assert torch.allclose(full(x, y), partial(x, y), atol=1e-4)
+
+
+@pytest.mark.parametrize("layer_type", ["arc", "cos", "subcenter-arc"])
+def test_sampled_logits(layer_type):
+    full, partial = create_layers(layer_type, sample_rate=0.25)
+    x, y = create_batch()
+    with torch.no_grad():
+        out_full = full(x, y)
+        out = partial(x, y)
+
+    assert out.shape == out_full.shape
+    # the positive logits are always computed, with margin
+    idx = torch.arange(batch_size)
+    assert torch.allclose(out[idx, y], out_full[idx, y], atol=1e-4)
+
+    # the rest of sampled classes are exact and
+    # the non-sampled get a large negative value
+    sampled = torch.any(out > -1e4, dim=0)
+    num_sampled = max(len(torch.unique(y)), math.ceil(0.25 * num_classes))
+    assert int(torch.sum(sampled)) == num_sampled
+    assert torch.allclose(out[:, sampled], out_full[:, sampled], atol=1e-4)
+    assert torch.all(out[:, ~sampled] == -1e4)
+
+
+@pytest.mark.parametrize("layer_type", ["arc", "cos", "subcenter-arc"])
+def test_state_dict(layer_type):
+    full, partial = create_layers(layer_type, sample_rate=0.25)
+    assert torch.equal(partial.state_dict()["kernel"], full.kernel.data)
+
+    _, partial2 = create_layers(layer_type, sample_rate=0.25)
+    partial2.kernel.data.zero_()
+    partial2.load_state_dict(partial.state_dict())
+    assert torch.equal(partial2.kernel, partial.kernel)
+
+
+class Net(nn.Module):
+    def __init__(self, output):
+        super().__init__()
+        self.proj = nn.Linear(in_feats, in_feats)
+        self.output = output
+
+    def forward(self, x, y=None):
+        return self.output(self.proj(x), y)
+
+    def get_config(self):
+        return {}
+
+
+def create_net(output_type):
+    torch.manual_seed(0)
+    proj = nn.Linear(in_feats, in_feats)
+    if output_type == "full":
+        output = ArcLossOutput(in_feats, num_classes, s=30, margin=0.3)
+    else:
+        # kernel shards are initialized with the rng of each rank,
+        # they are overwritten by load_state_dict
+        output = PartialFCArcLossOutput(
+            in_feats, num_classes, s=30, margin=0.3, sample_rate=1
+        )
+    net = Net(output)
+    net.proj = proj
+    return net
+
+
+def train_step(model, optimizer, x, y):
+    optimizer.zero_grad()
+    nn.CrossEntropyLoss()(model(x, y), y).backward()
+    optimizer.step()
+
+
+def _run_sharded(rank, world_size, init_file, exp_path):
+    # we import the trainer here since it is not needed by the rest of tests
+    from hyperion.torch.trainers import TorchTrainer
+
+    dist.init_process_group(
+        "gloo", init_method="file://" + init_file, rank=rank, world_size=world_size
+    )
+    torch.set_num_threads(1)
+    x, y = create_batch()
+    local_size = batch_size // world_size
+    local = slice(rank * local_size, (rank + 1) * local_size)
+
+    # reference trained without sharding with the batch of all the ranks
+    ref_model = create_net("full")
+    ref_optim = torch.optim.Adam(ref_model.parameters(), lr=0.01)
+
+    model = create_net("partial")
+    model.load_state_dict(ref_model.state_dict())
+    assert model.output.is_sharded
+    optim = torch.optim.Adam(model.parameters(), lr=0.01)
+    trainer = TorchTrainer(
+        model,
+        nn.CrossEntropyLoss(),
+        optim=optim,
+        exp_path=exp_path,
+        metrics={},
+        ddp=True,
+    )
+    shard = model.output
+    first = shard.class_offset
+    last = first + shard.num_shard_classes
+    for step in range(2):
+        train_step(trainer.model, trainer.optimizer, x[local], y[local])
+        if step == 0:
+            # after the first step, the gradients have to be the same
+            ref_optim.zero_grad()
+            nn.CrossEntropyLoss()(ref_model(x, y), y).backward()
+            assert torch.allclose(
+                shard.kernel.grad[:, : last - first],
+                ref_model.output.kernel.grad[:, first:last],
+                atol=1e-6,
+            )
+            assert torch.all(shard.kernel.grad[:, last - first :] == 0)
+            assert torch.allclose(
+                model.proj.weight.grad, ref_model.proj.weight.grad, atol=1e-6
+            )
+            ref_optim.step()
+        else:
+            train_step(ref_model, ref_optim, x, y)
+
+    # full kernel and optimizer state are gathered in rank 0
+    trainer._consolidate_state()
+    checkpoint = trainer.checkpoint() if rank == 0 else None
+    if rank == 0:
+        # the model is wrapped by DDP
+        state = {
+            k.replace("module.", "", 1): v
+            for k, v in checkpoint["model_state_dict"].items()
+        }
+        ref_state = ref_model.state_dict()
+        assert state["output.kernel"].shape == ref_state["output.kernel"].shape
+        for k in ref_state:
+            assert torch.allclose(state[k], ref_state[k], atol=1e-5), k
+
+        optim_state = checkpoint["optimizer_state_dict"]["state"]
+        ref_optim_state = ref_optim.state_dict()["state"]
+        kernel_id = checkpoint["optimizer_shards"]["param_ids"][0]
+        assert checkpoint["optimizer_shards"]["world_size"] == world_size
+        full_shape = (in_feats, shard.shard_size * world_size)
+        for k in ("exp_avg", "exp_avg_sq"):
+            v = optim_state[kernel_id][k]
+            assert v.shape == full_shape
+            assert torch.allclose(
+                v[:, :num_classes], ref_optim_state[kernel_id][k], atol=1e-6
+            )
+            assert torch.all(v[:, num_classes:] == 0)
+        torch.save(checkpoint, exp_path + "/model.pth")
+
+    dist.barrier()
+    # the rank takes its shard when loading the checkpoint
+    model2 = create_net("partial")
+    optim2 = torch.optim.Adam(model2.parameters(), lr=0.01)
+    trainer2 = TorchTrainer(
+        model2,
+        nn.CrossEntropyLoss(),
+        optim=optim2,
+        exp_path=exp_path,
+        metrics={},
+        ddp=True,
+    )
+    checkpoint = torch.load(exp_path + "/model.pth")
+    trainer2.model.load_state_dict(checkpoint["model_state_dict"])
+    assert torch.equal(model2.output.kernel, shard.kernel)
+    optim_state_dict = trainer2._shard_optimizer_state_dict(
+        checkpoint["optimizer_state_dict"], checkpoint["optimizer_shards"]
+    )
+    trainer2.optimizer.load_state_dict(optim_state_dict)
+    state = trainer.optimizer.state[shard.kernel]
+    state2 = trainer2.optimizer.state[model2.output.kernel]
+    for k in state:
+        assert torch.equal(state[k], state2[k]), k
+
+    # a checkpoint without the full state resets the state of the shards
+    optim_state_dict = trainer2._shard_optimizer_state_dict(
+        checkpoint["optimizer_state_dict"], None
+    )
+    kernel_id = checkpoint["optimizer_shards"]["param_ids"][0]
+    assert kernel_id not in optim_state_dict["state"]
+
+    dist.destroy_process_group()
+
+
+@pytest.mark.skipif(not dist.is_available(), reason="torch.distributed not available")
+def test_sharded(tmp_path):
+    world_size = 2
+    init_file = str(tmp_path / "dist_init")
+    exp_path = str(tmp_path / "exp")
+    os.makedirs(exp_path)
+    mp.spawn(
+        _run_sharded, args=(world_size, init_file, exp_path), nprocs=world_size
+    )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
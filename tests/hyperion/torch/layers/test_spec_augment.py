@@ -0,0 +1,151 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+
+import torch
+import torch.nn.functional as nnf
+
+from hyperion.torch.layers.spec_augment import AxisMasker, SpecWarper
+
+batch_size = 16
+num_frames = 200
+num_feats = 24
+
+
+def generate_lengths():
+    torch.manual_seed(0)
+    lengths = torch.rand(batch_size) * 0.8 + 0.2
+    lengths[0] = 1
+    valid_length = (lengths * num_frames).long()
+    return lengths, valid_length
+
+
+def run_lengths(x):
+    """Returns the number of consecutive runs of True along the last dim."""
+    x = x.long()
+    starts = x[:, 1:] * (1 - x[:, :-1])
+    return x[:, 0] + starts.sum(dim=-1)
+
+
+@pytest.mark.parametrize("shape", [(num_frames, num_feats), (2, num_frames, num_feats)])
+def test_mask_lengths(shape):
+    lengths, valid_length = generate_lengths()
+    masker = AxisMasker(min_width=10, max_width=80, max_num_masks=3, dim=-2)
+    masker.train()
+    x = torch.ones((batch_size,) + shape)
+    for _ in range(20):
+        y = masker(x, lengths)
+        assert y.shape == x.shape
+        for i in range(batch_size):
+            assert torch.all(y[i, ..., valid_length[i] :, :] == 1)
+
+
+def test_mask_num_and_widths():
+    torch.manual_seed(0)
+    batch_size = 64
+    x = torch.ones(batch_size, 1000, num_feats)
+
+    # number of masks varies per example, masks of width 1 rarely touch
+    masker = AxisMasker(
+        min_width=1, max_width=1, min_num_masks=0, max_num_masks=3, dim=-2
+    )
+    masker.train()
+    masked = masker(x)[:, :, 0] == 0
+    num_masks = run_lengths(masked)
+    assert torch.all(num_masks <= 3)
+    assert len(torch.unique(num_masks)) > 2
+
+    # width varies per example
+    masker = AxisMasker(
+        min_width=0, max_width=30, min_num_masks=1, max_num_masks=1, dim=-1
+    )
+    masker.train()
+    masked = masker(x)[:, 0, :] == 0
+    widths = masked.sum(dim=-1)
+    assert torch.all(widths <= 30)
+    assert len(torch.unique(widths)) > 5
+    assert torch.all(run_lengths(masked) <= 1)
+
+
+@pytest.mark.parametrize("shape", [(num_frames, num_feats), (2, num_frames, num_feats)])
+def test_warp_lengths(shape):
+    lengths, valid_length = generate_lengths()
+    warper = SpecWarper(window=10, mode="bicubic", dim=-2)
+    warper.train()
+    x = torch.randn((batch_size,) + shape)
+    for _ in range(20):
+        y = warper(x, lengths)
+        assert y.shape == x.shape
+        for i in range(batch_size):
+            l = valid_length[i]
+            assert torch.equal(y[i, ..., l:, :], x[i, ..., l:, :])
+
+
+@pytest.mark.parametrize("mode", ["bilinear", "bicubic"])
+@pytest.mark.parametrize("dim", [-2, -1])
+@pytest.mark.parametrize("shape", [(num_frames, num_feats), (2, num_frames, num_feats)])
+def test_warp_shape(shape, dim, mode):
+    lengths, _ = generate_lengths()
+    warper = SpecWarper(window=5, mode=mode, dim=dim)
+    warper.train()
+    x = torch.randn((batch_size,) + shape)
+    y = warper(x, lengths)
+    assert y.shape == x.shape
+    assert not torch.equal(x, y)
+
+    warper.eval()
+    assert warper(x, lengths) is x
+
+
+def interpolate_warp(x, center, warped, mode):
+    """Time warping with one center for the full batch
+    as in the original implementation."""
+    x = x.unsqueeze(1)
+    left = nnf.interpolate(
+        x[:, :, :center], (warped, x.shape[3]), mode=mode, align_corners=False
+    )
+    right = nnf.interpolate(
+        x[:, :, center:],
+        (x.shape[2] - warped, x.shape[3]),
+        mode=mode,
+        align_corners=False,
+    )
+    return torch.cat([left, right], dim=-2).squeeze(1)
+
+
+@pytest.mark.parametrize("mode", ["bilinear", "bicubic"])
+@pytest.mark.parametrize("center, warped", [(90, 80), (100, 111), (50, 50)])
+def test_warp_shared_center(center, warped, mode):
+    torch.manual_seed(0)
+    warper = SpecWarper(window=20, mode=mode, dim=-2)
+    warper.train()
+    warper._get_warp_points = lambda valid_length: (
+        torch.full_like(valid_length, center),
+        torch.full_like(valid_length, warped),
+    )
+    x = torch.randn(batch_size, num_frames, num_feats)
+    y = warper(x)
+    y_ref = interpolate_warp(x, center, warped, mode)
+
+    # the original implementation interpolates each segment separately,
+    # we compare the frames that don't use frames of the other segment
+    t = torch.arange(num_frames) + 0.5
+    t_in = torch.where(
+        t < warped,
+        t * center / warped,
+        center + (t - warped) * (num_frames - center) / (num_frames - warped),
+    )
+    t_in = t_in - 0.5
+    margin = 2
+    inside = ((t_in > margin) & (t_in < center - 1 - margin)) | (
+        (t_in > center + margin) & (t_in < num_frames - 1 - margin)
+    )
+    assert torch.sum(inside) > num_frames - 20
+    assert torch.allclose(y[:, inside], y_ref[:, inside], atol=1e-4)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,57 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import torch
+
+from hyperion.torch.models import ResNetXVector, TDNNXVector
+from hyperion.torch.utils import can_mask_padding
+
+in_feats = 40
+x_lengths = torch.as_tensor([203, 160, 97, 64])
+
+
+def create_data():
+    torch.manual_seed(1)
+    x = torch.randn(len(x_lengths), in_feats, int(x_lengths.max()))
+    for i, n in enumerate(x_lengths):
+        x[i, :, n:] = 0
+    return x
+
+
+def create_models():
+    torch.manual_seed(0)
+    models = [
+        TDNNXVector("tdnn", 3, in_feats, 10, 64, kernel_size=3, dilation=2),
+        ResNetXVector("lresnet34", in_feats, 10, 1),
+        ResNetXVector("seresnet34", in_feats, 10, 1),
+    ]
+    for model in models:
+        model.eval()
+    return models
+
+
+def test_can_mask_padding():
+    tdnn, resnet, seresnet = create_models()
+    assert can_mask_padding(tdnn.encoder_net)
+    assert can_mask_padding(resnet.encoder_net)
+    assert not can_mask_padding(seresnet.encoder_net)
+
+
+@pytest.mark.parametrize("chunk_length", [0, 120])
+def test_extract_embed_batch(chunk_length):
+    x = create_data()
+    for model in create_models():
+        with torch.no_grad():
+            y = model.extract_embed(
+                x, chunk_length=chunk_length, x_lengths=x_lengths
+            )
+            for i, n in enumerate(x_lengths):
+                y_i = model.extract_embed(x[i : i + 1, :, :n], chunk_length=chunk_length)
+                torch.testing.assert_close(y[i : i + 1], y_i, rtol=1e-4, atol=1e-4)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,100 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import torch
+
+from hyperion.torch.narchs import AudioFeatsMVN as AF
+from hyperion.torch.models import (
+    ResNetXVector,
+    TDNNXVector,
+    XVectorInference,
+    ExportedXVector,
+)
+
+in_feats = 40
+fs = 16000
+
+
+def create_feat_extractor():
+    audio_feats = {
+        "audio_feat": "logfb",
+        "num_filters": in_feats,
+        "use_energy": False,
+        "dither": 0,
+    }
+    mvn = {"norm_mean": True, "norm_var": False, "context": 50}
+    return AF(audio_feats, mvn=mvn, trans=False)
+
+
+def create_tdnn():
+    return TDNNXVector("tdnn", 3, in_feats, 10, 64, kernel_size=3, dilation=2)
+
+
+def create_resnet():
+    return ResNetXVector("lresnet34", in_feats, 10, 1)
+
+
+def create_model(create_xvector):
+    torch.manual_seed(0)
+    model = XVectorInference(create_feat_extractor(), create_xvector())
+    model.eval()
+    return model
+
+
+def create_data():
+    torch.manual_seed(1)
+    x_lengths = torch.as_tensor([int(2.5 * fs), int(1.7 * fs), int(0.9 * fs)])
+    x = torch.randn(len(x_lengths), int(x_lengths.max())) * 1000
+    for i, n in enumerate(x_lengths):
+        x[i, n:] = 0
+    return x, x_lengths
+
+
+@pytest.mark.parametrize("create_xvector", [create_tdnn, create_resnet])
+def test_export_load(create_xvector, tmp_path):
+    model = create_model(create_xvector)
+    file_path = str(tmp_path / "xvector.pt")
+    model.export(file_path, example_secs=2.0, check_secs=1.3)
+    assert XVectorInference.is_exported(file_path)
+
+    exported = XVectorInference.load(file_path)
+    assert isinstance(exported, ExportedXVector)
+    assert exported.embed_dim == model.embed_dim
+    assert exported.fs == fs
+    assert exported.frame_shift == model.feat_extractor.frame_shift
+
+    # variable length batch, different from the tracing batch
+    x, x_lengths = create_data()
+    with torch.no_grad():
+        y = model(x, x_lengths)
+        y_exp = exported(x, x_lengths)
+        assert y_exp.shape == (len(x_lengths), model.embed_dim)
+        torch.testing.assert_close(y_exp, y, rtol=1e-4, atol=1e-4)
+
+        f, f_lengths = model.extract_feats(x, x_lengths)
+        f_exp, f_exp_lengths = exported.extract_feats(x, x_lengths)
+        assert torch.equal(f_exp_lengths, f_lengths)
+        torch.testing.assert_close(f_exp, f, rtol=1e-4, atol=1e-4)
+
+        y_exp = exported.extract_embed(f.transpose(1, 2).contiguous(), f_lengths)
+        torch.testing.assert_close(y_exp, y, rtol=1e-4, atol=1e-4)
+
+        # the embeddings of the batch are the same as
+        # the embeddings of the single utterances
+        for i, n in enumerate(x_lengths):
+            y_i = exported(x[i : i + 1, :n], x_lengths[i : i + 1])
+            torch.testing.assert_close(y_i, y[i : i + 1], rtol=1e-4, atol=1e-4)
+
+
+def test_is_exported(tmp_path):
+    model = create_model(create_tdnn)
+    file_path = str(tmp_path / "model.pth")
+    torch.save(model.state_dict(), file_path)
+    assert not XVectorInference.is_exported(file_path)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
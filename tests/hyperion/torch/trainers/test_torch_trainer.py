@@ -0,0 +1,134 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import glob
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, TensorDataset
+
+from hyperion.torch.trainers import TorchTrainer
+
+num_egs = 64
+in_feats = 8
+num_classes = 4
+num_batches = 6
+
+
+class Net(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.fc = nn.Linear(in_feats, num_classes)
+
+    def forward(self, x):
+        return self.fc(x)
+
+    def get_config(self):
+        return {}
+
+
+class Interrupted(Exception):
+    pass
+
+
+class BatchSampler(object):
+    """Batch sampler that reproduces the batches of an epoch,
+    it raises Interrupted before returning the batch interrupt_batch
+    of the epoch interrupt_epoch to simulate a killed job.
+    """
+
+    def __init__(self, batch_size=8, interrupt_epoch=None, interrupt_batch=None):
+        self.batch_size = batch_size
+        self.interrupt_epoch = interrupt_epoch
+        self.interrupt_batch = interrupt_batch
+        self.epoch = 0
+        self.start_batch = 0
+
+    def set_epoch(self, epoch, start_batch=0):
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    def __len__(self):
+        return num_batches
+
+    def __iter__(self):
+        g = torch.Generator()
+        g.manual_seed(self.epoch)
+        batches = [
+            torch.randint(num_egs, (self.batch_size,), generator=g).tolist()
+            for _ in range(num_batches)
+        ]
+        start_batch = self.start_batch
+        self.start_batch = 0
+        for i in range(start_batch, num_batches):
+            if self.epoch == self.interrupt_epoch and i == self.interrupt_batch:
+                raise Interrupted()
+            yield batches[i]
+
+
+def create_data_loader(**kwargs):
+    g = torch.Generator()
+    g.manual_seed(0)
+    x = torch.randn(num_egs, in_feats, generator=g)
+    y = torch.randint(num_classes, (num_egs,), generator=g)
+    return DataLoader(TensorDataset(x, y), batch_sampler=BatchSampler(**kwargs))
+
+
+def create_trainer(exp_path, **kwargs):
+    torch.manual_seed(0)
+    model = Net()
+    optim = torch.optim.Adam(model.parameters(), lr=0.01)
+    return TorchTrainer(
+        model,
+        nn.CrossEntropyLoss(),
+        optim=optim,
+        epochs=2,
+        exp_path=exp_path,
+        metrics={},
+        **kwargs
+    )
+
+
+def list_ckpts(exp_path):
+    return sorted(os.path.basename(f) for f in glob.glob("%s/*.pth" % exp_path))
+
+
+def test_resume_from_step_checkpoint(tmp_path):
+    # training without interruptions
+    ref_path = tmp_path / "ref"
+    trainer = create_trainer(ref_path)
+    trainer.fit(create_data_loader())
+    ref_state = trainer.model.state_dict()
+
+    # training killed at the 5th batch of the second epoch
+    exp_path = tmp_path / "exp"
+    trainer = create_trainer(exp_path, save_interval_steps=2)
+    with pytest.raises(Interrupted):
+        trainer.fit(create_data_loader(interrupt_epoch=1, interrupt_batch=4))
+    trainer._wait_save()
+    # the step checkpoints of the first epoch were removed at the end
+    # of the epoch and each step checkpoint removes the previous one
+    assert list_ckpts(exp_path) == ["model_ep0001.pth", "model_ep0002_batch0000004.pth"]
+    checkpoint = torch.load(exp_path / "model_ep0002_batch0000004.pth")
+    assert checkpoint["epoch"] == 1
+    assert checkpoint["batch"] == 4
+
+    # the new job resumes from the step checkpoint
+    trainer = create_trainer(exp_path, save_interval_steps=2)
+    trainer.load_last_checkpoint()
+    assert trainer.cur_epoch == 1
+    assert trainer.start_batch == 4
+    trainer.fit(create_data_loader())
+    assert list_ckpts(exp_path) == ["model_ep0001.pth", "model_ep0002.pth"]
+
+    state = trainer.model.state_dict()
+    for k in ref_state:
+        assert torch.allclose(state[k], ref_state[k], atol=1e-6), k
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
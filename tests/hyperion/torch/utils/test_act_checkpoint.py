@@ -0,0 +1,109 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+
+import torch
+import torch.nn as nn
+
+from hyperion.torch.narchs import LResNet18, ConformerEncoderV1
+
+batch_size = 3
+in_feats = 24
+num_frames = 64
+
+
+def create_resnet(act_checkpoint_stages=None, momentum=0.1):
+    torch.manual_seed(0)
+    nnet = LResNet18(
+        1,
+        conv_channels=8,
+        base_channels=8,
+        in_norm=False,
+        dropout_rate=0.1,
+        act_checkpoint_stages=act_checkpoint_stages,
+    )
+    for m in nnet.modules():
+        if isinstance(m, nn.modules.batchnorm._BatchNorm):
+            m.momentum = momentum
+    return nnet
+
+
+def create_conformer(act_checkpoint_blocks=None):
+    torch.manual_seed(0)
+    return ConformerEncoderV1(
+        in_feats,
+        d_model=32,
+        num_heads=2,
+        num_blocks=3,
+        d_ff=64,
+        conv_kernel_sizes=7,
+        dropout_rate=0.1,
+        act_checkpoint_blocks=act_checkpoint_blocks,
+    )
+
+
+def norm_layers(nnet):
+    return [m for m in nnet.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm)]
+
+
+def train_step(nnet, x, num_steps=2):
+    """Forward and backward in train mode,
+    the dropout masks are the same for both networks."""
+    nnet.train()
+    for step in range(num_steps):
+        nnet.zero_grad()
+        torch.manual_seed(1000 + step)
+        y = nnet(x)
+        y.pow(2).mean().backward()
+    return y.detach()
+
+
+def assert_same_training(nnet, nnet_ckpt, x):
+    assert len(norm_layers(nnet)) > 0
+    y = train_step(nnet, x)
+    y_ckpt = train_step(nnet_ckpt, x)
+    torch.testing.assert_close(y_ckpt, y, rtol=1e-5, atol=1e-6)
+
+    params = dict(nnet.named_parameters())
+    for k, p in nnet_ckpt.named_parameters():
+        torch.testing.assert_close(p.grad, params[k].grad, rtol=1e-5, atol=1e-6)
+
+    # the running stats are updated once per step,
+    # not again when the forward is recomputed
+    buffers = dict(nnet.named_buffers())
+    for k, b in nnet_ckpt.named_buffers():
+        torch.testing.assert_close(b, buffers[k], rtol=1e-5, atol=1e-6)
+    for m in norm_layers(nnet_ckpt):
+        assert m.num_batches_tracked == 2
+
+    # eval mode calls the modules without checkpointing
+    nnet.eval()
+    nnet_ckpt.eval()
+    with torch.no_grad():
+        torch.testing.assert_close(nnet_ckpt(x), nnet(x), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("momentum", [0.1, None])
+@pytest.mark.parametrize("stages", [[0], [1, 3], [0, 1, 2, 3, 4]])
+def test_resnet(stages, momentum):
+    nnet = create_resnet(momentum=momentum)
+    nnet_ckpt = create_resnet(stages, momentum=momentum)
+    torch.manual_seed(1)
+    x = torch.randn(batch_size, 1, in_feats, num_frames)
+    assert_same_training(nnet, nnet_ckpt, x)
+
+
+@pytest.mark.parametrize("blocks", [[0], [0, 1, 2]])
+def test_conformer(blocks):
+    nnet = create_conformer()
+    nnet_ckpt = create_conformer(blocks)
+    torch.manual_seed(1)
+    x = torch.randn(batch_size, in_feats, num_frames)
+    assert_same_training(nnet, nnet_ckpt, x)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
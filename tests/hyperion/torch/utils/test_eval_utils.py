@@ -0,0 +1,111 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import logging
+
+import torch
+
+from hyperion.torch.narchs import TDNNV1, LResNet18, SEResNet18
+from hyperion.torch.utils import (
+    can_mask_padding,
+    eval_nnet_by_chunks,
+    eval_nnet_with_lengths,
+)
+
+in_feats = 24
+
+
+def create_tdnn():
+    return TDNNV1(3, in_feats, 32, kernel_size=3, dilation=2)
+
+
+def create_resnet():
+    return LResNet18(
+        1, conv_channels=8, base_channels=8, in_norm=False, do_maxpool=False
+    )
+
+
+def create_seresnet():
+    return SEResNet18(1, conv_channels=8, base_channels=8, se_r=4, in_norm=False)
+
+
+def create_nnet(create):
+    torch.manual_seed(0)
+    nnet = create()
+    nnet.eval()
+    return nnet
+
+
+def create_data(resnet):
+    torch.manual_seed(1)
+    x_lengths = torch.as_tensor([200, 143, 77, 30])
+    x = torch.randn(len(x_lengths), in_feats, int(x_lengths.max()))
+    for i, n in enumerate(x_lengths):
+        x[i, :, n:] = 0
+    if resnet:
+        x = x.unsqueeze(1)
+    return x, x_lengths
+
+
+def assert_per_utt(x, nnet, x_lengths, y, y_lengths, chunk_length=0):
+    """the valid frames of the batch are the same as
+    evaluating each sequence on its own"""
+    for i, n in enumerate(x_lengths):
+        with torch.no_grad():
+            y_i = eval_nnet_by_chunks(x[i : i + 1, ..., :n], nnet, chunk_length)
+        assert y_lengths[i] == y_i.size(-1)
+        torch.testing.assert_close(
+            y[i : i + 1, ..., : y_i.size(-1)], y_i, rtol=1e-4, atol=1e-4
+        )
+
+
+@pytest.mark.parametrize(
+    "create, maskable",
+    [(create_tdnn, True), (create_resnet, True), (create_seresnet, False)],
+)
+def test_eval_with_lengths(create, maskable, caplog):
+    nnet = create_nnet(create)
+    assert can_mask_padding(nnet) == maskable
+    x, x_lengths = create_data(create != create_tdnn)
+    with caplog.at_level(logging.INFO):
+        with torch.no_grad():
+            y, y_lengths = eval_nnet_with_lengths(x, nnet, x_lengths)
+
+    assert_per_utt(x, nnet, x_lengths, y, y_lengths)
+    per_utt_msgs = [r for r in caplog.records if "utterance by utterance" in r.message]
+    if maskable:
+        assert len(per_utt_msgs) == 0
+    else:
+        assert len(per_utt_msgs) == 1
+        assert per_utt_msgs[0].levelno == logging.INFO
+        assert "SEResNet18" in per_utt_msgs[0].message
+
+        # the fallback is only logged once per network
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            with torch.no_grad():
+                eval_nnet_with_lengths(x, nnet, x_lengths)
+        assert not any("utterance by utterance" in r.message for r in caplog.records)
+
+
+def test_eval_with_lengths_by_chunks(caplog):
+    nnet = create_nnet(create_tdnn)
+    x, x_lengths = create_data(False)
+    with caplog.at_level(logging.INFO):
+        with torch.no_grad():
+            y, y_lengths = eval_nnet_with_lengths(
+                x, nnet, x_lengths, chunk_length=100
+            )
+
+    assert_per_utt(x, nnet, x_lengths, y, y_lengths, chunk_length=100)
+    per_utt_msgs = [r for r in caplog.records if "utterance by utterance" in r.message]
+    assert len(per_utt_msgs) == 1
+    assert per_utt_msgs[0].levelno == logging.INFO
+    assert "chunks of 100 frames" in per_utt_msgs[0].message
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,116 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+from collections import OrderedDict as ODict
+import numpy as np
+from numpy.testing import assert_allclose
+
+import torch
+
+from hyperion.torch.utils.metric_acc import MetricAcc, LazyMetrics
+
+
+def generate_batches(num_batches=23, seed=0):
+    """Batch metrics mixing python floats and float32/float64 tensors."""
+    rng = np.random.RandomState(seed)
+    batches = []
+    for i in range(num_batches):
+        metrics = ODict()
+        metrics["loss"] = torch.tensor(rng.randn() + 3, dtype=torch.float64)
+        metrics["acc"] = float(rng.rand())
+        metrics["err"] = torch.tensor(rng.rand(), dtype=torch.float32)
+        batches.append((metrics, int(rng.randint(1, 64))))
+    return batches
+
+
+def recursive_mean(batches):
+    """Per-batch recursive mean of the original MetricAcc."""
+    keys = list(batches[0][0].keys())
+    acc = np.zeros((len(keys),))
+    count = 0
+    for metrics, n in batches:
+        count += n
+        r = n / count
+        for i, k in enumerate(keys):
+            acc[i] += r * (float(metrics[k]) - acc[i])
+    return ODict((k, acc[i]) for i, k in enumerate(keys))
+
+
+@pytest.mark.parametrize("reduce_interval", [None, 1, 5])
+def test_metrics(reduce_interval):
+    batches = generate_batches()
+    metric_acc = MetricAcc()
+    for i, (metrics, n) in enumerate(batches):
+        metric_acc.update(metrics, n)
+        if reduce_interval is not None and (i + 1) % reduce_interval == 0:
+            metric_acc.reduce()
+
+    logs = metric_acc.metrics
+    ref_logs = recursive_mean(batches)
+    assert list(logs.keys()) == list(ref_logs.keys())
+    for k in ref_logs:
+        assert_allclose(logs[k], ref_logs[k], rtol=1e-6)
+
+    metric_acc.reset()
+    metric_acc.update(*batches[0])
+    for k, v in metric_acc.metrics.items():
+        assert_allclose(v, float(batches[0][0][k]), rtol=1e-6)
+
+
+def test_lazy_metrics():
+    batches = generate_batches()
+    metric_acc = MetricAcc()
+    for metrics, n in batches[:10]:
+        metric_acc.update(metrics, n)
+
+    logs = metric_acc.get_lazy_metrics("train_")
+    # values set before materialization are kept
+    logs["lr"] = 0.01
+    # nothing is reduced until the logs are read
+    assert len(metric_acc._pending_values) == 10
+    ref_logs = recursive_mean(batches[:10])
+    assert list(logs.keys()) == ["train_" + k for k in ref_logs] + ["lr"]
+    assert logs["lr"] == 0.01
+    assert len(metric_acc._pending_values) == 0
+    for k in ref_logs:
+        assert_allclose(logs["train_" + k], ref_logs[k], rtol=1e-6)
+
+    # the metrics are only read once
+    for metrics, n in batches[10:]:
+        metric_acc.update(metrics, n)
+    assert_allclose(logs["train_loss"], ref_logs["loss"], rtol=1e-6)
+
+    # values set after materialization
+    logs["lr"] = 0.02
+    logs["time"] = 1.0
+    del logs["train_acc"]
+    assert dict(logs) == {
+        "train_loss": logs["train_loss"],
+        "train_err": logs["train_err"],
+        "lr": 0.02,
+        "time": 1.0,
+    }
+    assert len(logs) == 4
+
+
+def test_lazy_metrics_not_computed():
+    calls = []
+
+    def get_metrics():
+        calls.append(1)
+        return ODict(loss=1.0)
+
+    logs = LazyMetrics(get_metrics)
+    logs["lr"] = 0.1
+    assert len(calls) == 0
+    assert logs["lr"] == 0.1
+    assert len(calls) == 1
+    assert dict(logs) == {"loss": 1.0, "lr": 0.1}
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
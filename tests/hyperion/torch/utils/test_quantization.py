@@ -0,0 +1,128 @@
+"""
+ Copyright 2022 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import copy
+import pytest
+import torch
+import torch.nn as nn
+
+from hyperion.torch.models import ResNetXVector, TDNNXVector, EfficientNetXVector
+from hyperion.torch.utils import (
+    QuantizedRegion,
+    prepare_int8,
+    convert_int8,
+    quantize_dynamic_int8,
+)
+
+pytestmark = pytest.mark.skipif(
+    "fbgemm" not in torch.backends.quantized.supported_engines,
+    reason="fbgemm quantized engine not available",
+)
+
+in_feats = 40
+
+
+def init_model(model):
+    # non-trivial batchnorm stats to check the conv-bn fusion
+    for module in model.modules():
+        if isinstance(module, (nn.BatchNorm1d, nn.BatchNorm2d)):
+            module.running_mean.normal_(0, 0.1)
+            module.running_var.uniform_(0.5, 2)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.normal_(0, 0.1)
+    model.eval()
+    return model
+
+
+def create_resnet(resnet_type, **kwargs):
+    torch.manual_seed(0)
+    return init_model(ResNetXVector(resnet_type, in_feats, 10, 1, **kwargs))
+
+
+def create_tdnn(tdnn_type, **kwargs):
+    torch.manual_seed(0)
+    model = TDNNXVector(
+        tdnn_type,
+        3,
+        in_feats,
+        10,
+        64,
+        enc_expand_units=128,
+        kernel_size=3,
+        dilation=[1, 2, 1],
+        **kwargs
+    )
+    return init_model(model)
+
+
+def create_efficientnet(effnet_type):
+    torch.manual_seed(0)
+    return init_model(EfficientNetXVector(effnet_type, in_feats, 10))
+
+
+def quantize(model, x):
+    model = copy.deepcopy(model)
+    prepare_int8(model.encoder_net)
+    with torch.no_grad():
+        model.extract_embed(x)
+    convert_int8(model.encoder_net)
+    quantize_dynamic_int8(model.classif_net.fc_blocks)
+    return model
+
+
+def num_regions(model):
+    return sum(isinstance(m, QuantizedRegion) for m in model.modules())
+
+
+def num_float_convs(model):
+    return sum(type(m) in (nn.Conv1d, nn.Conv2d) for m in model.modules())
+
+
+@pytest.mark.parametrize(
+    "create_model, regions",
+    [
+        # input block + 4 stages
+        (lambda: create_resnet("lresnet34"), 5),
+        (lambda: create_resnet("lresnet34", hid_act="relu6"), 5),
+        (lambda: create_resnet("lresnet34", norm_before=False), 5),
+        (lambda: create_resnet("seresnet34"), 5),
+        (lambda: create_resnet("tseresnet34"), 5),
+        (lambda: create_resnet("lresnet50"), 5),
+        # one region per block
+        (lambda: create_tdnn("tdnn"), 3),
+        (lambda: create_tdnn("tdnn", hid_act="relu", norm_before=True), 3),
+        (lambda: create_tdnn("etdnn"), 3),
+        (lambda: create_tdnn("resetdnn"), 3),
+        # input block + mbconv blocks + head block
+        (lambda: create_efficientnet("efficientnet-b0"), 18),
+    ],
+)
+def test_int8(create_model, regions):
+    torch.manual_seed(1)
+    x = torch.randn(4, in_feats, 100)
+    model = create_model()
+    model_int8 = quantize(model, x)
+    assert num_regions(model_int8) == regions
+    assert num_float_convs(model_int8) == 0
+    assert (
+        model_int8.encoder_net.out_shape()[1] == model.encoder_net.out_shape()[1]
+    )
+
+    with torch.no_grad():
+        y = model.extract_embed(x)
+        y_int8 = model_int8.extract_embed(x)
+
+    assert y_int8.shape == y.shape
+    assert torch.all(nn.functional.cosine_similarity(y, y_int8) > 0.99)
+
+
+def test_int8_not_supported():
+    model = create_tdnn("tdnn", norm_layer="group-norm")
+    with pytest.raises(ValueError):
+        prepare_int8(model.encoder_net)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,100 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.transforms import *
+
+output_dir = './tests/data_out/transforms'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+x_dim = 20
+model_file = output_dir + '/fused_transform_list.h5'
+
+
+def create_data(num_samples=5000, seed=0):
+    rng = np.random.RandomState(seed=0)
+    A = rng.randn(x_dim, x_dim)
+    mu = rng.randn(x_dim)
+    mu_y = 2 * rng.randn(10, x_dim)
+    rng = np.random.RandomState(seed=seed)
+    x = np.dot(rng.randn(num_samples, x_dim), A) + mu
+    y = rng.randint(0, 10, size=(num_samples,))
+    x += mu_y[y]
+    return x, y
+
+
+def create_transform_list(x, y):
+    rng = np.random.RandomState(seed=1)
+    transforms = []
+    cw = CentWhiten(name='cw')
+    cw.fit(x)
+    transforms.append(cw)
+    x = cw.predict(x)
+    lda = LDA(lda_dim=9, name='lda')
+    lda.fit(x, y)
+    transforms.append(lda)
+    x = lda.predict(x)
+    mvn = MVN(name='mvn')
+    mvn.fit(x)
+    transforms.append(mvn)
+    x = mvn.predict(x)
+    lnorm = LNorm(name='lnorm')
+    lnorm.fit(x)
+    transforms.append(lnorm)
+    x = lnorm.predict(x)
+    U = np.linalg.qr(rng.randn(x.shape[1], 2))[0].T
+    nap = NAP(U=U, name='nap')
+    transforms.append(nap)
+    x = nap.predict(x)
+    gauss = Gaussianizer(max_vectors=1000, name='gauss')
+    gauss.fit(x)
+    transforms.append(gauss)
+    x = gauss.predict(x)
+    pca = PCA(pca_dim=5, name='pca')
+    pca.fit(x)
+    transforms.append(pca)
+    return TransformList(transforms)
+
+
+def test_compile():
+    x, y = create_data()
+    tl = create_transform_list(x, y)
+    x, _ = create_data(seed=2)
+    fused = tl.compile(block_size=1000, num_threads=2)
+    stage_types = [s[0] for s in fused.stages]
+    assert stage_types == ['affine', 'lnorm', 'affine', 'transform', 'affine']
+
+    y_ref = tl.predict(x)
+    y_fused = fused.predict(x)
+    assert y_fused.dtype == np.float32
+    # the gaussianizer lookup may move a few values to the neighbour bin
+    assert np.mean(np.abs(y_fused - y_ref) < 1e-4) > 0.999
+
+    fused64 = tl.compile(dtype='float64', block_size=1000)
+    y_fused = fused64.predict(x)
+    assert y_fused.dtype == np.float64
+    assert_allclose(y_fused, y_ref, rtol=1e-6, atol=1e-6)
+
+
+def test_save_load():
+    x, y = create_data(num_samples=2000)
+    tl = create_transform_list(x, y)
+    x, _ = create_data(num_samples=2000, seed=2)
+    fused1 = tl.compile(block_size=500)
+    fused1.save(model_file)
+    fused2 = FusedTransformList.load(model_file)
+    assert_allclose(fused1.predict(x), fused2.predict(x))
+    fused3 = TransformList.load(model_file)
+    assert isinstance(fused3, FusedTransformList)
+    assert_allclose(fused1.predict(x), fused3.predict(x))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
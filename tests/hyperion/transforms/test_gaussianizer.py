@@ -0,0 +1,177 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import numpy as np
+from numpy.testing import assert_allclose
+from scipy.special import erfinv
+
+from hyperion.transforms import Gaussianizer
+
+output_dir = './tests/data_out/transforms'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+x_dim = 10
+
+
+def create_data(num_samples=20000, seed=0):
+    rng = np.random.RandomState(seed=seed)
+    # skewed non-gaussian data with different scale per dimension
+    x = rng.gamma(2., 1., size=(num_samples, x_dim)) * np.arange(1, x_dim+1)
+    return x
+
+
+def exact_quantiles(x, num_quantiles):
+    p = (np.arange(num_quantiles) + 1) / (num_quantiles + 1)
+    return np.quantile(x, p, axis=0, method='hazen')
+
+
+def old_predict(r, x):
+    px_cum = np.linspace(0, 1, r.shape[0]+2)[1:-1]
+    y_map = erfinv(2*px_cum-1)*np.sqrt(2)
+    r = r[1:]
+    y = np.zeros_like(x)
+    for i in range(x.shape[1]):
+        y[:,i] = y_map[np.searchsorted(r[:,i], x[:,i])]
+    return y
+
+
+def test_fit_exact():
+    # if the data fits in the sketch, quantiles are exact
+    x = create_data(2000)
+    model = Gaussianizer(num_quantiles=300)
+    model.fit(x)
+    assert_allclose(model.q, exact_quantiles(x, 300), rtol=1e-8, atol=1e-8)
+
+
+def test_partial_fit():
+    x = create_data(100000)
+    model = Gaussianizer(num_quantiles=200)
+    for i in range(0, x.shape[0], 7000):
+        model.partial_fit(x[i:i+7000])
+    model.finalize()
+
+    q = exact_quantiles(x, 200)
+    scale = np.arange(1, x_dim+1)
+    assert np.max(np.abs(model.q - q)/scale) < 0.02
+
+
+def test_predict():
+    x = create_data()
+    model = Gaussianizer(num_quantiles=500)
+    model.fit(x)
+
+    x_test = create_data(5000, seed=1)
+    y = model.predict(x_test)
+    assert y.dtype == np.float32
+
+    p = (np.arange(500) + 1) / 501
+    y_map = erfinv(2*p-1)*np.sqrt(2)
+    y_ref = np.zeros_like(x_test)
+    for i in range(x_dim):
+        y_ref[:,i] = np.interp(x_test[:,i], model.q[:,i], y_map)
+
+    assert_allclose(y, y_ref, atol=1e-4)
+    assert_allclose(np.mean(y, axis=0), 0, atol=0.1)
+    assert_allclose(np.std(y, axis=0), 1, atol=0.1)
+
+    # block processing
+    model.block_size = 1000
+    y2 = model.predict(x_test)
+    assert_allclose(y, y2)
+
+
+def test_predict_edges():
+    # values out of range, equal to the table points and repeated points,
+    # the table is rounded to float32 like in predict
+    q = np.sort(create_data(500), axis=0).astype('float32').astype('float64')
+    q[:, 0] = 1
+    q[:20, 1] = q[0, 1]
+    q[-20:, 2] = q[-1, 2]
+    model = Gaussianizer(num_quantiles=500, q=q)
+    x_test = np.vstack((create_data(1000, seed=1), q[::7], q[0] - 1, q[-1] + 1))
+    x_test = x_test.astype('float32')
+    y = model.predict(x_test)
+    y_ref = np.zeros_like(x_test)
+    for i in range(x_dim):
+        y_ref[:,i] = np.interp(x_test[:,i], q[:,i], model.y_map)
+
+    assert_allclose(y, y_ref, atol=1e-4)
+
+    r = np.vstack((np.zeros((1, x_dim)), q))
+    model = Gaussianizer(r=r)
+    y = model.predict(x_test)
+    assert_allclose(y, old_predict(r, x_test), rtol=1e-5, atol=1e-5)
+
+
+def test_predict_approx():
+    x = create_data()
+    model = Gaussianizer(num_quantiles=500)
+    model.fit(x)
+    x_test = create_data(5000, seed=1)
+    y = model.predict(x_test)
+
+    model.approx_grid_size = 4096
+    y_approx = model.predict(x_test)
+    assert np.mean(np.abs(y - y_approx)) < 0.01
+
+    # the approximation must be monotone
+    x_sort = np.sort(x_test, axis=0)
+    y_sort = model.predict(x_sort)
+    assert np.all(np.diff(y_sort, axis=0) >= 0)
+
+
+def test_predict_old_model():
+    x = create_data(3000)
+    r = np.sort(x, axis=0)
+    r = np.vstack((np.zeros((1, x_dim)), r))
+    model = Gaussianizer(r=r)
+
+    x_test = create_data(1000, seed=1)
+    y = model.predict(x_test)
+    y_ref = old_predict(r, x_test)
+    assert_allclose(y, y_ref, rtol=1e-5, atol=1e-5)
+
+
+def test_save_load():
+    x = create_data()
+    model = Gaussianizer(num_quantiles=300, approx_grid_size=1024, name='gauss')
+    model.fit(x)
+
+    file_path = output_dir + '/gaussianizer.h5'
+    model.save(file_path)
+    model2 = Gaussianizer.load(file_path)
+    assert model2.num_quantiles == 300
+    assert model2.approx_grid_size == 1024
+    assert_allclose(model.q, model2.q, rtol=1e-5)
+
+    x_test = create_data(1000, seed=1)
+    assert_allclose(model.predict(x_test), model2.predict(x_test),
+                    atol=1e-4)
+
+
+def test_save_load_mat():
+    x = create_data()
+    model = Gaussianizer(num_quantiles=300)
+    model.fit(x)
+
+    file_path = output_dir + '/gaussianizer_mat.h5'
+    model.save_mat(file_path)
+    model2 = Gaussianizer.load_mat(file_path)
+    x_test = create_data(1000, seed=1)
+    assert_allclose(model.predict(x_test), model2.predict(x_test),
+                    atol=1e-5)
+
+    r = np.sort(x[:3000], axis=0)
+    model = Gaussianizer(r=r)
+    model.save_mat(file_path)
+    model2 = Gaussianizer.load_mat(file_path)
+    assert_allclose(model.predict(x_test), model2.predict(x_test))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
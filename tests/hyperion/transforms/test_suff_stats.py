@@ -0,0 +1,138 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import os
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.io import DataWriterFactory as DWF
+from hyperion.io import SequentialDataReaderFactory as SDRF
+from hyperion.transforms import *
+
+output_dir = './tests/data_out/transforms'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+x_dim = 10
+num_classes = 20
+stats_file = output_dir + '/class_stats.h5'
+
+
+def create_data(num_samples=3000):
+    rng = np.random.RandomState(seed=0)
+    A = rng.randn(x_dim, x_dim)
+    y = rng.randint(0, num_classes, size=(num_samples,))
+    x = np.dot(rng.randn(num_samples, x_dim), A) + 3 * rng.randn(num_classes, x_dim)[y]
+    return x, y
+
+
+def chunks(x, y=None, chunk_size=700):
+    for i in range(0, x.shape[0], chunk_size):
+        if y is None:
+            yield x[i:i+chunk_size]
+        else:
+            yield x[i:i+chunk_size], y[i:i+chunk_size]
+
+
+def test_gauss_stats_merge():
+    x, _ = create_data()
+    s1 = GaussStats()
+    s1.accum(x[:1000])
+    s2 = GaussStats()
+    s2.accum(x[1000:])
+    s = GaussStats.merge_list([s1, s2])
+    assert s.N == x.shape[0]
+    assert_allclose(s.mu, np.mean(x, axis=0))
+    assert_allclose(s.Sigma, np.cov(x.T, bias=True), rtol=1e-8, atol=1e-8)
+
+
+def test_pca_cw_mvn_partial_fit():
+    x, _ = create_data()
+    for model_class in [PCA, CentWhiten]:
+        model1 = model_class()
+        model1.fit(x)
+        model2 = model_class()
+        for x_i in chunks(x):
+            model2.partial_fit(x_i)
+        model2.finalize()
+        assert_allclose(model1.mu, model2.mu)
+        assert_allclose(model1.T, model2.T, rtol=1e-6, atol=1e-6)
+
+    model1 = MVN()
+    model1.fit(x)
+    model2 = MVN()
+    for x_i in chunks(x):
+        model2.partial_fit(x_i)
+    model2.finalize()
+    assert_allclose(model1.mu, model2.mu)
+    assert_allclose(model1.s, model2.s)
+
+
+def test_sbsw_lda_partial_fit():
+    x, y = create_data()
+    class_counts = np.bincount(y)
+    sbsw1 = SbSw()
+    sbsw1.fit(x, y)
+    sbsw2 = SbSw()
+    for x_i, y_i in chunks(x, y):
+        sbsw2.partial_fit(x_i, y_i, class_counts)
+    sbsw2.finalize()
+    assert sbsw2.num_classes == num_classes
+    assert_allclose(sbsw1.mu, sbsw2.mu)
+    assert_allclose(sbsw1.Sb, sbsw2.Sb, rtol=1e-8, atol=1e-8)
+    assert_allclose(sbsw1.Sw, sbsw2.Sw, rtol=1e-8, atol=1e-8)
+
+    lda1 = LDA(lda_dim=5)
+    lda1.fit(x, y)
+    lda2 = LDA(lda_dim=5)
+    for x_i, y_i in chunks(x, y):
+        lda2.partial_fit(x_i, y_i, class_counts)
+    lda2.finalize()
+    assert_allclose(lda1.T, lda2.T, rtol=1e-6, atol=1e-6)
+
+
+def test_class_stats_merge_save_load():
+    x, y = create_data()
+    s1 = ClassStats(name='stats')
+    s1.accum(x[:1000], y[:1000])
+    s1.save(stats_file)
+    s1 = ClassStats.load(stats_file)
+    s2 = ClassStats()
+    s2.accum(x[1000:], y[1000:])
+    lda = LDA()
+    lda.merge_stats(s2)
+    lda.merge_stats(s1)
+    mu, Sb, Sw = lda.stats.compute_sb_sw()
+    assert_allclose(mu, np.mean([np.mean(x[y==i], axis=0) for i in range(num_classes)], axis=0))
+    N = np.bincount(y)
+    Sw2 = sum([N[i]*np.cov(x[y==i].T, bias=True) for i in range(num_classes)])/len(y)
+    assert_allclose(Sw, Sw2, rtol=1e-8, atol=1e-8)
+
+
+def test_partial_fit_from_reader():
+    x, y = create_data(num_samples=500)
+    keys = ['utt%04d' % i for i in range(len(y))]
+    rspecifier = 'scp:%s/vecs.scp' % output_dir
+    with DWF.create('h5,scp:%s/vecs.h5,%s/vecs.scp' % (output_dir, output_dir)) as w:
+        w.write(keys, x)
+
+    reader = SDRF.create(rspecifier)
+    pca = partial_fit_from_reader(PCA(), reader, num_records=128)
+    pca2 = PCA()
+    pca2.fit(x)
+    assert_allclose(pca.T, pca2.T, rtol=1e-5, atol=1e-5)
+
+    reader = SDRF.create(rspecifier)
+    class_ids = dict(zip(keys, y))
+    lda = partial_fit_from_reader(LDA(lda_dim=5), reader, num_records=128,
+                                  class_ids=class_ids, class_counts=np.bincount(y))
+    lda2 = LDA(lda_dim=5)
+    lda2.fit(x, y)
+    assert_allclose(lda.T, lda2.T, rtol=1e-4, atol=1e-4)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
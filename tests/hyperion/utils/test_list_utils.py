@@ -95,5 +95,32 @@ def test_split_by_key():
     assert(np.all(loc == [i for i in range(4, 10)]))
 
 
+
+def test_split_balanced():
+
+    list1 = ['a', 'b', 'c', 'd', 'e', 'f']
+    weights = [120, 10, 10, 40, 30, 20]
+    list_s, loc = split_list_balanced(list1, weights, 1, 2)
+    assert(np.all(list_s == ['a']))
+    assert(np.all(loc == [0]))
+
+    list_s, loc = split_list_balanced(list1, weights, 2, 2)
+    assert(np.all(list_s == ['b', 'c', 'd', 'e', 'f']))
+    assert(np.all(loc == [1, 2, 3, 4, 5]))
+
+
+def test_partition_balanced():
+
+    weights = [120, 10, 10, 40, 30, 20]
+    part_ids = partition_list_balanced(weights, 2)
+    assert(np.all(part_ids == [0, 1, 1, 1, 1, 1]))
+
+    weights = [50, 10, 40, 30, 20, 10]
+    part_ids = partition_list_balanced(weights, 3)
+    for i in range(3):
+        list_s, loc = split_list_balanced(np.arange(6), weights, i+1, 3)
+        assert(np.all(loc == (part_ids == i).nonzero()[0]))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,48 @@
+"""
+ Copyright 2021 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import pytest
+import time
+import numpy as np
+
+from hyperion.utils.process_pool import ordered_imap, WorkerRTF
+
+
+def square(x):
+    # reverse the finishing order to check that outputs are sorted
+    time.sleep(0.01*(10-x))
+    return x**2
+
+
+def test_ordered_imap_serial():
+    y = list(ordered_imap(square, range(10), num_workers=1))
+    assert y == [x**2 for x in range(10)]
+
+
+def test_ordered_imap():
+    consumed = []
+    def gen():
+        for x in range(10):
+            consumed.append(x)
+            yield x
+
+    y = []
+    for y_i in ordered_imap(square, gen(), num_workers=2, max_pending=3,
+                            mp_context='fork'):
+        # back-pressure: no more than max_pending items ahead of the output
+        assert len(consumed) <= len(y) + 4
+        y.append(y_i)
+
+    assert y == [x**2 for x in range(10)]
+
+
+def test_worker_rtf():
+    rtf = WorkerRTF()
+    rtf.update(1, 1., 10.)
+    rtf.update(2, 2., 10.)
+    rtf.update(1, 1., 10.)
+    assert rtf.count == {1: 2, 2: 1}
+    assert rtf.proc_time[1] == 2.
+    rtf.report(2.)